@@ -0,0 +1,46 @@
+"""user_import_001: таблица user_import_jobs для фонового импорта жильцов.
+
+Раньше /users/import_excel грузил весь workbook в web-воркер и построчно
+создавал комнаты/жильцов в одной сессии — импорт всего жилфонда держал
+воркер минутами и при падении на середине откатывался целиком. Теперь
+импорт — Celery-задача, которая пишет пачками и коммитит каждую пачку
+вместе с checkpoint_row: прогресс виден в UI, упавший импорт продолжается
+со следующей строки.
+"""
+from alembic import op
+
+revision = "user_import_001"
+down_revision = "reading_source_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS user_import_jobs (
+            id SERIAL PRIMARY KEY,
+            status VARCHAR(24) NOT NULL DEFAULT 'pending',
+            file_path VARCHAR(512) NOT NULL,
+            file_name VARCHAR(255),
+            progress INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER NOT NULL DEFAULT 0,
+            processed_rows INTEGER NOT NULL DEFAULT 0,
+            checkpoint_row INTEGER NOT NULL DEFAULT 1,
+            summary JSONB,
+            started_by_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            started_by_username VARCHAR(128),
+            celery_task_id VARCHAR(64),
+            error TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            finished_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_import_jobs_id ON user_import_jobs (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_import_jobs_status_created "
+        "ON user_import_jobs (status, created_at)"
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS user_import_jobs")
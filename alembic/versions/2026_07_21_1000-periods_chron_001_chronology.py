@@ -0,0 +1,79 @@
+"""periods_chron_001: хранимая хронология биллингового периода.
+
+BillingPeriod.id — порядок создания записи, а не месяц (ретроактивные
+периоды). Поэтому каждый отчёт разбирал «Май 2026» в Python и сортировал
+ВСЕ периоды на каждый запрос. Теперь в periods лежат chron_year,
+chron_month и chron_ordinal = year*12 + month (непарсимые имена → 0), с
+индексом (chron_ordinal, id): SQL сортирует/фильтрует по хронологии,
+«N прошлых периодов» — диапазон по индексу.
+
+ORM держит колонки валидатором BillingPeriod.name; триггер ниже — для
+INSERT/UPDATE name мимо ORM. Бэкфилл — тем же триггером (SET name = name).
+Разбор зеркалит period_helpers.parse_period_name.
+"""
+from alembic import op
+
+revision = "periods_chron_001"
+down_revision = "user_import_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE periods ADD COLUMN IF NOT EXISTS chron_year SMALLINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE periods ADD COLUMN IF NOT EXISTS chron_month SMALLINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE periods ADD COLUMN IF NOT EXISTS chron_ordinal INTEGER NOT NULL DEFAULT 0")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_periods_chron_ordinal "
+        "ON periods (chron_ordinal, id)"
+    )
+    # lower() для кириллицы зависит от локали БД (в C-локали не работает),
+    # поэтому сверяемся и с нижним, и с каноническим «Май»-регистром.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION periods_set_chronology() RETURNS trigger AS $$
+        DECLARE
+            parts text[];
+            mon integer;
+            yr integer;
+        BEGIN
+            parts := regexp_match(btrim(NEW.name), '^(\\S+)\\s+(\\d{1,9})$');
+            IF parts IS NOT NULL THEN
+                mon := coalesce(
+                    array_position(ARRAY['январь','февраль','март','апрель','май','июнь',
+                                         'июль','август','сентябрь','октябрь','ноябрь','декабрь'],
+                                   lower(parts[1])),
+                    array_position(ARRAY['Январь','Февраль','Март','Апрель','Май','Июнь',
+                                         'Июль','Август','Сентябрь','Октябрь','Ноябрь','Декабрь'],
+                                   parts[1])
+                );
+                yr := parts[2]::integer;
+            END IF;
+            IF mon IS NULL OR yr IS NULL OR yr < 2000 OR yr > 2100 THEN
+                NEW.chron_year := 0;
+                NEW.chron_month := 0;
+                NEW.chron_ordinal := 0;
+            ELSE
+                NEW.chron_year := yr;
+                NEW.chron_month := mon;
+                NEW.chron_ordinal := yr * 12 + mon;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_periods_chronology ON periods")
+    op.execute("""
+        CREATE TRIGGER trg_periods_chronology
+        BEFORE INSERT OR UPDATE OF name ON periods
+        FOR EACH ROW EXECUTE FUNCTION periods_set_chronology()
+    """)
+    op.execute("UPDATE periods SET name = name")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_periods_chronology ON periods")
+    op.execute("DROP FUNCTION IF EXISTS periods_set_chronology()")
+    op.execute("DROP INDEX IF EXISTS idx_periods_chron_ordinal")
+    op.execute("ALTER TABLE periods DROP COLUMN IF EXISTS chron_ordinal")
+    op.execute("ALTER TABLE periods DROP COLUMN IF EXISTS chron_month")
+    op.execute("ALTER TABLE periods DROP COLUMN IF EXISTS chron_year")
@@ -0,0 +1,21 @@
+"""recalc_shards_001: чекпоинты шардов перерасчёта периода.
+
+Перерасчёт режется на шарды по зданиям (Celery chord). recalc_jobs.shard_state
+хранит план и чекпоинт каждого шарда (last_id keyset-обхода + частичный
+diff-итог); шарды пишут его атомарным jsonb_set вместе с апдейтами чанка,
+поэтому retry продолжает с места падения.
+"""
+from alembic import op
+
+revision = "recalc_shards_001"
+down_revision = "periods_chron_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE recalc_jobs ADD COLUMN IF NOT EXISTS shard_state JSONB")
+
+
+def downgrade():
+    op.execute("ALTER TABLE recalc_jobs DROP COLUMN IF EXISTS shard_state")
@@ -0,0 +1,124 @@
+"""audit_part_001: помесячное партиционирование audit_log.
+
+write_audit_log пишет почти на каждое админ-действие, а таблица росла
+без ретеншна с шестью вторичными индексами — стоимость вставки и bloat
+индексов росли вместе с историей. Теперь audit_log — RANGE (created_at)
+с партициями audit_log_yYYYYmMM:
+
+  * PK (id, created_at) — ключ партиционирования обязан входить в PK;
+  * индексы сведены к четырём, под реальные запросы журнала:
+    (created_at), (action, created_at), (entity_type, created_at),
+    (user_id, created_at). idx_audit_action / idx_audit_user_id /
+    idx_audit_entity покрыты составными или не использовались;
+  * партиции создаются здесь для всей истории + 3 месяца вперёд, дальше
+    их заранее заводит maintain_audit_partitions_task; DEFAULT-партиция —
+    страховка для дат вне диапазона;
+  * старые партиции та же задача выгружает в gzip-JSONL
+    (services/audit_archive) и отсоединяет.
+"""
+from alembic import op
+
+revision = "audit_part_001"
+down_revision = "recalc_shards_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE IF EXISTS audit_log RENAME TO audit_log_old")
+    op.execute("""
+        CREATE TABLE audit_log (
+            id SERIAL,
+            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            username VARCHAR NOT NULL,
+            action VARCHAR NOT NULL,
+            entity_type VARCHAR NOT NULL,
+            entity_id INTEGER,
+            details JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Партиции: от месяца самой старой записи до текущего + 3.
+    op.execute("""
+        DO $$
+        DECLARE
+            m date;
+            last_month date;
+        BEGIN
+            m := date_trunc('month', now())::date;
+            IF to_regclass('audit_log_old') IS NOT NULL THEN
+                EXECUTE 'SELECT date_trunc(''month'', coalesce(min(created_at), now()))::date FROM audit_log_old'
+                    INTO m;
+            END IF;
+            last_month := (date_trunc('month', now()) + interval '3 months')::date;
+            WHILE m <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_log FOR VALUES FROM (%L) TO (%L)',
+                    'audit_log_y' || to_char(m, 'YYYY') || 'm' || to_char(m, 'MM'),
+                    m, (m + interval '1 month')::date
+                );
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute("CREATE TABLE IF NOT EXISTS audit_log_default PARTITION OF audit_log DEFAULT")
+
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('audit_log_old') IS NOT NULL THEN
+                INSERT INTO audit_log (id, user_id, username, action, entity_type,
+                                       entity_id, details, created_at)
+                SELECT id, user_id, username, action, entity_type,
+                       entity_id, details, coalesce(created_at, now())
+                FROM audit_log_old;
+            END IF;
+        END $$;
+    """)
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('audit_log', 'id'), "
+        "coalesce(max(id), 1), max(id) IS NOT NULL) FROM audit_log"
+    )
+    op.execute("DROP TABLE IF EXISTS audit_log_old CASCADE")
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_log (created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_action_created ON audit_log (action, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_entity_created ON audit_log (entity_type, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_created ON audit_log (user_id, created_at)")
+
+
+def downgrade():
+    # Архивированные (выгруженные в JSONL) партиции назад не возвращаются.
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_part")
+    op.execute("""
+        CREATE TABLE audit_log (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            username VARCHAR NOT NULL,
+            action VARCHAR NOT NULL,
+            entity_type VARCHAR NOT NULL,
+            entity_id INTEGER,
+            details JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("""
+        INSERT INTO audit_log (id, user_id, username, action, entity_type,
+                               entity_id, details, created_at)
+        SELECT id, user_id, username, action, entity_type,
+               entity_id, details, created_at
+        FROM audit_log_part
+    """)
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('audit_log', 'id'), "
+        "coalesce(max(id), 1), max(id) IS NOT NULL) FROM audit_log"
+    )
+    op.execute("DROP TABLE audit_log_part CASCADE")
+    op.execute("CREATE INDEX idx_audit_user_id ON audit_log (user_id)")
+    op.execute("CREATE INDEX idx_audit_entity ON audit_log (entity_type, entity_id)")
+    op.execute("CREATE INDEX idx_audit_action ON audit_log (action)")
+    op.execute("CREATE INDEX idx_audit_created ON audit_log (created_at)")
+    op.execute("CREATE INDEX idx_audit_action_created ON audit_log (action, created_at)")
+    op.execute("CREATE INDEX idx_audit_entity_created ON audit_log (entity_type, created_at)")
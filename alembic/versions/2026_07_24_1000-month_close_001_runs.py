@@ -0,0 +1,40 @@
+"""month_close_001: прогоны закрытия месяца (граф этапов).
+
+month_close_runs хранит состояние каждого этапа (stages), общий контекст
+preload (context) и параметры запуска (options) — упавший этап
+перезапускается отдельно, выполненные не повторяются.
+"""
+from alembic import op
+
+revision = "month_close_001"
+down_revision = "audit_part_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS month_close_runs (
+            id SERIAL PRIMARY KEY,
+            period_id INTEGER NOT NULL REFERENCES periods(id) ON DELETE CASCADE,
+            status VARCHAR(24) NOT NULL DEFAULT 'running',
+            options JSONB NOT NULL DEFAULT '{}'::jsonb,
+            context JSONB NOT NULL DEFAULT '{}'::jsonb,
+            stages JSONB NOT NULL DEFAULT '{}'::jsonb,
+            started_by_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+            started_by_username VARCHAR(128),
+            error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            finished_at TIMESTAMP
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_month_close_runs_id ON month_close_runs (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_month_close_runs_period_created "
+        "ON month_close_runs (period_id, created_at)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS idx_month_close_runs_status ON month_close_runs (status)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS month_close_runs")
@@ -0,0 +1,55 @@
+"""debt_snap_001: debt_snapshots — долги жильцов по импортам 1С строками.
+
+История долгов жильца и diff импортов читали applied_state (JSONB на
+тысячи жильцов) каждого импорта. Теперь — строка на (импорт, жилец) с
+индексом (user_id, started_at). Backfill из applied_state существующих
+логов — здесь же одним INSERT ... SELECT (повторно:
+python -m app.scripts.backfill_debt_snapshots).
+"""
+from alembic import op
+
+revision = "debt_snap_001"
+down_revision = "month_close_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS debt_snapshots (
+            import_log_id INTEGER NOT NULL REFERENCES debt_import_logs(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            account_type VARCHAR(8) NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            debt NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            overpayment NUMERIC(12, 2) NOT NULL DEFAULT 0,
+            username VARCHAR(255),
+            room_id INTEGER,
+            room_label VARCHAR(255),
+            PRIMARY KEY (import_log_id, user_id)
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_debt_snapshots_user_started "
+        "ON debt_snapshots (user_id, started_at)"
+    )
+    op.execute(r"""
+        INSERT INTO debt_snapshots (import_log_id, user_id, account_type, started_at,
+                                    debt, overpayment, username, room_id, room_label)
+        SELECT l.id, e.key::int, l.account_type, l.started_at,
+               COALESCE(NULLIF(e.value ->> ('debt_' || l.account_type), '')::numeric, 0),
+               COALESCE(NULLIF(e.value ->> ('overpayment_' || l.account_type), '')::numeric, 0),
+               LEFT(e.value ->> 'username', 255),
+               NULLIF(e.value ->> 'room_id', '')::int,
+               LEFT(e.value ->> 'room_label', 255)
+        FROM debt_import_logs l
+        CROSS JOIN LATERAL jsonb_each(l.applied_state) e
+        WHERE l.applied_state IS NOT NULL
+          AND jsonb_typeof(l.applied_state) = 'object'
+          AND e.key ~ '^[0-9]{1,9}$'
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS debt_snapshots")
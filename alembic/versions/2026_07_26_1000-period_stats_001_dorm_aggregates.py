@@ -0,0 +1,92 @@
+"""period_stats_001: period_dorm_stats — агрегаты показаний (период, общежитие).
+
+«Сравнение периодов», предпросмотр закрытия и тренды читали SUM/COUNT по
+readings при каждом вызове. Теперь — готовые строки period_dorm_stats;
+устаревание — метки period_stats_marks, которые пишут слушатели сессии в
+транзакции записи readings; period_stats_state — xmin последнего
+пересчёта периода (services/period_stats.py).
+
+Backfill всех периодов — здесь же одним INSERT ... SELECT (повторно:
+python -m app.scripts.rebuild_period_stats).
+"""
+from alembic import op
+
+revision = "period_stats_001"
+down_revision = "debt_snap_001"
+branch_labels = None
+depends_on = None
+
+_COSTS = (
+    "cost_hot_water", "cost_cold_water", "cost_sewage",
+    "cost_electricity", "cost_maintenance", "cost_social_rent",
+    "cost_waste", "cost_fixed_part", "total_cost",
+)
+
+
+def upgrade():
+    cost_columns = ",\n".join(f"{c} NUMERIC(14, 2) NOT NULL DEFAULT 0" for c in _COSTS)
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS period_dorm_stats (
+            period_id INTEGER NOT NULL REFERENCES periods(id) ON DELETE CASCADE,
+            dormitory_key VARCHAR(255) NOT NULL DEFAULT '',
+            approved_count INTEGER NOT NULL DEFAULT 0,
+            draft_count INTEGER NOT NULL DEFAULT 0,
+            anomaly_drafts INTEGER NOT NULL DEFAULT 0,
+            rooms_submitted INTEGER NOT NULL DEFAULT 0,
+            {cost_columns},
+            draft_sum NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (period_id, dormitory_key)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS period_stats_state (
+            period_id INTEGER PRIMARY KEY REFERENCES periods(id) ON DELETE CASCADE,
+            refreshed_xmin BIGINT NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS period_stats_marks (
+            id BIGSERIAL PRIMARY KEY,
+            period_id INTEGER,
+            xid BIGINT NOT NULL DEFAULT (pg_current_xact_id()::text)::bigint
+        )
+    """)
+
+    # Backfill: xmin фиксируем ДО агрегата — записи, идущие параллельно
+    # миграции, оставят метки с xid >= него и период пересчитается.
+    op.execute("""
+        INSERT INTO period_stats_state (period_id, refreshed_xmin, refreshed_at)
+        SELECT id, (pg_snapshot_xmin(pg_current_snapshot())::text)::bigint,
+               timezone('utc', now())
+        FROM periods
+        ON CONFLICT (period_id) DO NOTHING
+    """)
+    sums = ",\n".join(
+        f"COALESCE(SUM(r.{c}) FILTER (WHERE r.is_approved IS TRUE), 0)" for c in _COSTS
+    )
+    op.execute(f"""
+        INSERT INTO period_dorm_stats (
+            period_id, dormitory_key, approved_count, draft_count,
+            anomaly_drafts, rooms_submitted, {", ".join(_COSTS)}, draft_sum
+        )
+        SELECT r.period_id, COALESCE(rm.dormitory_name, ''),
+               COUNT(*) FILTER (WHERE r.is_approved IS TRUE),
+               COUNT(*) FILTER (WHERE r.is_approved IS FALSE),
+               COUNT(*) FILTER (WHERE r.is_approved IS FALSE AND r.anomaly_score >= 80),
+               COUNT(DISTINCT r.room_id) FILTER (WHERE r.hot_water IS NOT NULL
+                   OR r.cold_water IS NOT NULL OR r.electricity IS NOT NULL),
+               {sums},
+               COALESCE(SUM(r.total_cost) FILTER (WHERE r.is_approved IS FALSE), 0)
+        FROM readings r
+        LEFT JOIN rooms rm ON rm.id = r.room_id
+        WHERE r.period_id IS NOT NULL
+        GROUP BY r.period_id, COALESCE(rm.dormitory_name, '')
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS period_stats_marks")
+    op.execute("DROP TABLE IF EXISTS period_stats_state")
+    op.execute("DROP TABLE IF EXISTS period_dorm_stats")
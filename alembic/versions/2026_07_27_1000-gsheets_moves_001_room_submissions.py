@@ -0,0 +1,113 @@
+"""gsheets_moves_001: gsheets_room_submissions — сводка подач (жилец, комната, месяц).
+
+«Кандидаты на переезд» на каждый вызов тянули ВСЕ сопоставленные строки
+gsheets_import_rows за год и группировали их в Python. Теперь — сводка
+row_count по (жилец, комната, месяц sheet_timestamp), которую ведёт
+триггер: сопоставление, утверждение, отклонение, переназначение и
+удаление строки импорта двигают счётчики на ±1 в той же транзакции.
+Триггер, а не слушатель Session — строки импорта правят и bulk UPDATE
+(supersede, очистка аномалий, скрипты), и psql.
+
+Учитывается строка с matched_user_id, matched_room_id, sheet_timestamp и
+status <> 'rejected' — тот же фильтр, что был в эндпоинте.
+
+Backfill — здесь же одним INSERT ... SELECT. CREATE TRIGGER берёт
+блокировку gsheets_import_rows до конца миграции, так что записей между
+триггером и backfill не бывает.
+"""
+from alembic import op
+
+revision = "gsheets_moves_001"
+down_revision = "period_stats_001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS gsheets_room_submissions (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            room_id INTEGER NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+            month DATE NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, room_id, month)
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_gsheets_room_submissions_month "
+        "ON gsheets_room_submissions (month)"
+    )
+    # OLD/NEW разбираем вложенными IF: в plpgsql AND не обязан быть ленивым,
+    # а OLD у INSERT (и NEW у DELETE) не определён.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION gsheets_room_submissions_sync() RETURNS trigger AS $$
+        DECLARE
+            old_counted boolean := false;
+            new_counted boolean := false;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_counted := OLD.matched_user_id IS NOT NULL
+                    AND OLD.matched_room_id IS NOT NULL
+                    AND OLD.sheet_timestamp IS NOT NULL
+                    AND coalesce(OLD.status <> 'rejected', false);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_counted := NEW.matched_user_id IS NOT NULL
+                    AND NEW.matched_room_id IS NOT NULL
+                    AND NEW.sheet_timestamp IS NOT NULL
+                    AND coalesce(NEW.status <> 'rejected', false);
+            END IF;
+            -- pending → approved (promote) и прочие правки без смены ключа.
+            IF TG_OP = 'UPDATE' AND old_counted AND new_counted
+               AND OLD.matched_user_id = NEW.matched_user_id
+               AND OLD.matched_room_id = NEW.matched_room_id
+               AND date_trunc('month', OLD.sheet_timestamp) = date_trunc('month', NEW.sheet_timestamp) THEN
+                RETURN NULL;
+            END IF;
+            IF old_counted THEN
+                UPDATE gsheets_room_submissions SET row_count = row_count - 1
+                WHERE user_id = OLD.matched_user_id AND room_id = OLD.matched_room_id
+                  AND month = date_trunc('month', OLD.sheet_timestamp)::date;
+                DELETE FROM gsheets_room_submissions
+                WHERE user_id = OLD.matched_user_id AND room_id = OLD.matched_room_id
+                  AND month = date_trunc('month', OLD.sheet_timestamp)::date
+                  AND row_count <= 0;
+            END IF;
+            IF new_counted THEN
+                INSERT INTO gsheets_room_submissions (user_id, room_id, month, row_count)
+                VALUES (NEW.matched_user_id, NEW.matched_room_id,
+                        date_trunc('month', NEW.sheet_timestamp)::date, 1)
+                ON CONFLICT (user_id, room_id, month)
+                DO UPDATE SET row_count = gsheets_room_submissions.row_count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_gsheets_room_submissions ON gsheets_import_rows")
+    op.execute("""
+        CREATE TRIGGER trg_gsheets_room_submissions
+        AFTER INSERT OR DELETE
+           OR UPDATE OF matched_user_id, matched_room_id, sheet_timestamp, status
+        ON gsheets_import_rows
+        FOR EACH ROW EXECUTE FUNCTION gsheets_room_submissions_sync()
+    """)
+
+    op.execute("DELETE FROM gsheets_room_submissions")
+    op.execute("""
+        INSERT INTO gsheets_room_submissions (user_id, room_id, month, row_count)
+        SELECT matched_user_id, matched_room_id,
+               date_trunc('month', sheet_timestamp)::date, COUNT(*)
+        FROM gsheets_import_rows
+        WHERE matched_user_id IS NOT NULL
+          AND matched_room_id IS NOT NULL
+          AND sheet_timestamp IS NOT NULL
+          AND status <> 'rejected'
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_gsheets_room_submissions ON gsheets_import_rows")
+    op.execute("DROP FUNCTION IF EXISTS gsheets_room_submissions_sync()")
+    op.execute("DROP TABLE IF EXISTS gsheets_room_submissions")
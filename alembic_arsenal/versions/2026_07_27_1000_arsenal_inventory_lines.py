@@ -0,0 +1,118 @@
+"""Inventory reconciliation lines + counters
+
+Revision ID: arsenal_upg_005_inventory_lines
+Revises: arsenal_upg_004_drop_gsm
+Create Date: 2026-07-27 10:00:00.000000
+
+Сверка инвентаризации ведётся инкрементально (services/inventory.py):
+  1. inventory_lines — ожидаемое (снимок WeaponRegistry на старте) и
+     найденное по ключу (инвентаризация, номенклатура, serial_key).
+     serial_key = '' — позиция без серийника.
+  2. inventories: snapshot_at + счётчики expected_units / found_units /
+     matched_count / missing_count / surplus_count / scan_count — отчёт
+     и прогресс берутся из них, а не пересчётом по реестру.
+
+Backfill уже существующих инвентаризаций: ожидаемое — из текущего реестра
+(ровно то, что показывал старый отчёт), найденное — агрегат inventory_items.
+snapshot_at = started_at.
+
+Откат: таблица и колонки дропаются, inventory_items (журнал сканов) не
+трогается — старый код работает с ним как раньше.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'arsenal_upg_005_inventory_lines'
+down_revision = 'arsenal_upg_004_drop_gsm'
+branch_labels = None
+depends_on = None
+
+
+_COUNTERS = (
+    "expected_units", "found_units",
+    "matched_count", "missing_count", "surplus_count", "scan_count",
+)
+
+
+def upgrade() -> None:
+    op.add_column('inventories', sa.Column('snapshot_at', sa.DateTime(), nullable=True))
+    for name in _COUNTERS:
+        op.add_column('inventories', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'inventory_lines',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('inventory_id', sa.Integer(), nullable=False),
+        sa.Column('nomenclature_id', sa.Integer(), nullable=False),
+        sa.Column('serial_key', sa.String(), nullable=False, server_default=''),
+        sa.Column('is_numbered', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('expected_quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('found_quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['inventory_id'], ['inventories.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['nomenclature_id'], ['nomenclature.id']),
+        sa.UniqueConstraint('inventory_id', 'nomenclature_id', 'serial_key',
+                            name='uix_inventory_line'),
+    )
+
+    # --- backfill ---
+    op.execute("""
+        INSERT INTO inventory_lines
+            (inventory_id, nomenclature_id, serial_key, is_numbered,
+             expected_quantity, found_quantity)
+        SELECT i.id, wr.nomenclature_id, wr.serial_number, n.is_numbered,
+               SUM(wr.quantity), 0
+        FROM inventories i
+        JOIN weapon_registry wr
+          ON wr.current_object_id = i.object_id
+         AND wr.status = 1 AND wr.quantity > 0
+        JOIN nomenclature n ON n.id = wr.nomenclature_id
+        GROUP BY i.id, wr.nomenclature_id, wr.serial_number, n.is_numbered
+    """)
+    op.execute("""
+        INSERT INTO inventory_lines
+            (inventory_id, nomenclature_id, serial_key, is_numbered,
+             expected_quantity, found_quantity)
+        SELECT it.inventory_id, it.nomenclature_id, COALESCE(it.serial_number, ''),
+               n.is_numbered, 0, SUM(it.found_quantity)
+        FROM inventory_items it
+        JOIN nomenclature n ON n.id = it.nomenclature_id
+        GROUP BY it.inventory_id, it.nomenclature_id,
+                 COALESCE(it.serial_number, ''), n.is_numbered
+        ON CONFLICT ON CONSTRAINT uix_inventory_line
+        DO UPDATE SET found_quantity = EXCLUDED.found_quantity
+    """)
+    op.execute("""
+        UPDATE inventories i SET
+            snapshot_at    = i.started_at,
+            expected_units = agg.expected_units,
+            found_units    = agg.found_units,
+            matched_count  = agg.matched_count,
+            missing_count  = agg.missing_count,
+            surplus_count  = agg.surplus_count
+        FROM (
+            SELECT inventory_id,
+                   SUM(expected_quantity) AS expected_units,
+                   SUM(found_quantity) AS found_units,
+                   COUNT(*) FILTER (WHERE found_quantity = expected_quantity
+                                      AND expected_quantity > 0) AS matched_count,
+                   COUNT(*) FILTER (WHERE found_quantity < expected_quantity) AS missing_count,
+                   COUNT(*) FILTER (WHERE found_quantity > expected_quantity) AS surplus_count
+            FROM inventory_lines
+            GROUP BY inventory_id
+        ) agg
+        WHERE agg.inventory_id = i.id
+    """)
+    op.execute("""
+        UPDATE inventories i SET scan_count = s.cnt
+        FROM (SELECT inventory_id, COUNT(*) AS cnt FROM inventory_items GROUP BY inventory_id) s
+        WHERE s.inventory_id = i.id
+    """)
+    op.execute("UPDATE inventories SET snapshot_at = started_at WHERE snapshot_at IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_table('inventory_lines')
+    for name in reversed(_COUNTERS):
+        op.drop_column('inventories', name)
+    op.drop_column('inventories', 'snapshot_at')
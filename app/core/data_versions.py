@@ -0,0 +1,350 @@
+# app/core/data_versions.py
+"""Реестр версий данных + ETag / If-None-Match для read-heavy GET.
+
+main.no_cache_api_headers ставил `no-store` на весь /api — SPA заново
+скачивала /api/rooms, /api/users, /api/tariffs, историю периодов, сводку
+и аналитику, даже если в БД ничего не менялось. Теперь:
+
+  1. Версии. В Redis-хэше VERSIONS_KEY лежат монотонные счётчики:
+       "<table>"            — любая запись в таблицу;
+       "<table>@<period>"   — запись строки с этим period_id (readings,
+                              adjustments);
+       "room@<id>", "user@<id>" — запись, видимая по комнате/жильцу
+                              (SCOPED_KEYS);
+       "<prefix>*"          — строки неизвестны (bulk UPDATE, raw SQL) —
+                              инвалидирует все значения скоупа.
+     Счётчики поднимаются ПОСЛЕ commit (Session.after_commit) по таблицам,
+     затронутым сессией: flush ORM-объектов + bulk/raw-statement'ы через
+     Session.execute. Работает одинаково в web (AsyncSession) и Celery.
+     В web-процессе (use_event_loop из lifespan) bump — задача на loop'е
+     через общий async-клиент: sync-pipeline в after_commit блокировал бы
+     event loop на round-trip в Redis. Celery и скрипты — sync-клиент.
+     Поле EPOCH_FIELD — случайная эпоха реестра: read_versions отдаёт
+     версии как "<эпоха>.<счётчик>". После flush/потери Redis счётчики
+     начинаются с нуля, но эпоха новая — старый ETag и версии в кешах
+     QR-портала/симулятора с новыми не совпадут.
+
+  2. ETag. Зависимость `conditional_get("rooms", "users", ...)` читает
+     версии одним HMGET (до запросов самого эндпоинта), считает сильный
+     ETag от (версии, путь, query, пользователь) и при совпадении с
+     If-None-Match отвечает 304 без тела. Плейсхолдеры `{period_id}` в
+     ключах берутся из query/path; без значения — ключ всей таблицы.
+
+  3. Кеш. Ответ с ETag получает `private, no-cache` вместо `no-store`:
+     браузер хранит копию и ревалидирует каждый раз, shared-кеши (прокси)
+     приватные данные по-прежнему не хранят.
+
+Redis недоступен — версий нет, ETag не ставится, поведение как раньше.
+Порядок «версии читаем ДО данных» безопасен: параллельная запись даст
+ETag со старой версией и новыми данными — следующий запрос просто получит
+200, а не ложный 304.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import uuid
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_KEY = "data_versions"
+EPOCH_FIELD = "_epoch"
+
+# Таблицы, за которыми следим (имена ЖКХ-моделей). Остальные записи
+# (audit_log, error_log, arsenal_*) версий не двигают.
+TRACKED_TABLES = frozenset({
+    "rooms", "users", "tariffs", "periods", "readings", "adjustments",
+    "system_settings", "analyzer_settings", "anomaly_dismissals",
+})
+# Скоупы: колонка строки → префикс ключа. Запись строки двигает, кроме
+# "<table>", ещё "<prefix><значение>" (старое и новое значение колонки).
+#   readings@7 / adjustments@7 — данные периода (сводки, аналитика);
+#   room@15 / user@42          — всё, что видно по комнате/жильцу (QR-портал).
+SCOPED_KEYS = {
+    "readings": (("period_id", "readings@"), ("room_id", "room@"), ("user_id", "user@")),
+    "adjustments": (("period_id", "adjustments@"), ("user_id", "user@")),
+    "rooms": (("id", "room@"),),
+    "users": (("id", "user@"), ("room_id", "room@")),
+}
+
+_SESSION_KEY = "data_versions_dirty"
+_WRITE_SQL_RE = re.compile(
+    r"^\s*(?:WITH\b.*?\)\s*)?(?:UPDATE|INSERT\s+INTO|DELETE\s+FROM)\s+\"?(\w+)\"?",
+    re.IGNORECASE | re.DOTALL,
+)
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+# =========================================================================
+# BUMP — какие ключи задела сессия
+# =========================================================================
+def keys_for_write(table: str, scopes: Optional[dict] = None) -> set[str]:
+    """Ключи версий, которые двигает запись в `table`.
+
+    scopes — {колонка: значения} затронутых строк; None — строки неизвестны
+    (bulk/raw SQL): вместо конкретных значений двигается "<prefix>*".
+    """
+    if table not in TRACKED_TABLES:
+        return set()
+    keys = {table}
+    for column, prefix in SCOPED_KEYS.get(table, ()):
+        if scopes is None:
+            keys.add(prefix + "*")
+            continue
+        keys.update(f"{prefix}{value}" for value in scopes.get(column, ()) if value is not None)
+    return keys
+
+
+def _dirty(session) -> set:
+    return session.info.setdefault(_SESSION_KEY, set())
+
+
+def _row_scopes(obj, table: str) -> dict:
+    """{колонка: {старое, новое значение}} для скоуп-колонок объекта."""
+    from sqlalchemy import inspect as sa_inspect
+
+    state = sa_inspect(obj)
+    scopes = {}
+    for column, _prefix in SCOPED_KEYS.get(table, ()):
+        hist = state.attrs[column].history
+        scopes[column] = {*hist.added, *hist.deleted, *hist.unchanged}
+    return scopes
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flush(session, _flush_context):
+    dirty = _dirty(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_TABLES:
+            dirty.update(keys_for_write(table, _row_scopes(obj, table)))
+
+
+def written_table(orm_execute_state) -> Optional[str]:
+    """Таблица, в которую пишет statement Session.execute (bulk ORM/Core
+    UPDATE/DELETE/INSERT или raw SQL); None — не запись."""
+    statement = orm_execute_state.statement
+    if isinstance(statement, TextClause):
+        match = _WRITE_SQL_RE.match(statement.text)
+        return match.group(1).lower() if match else None
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        return getattr(getattr(statement, "table", None), "name", None)
+    return None
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement(orm_execute_state):
+    """Bulk UPDATE/DELETE/INSERT и raw SQL через Session.execute: строки
+    неизвестны — двигаем wildcard-ключи скоупов."""
+    table = written_table(orm_execute_state)
+    if table:
+        _dirty(orm_execute_state.session).update(
+            keys_for_write(table, None)
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    keys = session.info.pop(_SESSION_KEY, None)
+    if not keys:
+        return
+    if _web_loop is not None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None  # sync-сессия в потоке threadpool'а
+        if running is _web_loop:
+            task = running.create_task(bump_async(keys))
+            _pending.add(task)
+            task.add_done_callback(_pending.discard)
+            return
+    bump(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+_sync_client = None
+# Loop web-процесса (use_event_loop) и его незавершённые bump-задачи.
+# Только web: в Celery/скриптах asyncio.run создаёт loop на вызов, и
+# задача, не успевшая до его закрытия, была бы отменена.
+_web_loop: Optional[asyncio.AbstractEventLoop] = None
+_pending: set = set()
+
+
+def use_event_loop(loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Web-процесс: bump после commit — задачей на этом loop'е (lifespan).
+    None — снова sync-клиент."""
+    global _web_loop
+    _web_loop = loop
+
+
+def _redis_sync():
+    global _sync_client
+    if _sync_client is None:
+        from redis import Redis
+        _sync_client = Redis.from_url(
+            settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1,
+            decode_responses=True,
+        )
+    return _sync_client
+
+
+def bump(keys: Iterable[str]) -> None:
+    """HINCRBY по ключам одним pipeline'ом. Вызывается и вручную — для
+    записей мимо Session (psql-скрипты, COPY)."""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    try:
+        pipe = _redis_sync().pipeline(transaction=False)
+        for key in keys:
+            pipe.hincrby(VERSIONS_KEY, key, 1)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("[DATA_VERSIONS] bump %s failed: %s", keys, exc)
+
+
+async def bump_async(keys: Iterable[str]) -> None:
+    """bump() через общий async-клиент web-процесса."""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    try:
+        pipe = _redis_async().pipeline(transaction=False)
+        for key in keys:
+            pipe.hincrby(VERSIONS_KEY, key, 1)
+        await pipe.execute()
+    except Exception as exc:
+        logger.warning("[DATA_VERSIONS] bump %s failed: %s", keys, exc)
+
+
+async def drain(timeout: float = 2.0) -> None:
+    """Дождаться bump-задач, запущенных после commit (чтение версий,
+    остановка приложения)."""
+    if _pending:
+        await asyncio.wait(list(_pending), timeout=timeout)
+
+
+# =========================================================================
+# READ — версии и ETag
+# =========================================================================
+def _redis_async():
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+async def read_versions(keys: list[str]) -> Optional[list[str]]:
+    """Текущие версии ключей (None — Redis недоступен).
+
+    Сначала дожидается bump'ов этого процесса: GET сразу после записи
+    иначе мог бы получить 304 по версии, которую commit ещё не поднял."""
+    await drain()
+    try:
+        redis = _redis_async()
+        epoch, *values = await redis.hmget(VERSIONS_KEY, [EPOCH_FIELD, *keys])
+        if epoch is None:
+            # Реестр пуст (первый запуск или flush) — новая эпоха; HSETNX
+            # решает гонку воркеров, все читают значение победителя.
+            await redis.hsetnx(VERSIONS_KEY, EPOCH_FIELD, uuid.uuid4().hex[:12])
+            epoch = await redis.hget(VERSIONS_KEY, EPOCH_FIELD)
+    except Exception as exc:
+        logger.warning("[DATA_VERSIONS] read failed: %s", exc)
+        return None
+    return [f"{epoch}.{v or 0}" for v in values]
+
+
+def resolve_keys(templates: Iterable[str], params: dict) -> list[str]:
+    """"readings@{period_id}" → "readings@7" или "readings" (нет значения).
+    Для периодного ключа добавляется "<table>@*"."""
+    keys: list[str] = []
+    for template in templates:
+        names = _PLACEHOLDER_RE.findall(template)
+        if names and all(params.get(n) not in (None, "") for n in names):
+            keys.append(template.format(**{n: params[n] for n in names}))
+            keys.append(_PLACEHOLDER_RE.sub("*", template))
+        elif names:
+            keys.append(template.split("@", 1)[0])
+        else:
+            keys.append(template)
+    return list(dict.fromkeys(keys))
+
+
+def compute_etag(keys: list[str], versions: list[str], request: Request) -> str:
+    """Сильный ETag: версии + путь + отсортированный query + пользователь
+    (ответ зависит от роли/видимости, Authorization в ключе)."""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    auth = request.headers.get("Authorization", "")
+    raw = "|".join([
+        request.url.path, query,
+        hashlib.sha256(auth.encode()).hexdigest(),
+        *(f"{k}={v}" for k, v in zip(keys, versions)),
+    ])
+    return '"dv-' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class NotModified(Exception):
+    """304 из зависимости — обработчик в main.py отдаёт ответ без тела."""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def conditional_get(*templates: str):
+    """Зависимость для GET: ETag по версиям данных, 304 на If-None-Match.
+
+        @router.get("", dependencies=[Depends(conditional_get("rooms", "users"))])
+
+    Ставить ПОСЛЕ авторизационных зависимостей: 304 без проверки прав
+    подтверждал бы актуальность чужого ETag.
+    """
+    async def _dependency(request: Request, response: Response) -> None:
+        params = {**request.query_params, **request.path_params}
+        keys = resolve_keys(templates, params)
+        versions = await read_versions(keys)
+        if versions is None:
+            return
+        etag = compute_etag(keys, versions, request)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            raise NotModified(etag)
+        response.headers["ETag"] = etag
+
+    return _dependency
+
+
+__all__ = [
+    "NotModified",
+    "SCOPED_KEYS",
+    "TRACKED_TABLES",
+    "VERSIONS_KEY",
+    "bump",
+    "bump_async",
+    "compute_etag",
+    "conditional_get",
+    "drain",
+    "etag_matches",
+    "keys_for_write",
+    "read_versions",
+    "resolve_keys",
+    "use_event_loop",
+    "written_table",
+]
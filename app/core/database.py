@@ -216,6 +216,16 @@ ArsenalSessionLocalSync = sessionmaker(
 )
 
 
+# Версии данных для ETag (app/core/data_versions), отложенный multi-row
+# INSERT audit_log (app/core/log_writer), строки debt_snapshots из
+# applied_state импортов 1С и метки устаревания period_dorm_stats: слушатели
+# Session регистрируются при импорте — в web и в Celery одинаково.
+import app.core.data_versions  # noqa: E402,F401
+import app.core.log_writer  # noqa: E402,F401
+import app.modules.utility.services.debt_snapshots  # noqa: E402,F401
+import app.modules.utility.services.period_stats  # noqa: E402,F401
+
+
 # =========================================================================
 # Логирование конфигурации при импорте (для отладки)
 # =========================================================================
@@ -0,0 +1,238 @@
+# app/core/error_ingest.py
+"""Приём JS-ошибок клиента: отпечаток, агрегация, сэмплирование.
+
+Раньше /api/errors/frontend клал в error_log КАЖДОЕ событие: сломанный
+деплой → каждая открытая вкладка шлёт один и тот же стек, лимит 30/мин
+на IP это лишь немного притормаживает. Копилка тонула в тысячах
+одинаковых строк, а /api/admin/errors/stats считал их при каждом
+открытии вкладки.
+
+Теперь событие сначала проходит через FrontendErrorIngest:
+
+  * fingerprint = sha1(release + нормализованное сообщение + нормализованный
+    стек). Из стека выкидываются origin, query (?v=hash), хеш в имени
+    файла (app.d9df065e17.js, app/scripts/build_static.py) и :line:col —
+    то, что меняется от сборки/хоста, но не меняет саму ошибку; сборку
+    различает release, который шлёт клиент (хеш своего app.js); из
+    сообщения — числа, hex и uuid (id записей, адреса);
+  * одинаковые отпечатки копятся в памяти воркера: счётчик, first/last
+    seen. Раз в FLUSH_SECONDS на каждый отпечаток уходит ОДНА строка
+    через буфер log_writer (extra.occurrences / first_seen / last_seen);
+  * под всплеском (больше BURST_THRESHOLD событий за окно) включается
+    сэмплирование с долей BURST_THRESHOLD / событий_в_окне — нормализация
+    20-КБ стека тоже чего-то стоит; принятые события считаются с весом
+    1/доля, так что occurrences остаётся оценкой реального числа;
+  * новых отпечатков за окно — не больше MAX_FINGERPRINTS, остальное
+    только считается (overflow) — память под контролем.
+
+Агрегация — на воркер (как приблизительный режим rate_limit): при N
+воркерах одна ошибка даёт до N строк за окно, а не по строке на событие.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import random
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core.time_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 60.0
+BURST_THRESHOLD = 200
+MAX_FINGERPRINTS = 500
+STACK_FRAMES = 12
+
+_ORIGIN_RE = re.compile(r"https?://[^/\s)]+")
+_QUERY_RE = re.compile(r"\?[^\s):]*")
+# app.d9df065e17.js → app.js (HASH_LEN build_static).
+_ASSET_HASH_RE = re.compile(r"\.[0-9a-f]{10}(?=\.(?:js|css)\b)")
+_LOCATION_RE = re.compile(r"(:\d+)+(?=\)?$)")
+_VOLATILE_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b|\d+",
+    re.I,
+)
+
+
+def normalize_message(message: Optional[str]) -> str:
+    return _VOLATILE_RE.sub("?", (message or "").strip())[:500]
+
+
+def normalize_stack(stack: Optional[str]) -> str:
+    """Первые STACK_FRAMES строк стека без origin, query, хешей в именах
+    файлов и позиций."""
+    frames = []
+    for line in (stack or "").splitlines()[:STACK_FRAMES]:
+        line = _ORIGIN_RE.sub("", line.strip())
+        line = _QUERY_RE.sub("", line)
+        line = _ASSET_HASH_RE.sub("", line)
+        frames.append(_LOCATION_RE.sub("", line))
+    return "\n".join(f for f in frames if f)
+
+
+def fingerprint(message: Optional[str], stack: Optional[str],
+                release: Optional[str] = None) -> str:
+    raw = "\n".join((release or "", normalize_message(message), normalize_stack(stack)))
+    return hashlib.sha1(raw.encode("utf-8", "replace")).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class _Entry:
+    fields: dict
+    first_seen: datetime
+    last_seen: datetime
+    occurrences: float = 0.0
+    min_rate: float = 1.0
+
+
+class FrontendErrorIngest:
+    """Агрегатор JS-ошибок воркера + фоновый сброс в log_writer.
+
+    Фоновая задача стартует лениво при первом ingest (нужен работающий
+    loop); close() сбрасывает накопленное при остановке приложения.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[Callable[..., bool]] = None,
+        *,
+        flush_seconds: float = FLUSH_SECONDS,
+        burst_threshold: int = BURST_THRESHOLD,
+        max_fingerprints: int = MAX_FINGERPRINTS,
+        rng: Callable[[], float] = random.random,
+    ):
+        self._sink = sink
+        self.flush_seconds = flush_seconds
+        self.burst_threshold = burst_threshold
+        self.max_fingerprints = max_fingerprints
+        self._rng = rng
+        self._entries: dict[str, _Entry] = {}
+        self._window_events = 0
+        self._task: Optional[asyncio.Task] = None
+        self.counters = dict.fromkeys(
+            ("received", "aggregated", "sampled_out", "overflow", "flushed_rows"), 0,
+        )
+
+    def _enqueue(self, **kwargs) -> bool:
+        if self._sink is None:
+            from app.core.log_writer import enqueue_error
+            self._sink = enqueue_error
+        return self._sink(**kwargs)
+
+    def sample_rate(self) -> float:
+        if self._window_events <= self.burst_threshold:
+            return 1.0
+        return self.burst_threshold / self._window_events
+
+    def ingest(self, *, message: str, stack: Optional[str],
+               release: Optional[str] = None, **fields) -> str:
+        """Учесть событие. → "new" | "aggregated" | "sampled_out" | "overflow".
+
+        fields — именованные аргументы enqueue_error для первой строки
+        отпечатка (source, http_path, exc_type, extra, ...).
+        """
+        self._ensure_task()
+        self.counters["received"] += 1
+        self._window_events += 1
+        rate = self.sample_rate()
+        if rate < 1.0 and self._rng() >= rate:
+            self.counters["sampled_out"] += 1
+            return "sampled_out"
+
+        fp = fingerprint(message, stack, release)
+        now = utcnow()
+        entry = self._entries.get(fp)
+        if entry is None:
+            if len(self._entries) >= self.max_fingerprints:
+                self.counters["overflow"] += 1
+                return "overflow"
+            extra = dict(fields.pop("extra", None) or {})
+            extra.update(fingerprint=fp, release=release)
+            entry = self._entries[fp] = _Entry(
+                fields={**fields, "exc_message": message,
+                        "traceback_str": stack, "extra": extra},
+                first_seen=now, last_seen=now,
+            )
+            status = "new"
+        else:
+            self.counters["aggregated"] += 1
+            status = "aggregated"
+        entry.occurrences += 1 / rate
+        entry.last_seen = now
+        entry.min_rate = min(entry.min_rate, rate)
+        return status
+
+    def flush(self) -> int:
+        """Одна строка error_log на отпечаток окна; окно начинается заново."""
+        entries, self._entries = self._entries, {}
+        self._window_events = 0
+        for entry in entries.values():
+            fields = dict(entry.fields)
+            fields["extra"] = {
+                **fields["extra"],
+                "occurrences": round(entry.occurrences),
+                "first_seen": entry.first_seen.isoformat(),
+                "last_seen": entry.last_seen.isoformat(),
+                "sample_rate": round(entry.min_rate, 4),
+            }
+            if self._enqueue(run_investigation=False, **fields):
+                self.counters["flushed_rows"] += 1
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "pending_fingerprints": len(self._entries),
+            "window_events": self._window_events,
+            "sample_rate": round(self.sample_rate(), 4),
+        }
+
+    def _ensure_task(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # без loop'а сбросит close()/ручной flush
+        if self._task is not None and self._task.get_loop() is not loop:
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.warning("[error_ingest] flush failed: %s", exc)
+
+    async def close(self) -> None:
+        """Остановить фоновую задачу и сбросить накопленное окно."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        try:
+            self.flush()
+        except Exception as exc:
+            logger.warning("[error_ingest] shutdown flush failed: %s", exc)
+
+
+frontend_ingest = FrontendErrorIngest()
+
+
+__all__ = [
+    "FrontendErrorIngest",
+    "fingerprint",
+    "frontend_ingest",
+    "normalize_message",
+    "normalize_stack",
+]
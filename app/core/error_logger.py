@@ -10,6 +10,10 @@
 
 Все вызовы — fire-and-forget с try/except внутри. Если сохранение ошибки
 само упало (БД отвалилась, например), это не должно ломать request.
+
+Web-пути (middleware, 4xx, frontend) пишут не сами, а через буфер
+app.core.log_writer.enqueue_error (поля — error_fields, расследование —
+investigate_safe, в фоне пачками). log_error — прямая запись для Celery.
 """
 from __future__ import annotations
 
@@ -66,46 +70,20 @@ async def log_error(
     подгружает связанные сущности по URL. Для celery / frontend вызовов
     можно выключить (там URL может не быть).
     """
-    if exc is not None:
-        if exc_type is None:
-            exc_type = type(exc).__name__
-        if exc_message is None:
-            exc_message = str(exc)[:5000]
-        if traceback_str is None:
-            traceback_str = "".join(
-                _tb.format_exception(type(exc), exc, exc.__traceback__)
-            )[:50000]
+    fields = error_fields(
+        source=source, level=level, http_method=http_method,
+        http_path=http_path, http_status=http_status, exc=exc,
+        exc_type=exc_type, exc_message=exc_message, traceback_str=traceback_str,
+        request_body=request_body, user_id=user_id, user_username=user_username,
+        request_id=request_id, extra=extra,
+    )
 
     investigation = None
     if run_investigation and http_path:
-        try:
-            investigation = await _investigate_url(
-                db, http_path, http_method, user_id, request_body,
-            )
-        except Exception as inv_err:
-            logger.warning(
-                "[error_logger] investigation failed for %s: %s",
-                http_path, inv_err,
-            )
-            investigation = {"_investigation_error": str(inv_err)[:500]}
+        investigation = await investigate_safe(db, http_path, http_method, user_id, request_body)
 
     try:
-        err = ErrorLog(
-            source=source,
-            level=level,
-            http_method=http_method,
-            http_path=http_path,
-            http_status=http_status,
-            exc_type=exc_type,
-            exc_message=exc_message,
-            traceback=traceback_str,
-            request_body=_safe_jsonable(request_body),
-            user_id=user_id,
-            user_username=user_username,
-            request_id=request_id,
-            investigation=investigation,
-            extra=_safe_jsonable(extra) if extra else None,
-        )
+        err = ErrorLog(**fields, investigation=investigation)
         db.add(err)
         await db.commit()
         return err.id
@@ -118,6 +96,71 @@ async def log_error(
         return None
 
 
+def error_fields(
+    *,
+    source: str,
+    level: str = "error",
+    http_method: Optional[str] = None,
+    http_path: Optional[str] = None,
+    http_status: Optional[int] = None,
+    exc: Optional[BaseException] = None,
+    exc_type: Optional[str] = None,
+    exc_message: Optional[str] = None,
+    traceback_str: Optional[str] = None,
+    request_body: Any = None,
+    user_id: Optional[int] = None,
+    user_username: Optional[str] = None,
+    request_id: Optional[str] = None,
+    extra: Optional[dict] = None,
+) -> dict:
+    """Колонки ErrorLog без investigation — без обращений к БД.
+
+    Traceback извлекается СРАЗУ (пока исключение живо), поэтому буферный
+    writer (app.core.log_writer) может писать запись позже.
+    """
+    if exc is not None:
+        if exc_type is None:
+            exc_type = type(exc).__name__
+        if exc_message is None:
+            exc_message = str(exc)[:5000]
+        if traceback_str is None:
+            traceback_str = "".join(
+                _tb.format_exception(type(exc), exc, exc.__traceback__)
+            )[:50000]
+    return {
+        "source": source,
+        "level": level,
+        "http_method": http_method,
+        "http_path": http_path,
+        "http_status": http_status,
+        "exc_type": exc_type,
+        "exc_message": exc_message,
+        "traceback": traceback_str,
+        "request_body": _safe_jsonable(request_body),
+        "user_id": user_id,
+        "user_username": user_username,
+        "request_id": request_id,
+        "extra": _safe_jsonable(extra) if extra else None,
+    }
+
+
+async def investigate_safe(
+    db: AsyncSession,
+    path: str,
+    method: Optional[str],
+    user_id: Optional[int],
+    body: Any = None,
+) -> dict:
+    """_investigate_url, не бросающий исключений (ошибка — в самом dict)."""
+    try:
+        return await _investigate_url(db, path, method, user_id, body)
+    except Exception as inv_err:
+        logger.warning(
+            "[error_logger] investigation failed for %s: %s", path, inv_err,
+        )
+        return {"_investigation_error": str(inv_err)[:500]}
+
+
 # =====================================================================
 # Авто-расследование по URL
 # =====================================================================
@@ -165,12 +208,19 @@ async def _investigate_url(
             inv[f"_{kind}_error"] = str(e)[:300]
         break  # один match — достаточно
 
-    # Дополнительно: recent audit-log для user_id из request.
+    # Дополнительно: recent audit-log для user_id из request. Окно 90 дней —
+    # audit_log партиционирована по месяцам, без границы запрос шёл бы по
+    # всем партициям.
     if user_id:
         try:
+            from datetime import timedelta
+            from app.core.time_utils import utcnow
             recent = (await db.execute(
                 select(AuditLog)
-                .where(AuditLog.user_id == user_id)
+                .where(
+                    AuditLog.user_id == user_id,
+                    AuditLog.created_at >= utcnow() - timedelta(days=90),
+                )
                 .order_by(AuditLog.created_at.desc())
                 .limit(5)
             )).scalars().all()
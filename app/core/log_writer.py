@@ -0,0 +1,221 @@
+# app/core/log_writer.py
+"""Буферная запись журналов: error_log — в фоне пачками, audit_log — одним
+INSERT на commit.
+
+error_log. Раньше каждая 500/4xx/JS-ошибка в самом упавшем запросе
+открывала новую AsyncSession, гоняла _investigate_url (3-5 SELECT'ов) и
+коммитила одну строку. Шторм ошибок (упала БД/релей → сотни 500 в минуту)
+так удваивал нагрузку на ту самую БД, из-за которой всё упало. Теперь:
+
+  * enqueue_error() — собирает поля (error_logger.error_fields, traceback
+    снимается сразу) и кладёт в in-process очередь; запрос не ждёт БД;
+  * фоновая задача ErrorLogWriter забирает пачку (до BATCH_SIZE или
+    FLUSH_SECONDS), пишет её ОДНИМ flush/commit, затем дозаполняет
+    investigation — одно расследование на (путь, метод, user) в пачке;
+  * очередь ограничена MAX_QUEUE: при переполнении новые записи
+    отбрасываются (счётчик dropped) — лог не должен съесть память.
+
+Celery (task_failure hook) по-прежнему пишет напрямую через log_error:
+там одноразовый event loop, фоновой задаче жить негде.
+
+audit_log. write_audit_log должен оставаться атомарным с действием, поэтому
+записи копятся в session.info и уходят одним multi-row INSERT в
+before_commit той же транзакции (rollback — выбрасываются). Без ORM-
+объектов: ни identity map, ни RETURNING, ни per-object flush.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+FLUSH_SECONDS = 0.5
+MAX_QUEUE = 2000
+
+_AUDIT_KEY = "audit_log_pending"
+
+
+# =========================================================================
+# AUDIT — multi-row INSERT в транзакции вызывающего
+# =========================================================================
+def stage_audit(session, row: dict) -> None:
+    """Отложить строку audit_log до commit этой сессии (AsyncSession или Session)."""
+    session.info.setdefault(_AUDIT_KEY, []).append(row)
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_audit(session):
+    rows = session.info.pop(_AUDIT_KEY, None)
+    if rows:
+        from app.modules.utility.models import AuditLog
+
+        session.execute(insert(AuditLog.__table__).values(rows))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_audit(session, previous_transaction):
+    # soft — срабатывает и когда транзакция в БД ещё не начиналась (staging
+    # соединение не открывает). Откат SAVEPOINT внешние строки не трогает.
+    if not previous_transaction.nested:
+        session.info.pop(_AUDIT_KEY, None)
+
+
+# =========================================================================
+# ERROR LOG — фоновая пачечная запись
+# =========================================================================
+class ErrorLogWriter:
+    """Очередь записей error_log + фоновая задача, пишущая их пачками.
+
+    Задача стартует лениво при первом submit (нужен работающий loop);
+    close() дописывает остаток при остановке приложения.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        *,
+        batch_size: int = BATCH_SIZE,
+        flush_seconds: float = FLUSH_SECONDS,
+        max_queue: int = MAX_QUEUE,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._collecting: list[dict] = []
+        self.dropped = 0
+        self.written = 0
+
+    def _sessions(self):
+        if self._session_factory is None:
+            from app.core.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    def submit(self, record: dict) -> bool:
+        """Положить запись в очередь. False — очередь полна (запись потеряна)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._task.get_loop() is not loop:
+            # Новый event loop (перезапуск в тестах / reload) — старые
+            # очередь и задача принадлежат закрытому loop'у.
+            self._queue = self._task = None
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning("[log_writer] error_log queue full, dropped=%d", self.dropped)
+            return False
+
+    async def _next_batch(self) -> list[dict]:
+        # Собираемая пачка живёт в self._collecting: close() посреди
+        # ожидания её не теряет.
+        batch = self._collecting
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.write_batch(batch)
+            except Exception as exc:
+                logger.warning("[log_writer] batch of %d lost: %s", len(batch), exc)
+
+    async def write_batch(self, batch: list[dict]) -> None:
+        """Вставить пачку одним commit'ом, затем дописать investigation."""
+        from app.core.error_logger import investigate_safe
+        from app.modules.utility.models import ErrorLog
+
+        async with self._sessions() as db:
+            rows = [
+                (ErrorLog(**record["fields"]), record.get("investigate"))
+                for record in batch
+            ]
+            db.add_all([err for err, _ in rows])
+            await db.commit()
+            self.written += len(rows)
+
+            investigations: dict[tuple, dict] = {}
+            for err, key in rows:
+                if not key:
+                    continue
+                if key not in investigations:
+                    investigations[key] = await investigate_safe(db, *key)
+                err.investigation = investigations[key]
+            if investigations:
+                await db.commit()
+
+    async def close(self) -> None:
+        """Остановить фоновую задачу и дописать то, что осталось в очереди."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._queue is None:
+            return
+        pending, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for i in range(0, len(pending), self.batch_size):
+            try:
+                await self.write_batch(pending[i:i + self.batch_size])
+            except Exception as exc:
+                logger.warning("[log_writer] shutdown flush failed: %s", exc)
+
+
+error_writer = ErrorLogWriter()
+
+
+def enqueue_error(*, run_investigation: bool = True, **kwargs: Any) -> bool:
+    """Неблокирующий аналог error_logger.log_error (без db) для web-процесса.
+
+    Принимает те же именованные аргументы. Возвращает False, если запись
+    отброшена (очередь полна / нет работающего event loop).
+    """
+    from app.core.error_logger import error_fields
+
+    fields = error_fields(**kwargs)
+    investigate = None
+    if run_investigation and fields["http_path"]:
+        investigate = (fields["http_path"], fields["http_method"], fields["user_id"])
+    try:
+        return error_writer.submit({"fields": fields, "investigate": investigate})
+    except RuntimeError:
+        logger.warning("[log_writer] no running loop — error_log entry dropped")
+        return False
+
+
+__all__ = [
+    "ErrorLogWriter",
+    "enqueue_error",
+    "error_writer",
+    "stage_audit",
+]
@@ -10,9 +10,9 @@ ErrorCaptureMiddleware — копилка backend-ошибок (E3-A, 28.05.2026
 1. Middleware ловит ВСЁ что падает в чейне call_next — это unhandled
    exceptions сервиса. После сохранения exception пробрасывается дальше
    (FastAPI ставит 500 + Sentry).
-2. Сохранение ошибки идёт в ОТДЕЛЬНОЙ AsyncSession (request-scoped session
-   уже broken после исключения), причём в try/except — если сохранение
-   само упало, request не должен «удвоить ошибку».
+2. Сохранение ошибки НЕ идёт в упавшем запросе: запись кладётся в
+   буфер app.core.log_writer (фоновая пачечная запись + расследование
+   по URL там же). Шторм 500-х не умножает нагрузку на БД и латентность.
 3. Для 4xx (HTTPException) middleware НЕ работает — их FastAPI обрабатывает
    до того как exception всплывёт сюда. Для 4xx используем отдельный
    exception_handler в main.py (см. main.py).
@@ -60,29 +60,26 @@ def _should_skip(path: str) -> bool:
 
 
 async def _save_to_error_log(request: Request, exc: BaseException) -> None:
-    """Сохраняет запись об ошибке. Идёт в отдельной AsyncSession."""
+    """Ставит запись об ошибке в буфер error_log (запись — в фоне)."""
     # Лениво импортируем чтобы избежать круговых импортов на старте.
-    from app.core.database import AsyncSessionLocal
-    from app.core.error_logger import log_error
+    from app.core.log_writer import enqueue_error
 
     body = await _read_safe_body(request)
     user_id, user_username = _extract_user(request)
     request_id = request.headers.get("X-Request-ID")
 
-    async with AsyncSessionLocal() as db:
-        await log_error(
-            db,
-            source="backend",
-            level="error",
-            http_method=request.method,
-            http_path=request.url.path,
-            http_status=500,
-            exc=exc,
-            request_body=body,
-            user_id=user_id,
-            user_username=user_username,
-            request_id=request_id,
-        )
+    enqueue_error(
+        source="backend",
+        level="error",
+        http_method=request.method,
+        http_path=request.url.path,
+        http_status=500,
+        exc=exc,
+        request_body=body,
+        user_id=user_id,
+        user_username=user_username,
+        request_id=request_id,
+    )
 
 
 async def _read_safe_body(request: Request) -> Any:
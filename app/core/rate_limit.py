@@ -0,0 +1,204 @@
+# app/core/rate_limit.py
+"""Rate-limit с локальными бакетами и сверкой через Redis.
+
+fastapi-limiter делал EVAL в Redis на КАЖДЫЙ запрос с лимитом — сетевой
+поход ради бухгалтерии. Здесь два режима одной зависимости RateLimit:
+
+  * exact=True (логин, 2FA, сброс пароля) — счётчик окна в Redis, один
+    pipeline (MULTI: INCR + PEXPIRE NX + PTTL) на запрос. Брутфорс
+    считается по всем воркерам точно;
+  * exact=False (по умолчанию) — бакет живёт в памяти воркера. Окна
+    выровнены по времени (floor(now / seconds)), поэтому у всех воркеров
+    один и тот же ключ окна в Redis. Раз в SYNC_SECONDS фоновая сверка
+    одним pipeline'ом прибавляет к Redis-счётчикам локально набранное
+    (INCRBY) и забирает общие значения: остальные воркеры видны с
+    задержкой до SYNC_SECONDS. Лимит приблизительный — может пропустить
+    лишние запросы в пределах этой задержки, зато запрос в Redis не ходит.
+
+Бакет = окно фиксированной длины: ёмкость `times`, полностью
+восполняется на границе окна (как и у fastapi-limiter).
+
+Redis недоступен: approximate работает на одних локальных бакетах,
+exact откатывается на них же (лимит на воркер, а не на кластер) —
+вход не должен ложиться вместе с Redis.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rl"
+SYNC_SECONDS = 1.0
+# Сколько ключей бакетов держит воркер; при переполнении сначала
+# выбрасываются окна, которые уже закончились.
+MAX_BUCKETS = 20000
+
+
+def client_identifier(request: Request) -> str:
+    """IP клиента: первый X-Forwarded-For (за nginx) или адрес сокета."""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class _Bucket:
+    __slots__ = ("window", "seen", "pending")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.seen = 0       # общий счётчик окна по последней сверке
+        self.pending = 0    # набрано локально и ещё не отправлено в Redis
+
+
+class LocalBuckets:
+    """Бакеты воркера + фоновая сверка с Redis."""
+
+    def __init__(self, sync_seconds: float = SYNC_SECONDS, max_buckets: int = MAX_BUCKETS):
+        self.sync_seconds = sync_seconds
+        self.max_buckets = max_buckets
+        self._buckets: dict[str, _Bucket] = {}
+        self._ttl: dict[str, int] = {}
+        self._last_sync = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def hit(self, key: str, times: int, seconds: int, now: Optional[float] = None) -> Optional[float]:
+        """Засчитать запрос. None — пропустить, иначе секунд до конца окна."""
+        now = time.time() if now is None else now
+        window = int(now // seconds)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.window != window:
+            if bucket is None and len(self._buckets) >= self.max_buckets:
+                self._evict(now)
+            bucket = self._buckets[key] = _Bucket(window)
+            self._ttl[key] = seconds
+        if bucket.seen + bucket.pending >= times:
+            return (window + 1) * seconds - now
+        bucket.pending += 1
+        self._maybe_sync()
+        return None
+
+    def _evict(self, now: float) -> None:
+        for key, bucket in list(self._buckets.items()):
+            if bucket.window < int(now // self._ttl[key]):
+                del self._buckets[key], self._ttl[key]
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.clear()
+            self._ttl.clear()
+
+    def _maybe_sync(self) -> None:
+        loop_now = time.monotonic()
+        if loop_now - self._last_sync < self.sync_seconds:
+            return
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._last_sync = loop_now
+        try:
+            self._sync_task = asyncio.get_running_loop().create_task(self.sync())
+        except RuntimeError:
+            pass
+
+    async def sync(self, now: Optional[float] = None) -> None:
+        """Отправить pending и забрать общие счётчики — один pipeline."""
+        from app.core.redis_client import get_redis
+
+        now = time.time() if now is None else now
+        live = [
+            (key, bucket, bucket.pending)
+            for key, bucket in self._buckets.items()
+            if bucket.window == int(now // self._ttl[key])
+        ]
+        if not live:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for key, bucket, pending in live:
+                redis_key = f"{KEY_PREFIX}:{key}:{bucket.window}"
+                pipe.incrby(redis_key, pending)
+                pipe.expire(redis_key, self._ttl[key] + 1)
+            results = await pipe.execute()
+        except Exception as exc:
+            self.sync_errors += 1
+            logger.warning("[RATE_LIMIT] sync failed, local buckets only: %s", exc)
+            return
+        self.syncs += 1
+        for (key, bucket, pending), total in zip(live, results[::2]):
+            # За время await могли прийти новые запросы — их pending не трогаем.
+            bucket.pending -= pending
+            bucket.seen = int(total)
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "syncs": self.syncs, "sync_errors": self.sync_errors}
+
+
+local_buckets = LocalBuckets()
+
+
+async def exact_hit(key: str, times: int, seconds: int) -> Optional[float]:
+    """Точный счётчик окна в Redis. None — пропустить, иначе Retry-After."""
+    from app.core.redis_client import get_redis
+
+    redis_key = f"{KEY_PREFIX}:exact:{key}"
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.incr(redis_key)
+    pipe.pexpire(redis_key, seconds * 1000, nx=True)
+    pipe.pttl(redis_key)
+    count, _, pttl = await pipe.execute()
+    if int(count) <= times:
+        return None
+    return max(int(pttl), 0) / 1000
+
+
+class RateLimit:
+    """Зависимость FastAPI: `dependencies=[Depends(RateLimit(times=5, seconds=60))]`.
+
+    scope — имя лимита в ключе; по умолчанию шаблон пути маршрута, то есть
+    отдельный счётчик на каждый endpoint и IP.
+    """
+
+    def __init__(self, times: int, seconds: int, *, exact: bool = False,
+                 scope: Optional[str] = None):
+        self.times = times
+        self.seconds = seconds
+        self.exact = exact
+        self.scope = scope
+
+    def key(self, request: Request) -> str:
+        route = request.scope.get("route")
+        scope = self.scope or getattr(route, "path", None) or request.url.path
+        return f"{scope}:{client_identifier(request)}"
+
+    async def check(self, request: Request) -> Optional[float]:
+        key = self.key(request)
+        if self.exact:
+            try:
+                return await exact_hit(key, self.times, self.seconds)
+            except Exception as exc:
+                logger.warning("[RATE_LIMIT] exact check fell back to local: %s", exc)
+        return local_buckets.hit(key, self.times, self.seconds)
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        retry_after = await self.check(request)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too Many Requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
+__all__ = [
+    "LocalBuckets",
+    "RateLimit",
+    "client_identifier",
+    "local_buckets",
+]
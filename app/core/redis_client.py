@@ -0,0 +1,110 @@
+# app/core/redis_client.py
+"""Общий async-клиент Redis web-процесса + счётчик round-trip'ов на запрос.
+
+Раньше каждый модуль заводил свой клиент (lifespan для FastAPILimiter/
+FastAPICache, data_versions, qr_portal_cache) — три пула соединений на
+воркер и никакой картины, сколько походов в Redis стоит один запрос.
+Теперь:
+
+  * get_redis() — один клиент на процесс (decode_responses, таймауты 1с);
+    его используют кэш ответов (FastAPICache), ETag-версии, кэш QR-портала
+    и лимитер (app/core/rate_limit.py);
+  * CountingConnection считает каждую отправку пакета в Redis: одиночная
+    команда = 1, pipeline любой длины = 1;
+  * RedisTripsMiddleware заводит счётчик на запрос и копит агрегаты по
+    маршрутам (route_stats) — их показывает /api/admin/system/health/deep.
+
+Pub/sub (admin_events) и блокирующие локи живут на своих соединениях —
+их долгие ожидания в счётчик запросов не входят.
+"""
+from __future__ import annotations
+
+import contextvars
+from typing import Optional
+
+from redis.asyncio.connection import Connection
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.core.config import settings
+
+# Счётчик текущего запроса: list из одного int — общий для всех задач,
+# порождённых запросом (contextvar копирует ссылку, а не значение).
+current_redis_trips: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    "redis_trips", default=None
+)
+
+# route → [запросов, round-trip'ов, максимум на запрос]
+route_stats: dict[str, list[int]] = {}
+_MAX_ROUTES = 500
+
+
+class CountingConnection(Connection):
+    async def send_packed_command(self, command, check_health: bool = True) -> None:
+        counter = current_redis_trips.get()
+        if counter is not None:
+            counter[0] += 1
+        await super().send_packed_command(command, check_health)
+
+
+_client = None
+
+
+def get_redis():
+    """Общий async-клиент (лениво; один на процесс)."""
+    global _client
+    if _client is None:
+        from redis import asyncio as aioredis
+        _client = aioredis.from_url(
+            settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1,
+            decode_responses=True, connection_class=CountingConnection,
+        )
+    return _client
+
+
+def record(route: str, trips: int) -> None:
+    stats = route_stats.get(route)
+    if stats is None:
+        if len(route_stats) >= _MAX_ROUTES:
+            return
+        stats = route_stats[route] = [0, 0, 0]
+    stats[0] += 1
+    stats[1] += trips
+    stats[2] = max(stats[2], trips)
+
+
+def top_routes(limit: int = 15) -> list[dict]:
+    """Маршруты с наибольшим числом походов в Redis на запрос."""
+    rows = [
+        {
+            "route": route,
+            "requests": n,
+            "trips_per_request": round(trips / n, 2),
+            "max_trips": peak,
+        }
+        for route, (n, trips, peak) in route_stats.items() if n
+    ]
+    rows.sort(key=lambda r: (r["trips_per_request"], r["requests"]), reverse=True)
+    return rows[:limit]
+
+
+class RedisTripsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        counter = [0]
+        token = current_redis_trips.set(counter)
+        try:
+            return await call_next(request)
+        finally:
+            current_redis_trips.reset(token)
+            route = request.scope.get("route")
+            # Шаблон пути, а не сам путь — иначе /api/rooms/1..N раздуют словарь.
+            record(f"{request.method} {getattr(route, 'path', None) or '-'}", counter[0])
+
+
+__all__ = [
+    "CountingConnection",
+    "RedisTripsMiddleware",
+    "current_redis_trips",
+    "get_redis",
+    "top_routes",
+]
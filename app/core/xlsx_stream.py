@@ -0,0 +1,187 @@
+# app/core/xlsx_stream.py
+"""
+Единый потоковый движок XLSX-выгрузок (ЖКХ + Арсенал).
+
+Раньше каждый экспорт собирал обычный `Workbook()` целиком в памяти
+(openpyxl держит объект-ячейку на КАЖДОЕ значение — ~1 КБ на ячейку),
+сохранял его в `BytesIO` и только потом отдавал. На 50k строк × 15 колонок
+это сотни мегабайт RSS на воркер — и всё это при `.all()` из БД поверх.
+
+Здесь:
+  1) БД читается порциями через `db.stream(...)` + `yield_per` — в памяти
+     одновременно только одна партиция строк;
+  2) workbook write-only: openpyxl пишет строки сразу во временный XML-файл
+     листа, объектов-ячеек не создаёт;
+  3) append партиции уходит в `asyncio.to_thread` — сериализация десятков
+     тысяч строк не блокирует event loop;
+  4) итоговый zip пишется в SpooledTemporaryFile (мелкие отчёты остаются в
+     RAM, большие уходят на диск) и отдаётся StreamingResponse кусками.
+
+Память на воркер — константа, не зависящая от числа строк.
+
+Использование:
+    book = XlsxStream()
+    sheet = book.sheet("Жильцы", headers=[...], widths=[6, 30, ...])
+    await sheet.extend_from_db(db, stmt, lambda row: [...])
+    sheet.append(["ИТОГО", ...], bold=True)
+    return await book.response("residents.xlsx")
+"""
+from __future__ import annotations
+
+import asyncio
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Порог SpooledTemporaryFile: до 8 МБ готовый файл живёт в памяти, дальше —
+# прозрачно сбрасывается на диск (tmpfs/overlay контейнера).
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Размер порции при чтении из БД и при отдаче файла клиенту.
+DB_CHUNK_ROWS = 1000
+RESPONSE_CHUNK_BYTES = 64 * 1024
+
+# Партиции меньше этого пишем прямо в loop: to_thread дороже самой записи.
+_THREAD_MIN_ROWS = 200
+
+_BOLD = Font(bold=True)
+
+
+class XlsxSheet:
+    """Лист write-only книги. Строки только дописываются — читать нельзя."""
+
+    def __init__(self, ws):
+        self._ws = ws
+        self.rows_written = 0
+
+    def cell(self, value: Any, *, bold: bool = False,
+             fill: Optional[str] = None, font: Optional[Font] = None) -> WriteOnlyCell:
+        """Стилизованная ячейка для смешанной строки: [sheet.cell(k, bold=True), v]."""
+        cell = WriteOnlyCell(self._ws, value=value)
+        if font is not None:
+            cell.font = font
+        elif bold:
+            cell.font = _BOLD
+        if fill:
+            cell.fill = PatternFill("solid", fgColor=fill)
+        return cell
+
+    def append(self, values: Sequence[Any], *, bold: bool = False,
+               fill: Optional[str] = None, font: Optional[Font] = None) -> None:
+        """Одна строка. bold/fill/font — для заголовков и итогов."""
+        if bold or fill or font is not None:
+            values = [self.cell(v, bold=bold, fill=fill, font=font) for v in values]
+        self._ws.append(list(values))
+        self.rows_written += 1
+
+    def _append_many(self, rows: Iterable[Sequence[Any]]) -> int:
+        n = 0
+        ws_append = self._ws.append
+        for r in rows:
+            ws_append(list(r))
+            n += 1
+        self.rows_written += n
+        return n
+
+    async def extend(self, rows: Sequence[Sequence[Any]]) -> int:
+        """Пачка строк. Крупные пачки пишутся в отдельном потоке."""
+        if len(rows) < _THREAD_MIN_ROWS:
+            return self._append_many(rows)
+        return await asyncio.to_thread(self._append_many, rows)
+
+    async def extend_from_db(
+        self,
+        db,
+        statement,
+        row_fn: Callable[[Any], Optional[Sequence[Any]]],
+        *,
+        chunk_size: int = DB_CHUNK_ROWS,
+    ) -> int:
+        """Стримит результат запроса в лист порциями по chunk_size.
+
+        row_fn(row) → список значений строки или None (строку пропустить).
+        Возвращает число записанных строк.
+        """
+        result = await db.stream(statement.execution_options(yield_per=chunk_size))
+        written = 0
+        async for partition in result.partitions(chunk_size):
+            rows = [r for r in (row_fn(row) for row in partition) if r is not None]
+            if rows:
+                written += await self.extend(rows)
+        return written
+
+
+class XlsxStream:
+    """Write-only книга + отдача через SpooledTemporaryFile."""
+
+    def __init__(self):
+        self._wb = Workbook(write_only=True)
+
+    def sheet(
+        self,
+        title: str,
+        *,
+        headers: Optional[Sequence[str]] = None,
+        widths: Optional[Sequence[float]] = None,
+        header_fill: Optional[str] = None,
+    ) -> XlsxSheet:
+        """Новый лист. Ширины колонок в write-only режиме задаются ДО первой
+        строки — поэтому они принимаются здесь, а не отдельным вызовом."""
+        ws = self._wb.create_sheet(title)
+        for idx, width in enumerate(widths or (), start=1):
+            if width:
+                ws.column_dimensions[get_column_letter(idx)].width = width
+        sheet = XlsxSheet(ws)
+        if headers:
+            sheet.append(headers, bold=True, fill=header_fill)
+        return sheet
+
+    def _save_sync(self):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            self._wb.save(spool)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    async def save(self):
+        """Собирает zip в spooled-файл (в потоке). Файл закрывает вызывающий."""
+        return await asyncio.to_thread(self._save_sync)
+
+    async def response(self, filename: str) -> StreamingResponse:
+        spool = await self.save()
+        return StreamingResponse(
+            iter_file(spool),
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": content_disposition(filename)},
+        )
+
+
+def iter_file(fileobj, chunk_size: int = RESPONSE_CHUNK_BYTES) -> Iterator[bytes]:
+    """Отдаёт файл кусками и закрывает его (spooled-файл на диске удалится).
+    Синхронный генератор — Starlette крутит его в threadpool."""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def content_disposition(filename: str) -> str:
+    """attachment с RFC 5987 filename* (кириллица в именах периодов) и
+    ASCII-фолбэком для старых клиентов."""
+    ascii_name = filename.encode("ascii", "replace").decode("ascii").replace("?", "_").replace('"', "")
+    return f"attachment; filename=\"{ascii_name}\"; filename*=utf-8''{quote(filename)}"
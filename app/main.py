@@ -1,13 +1,12 @@
 # app/main.py
 
+import asyncio
 import os
 import logging
 from contextlib import asynccontextmanager
 from typing import List
 
-import redis.asyncio as redis
-
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.encoders import jsonable_encoder
@@ -16,7 +15,6 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
-from fastapi_limiter import FastAPILimiter
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 
@@ -25,6 +23,8 @@ from passlib.context import CryptContext
 
 # === CORE ===
 from app.core.config import settings
+from app.core import data_versions
+from app.core.data_versions import NotModified
 from app.core.database import ArsenalSessionLocal
 
 # === MODELS ===
@@ -49,6 +49,7 @@ from app.modules.utility.routers import (
     admin_system_health,
     admin_analyzer,
     admin_recalc,
+    admin_month_close,
     admin_notifications,
     admin_ot_staff,
     admin_security,
@@ -81,6 +82,7 @@ from app.modules.arsenal import (
 from app.core.request_context import RequestIdFilter, JsonFormatter
 from app.core.middleware.request_id import RequestIdMiddleware
 from app.core.middleware.error_capture import ErrorCaptureMiddleware
+from app.core.redis_client import RedisTripsMiddleware, get_redis
 from app.core.sentry_init import setup_sentry
 
 # JSON-логи в production (агрегация в Loki/CloudWatch/Sentry breadcrumbs),
@@ -201,12 +203,11 @@ async def lifespan(app: FastAPI):
     logger.info(f"Starting application in mode: {APP_MODE.upper()}")
 
     try:
-        redis_client = redis.from_url(
-            settings.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True,
-        )
-        await FastAPILimiter.init(redis_client)
+        # Один клиент на процесс: кэш ответов, ETag-версии, QR-кэш и
+        # лимитер (app/core/redis_client.py). ping — как раньше
+        # FastAPILimiter.init: без Redis старт в production падает.
+        redis_client = get_redis()
+        await redis_client.ping()
         FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
         logger.info("Redis connected")
     except Exception as error:
@@ -221,6 +222,10 @@ async def lifespan(app: FastAPI):
         if settings.ENVIRONMENT == "production":
             raise
 
+    # Версии данных (app/core/data_versions): bump после commit — задачей на
+    # этом loop'е через async-клиент, а не sync-pipeline'ом внутри loop'а.
+    data_versions.use_event_loop(asyncio.get_running_loop())
+
     # APP_MODE "arsenal_gsm" сохранён как историческое имя — после удаления
     # модуля GSM (apr 2026) фактически создаём админа только для Arsenal.
     # Переименование значения = каскадные изменения в docker-compose/CI без
@@ -253,6 +258,14 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # Сбросить окно JS-ошибок (app/core/error_ingest) в буфер error_log
+    # (app/core/log_writer) и дописать его до остановки воркера.
+    from app.core.error_ingest import frontend_ingest
+    from app.core.log_writer import error_writer
+    await frontend_ingest.close()
+    await error_writer.close()
+    await data_versions.drain()
+    data_versions.use_event_loop(None)
     logger.info("Application shutdown")
 
 
@@ -315,6 +328,11 @@ app.add_middleware(RequestIdMiddleware)
 # отдельный хук ниже по флагу analyzer_config.
 app.add_middleware(ErrorCaptureMiddleware)
 
+# Счётчик походов в Redis на запрос (агрегаты по маршрутам — в
+# /api/admin/system/health/deep). Зарегистрирован после ErrorCapture, то
+# есть снаружи него — запросы, упавшие с 500, тоже посчитаны.
+app.add_middleware(RedisTripsMiddleware)
+
 
 # =====================================================================
 # 4xx → копилка (E3-B, 31.05.2026)
@@ -330,10 +348,9 @@ _LOG_4XX_STATUSES = {400, 402, 409, 413, 422}
 
 async def _persist_http_error(request: Request, status_code: int,
                               message: str, exc_type: str, extra=None) -> None:
-    """Best-effort запись 4xx в копилку (отдельная сессия, не валит ответ)."""
+    """Best-effort запись 4xx в копилку (буфер log_writer, не валит ответ)."""
     try:
-        from app.core.database import AsyncSessionLocal
-        from app.core.error_logger import log_error
+        from app.core.log_writer import enqueue_error
         from app.core.middleware.error_capture import (
             _read_safe_body, _extract_user, _should_skip,
         )
@@ -341,16 +358,15 @@ async def _persist_http_error(request: Request, status_code: int,
             return
         body = await _read_safe_body(request)
         uid, uname = _extract_user(request)
-        async with AsyncSessionLocal() as db:
-            await log_error(
-                db, source="backend", level="warning",
-                http_method=request.method, http_path=request.url.path,
-                http_status=status_code, exc_type=exc_type,
-                exc_message=message[:5000], request_body=body,
-                user_id=uid, user_username=uname,
-                request_id=request.headers.get("X-Request-ID"),
-                extra=extra,
-            )
+        enqueue_error(
+            source="backend", level="warning",
+            http_method=request.method, http_path=request.url.path,
+            http_status=status_code, exc_type=exc_type,
+            exc_message=message[:5000], request_body=body,
+            user_id=uid, user_username=uname,
+            request_id=request.headers.get("X-Request-ID"),
+            extra=extra,
+        )
     except Exception as _e:  # pragma: no cover
         logger.warning("[4xx-log] failed to persist: %s", _e)
 
@@ -369,6 +385,12 @@ async def _http_exception_handler(request: Request, exc: StarletteHTTPException)
     )
 
 
+@app.exception_handler(NotModified)
+async def _not_modified_handler(request: Request, exc: NotModified):
+    # 304 — без тела; ETag повторяем, как требует RFC 9110.
+    return Response(status_code=304, headers={"ETag": exc.etag})
+
+
 @app.exception_handler(RequestValidationError)
 async def _validation_exception_handler(request: Request, exc: RequestValidationError):
     errors = exc.errors()
@@ -471,9 +493,15 @@ async def no_cache_api_headers(request: Request, call_next):
     response = await call_next(request)
 
     if request.url.path.startswith("/api/"):
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+        if "ETag" in response.headers:
+            # Версионированный ответ (app/core/data_versions): браузер хранит
+            # копию и ревалидирует через If-None-Match, shared-кеши — нет.
+            response.headers["Cache-Control"] = "private, no-cache, must-revalidate"
+            response.headers["Vary"] = "Authorization"
+        else:
+            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
 
     return response
 
@@ -499,6 +527,7 @@ app.include_router(admin_gsheets.router)
 app.include_router(admin_system_health.router)
 app.include_router(admin_analyzer.router)
 app.include_router(admin_recalc.router)
+app.include_router(admin_month_close.router)
 app.include_router(admin_notifications.router)
 app.include_router(admin_ot_staff.router)
 app.include_router(admin_security.router)
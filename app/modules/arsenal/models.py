@@ -282,6 +282,16 @@ class Inventory(ArsenalBase):
     # Документы корректировок, созданных при закрытии (расхождения).
     correction_document_id = Column(Integer, ForeignKey(DOCUMENT_FK), nullable=True)
 
+    # Сверка ведётся инкрементально (services/inventory.py): ожидаемые остатки
+    # снимаются в inventory_lines при старте, каждый скан двигает счётчики.
+    snapshot_at = Column(DateTime, nullable=True)
+    expected_units = Column(Integer, nullable=False, default=0, server_default="0")
+    found_units = Column(Integer, nullable=False, default=0, server_default="0")
+    matched_count = Column(Integer, nullable=False, default=0, server_default="0")
+    missing_count = Column(Integer, nullable=False, default=0, server_default="0")
+    surplus_count = Column(Integer, nullable=False, default=0, server_default="0")
+    scan_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     object = relationship("AccountingObject", foreign_keys=[object_id])
     started_by = relationship("ArsenalUser", foreign_keys=[started_by_id])
     closed_by = relationship("ArsenalUser", foreign_keys=[closed_by_id])
@@ -319,6 +329,35 @@ class InventoryItem(ArsenalBase):
     )
 
 
+class InventoryLine(ArsenalBase):
+    """Состояние сверки одной позиции инвентаризации.
+
+    Ключ — (номенклатура, serial_key): серийник, '' — без серийника.
+    expected_quantity снимается из WeaponRegistry при старте инвентаризации,
+    found_quantity растёт со сканами. Строка, которой не было в учёте,
+    появляется при первом скане (expected=0 → излишек).
+    """
+    __tablename__ = "inventory_lines"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    inventory_id = Column(
+        Integer, ForeignKey("inventories.id", ondelete="CASCADE"), nullable=False,
+    )
+    nomenclature_id = Column(Integer, ForeignKey(NOMENCLATURE_FK), nullable=False)
+    serial_key = Column(String, nullable=False, default="")
+    is_numbered = Column(Boolean, nullable=False, default=True)
+    expected_quantity = Column(Integer, nullable=False, default=0)
+    found_quantity = Column(Integer, nullable=False, default=0)
+
+    nomenclature = relationship("Nomenclature")
+
+    __table_args__ = (
+        UniqueConstraint(
+            "inventory_id", "nomenclature_id", "serial_key", name="uix_inventory_line",
+        ),
+    )
+
+
 # =====================================================================
 # PASSWORD RESET TOKEN — безопасный сброс пароля без JSON-plaintext
 # =====================================================================
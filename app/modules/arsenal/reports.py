@@ -204,53 +204,29 @@ async def export_balance_summary(
     current_user: ArsenalUser = Depends(get_current_arsenal_user),
 ):
     """Excel-версия балансовой ведомости. 2 листа: Детализация + Итоги по счетам."""
-    import io
-    from fastapi.responses import StreamingResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
+    from app.core.xlsx_stream import XlsxStream
 
     data = await balance_summary(object_id, db, current_user)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Детализация"
-    headers = ["Счёт", "Категория", "Объект", "Ед.", "Кол-во", "Стоимость, ₽"]
-    for i, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=i, value=h)
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="DBEAFE")
-    row = 2
-    for acc, block in data["by_account"].items():
-        for it in block["items"]:
-            ws.cell(row=row, column=1, value=acc)
-            ws.cell(row=row, column=2, value=it["category"])
-            ws.cell(row=row, column=3, value=it["object_name"])
-            ws.cell(row=row, column=4, value=it["units"])
-            ws.cell(row=row, column=5, value=it["quantity"])
-            ws.cell(row=row, column=6, value=it["cost"])
-            row += 1
-    for col_letter, width in [("A", 14), ("B", 28), ("C", 28), ("D", 8), ("E", 10), ("F", 14)]:
-        ws.column_dimensions[col_letter].width = width
-
-    ws2 = wb.create_sheet("Итоги по счетам")
-    ws2.append(["Счёт", "Ед.", "Стоимость, ₽"])
+    book = XlsxStream()
+    ws = book.sheet(
+        "Детализация",
+        headers=["Счёт", "Категория", "Объект", "Ед.", "Кол-во", "Стоимость, ₽"],
+        widths=[14, 28, 28, 8, 10, 14],
+        header_fill="DBEAFE",
+    )
+    await ws.extend([
+        [acc, it["category"], it["object_name"], it["units"], it["quantity"], it["cost"]]
+        for acc, block in data["by_account"].items()
+        for it in block["items"]
+    ])
+
+    ws2 = book.sheet("Итоги по счетам", headers=["Счёт", "Ед.", "Стоимость, ₽"], header_fill="DBEAFE")
     for acc, block in data["by_account"].items():
         ws2.append([acc, block["total_units"], block["total_cost"]])
     ws2.append([])
-    ws2.append(["ИТОГО", data["grand_total_units"], data["grand_total_cost"]])
-    for cell in ws2[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill("solid", fgColor="DBEAFE")
-    for cell in ws2[ws2.max_row]:
-        cell.font = Font(bold=True)
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="balance_summary.xlsx"'},
-    )
+    ws2.append(["ИТОГО", data["grand_total_units"], data["grand_total_cost"]], bold=True)
+
+    return await book.response("balance_summary.xlsx")
 
 
 # =====================================================================
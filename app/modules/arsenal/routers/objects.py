@@ -96,44 +96,24 @@ async def export_objects(
     Для офлайн-аудита и печати реестра подразделений."""
     if current_user.role != "admin":
         raise HTTPException(403, "Только администратор")
-    import io
-    from fastapi.responses import StreamingResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
+    from app.core.xlsx_stream import XlsxStream
 
     data = await get_objects_with_stats(db, current_user)
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Объекты"
-    headers = ["ID", "Название", "Тип", "Родитель", "МОЛ", "Ед.", "Кол-во", "Стоимость", "Подразделений"]
-    for i, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=i, value=h)
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="DBEAFE")
-    for i, o in enumerate(data, 2):
-        parent_name = next((x["name"] for x in data if x["id"] == o["parent_id"]), "")
-        ws.cell(row=i, column=1, value=o["id"])
-        ws.cell(row=i, column=2, value=o["name"])
-        ws.cell(row=i, column=3, value=o["obj_type"])
-        ws.cell(row=i, column=4, value=parent_name)
-        ws.cell(row=i, column=5, value=o["mol_name"])
-        ws.cell(row=i, column=6, value=o["units_count"])
-        ws.cell(row=i, column=7, value=o["total_quantity"])
-        ws.cell(row=i, column=8, value=o["total_cost"])
-        ws.cell(row=i, column=9, value=o["children_count"])
-    for col_letter, width in [("A", 6), ("B", 34), ("C", 18), ("D", 24), ("E", 28),
-                              ("F", 10), ("G", 10), ("H", 16), ("I", 14)]:
-        ws.column_dimensions[col_letter].width = width
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="arsenal_objects.xlsx"'},
+    names = {x["id"]: x["name"] for x in data}
+
+    book = XlsxStream()
+    ws = book.sheet(
+        "Объекты",
+        headers=["ID", "Название", "Тип", "Родитель", "МОЛ", "Ед.", "Кол-во", "Стоимость", "Подразделений"],
+        widths=[6, 34, 18, 24, 28, 10, 10, 16, 14],
+        header_fill="DBEAFE",
     )
+    await ws.extend([
+        [o["id"], o["name"], o["obj_type"], names.get(o["parent_id"], ""), o["mol_name"],
+         o["units_count"], o["total_quantity"], o["total_cost"], o["children_count"]]
+        for o in data
+    ])
+    return await book.response("arsenal_objects.xlsx")
 
 
 class ObjPatch(BaseModel):
@@ -19,7 +19,6 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from sqlalchemy import and_, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.core.database import get_arsenal_db
 from app.core.auth import get_password_hash
@@ -30,7 +29,6 @@ from app.modules.arsenal.models import (
     ArsenalUser,
     DisposalReason,
     Inventory,
-    InventoryItem,
     Nomenclature,
     WeaponRegistry,
 )
@@ -172,7 +170,8 @@ async def start_inventory(
     current_user: ArsenalUser = Depends(get_current_arsenal_user),
 ):
     """Начать инвентаризацию склада. Только одна активная инвентаризация
-    на объект за раз — иначе расхождения смешаются."""
+    на объект за раз — иначе расхождения смешаются. Ожидаемые остатки
+    снимаются в inventory_lines сразу (services/inventory.py)."""
     if current_user.role != "admin" and current_user.object_id != data.object_id:
         raise HTTPException(403, "Нет прав на инвентаризацию этого объекта")
 
@@ -201,6 +200,9 @@ async def start_inventory(
     db.add(inv)
     await db.flush()
 
+    from app.modules.arsenal.services.inventory import take_snapshot
+    await take_snapshot(db, inv)
+
     from app.modules.arsenal.services.audit import write_arsenal_audit
     await write_arsenal_audit(
         db, user_id=current_user.id, username=current_user.username,
@@ -211,7 +213,7 @@ async def start_inventory(
     await db.commit()
     await db.refresh(inv)
     return {"id": inv.id, "object_id": inv.object_id, "status": inv.status,
-            "started_at": inv.started_at}
+            "started_at": inv.started_at, "expected_units": inv.expected_units}
 
 
 class InventoryScan(BaseModel):
@@ -228,6 +230,64 @@ class InventoryQuickScan(BaseModel):
     serial_number: str
 
 
+class InventoryBatchScan(BaseModel):
+    """Пачка быстрых сканов: сканер копит серийники офлайн и шлёт разом."""
+    serial_numbers: list[str] = Field(..., min_length=1, max_length=1000)
+
+
+async def _open_inventory(db: AsyncSession, inventory_id: int) -> Inventory:
+    inv = await db.get(Inventory, inventory_id)
+    if not inv:
+        raise HTTPException(404, "Инвентаризация не найдена")
+    if inv.status != "open":
+        raise HTTPException(409, "Инвентаризация уже закрыта / отменена")
+    return inv
+
+
+async def _quick_scans(db: AsyncSession, inv: Inventory, serials: list[str],
+                       user_id: int) -> list[dict]:
+    """Быстрые сканы по серийникам: один поиск по реестру на всю пачку,
+    один upsert сверки. Результат — на каждый серийник, в порядке входа."""
+    from app.modules.arsenal.services.inventory import (
+        ScanInput, apply_scans, resolve_serials,
+    )
+
+    registry = await resolve_serials(db, inv.object_id, list(set(serials)))
+    results: list[Optional[dict]] = [None] * len(serials)
+    scans, owners = [], []
+    for i, serial in enumerate(serials):
+        hit = registry.get(serial)
+        if not hit:
+            # Номенклатура неизвестна — в сверку не пишем, UI уведомит оператора.
+            results[i] = {
+                "serial_number": serial, "saved": False,
+                "warning": f"Серийник {serial!r} не найден в реестре — зафиксирован как излишек.",
+                "suggestion": "Найдите номенклатуру вручную через форму /scan",
+            }
+            continue
+        nom_id, nom_name, obj_id = hit
+        warning = None
+        if obj_id != inv.object_id:
+            warning = (
+                f"Серийник {serial!r} числится на другом объекте (id={obj_id}). "
+                "Возможно чужой предмет или не было оформлено перемещение."
+            )
+        results[i] = {
+            "serial_number": serial, "nomenclature_id": nom_id,
+            "nomenclature_name": nom_name, "warning": warning,
+        }
+        scans.append(ScanInput(nomenclature_id=nom_id, serial_number=serial, note=warning))
+        owners.append(i)
+
+    for i, res in zip(owners, await apply_scans(db, inv, scans, user_id)):
+        results[i]["saved"] = res["status"] == "saved"
+        if res["status"] == "saved":
+            results[i]["item_id"] = res["item_id"]
+        else:
+            results[i]["duplicate"] = True
+    return results
+
+
 @router.post("/inventory/{inventory_id}/quick-scan")
 async def quick_scan(
     inventory_id: int,
@@ -245,81 +305,42 @@ async def quick_scan(
 
     Возвращает статус-код, позволяющий UI показать цветное уведомление.
     """
-    inv = await db.get(Inventory, inventory_id)
-    if not inv:
-        raise HTTPException(404, "Инвентаризация не найдена")
-    if inv.status != "open":
-        raise HTTPException(409, "Инвентаризация уже закрыта / отменена")
-
+    inv = await _open_inventory(db, inventory_id)
     serial = (data.serial_number or "").strip()
     if not serial:
         raise HTTPException(400, "Пустой серийник")
 
-    # Ищем в реестре — только активные
-    found = (await db.execute(
-        select(WeaponRegistry)
-        .options(selectinload(WeaponRegistry.nomenclature))
-        .where(
-            WeaponRegistry.serial_number == serial,
-            WeaponRegistry.status == 1,
-        )
-        .limit(1)
-    )).scalars().first()
+    result = (await _quick_scans(db, inv, [serial], current_user.id))[0]
+    if result.pop("duplicate", False):
+        raise HTTPException(409, f"Серийник {serial!r} уже сканирован в этой инвентаризации")
+    await db.commit()
+    result.pop("serial_number" if result["saved"] else "nomenclature_id", None)
+    return result
 
-    warning = None
-    nomenclature_id = None
-    nomenclature_name = None
-    if found:
-        nomenclature_id = found.nomenclature_id
-        nomenclature_name = found.nomenclature.name if found.nomenclature else None
-        # Проверка, что этот серийник числится ИМЕННО на этом складе
-        if found.current_object_id != inv.object_id:
-            warning = (
-                f"Серийник {serial!r} числится на другом объекте (id={found.current_object_id}). "
-                "Возможно чужой предмет или не было оформлено перемещение."
-            )
-    else:
-        warning = f"Серийник {serial!r} не найден в реестре — зафиксирован как излишек."
-
-    # Проверка дубликата внутри этой инвентаризации
-    if nomenclature_id:
-        dup = (await db.execute(
-            select(InventoryItem).where(
-                InventoryItem.inventory_id == inventory_id,
-                InventoryItem.nomenclature_id == nomenclature_id,
-                InventoryItem.serial_number == serial,
-            )
-        )).scalars().first()
-        if dup:
-            raise HTTPException(409, f"Серийник {serial!r} уже сканирован в этой инвентаризации")
-
-    item = InventoryItem(
-        inventory_id=inventory_id,
-        nomenclature_id=nomenclature_id or 0,  # 0 не пройдёт FK — уложит в warning ниже
-        serial_number=serial,
-        found_quantity=1,
-        scanned_by_id=current_user.id,
-        note=warning,
-    )
-    # Если nomenclature_id неизвестен — не сохраняем сканирование в БД, но
-    # возвращаем warning, чтобы UI уведомил оператора о находке.
-    if not nomenclature_id:
-        return {
-            "saved": False,
-            "warning": warning,
-            "serial_number": serial,
-            "suggestion": "Найдите номенклатуру вручную через форму /scan",
-        }
 
-    db.add(item)
+@router.post("/inventory/{inventory_id}/scan-batch")
+async def quick_scan_batch(
+    inventory_id: int,
+    data: InventoryBatchScan,
+    db: AsyncSession = Depends(get_arsenal_db),
+    current_user: ArsenalUser = Depends(get_current_arsenal_user),
+):
+    """Пачка быстрых сканов одним запросом (ручной сканер, плохая связь).
+    Дубли не прерывают пачку — отмечаются в результате по серийнику."""
+    inv = await _open_inventory(db, inventory_id)
+    serials = [s.strip() for s in data.serial_numbers if s and s.strip()]
+    if not serials:
+        raise HTTPException(400, "Пустой список серийников")
+
+    results = await _quick_scans(db, inv, serials, current_user.id)
     await db.commit()
-    await db.refresh(item)
+    await db.refresh(inv)
     return {
-        "saved": True,
-        "item_id": item.id,
-        "nomenclature_id": nomenclature_id,
-        "nomenclature_name": nomenclature_name,
-        "warning": warning,
+        "results": results,
+        "saved": sum(1 for r in results if r["saved"]),
+        "duplicates": sum(1 for r in results if r.get("duplicate")),
+        "not_found": sum(1 for r in results if not r["saved"] and not r.get("duplicate")),
+        "summary": _summary(inv),
     }
 
 
@@ -334,74 +355,63 @@ async def scan_inventory_item(
 
     Для номерного учёта: добавляется одна запись на серийник. Повторное
     сканирование того же серийника — 409.
-    Для партионного: ищется существующая строка по номенклатуре, если есть —
-    увеличивается found_quantity, иначе создаётся новая.
+    Для партионного: found_quantity строки сверки (номенклатура + партия)
+    увеличивается; скан без номера партии ложится на единственную
+    ожидаемую партию.
     """
-    inv = await db.get(Inventory, inventory_id)
-    if not inv:
-        raise HTTPException(404, "Инвентаризация не найдена")
-    if inv.status != "open":
-        raise HTTPException(409, "Инвентаризация уже закрыта / отменена")
+    inv = await _open_inventory(db, inventory_id)
 
     if not data.nomenclature_id:
         raise HTTPException(400, "nomenclature_id обязателен (или используйте /quick-scan для быстрого скана по серийнику)")
     nom = await db.get(Nomenclature, data.nomenclature_id)
     if not nom:
         raise HTTPException(400, "Номенклатура не найдена")
+    if nom.is_numbered and not data.serial_number:
+        raise HTTPException(400, "Для номерного учёта нужен серийный номер")
 
-    if nom.is_numbered:
-        # Серийник обязателен, дубли запрещены
-        if not data.serial_number:
-            raise HTTPException(400, "Для номерного учёта нужен серийный номер")
-        dup = (await db.execute(
-            select(InventoryItem).where(
-                InventoryItem.inventory_id == inventory_id,
-                InventoryItem.nomenclature_id == data.nomenclature_id,
-                InventoryItem.serial_number == data.serial_number,
-            )
-        )).scalars().first()
-        if dup:
-            raise HTTPException(
-                409, f"Серийник {data.serial_number!r} уже сканирован в этой инвентаризации",
-            )
-        item = InventoryItem(
-            inventory_id=inventory_id,
-            nomenclature_id=data.nomenclature_id,
-            serial_number=data.serial_number,
-            found_quantity=1,
-            note=data.note,
-            scanned_by_id=current_user.id,
+    from app.modules.arsenal.services.inventory import ScanInput, apply_scans
+
+    result = (await apply_scans(db, inv, [ScanInput(
+        nomenclature_id=data.nomenclature_id, serial_number=data.serial_number,
+        quantity=data.found_quantity, note=data.note,
+    )], current_user.id))[0]
+    if result["status"] == "duplicate":
+        raise HTTPException(
+            409, f"Серийник {data.serial_number!r} уже сканирован в этой инвентаризации",
         )
-        db.add(item)
-    else:
-        # Партионный — один ряд на номенклатуру (+ опционально номер партии)
-        existing = (await db.execute(
-            select(InventoryItem).where(
-                InventoryItem.inventory_id == inventory_id,
-                InventoryItem.nomenclature_id == data.nomenclature_id,
-                InventoryItem.serial_number.is_(data.serial_number)
-                if data.serial_number is None else
-                InventoryItem.serial_number == data.serial_number,
-            )
-        )).scalars().first()
-        if existing:
-            existing.found_quantity += data.found_quantity
-            if data.note:
-                existing.note = (existing.note or "") + " | " + data.note
-            item = existing
-        else:
-            item = InventoryItem(
-                inventory_id=inventory_id,
-                nomenclature_id=data.nomenclature_id,
-                serial_number=data.serial_number,
-                found_quantity=data.found_quantity,
-                note=data.note,
-                scanned_by_id=current_user.id,
-            )
-            db.add(item)
     await db.commit()
-    await db.refresh(item)
-    return {"id": item.id, "found_quantity": item.found_quantity}
+    return {"id": result["item_id"], "found_quantity": result["found_quantity"]}
+
+
+def _summary(inv: Inventory) -> dict:
+    """Сводка из счётчиков инвентаризации — без обхода строк."""
+    total_expected_units = inv.expected_units or 0
+    total_found_units = inv.found_units or 0
+    progress_pct = (
+        round(min(total_found_units / total_expected_units * 100, 100))
+        if total_expected_units > 0 else 0
+    )
+
+    # Скорость: scans/мин (для оценки времени завершения оператором).
+    elapsed_min = None
+    scans_per_min = None
+    if inv.started_at:
+        elapsed_seconds = ((inv.closed_at or utcnow()) - inv.started_at).total_seconds()
+        if elapsed_seconds > 0:
+            elapsed_min = round(elapsed_seconds / 60, 1)
+            if inv.scan_count:
+                scans_per_min = round(inv.scan_count / max(elapsed_min, 0.1), 1)
+
+    return {
+        "matched_count": inv.matched_count,
+        "missing_count": inv.missing_count,
+        "surplus_count": inv.surplus_count,
+        "total_expected_units": total_expected_units,
+        "total_found_units": total_found_units,
+        "progress_pct": progress_pct,
+        "elapsed_minutes": elapsed_min,
+        "scans_per_minute": scans_per_min,
+    }
 
 
 @router.get("/inventory/{inventory_id}/report")
@@ -410,100 +420,23 @@ async def inventory_report(
     db: AsyncSession = Depends(get_arsenal_db),
     current_user: ArsenalUser = Depends(get_current_arsenal_user),
 ):
-    """Отчёт расхождений: что ожидается (по WeaponRegistry) vs что найдено.
+    """Отчёт расхождений: что ожидается (снимок WeaponRegistry на старте)
+    vs что найдено.
 
     Структура:
       * missing — в БД есть, но не найдено в ходе инвентаризации (недостача)
       * surplus — найдено, но в БД нет (излишек, чужое или ошибка)
       * matched — совпадает
-    Для партионного учёта сравниваются количества.
+    Для партионного учёта сравниваются количества. Списки — из
+    inventory_lines, сводка — из счётчиков инвентаризации.
     """
-    inv = (await db.execute(
-        select(Inventory)
-        .options(selectinload(Inventory.items).selectinload(InventoryItem.nomenclature))
-        .where(Inventory.id == inventory_id)
-    )).scalars().first()
+    inv = await db.get(Inventory, inventory_id)
     if not inv:
         raise HTTPException(404, "Инвентаризация не найдена")
 
-    # Ожидаемые остатки на складе
-    expected_rows = (await db.execute(
-        select(
-            WeaponRegistry.nomenclature_id,
-            WeaponRegistry.serial_number,
-            WeaponRegistry.quantity,
-            Nomenclature.name,
-            Nomenclature.is_numbered,
-        )
-        .join(Nomenclature, Nomenclature.id == WeaponRegistry.nomenclature_id)
-        .where(
-            WeaponRegistry.current_object_id == inv.object_id,
-            WeaponRegistry.status == 1,
-        )
-    )).all()
-
-    # Ключи: для номерного — (nom_id, serial), для партионного — (nom_id, serial or None)
-    expected_map: dict[tuple, dict] = {}
-    for nom_id, serial, qty, name, is_numbered in expected_rows:
-        key = (nom_id, serial if is_numbered else (serial or None))
-        expected_map[key] = {
-            "nomenclature_id": nom_id,
-            "serial_number": serial,
-            "name": name,
-            "is_numbered": bool(is_numbered),
-            "expected_quantity": int(qty or 0),
-        }
-
-    found_map: dict[tuple, dict] = {}
-    for it in inv.items:
-        is_num = bool(it.nomenclature.is_numbered) if it.nomenclature else False
-        key = (it.nomenclature_id, it.serial_number if is_num else (it.serial_number or None))
-        if key not in found_map:
-            found_map[key] = {
-                "nomenclature_id": it.nomenclature_id,
-                "serial_number": it.serial_number,
-                "name": it.nomenclature.name if it.nomenclature else "—",
-                "is_numbered": is_num,
-                "found_quantity": 0,
-            }
-        found_map[key]["found_quantity"] += it.found_quantity
-
-    matched, missing, surplus = [], [], []
-    all_keys = set(expected_map.keys()) | set(found_map.keys())
-    for k in all_keys:
-        exp = expected_map.get(k)
-        fnd = found_map.get(k)
-        if exp and fnd:
-            diff = fnd["found_quantity"] - exp["expected_quantity"]
-            if diff == 0:
-                matched.append({**exp, "found_quantity": fnd["found_quantity"]})
-            elif diff < 0:
-                missing.append({**exp, "found_quantity": fnd["found_quantity"], "deficit": -diff})
-            else:
-                surplus.append({**fnd, "expected_quantity": exp["expected_quantity"], "excess": diff})
-        elif exp:
-            missing.append({**exp, "found_quantity": 0, "deficit": exp["expected_quantity"]})
-        else:
-            surplus.append({**fnd, "expected_quantity": 0, "excess": fnd["found_quantity"]})
-
-    # Прогресс: сколько % ожидаемого уже сканировано.
-    total_expected_units = sum(e["expected_quantity"] for e in expected_map.values())
-    total_found_units = sum(f["found_quantity"] for f in found_map.values())
-    progress_pct = (
-        round(min(total_found_units / total_expected_units * 100, 100))
-        if total_expected_units > 0 else 0
-    )
-
-    # Скорость: scans/мин (для оценки времени завершения оператором).
-    elapsed_min = None
-    scans_per_min = None
-    if inv.started_at:
-        elapsed_seconds = (utcnow() - inv.started_at).total_seconds()
-        if elapsed_seconds > 0:
-            elapsed_min = round(elapsed_seconds / 60, 1)
-            if len(inv.items) > 0:
-                scans_per_min = round(len(inv.items) / max(elapsed_min, 0.1), 1)
+    from app.modules.arsenal.services.inventory import load_lines, split_report
 
+    matched, missing, surplus = split_report(await load_lines(db, inventory_id))
     return {
         "inventory": {
             "id": inv.id, "object_id": inv.object_id, "status": inv.status,
@@ -514,16 +447,7 @@ async def inventory_report(
         "matched": matched,
         "missing": missing,
         "surplus": surplus,
-        "summary": {
-            "matched_count": len(matched),
-            "missing_count": len(missing),
-            "surplus_count": len(surplus),
-            "total_expected_units": total_expected_units,
-            "total_found_units": total_found_units,
-            "progress_pct": progress_pct,
-            "elapsed_minutes": elapsed_min,
-            "scans_per_minute": scans_per_min,
-        },
+        "summary": _summary(inv),
     }
 
 
@@ -536,63 +460,23 @@ async def inventory_pending(
     """Что ещё НЕ отсканировано — для ускорения процесса. Оператор видит
     оставшийся список и может целенаправленно искать пропавшие предметы,
     а не бегать по складу в поисках всех подряд."""
-    inv = (await db.execute(
-        select(Inventory)
-        .options(selectinload(Inventory.items).selectinload(InventoryItem.nomenclature))
-        .where(Inventory.id == inventory_id)
-    )).scalars().first()
+    inv = await db.get(Inventory, inventory_id)
     if not inv:
         raise HTTPException(404, "Инвентаризация не найдена")
 
-    # Ожидаемые единицы
-    expected = (await db.execute(
-        select(
-            WeaponRegistry.id,
-            WeaponRegistry.nomenclature_id,
-            WeaponRegistry.serial_number,
-            WeaponRegistry.quantity,
-            Nomenclature.name,
-            Nomenclature.is_numbered,
-        )
-        .join(Nomenclature, Nomenclature.id == WeaponRegistry.nomenclature_id)
-        .where(
-            WeaponRegistry.current_object_id == inv.object_id,
-            WeaponRegistry.status == 1,
-        )
-    )).all()
-
-    # Для номерного: ключ = (nom_id, serial)
-    # Для партионного: (nom_id, None) и сравнение по количеству
-    scanned_keys = set()
-    scanned_qty_by_nom: dict[int, int] = {}
-    for it in inv.items:
-        is_num = bool(it.nomenclature.is_numbered) if it.nomenclature else False
-        if is_num:
-            scanned_keys.add((it.nomenclature_id, it.serial_number))
-        else:
-            scanned_qty_by_nom[it.nomenclature_id] = (
-                scanned_qty_by_nom.get(it.nomenclature_id, 0) + it.found_quantity
-            )
+    from app.modules.arsenal.services.inventory import load_lines
 
     pending = []
-    for _, nom_id, serial, qty, name, is_numbered in expected:
-        if is_numbered:
-            if (nom_id, serial) not in scanned_keys:
-                pending.append({
-                    "nomenclature_id": nom_id, "name": name,
-                    "serial_number": serial, "is_numbered": True,
-                    "expected_quantity": int(qty or 0),
-                })
-        else:
-            scanned = scanned_qty_by_nom.get(nom_id, 0)
-            remaining = int(qty or 0) - scanned
-            if remaining > 0:
-                pending.append({
-                    "nomenclature_id": nom_id, "name": name,
-                    "serial_number": serial, "is_numbered": False,
-                    "expected_quantity": int(qty or 0),
-                    "remaining_quantity": remaining,
-                })
+    for line, name in await load_lines(db, inventory_id, pending_only=True):
+        item = {
+            "nomenclature_id": line.nomenclature_id, "name": name,
+            "serial_number": line.serial_key or None,
+            "is_numbered": bool(line.is_numbered),
+            "expected_quantity": line.expected_quantity,
+        }
+        if not line.is_numbered:
+            item["remaining_quantity"] = line.expected_quantity - line.found_quantity
+        pending.append(item)
     return {
         "inventory_id": inv.id,
         "object_id": inv.object_id,
@@ -644,9 +528,9 @@ async def close_inventory(
     correction_summary = None
 
     if p.auto_correct:
-        # Вычисляем отчёт ещё раз внутри транзакции
-        report = await inventory_report(inventory_id, db, current_user)
-        missing, surplus = report["missing"], report["surplus"]
+        # Расхождения — из строк сверки, реестр заново не агрегируем.
+        from app.modules.arsenal.services.inventory import load_lines, split_report
+        _matched, missing, surplus = split_report(await load_lines(db, inventory_id))
 
         if missing or surplus:
             # Причина для недостачи. По умолчанию "LOST" из сида миграции.
@@ -801,26 +685,22 @@ async def export_inventory_report(
 ):
     """Excel-отчёт расхождений для печати/подписи комиссией. Три листа:
     «Совпадения», «Недостача», «Излишек» + сводка."""
-    import io
+    from openpyxl.styles import Font
 
-    from fastapi.responses import StreamingResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
+    from app.core.xlsx_stream import XlsxStream
 
     report = await inventory_report(inventory_id, db, current_user)
     inv = report["inventory"]
     obj = await db.get(AccountingObject, inv["object_id"])
     obj_name = obj.name if obj else f"id={inv['object_id']}"
 
-    wb = Workbook(write_only=False)
+    book = XlsxStream()
 
     # ------ Лист «Сводка» ------
-    ws = wb.active
-    ws.title = "Сводка"
-    bold = Font(bold=True)
-    ws["A1"] = f"Инвентаризационная ведомость — {obj_name}"
-    ws["A1"].font = Font(bold=True, size=14)
-    ws.merge_cells("A1:D1")
+    # write-only книга не умеет merge_cells — заголовок просто крупным шрифтом.
+    ws = book.sheet("Сводка", widths=[32, 40])
+    ws.append([f"Инвентаризационная ведомость — {obj_name}"], font=Font(bold=True, size=14))
+    ws.append([])
     summary_rows = [
         ("ID инвентаризации", inv["id"]),
         ("Объект", obj_name),
@@ -834,67 +714,48 @@ async def export_inventory_report(
         ("Недостача", report["summary"]["missing_count"]),
         ("Излишек", report["summary"]["surplus_count"]),
     ]
-    for i, (k, v) in enumerate(summary_rows, start=3):
-        ws.cell(row=i, column=1, value=k).font = bold
-        ws.cell(row=i, column=2, value=str(v) if v is not None else "—")
-    ws.column_dimensions["A"].width = 32
-    ws.column_dimensions["B"].width = 40
+    for k, v in summary_rows:
+        ws.append([ws.cell(k, bold=True), str(v) if v is not None else "—"])
 
     # ------ Лист «Недостача» ------
-    ws2 = wb.create_sheet("Недостача")
-    header = ["Номенклатура", "Серийник", "Ожидалось", "Найдено", "Дефицит"]
-    for c, v in enumerate(header, start=1):
-        cell = ws2.cell(row=1, column=c, value=v)
-        cell.font = bold
-        cell.fill = PatternFill("solid", fgColor="FECACA")
-    for i, r in enumerate(report["missing"], start=2):
-        ws2.cell(row=i, column=1, value=r.get("name"))
-        ws2.cell(row=i, column=2, value=r.get("serial_number") or "—")
-        ws2.cell(row=i, column=3, value=r.get("expected_quantity"))
-        ws2.cell(row=i, column=4, value=r.get("found_quantity"))
-        ws2.cell(row=i, column=5, value=r.get("deficit"))
-    for col in range(1, 6):
-        ws2.column_dimensions[chr(64 + col)].width = 20
+    ws2 = book.sheet(
+        "Недостача",
+        headers=["Номенклатура", "Серийник", "Ожидалось", "Найдено", "Дефицит"],
+        widths=[20] * 5,
+        header_fill="FECACA",
+    )
+    await ws2.extend([
+        [r.get("name"), r.get("serial_number") or "—", r.get("expected_quantity"),
+         r.get("found_quantity"), r.get("deficit")]
+        for r in report["missing"]
+    ])
 
     # ------ Лист «Излишек» ------
-    ws3 = wb.create_sheet("Излишек")
-    header = ["Номенклатура", "Серийник", "Ожидалось", "Найдено", "Избыток"]
-    for c, v in enumerate(header, start=1):
-        cell = ws3.cell(row=1, column=c, value=v)
-        cell.font = bold
-        cell.fill = PatternFill("solid", fgColor="FEF3C7")
-    for i, r in enumerate(report["surplus"], start=2):
-        ws3.cell(row=i, column=1, value=r.get("name"))
-        ws3.cell(row=i, column=2, value=r.get("serial_number") or "—")
-        ws3.cell(row=i, column=3, value=r.get("expected_quantity"))
-        ws3.cell(row=i, column=4, value=r.get("found_quantity"))
-        ws3.cell(row=i, column=5, value=r.get("excess"))
-    for col in range(1, 6):
-        ws3.column_dimensions[chr(64 + col)].width = 20
+    ws3 = book.sheet(
+        "Излишек",
+        headers=["Номенклатура", "Серийник", "Ожидалось", "Найдено", "Избыток"],
+        widths=[20] * 5,
+        header_fill="FEF3C7",
+    )
+    await ws3.extend([
+        [r.get("name"), r.get("serial_number") or "—", r.get("expected_quantity"),
+         r.get("found_quantity"), r.get("excess")]
+        for r in report["surplus"]
+    ])
 
     # ------ Лист «Совпадения» ------
-    ws4 = wb.create_sheet("Совпадения")
-    header = ["Номенклатура", "Серийник", "Количество"]
-    for c, v in enumerate(header, start=1):
-        cell = ws4.cell(row=1, column=c, value=v)
-        cell.font = bold
-        cell.fill = PatternFill("solid", fgColor="D1FAE5")
-    for i, r in enumerate(report["matched"], start=2):
-        ws4.cell(row=i, column=1, value=r.get("name"))
-        ws4.cell(row=i, column=2, value=r.get("serial_number") or "—")
-        ws4.cell(row=i, column=3, value=r.get("found_quantity"))
-    for col in range(1, 4):
-        ws4.column_dimensions[chr(64 + col)].width = 25
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"inventory_{inventory_id}_{obj_name}.xlsx".replace(" ", "_")
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    ws4 = book.sheet(
+        "Совпадения",
+        headers=["Номенклатура", "Серийник", "Количество"],
+        widths=[25] * 3,
+        header_fill="D1FAE5",
     )
+    await ws4.extend([
+        [r.get("name"), r.get("serial_number") or "—", r.get("found_quantity")]
+        for r in report["matched"]
+    ])
+
+    return await book.response(f"inventory_{inventory_id}_{obj_name}.xlsx".replace(" ", "_"))
 
 
 @router.get("/inventory")
@@ -1,9 +1,12 @@
 import io
 import re
+import asyncio
 import logging
 import secrets
 import string
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal, ROUND_HALF_UP
 from openpyxl import load_workbook
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,6 +19,10 @@ from app.modules.arsenal.models import AccountingObject, Nomenclature, WeaponReg
 logger = logging.getLogger(__name__)
 ZERO = Decimal("0.00")
 BATCH_SIZE = 1000
+# Потоки для argon2: C-код отпускает GIL, но каждый хеш берёт ~64 МБ памяти —
+# держим параллелизм небольшим.
+HASH_WORKERS = 4
+BATCH_KEYWORDS = ["патрон", "граната", "мина", "снаряд", "зип", "масло", "смазка", "гвоздодер"]
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
@@ -37,164 +44,264 @@ def parse_price(value) -> Decimal:
         return ZERO
 
 
-async def import_arsenal_from_excel(file_content: bytes, db: AsyncSession) -> dict:
-    """
-    Импорт данных из Excel с оптимизацией памяти и исправленной логикой количества.
-    """
-    workbook = None
-    try:
-        workbook = load_workbook(filename=io.BytesIO(file_content), read_only=True, data_only=True)
-        worksheet = workbook.active
+@dataclass(slots=True)
+class ParsedRow:
+    """Строка ведомости после разбора (до привязки к объектам/номенклатуре)."""
+    row_index: int
+    obj_name: str
+    mol_name: Optional[str]
+    nom_name: str
+    serial: Optional[str]  # из скобок в наименовании; None — определится по типу
+    account: Optional[str]
+    kbk: Optional[str]
+    qty: int
+    unit_price: Decimal
+    inv_number: Optional[str]
 
-        objects_cache: Dict[str, AccountingObject] = {}
-        nom_cache: Dict[str, Nomenclature] = {}
 
-        obj_res = await db.execute(select(AccountingObject))
-        for obj in obj_res.scalars().all():
-            key = f"{obj.name.lower()}_{str(obj.mol_name).lower() if obj.mol_name else ''}"
-            objects_cache[key] = obj
+def object_key(name: str, mol_name: Optional[str]) -> str:
+    return f"{name.lower()}_{str(mol_name).lower() if mol_name else ''}"
 
-        nom_res = await db.execute(select(Nomenclature))
-        for nom in nom_res.scalars().all():
-            nom_cache[nom.name.lower()] = nom
 
-        batch = []
-        added_count = 0
-        skipped_count = 0
-        created_users_creds = []
+def guess_is_numbered(nom_name: str, account: Optional[str]) -> bool:
+    """Тип новой номенклатуры: счёт 105 и расходники — партионные."""
+    nom_name_lower = nom_name.lower()
+    if (account and str(account).startswith("105")) or any(
+            kw in nom_name_lower for kw in BATCH_KEYWORDS):
+        return False
+    return True
 
-        rows = worksheet.iter_rows(values_only=True)
 
-        for row_index, row in enumerate(rows, start=1):
-            try:
-                if not row or row[0] is None:
-                    continue
-                first_col = str(row[0]).strip().replace('.', '')
-                if not first_col.isdigit():
-                    skipped_count += 1
-                    continue
-
-                raw_name = str(row[1]).strip() if len(row) > 1 and row[1] else ""
-                if not raw_name:
-                    skipped_count += 1
-                    continue
-
-                account = str(row[2]).strip() if len(row) > 2 and row[2] else None
-                kbk = str(row[3]).strip() if len(row) > 3 and row[3] else None
-                storage_raw = str(row[4]).strip() if len(row) > 4 and row[4] else "Главный склад"
-
-                qty_val = row[5] if len(row) > 5 else 1
-                try:
-                    qty = int(float(str(qty_val).replace(" ", "").replace("\xa0", "")))
-                    if qty < 1:
-                        qty = 1
-                except Exception:
-                    qty = 1
-
-                total_sum_val = row[6] if len(row) > 6 else 0
-                total_sum = parse_price(total_sum_val)
-
-                if qty > 0 and total_sum > 0:
-                    unit_price = total_sum / Decimal(qty)
-                    unit_price = unit_price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                else:
-                    unit_price = total_sum
-
-                inv_number = str(row[7]).strip() if len(row) > 7 and row[7] else None
-
-                # --- 1. Обработка Склада и МОЛ (без изменений) ---
-                obj_name = storage_raw
-                mol_name = None
-                if " - " in storage_raw:
-                    parts = storage_raw.rsplit(" - ", 1)
-                    obj_name = parts[0].strip()
-                    mol_name = parts[1].strip()
-
-                obj_key = f"{obj_name.lower()}_{str(mol_name).lower() if mol_name else ''}"
-                target_object = objects_cache.get(obj_key)
-
-                if not target_object:
-                    target_object = AccountingObject(name=obj_name, obj_type="Склад", mol_name=mol_name)
-                    db.add(target_object)
-                    await db.flush()
-                    objects_cache[obj_key] = target_object
-                    # ... (создание пользователя) ...
-                    new_username = f"unit_{target_object.id}"
-                    alphabet = string.ascii_letters + string.digits
-                    plain_password = ''.join(secrets.choice(alphabet) for _ in range(8))
-                    new_user = ArsenalUser(
-                        username=new_username,
-                        hashed_password=pwd_context.hash(plain_password),
-                        role="unit_head",
-                        object_id=target_object.id
-                    )
-                    db.add(new_user)
-                    created_users_creds.append({
-                        "object": obj_name, "mol": mol_name or "-",
-                        "username": new_username, "password": plain_password
-                    })
-
-                # --- 2. 🔥 ИСПРАВЛЕННАЯ ЛОГИКА ОБРАБОТКИ НОМЕНКЛАТУРЫ ---
-                serial = "Б/Н"
-                nom_name = raw_name
-
-                match = re.search(r'\(([^)]+)\)$', raw_name)
-                if match:
-                    serial = match.group(1).strip()
-                    nom_name = raw_name[:match.start()].strip()
-
-                nom_key = nom_name.lower()
-                nomenclature = nom_cache.get(nom_key)
-
-                is_numbered = True  # Значение по-умолчанию
-
-                if nomenclature:
-                    # Если номенклатура уже есть в базе, доверяем ЕЙ
-                    is_numbered = nomenclature.is_numbered
-                else:
-                    # Если это новый товар, пытаемся угадать его тип
-                    batch_keywords = ["патрон", "граната", "мина", "снаряд", "зип", "масло", "смазка", "гвоздодер"]
-                    nom_name_lower = nom_name.lower()
-                    if (account and str(account).startswith("105")) or any(
-                            kw in nom_name_lower for kw in batch_keywords):
-                        is_numbered = False
-
-                    # Создаем новую номенклатуру с правильным флагом
-                    nomenclature = Nomenclature(name=nom_name, default_account=account, is_numbered=is_numbered)
-                    db.add(nomenclature)
-                    await db.flush()
-                    nom_cache[nom_key] = nomenclature
-
-                # Определяем серийник, если он не был указан в скобках
-                if serial == "Б/Н":
-                    if is_numbered:
-                        serial = f"Инв.{inv_number}" if inv_number else f"Б/Н-{row_index}"
-                    else:
-                        serial = "Партия 1"
-
-                # --- 3. 🔥 ИСПРАВЛЕННАЯ ЛОГИКА ФОРМИРОВАНИЯ КОЛИЧЕСТВА ---
-                final_quantity = 1 if is_numbered else qty
-
-                batch.append({
-                    "nomenclature_id": nomenclature.id,
-                    "serial_number": serial,
-                    "current_object_id": target_object.id,
-                    "status": 1,
-                    "quantity": final_quantity,  # <-- Используем правильное количество
-                    "inventory_number": inv_number,
-                    "price": unit_price,
-                    "account_code": account,
-                    "kbk": kbk
-                })
-                # ... (далее без изменений) ...
-                if len(batch) >= BATCH_SIZE:
-                    await upsert_batch(db, batch)
-                    added_count += len(batch)
-                    batch.clear()
+def _parse_row(row_index: int, row) -> Optional[ParsedRow]:
+    first_col = str(row[0]).strip().replace('.', '')
+    if not first_col.isdigit():
+        return None
+
+    raw_name = str(row[1]).strip() if len(row) > 1 and row[1] else ""
+    if not raw_name:
+        return None
+
+    account = str(row[2]).strip() if len(row) > 2 and row[2] else None
+    kbk = str(row[3]).strip() if len(row) > 3 and row[3] else None
+    storage_raw = str(row[4]).strip() if len(row) > 4 and row[4] else "Главный склад"
 
+    qty_val = row[5] if len(row) > 5 else 1
+    try:
+        qty = int(float(str(qty_val).replace(" ", "").replace("\xa0", "")))
+        if qty < 1:
+            qty = 1
+    except Exception:
+        qty = 1
+
+    total_sum_val = row[6] if len(row) > 6 else 0
+    total_sum = parse_price(total_sum_val)
+
+    if qty > 0 and total_sum > 0:
+        unit_price = total_sum / Decimal(qty)
+        unit_price = unit_price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    else:
+        unit_price = total_sum
+
+    inv_number = str(row[7]).strip() if len(row) > 7 and row[7] else None
+
+    # Склад и МОЛ: «Склад - Иванов И.И.»
+    obj_name = storage_raw
+    mol_name = None
+    if " - " in storage_raw:
+        parts = storage_raw.rsplit(" - ", 1)
+        obj_name = parts[0].strip()
+        mol_name = parts[1].strip()
+
+    # Серийник в скобках в конце наименования: «АК-74 (123456)»
+    serial = None
+    nom_name = raw_name
+    match = re.search(r'\(([^)]+)\)$', raw_name)
+    if match:
+        serial = match.group(1).strip()
+        nom_name = raw_name[:match.start()].strip()
+        # «АК-74 (Б/Н)» — то же, что без серийника: номер определится по типу
+        # (Инв.<номер> / Б/Н-<строка>), иначе все такие строки слились бы в одну.
+        if serial == "Б/Н":
+            serial = None
+
+    return ParsedRow(
+        row_index=row_index, obj_name=obj_name, mol_name=mol_name,
+        nom_name=nom_name, serial=serial, account=account, kbk=kbk,
+        qty=qty, unit_price=unit_price, inv_number=inv_number,
+    )
+
+
+def parse_workbook(file_content: bytes) -> Tuple[List[ParsedRow], int]:
+    """Проход 1 (синхронный, зовётся через asyncio.to_thread): разбор всех
+    строк ведомости. → (строки, сколько пропущено)."""
+    workbook = load_workbook(filename=io.BytesIO(file_content), read_only=True, data_only=True)
+    parsed: List[ParsedRow] = []
+    skipped = 0
+    try:
+        for row_index, row in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            if not row or row[0] is None:
+                continue
+            try:
+                item = _parse_row(row_index, row)
             except Exception as e:
                 logger.error(f"Error parsing row {row_index}: {e}")
-                skipped_count += 1
+                item = None
+            if item is None:
+                skipped += 1
+            else:
+                parsed.append(item)
+    finally:
+        workbook.close()
+    return parsed, skipped
+
+
+def _generate_password(length: int = 8) -> str:
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(alphabet) for _ in range(length))
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """argon2 вне event loop: пул потоков (argon2-cffi отпускает GIL)."""
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        return list(await asyncio.gather(
+            *(loop.run_in_executor(pool, pwd_context.hash, p) for p in passwords)
+        ))
+
+
+def _chunks(rows: list, size: Optional[int] = None):
+    """Многострочный INSERT ... VALUES пачками: у Postgres/asyncpg лимит
+    32767 bind-параметров на запрос, первичный залив его превышает."""
+    size = size or BATCH_SIZE
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def _create_objects(db: AsyncSession, parsed: List[ParsedRow],
+                          objects_ids: Dict[str, int]) -> list:
+    """Новые склады/МОЛ INSERT ... RETURNING (пачками) + по пользователю unit_head
+    на каждый. → учётки для ответа (с открытыми паролями)."""
+    new_objects: Dict[str, dict] = {}
+    for item in parsed:
+        key = object_key(item.obj_name, item.mol_name)
+        if key not in objects_ids and key not in new_objects:
+            new_objects[key] = {"name": item.obj_name, "obj_type": "Склад", "mol_name": item.mol_name}
+    if not new_objects:
+        return []
+
+    created = []
+    for chunk in _chunks(list(new_objects.values())):
+        created += (await db.execute(
+            insert(AccountingObject)
+            .values(chunk)
+            .returning(AccountingObject.id, AccountingObject.name, AccountingObject.mol_name)
+        )).all()
+    for obj_id, name, mol_name in created:
+        objects_ids[object_key(name, mol_name)] = obj_id
+
+    created = sorted(created, key=lambda r: r[0])
+    passwords = [_generate_password() for _ in created]
+    hashes = await hash_passwords(passwords)
+    await db.execute(insert(ArsenalUser), [
+        {"username": f"unit_{obj_id}", "hashed_password": hashed,
+         "role": "unit_head", "object_id": obj_id}
+        for (obj_id, _name, _mol), hashed in zip(created, hashes)
+    ])
+    return [
+        {"object": name, "mol": mol_name or "-", "username": f"unit_{obj_id}", "password": password}
+        for (obj_id, name, mol_name), password in zip(created, passwords)
+    ]
+
+
+async def _create_nomenclature(db: AsyncSession, parsed: List[ParsedRow],
+                               nom_by_key: Dict[str, Tuple[int, bool]]) -> None:
+    """Новая номенклатура INSERT ... RETURNING (пачками). Тип (is_numbered) и счёт
+    берутся из первой строки с этим наименованием — как при построчном импорте."""
+    new_noms: Dict[str, dict] = {}
+    for item in parsed:
+        key = item.nom_name.lower()
+        if key not in nom_by_key and key not in new_noms:
+            new_noms[key] = {
+                "name": item.nom_name, "default_account": item.account,
+                "is_numbered": guess_is_numbered(item.nom_name, item.account),
+            }
+    if not new_noms:
+        return
+    created = []
+    for chunk in _chunks(list(new_noms.values())):
+        created += (await db.execute(
+            insert(Nomenclature)
+            .values(chunk)
+            .returning(Nomenclature.id, Nomenclature.name, Nomenclature.is_numbered)
+        )).all()
+    for nom_id, name, is_numbered in created:
+        nom_by_key[name.lower()] = (nom_id, is_numbered)
+
+
+def registry_row(item: ParsedRow, nomenclature_id: int, is_numbered: bool, object_id: int) -> dict:
+    """Строка weapon_registry. Серийник без скобок: номерное — по инв. номеру
+    (или номеру строки), партионное — «Партия 1»; у партии — полное количество."""
+    serial = item.serial
+    if serial is None:
+        if is_numbered:
+            serial = f"Инв.{item.inv_number}" if item.inv_number else f"Б/Н-{item.row_index}"
+        else:
+            serial = "Партия 1"
+    return {
+        "nomenclature_id": nomenclature_id,
+        "serial_number": serial,
+        "current_object_id": object_id,
+        "status": 1,
+        "quantity": 1 if is_numbered else item.qty,
+        "inventory_number": item.inv_number,
+        "price": item.unit_price,
+        "account_code": item.account,
+        "kbk": item.kbk,
+    }
+
+
+async def import_arsenal_from_excel(file_content: bytes, db: AsyncSession) -> dict:
+    """
+    Импорт ведомости в два прохода, чтобы большой первичный залив не
+    держал event loop API-воркера:
+      1) разбор xlsx в потоке (parse_workbook);
+      2) все новые склады/МОЛ и номенклатура — INSERT ... RETURNING пачками,
+         пароли новых unit_head хешируются вне loop'а;
+      3) строки реестра — upsert_batch пачками по BATCH_SIZE.
+    Для уже существующей номенклатуры is_numbered берётся из БД.
+    """
+    try:
+        parsed, skipped_count = await asyncio.to_thread(parse_workbook, file_content)
+
+        objects_ids: Dict[str, int] = {
+            object_key(name, mol_name): obj_id
+            for obj_id, name, mol_name in (await db.execute(
+                select(AccountingObject.id, AccountingObject.name, AccountingObject.mol_name)
+            )).all()
+        }
+        nom_by_key: Dict[str, Tuple[int, bool]] = {
+            name.lower(): (nom_id, is_numbered)
+            for nom_id, name, is_numbered in (await db.execute(
+                select(Nomenclature.id, Nomenclature.name, Nomenclature.is_numbered)
+            )).all()
+        }
+
+        created_users_creds = await _create_objects(db, parsed, objects_ids)
+        await _create_nomenclature(db, parsed, nom_by_key)
+
+        added_count = 0
+        batch = []
+        for item in parsed:
+            nom_id, is_numbered = nom_by_key[item.nom_name.lower()]
+            batch.append(registry_row(
+                item, nom_id, is_numbered, objects_ids[object_key(item.obj_name, item.mol_name)],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                await upsert_batch(db, batch)
+                added_count += len(batch)
+                batch.clear()
 
         if batch:
             await upsert_batch(db, batch)
@@ -209,9 +316,6 @@ async def import_arsenal_from_excel(file_content: bytes, db: AsyncSession) -> di
     except Exception as e:
         await db.rollback()
         return {"status": "error", "message": str(e)}
-    finally:
-        if workbook:
-            workbook.close()
 
 
 async def upsert_batch(db: AsyncSession, rows: list):
@@ -0,0 +1,284 @@
+"""Инкрементальная сверка инвентаризации.
+
+Раньше отчёт (и закрытие, и «что осталось») на каждый вызов заново
+агрегировал весь WeaponRegistry склада и все сканы, а каждый скан делал
+свои SELECT по реестру и по сканам. На большом складе с ручными
+сканерами это секунды на каждое обновление экрана.
+
+Теперь:
+  * при старте инвентаризации ожидаемые остатки снимаются одним
+    агрегатом по реестру в inventory_lines (ключ — номенклатура + серийник);
+  * скан (один или пачка) — один multi-row upsert в inventory_lines,
+    повторный серийник номерного учёта не проходит условие ON CONFLICT;
+  * счётчики matched/missing/surplus/found_units в inventories двигаются
+    на дельту переходов статусов затронутых строк;
+  * отчёт/pending/закрытие читают строки и счётчики, реестр не трогают.
+
+Ожидаемое фиксируется на момент старта — перемещения во время
+инвентаризации в сверку не попадают (как и положено инвентаризационной
+описи).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.time_utils import utcnow
+from app.modules.arsenal.models import (
+    Inventory,
+    InventoryItem,
+    InventoryLine,
+    Nomenclature,
+    WeaponRegistry,
+)
+
+STATUSES = ("matched", "missing", "surplus")
+
+
+@dataclass(slots=True)
+class ScanInput:
+    nomenclature_id: int
+    serial_number: Optional[str] = None
+    quantity: int = 1
+    note: Optional[str] = None
+
+
+def line_status(expected: int, found: int) -> Optional[str]:
+    """Статус строки сверки; None — строки нет (0 ожидалось, 0 найдено)."""
+    if expected == found:
+        return "matched" if expected else None
+    return "missing" if found < expected else "surplus"
+
+
+def counter_deltas(changes: Iterable[tuple[int, int, int]]) -> dict[str, int]:
+    """(expected, found_до, found_после) по строкам → дельты счётчиков."""
+    deltas = dict.fromkeys(STATUSES, 0)
+    for expected, before, after in changes:
+        old, new = line_status(expected, before), line_status(expected, after)
+        if old == new:
+            continue
+        if old:
+            deltas[old] -= 1
+        if new:
+            deltas[new] += 1
+    return deltas
+
+
+async def take_snapshot(db: AsyncSession, inv: Inventory) -> None:
+    """Снять ожидаемые остатки склада в inventory_lines (инвентаризация
+    должна быть уже flush'нута — нужен inv.id)."""
+    expected = (
+        select(
+            WeaponRegistry.nomenclature_id,
+            WeaponRegistry.serial_number,
+            Nomenclature.is_numbered,
+            func.sum(WeaponRegistry.quantity),
+        )
+        .join(Nomenclature, Nomenclature.id == WeaponRegistry.nomenclature_id)
+        .where(
+            WeaponRegistry.current_object_id == inv.object_id,
+            WeaponRegistry.status == 1,
+            WeaponRegistry.quantity > 0,
+        )
+        .group_by(WeaponRegistry.nomenclature_id, WeaponRegistry.serial_number,
+                  Nomenclature.is_numbered)
+    )
+    rows = (await db.execute(expected)).all()
+    if rows:
+        await db.execute(insert(InventoryLine), [
+            {"inventory_id": inv.id, "nomenclature_id": nom_id, "serial_key": serial,
+             "is_numbered": bool(is_numbered), "expected_quantity": int(qty),
+             "found_quantity": 0}
+            for nom_id, serial, is_numbered, qty in rows
+        ])
+    inv.snapshot_at = utcnow()
+    inv.expected_units = sum(int(qty) for *_k, qty in rows)
+    inv.missing_count = len(rows)
+    inv.found_units = inv.matched_count = inv.surplus_count = inv.scan_count = 0
+
+
+async def resolve_serials(db: AsyncSession, object_id: int,
+                          serials: list[str]) -> dict[str, tuple]:
+    """Серийники → (nomenclature_id, name, current_object_id) по активному
+    реестру одним запросом. При дублях серийника предпочитается этот склад."""
+    if not serials:
+        return {}
+    rows = (await db.execute(
+        select(WeaponRegistry.serial_number, WeaponRegistry.nomenclature_id,
+               Nomenclature.name, WeaponRegistry.current_object_id)
+        .join(Nomenclature, Nomenclature.id == WeaponRegistry.nomenclature_id)
+        .where(WeaponRegistry.serial_number.in_(serials), WeaponRegistry.status == 1)
+    )).all()
+    found: dict[str, tuple] = {}
+    for serial, nom_id, name, obj_id in rows:
+        if serial not in found or obj_id == object_id:
+            found[serial] = (nom_id, name, obj_id)
+    return found
+
+
+async def apply_scans(db: AsyncSession, inv: Inventory, scans: list[ScanInput],
+                      user_id: Optional[int]) -> list[dict]:
+    """Применить сканы к сверке. → результат на каждый скан (в порядке входа):
+    {"status": "saved" | "duplicate" | "unknown_nomenclature", ...}."""
+    results: list[dict] = [{} for _ in scans]
+    nom_ids = {s.nomenclature_id for s in scans}
+    numbered = dict((await db.execute(
+        select(Nomenclature.id, Nomenclature.is_numbered).where(Nomenclature.id.in_(nom_ids))
+    )).all()) if nom_ids else {}
+
+    # Партионный скан без серийника ложится на единственную ожидаемую партию
+    # этой номенклатуры («Партия 1»), а не в отдельную строку-излишек.
+    unserialized = {s.nomenclature_id for s in scans
+                    if not s.serial_number and numbered.get(s.nomenclature_id) is False}
+    single_batch: dict[int, str] = {}
+    if unserialized:
+        batch_lines = (await db.execute(
+            select(InventoryLine.nomenclature_id, InventoryLine.serial_key).where(
+                InventoryLine.inventory_id == inv.id,
+                InventoryLine.nomenclature_id.in_(unserialized),
+                InventoryLine.expected_quantity > 0,
+            )
+        )).all()
+        by_nom: dict[int, list[str]] = {}
+        for nom_id, key in batch_lines:
+            by_nom.setdefault(nom_id, []).append(key)
+        single_batch = {nom_id: keys[0] for nom_id, keys in by_nom.items() if len(keys) == 1}
+
+    # Группировка по ключу строки: номерной — один раз, партионный — сумма.
+    rows: dict[tuple[int, str], dict] = {}
+    owners: dict[tuple[int, str], list[int]] = {}
+    for i, scan in enumerate(scans):
+        is_numbered = numbered.get(scan.nomenclature_id)
+        if is_numbered is None:
+            results[i] = {"status": "unknown_nomenclature"}
+            continue
+        key_serial = (scan.serial_number or "").strip()
+        if not key_serial and not is_numbered:
+            key_serial = single_batch.get(scan.nomenclature_id, "")
+        key = (scan.nomenclature_id, key_serial)
+        qty = 1 if is_numbered else scan.quantity
+        if key in rows:
+            if is_numbered:
+                results[i] = {"status": "duplicate"}
+                continue
+            rows[key]["found_quantity"] += qty
+        else:
+            rows[key] = {
+                "inventory_id": inv.id, "nomenclature_id": scan.nomenclature_id,
+                "serial_key": key_serial, "is_numbered": is_numbered,
+                "expected_quantity": 0, "found_quantity": qty,
+            }
+        owners.setdefault(key, []).append(i)
+
+    applied: dict[tuple[int, str], tuple[int, int]] = {}
+    if rows:
+        stmt = insert(InventoryLine).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            constraint="uix_inventory_line",
+            set_={"found_quantity": InventoryLine.found_quantity + stmt.excluded.found_quantity},
+            # Повторный скан номерной единицы строку не трогает → нет в RETURNING.
+            where=or_(InventoryLine.is_numbered.is_(False), InventoryLine.found_quantity == 0),
+        ).returning(
+            InventoryLine.nomenclature_id, InventoryLine.serial_key,
+            InventoryLine.expected_quantity, InventoryLine.found_quantity,
+        )
+        for nom_id, key_serial, expected, found in (await db.execute(stmt)).all():
+            applied[(nom_id, key_serial)] = (expected, found)
+
+    changes, found_units = [], 0
+    log_rows, log_owner = [], []
+    for key, row in rows.items():
+        if key not in applied:
+            for i in owners[key]:
+                results[i] = {"status": "duplicate"}
+            continue
+        expected, found = applied[key]
+        added = row["found_quantity"]
+        changes.append((expected, found - added, found))
+        found_units += added
+        for i in owners[key]:
+            results[i] = {
+                "status": "saved", "nomenclature_id": key[0],
+                "serial_number": key[1] or None,
+                "expected_quantity": expected, "found_quantity": found,
+            }
+            scan = scans[i]
+            log_owner.append(i)
+            log_rows.append({
+                "inventory_id": inv.id, "nomenclature_id": key[0],
+                "serial_number": key[1] or None,
+                "found_quantity": 1 if row["is_numbered"] else scan.quantity,
+                "note": scan.note, "scanned_by_id": user_id,
+            })
+
+    if log_rows:
+        # Журнал сканов — для аудита; сверка его больше не читает.
+        item_ids = (await db.execute(
+            insert(InventoryItem).values(log_rows).returning(InventoryItem.id)
+        )).scalars().all()
+        for i, item_id in zip(log_owner, item_ids):
+            results[i]["item_id"] = item_id
+
+        deltas = counter_deltas(changes)
+        await db.execute(
+            update(Inventory).where(Inventory.id == inv.id).values(
+                found_units=Inventory.found_units + found_units,
+                matched_count=Inventory.matched_count + deltas["matched"],
+                missing_count=Inventory.missing_count + deltas["missing"],
+                surplus_count=Inventory.surplus_count + deltas["surplus"],
+                scan_count=Inventory.scan_count + len(log_rows),
+            ).execution_options(synchronize_session="fetch")
+        )
+    return results
+
+
+async def load_lines(db: AsyncSession, inventory_id: int, *,
+                     pending_only: bool = False) -> list[tuple]:
+    """(line, nomenclature_name) инвентаризации; pending_only — только недосчёт."""
+    q = (
+        select(InventoryLine, Nomenclature.name)
+        .join(Nomenclature, Nomenclature.id == InventoryLine.nomenclature_id)
+        .where(InventoryLine.inventory_id == inventory_id)
+        .order_by(Nomenclature.name, InventoryLine.serial_key)
+    )
+    if pending_only:
+        q = q.where(InventoryLine.found_quantity < InventoryLine.expected_quantity)
+    return list((await db.execute(q)).all())
+
+
+def split_report(lines: list[tuple]) -> tuple[list, list, list]:
+    """Строки сверки → (matched, missing, surplus) в формате отчёта."""
+    matched, missing, surplus = [], [], []
+    for line, name in lines:
+        base = {
+            "nomenclature_id": line.nomenclature_id,
+            "serial_number": line.serial_key or None,
+            "name": name,
+            "is_numbered": bool(line.is_numbered),
+            "expected_quantity": line.expected_quantity,
+            "found_quantity": line.found_quantity,
+        }
+        status = line_status(line.expected_quantity, line.found_quantity)
+        if status == "matched":
+            matched.append(base)
+        elif status == "missing":
+            missing.append({**base, "deficit": line.expected_quantity - line.found_quantity})
+        elif status == "surplus":
+            surplus.append({**base, "excess": line.found_quantity - line.expected_quantity})
+    return matched, missing, surplus
+
+
+__all__ = [
+    "ScanInput",
+    "apply_scans",
+    "counter_deltas",
+    "line_status",
+    "load_lines",
+    "resolve_serials",
+    "split_report",
+    "take_snapshot",
+]
@@ -3,6 +3,7 @@
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     ForeignKey,
     Boolean,
@@ -10,8 +11,10 @@ from sqlalchemy import (
     DateTime,
     Date,
     Text,
+    SmallInteger,
     Enum as SAEnum,
-    func
+    func,
+    text,
 )
 from sqlalchemy.types import Numeric
 from sqlalchemy.orm import relationship, validates
@@ -590,6 +593,26 @@ class BillingPeriod(Base):
     is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime, default=_utcnow)
 
+    # Хронология биллингового месяца из name («Май 2026» → 2026, 5,
+    # 2026*12+5). id — порядок создания, не месяц (ретроактивные периоды),
+    # поэтому сортировка/«N прошлых периодов» идут по chron_ordinal.
+    # Непарсимые имена («Начальный период») → 0: baseline в начале.
+    # Держится валидатором ниже и триггером periods_chron_001 (raw SQL).
+    chron_year = Column(SmallInteger, nullable=False, default=0, server_default="0")
+    chron_month = Column(SmallInteger, nullable=False, default=0, server_default="0")
+    chron_ordinal = Column(Integer, nullable=False, default=0, server_default="0")
+
+    @validates("name")
+    def _v_name(self, key, value):
+        from app.modules.utility.services.period_helpers import chron_ordinal, period_chron_key
+        self.chron_year, self.chron_month = period_chron_key(value)
+        self.chron_ordinal = chron_ordinal(value)
+        return value
+
+    __table_args__ = (
+        Index("idx_periods_chron_ordinal", "chron_ordinal", "id"),
+    )
+
 
 # ======================================================
 # ADJUSTMENTS
@@ -786,10 +809,14 @@ class AuditLog(Base):
     Журнал действий администратора.
     Фиксирует кто, когда и что сделал в системе.
     Критично для бухгалтерских проверок и разрешения споров.
+
+    Партиционирована помесячно по created_at (миграция audit_part_001):
+    партиции заводит заранее и по ретеншну выгружает в gzip-JSONL
+    maintain_audit_partitions_task (services/audit_archive).
     """
     __tablename__ = "audit_log"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Кто совершил действие (nullable + SET NULL — сохраняем лог даже если пользователь удалён)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
@@ -805,20 +832,21 @@ class AuditLog(Base):
     # Детали (произвольный JSON)
     details = Column(JSONB, nullable=True)
 
-    # Когда
-    created_at = Column(DateTime, default=_utcnow, index=True)
+    # Когда (ключ партиционирования — входит в PK)
+    created_at = Column(DateTime, primary_key=True, default=_utcnow)
 
     user = relationship("User")
 
     __table_args__ = (
-        Index("idx_audit_user_id", "user_id"),
-        Index("idx_audit_entity", "entity_type", "entity_id"),
-        Index("idx_audit_action", "action"),
         Index("idx_audit_created", "created_at"),
-        # Добавлено миграцией perf_001_scaling_indexes: ускоряют фильтрацию
-        # журнала по action/entity с сортировкой по created_at (самый частый запрос).
+        # Ускоряют фильтрацию журнала по action/entity/автору с сортировкой
+        # по created_at (самый частый запрос).
         Index("idx_audit_action_created", "action", "created_at"),
         Index("idx_audit_entity_created", "entity_type", "created_at"),
+        Index("idx_audit_user_created", "user_id", "created_at"),
+        {
+            "postgresql_partition_by": "RANGE (created_at)"
+        }
     )
 
 
@@ -902,6 +930,35 @@ class GSheetsImportRow(Base):
     )
 
 
+class GSheetsRoomSubmission(Base):
+    """Сводка GSheets-подач: строка на (жилец, комната, месяц подачи).
+
+    row_count — число сопоставленных (matched_user_id + matched_room_id)
+    и не отклонённых строк gsheets_import_rows с sheet_timestamp в этом
+    месяце. Ведёт триггер trg_gsheets_room_submissions (миграция
+    gsheets_moves_001) на INSERT/UPDATE/DELETE строк импорта — любым путём,
+    включая bulk UPDATE и psql; строки с нулём удаляются.
+
+    Читают «кандидаты на переезд» (services/move_candidates.py) и сканер
+    сигналов жильцов — GROUP BY ... HAVING по сводке вместо всех строк
+    импорта за год.
+    """
+    __tablename__ = "gsheets_room_submissions"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True,
+    )
+    room_id = Column(
+        Integer, ForeignKey("rooms.id", ondelete="CASCADE"), primary_key=True,
+    )
+    month = Column(Date, primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("idx_gsheets_room_submissions_month", "month"),
+    )
+
+
 # ======================================================
 # GSHEETS ALIAS — запомненные соответствия «стороннее ФИО → реальный жилец»
 # ======================================================
@@ -1054,6 +1111,12 @@ class RecalcJob(Base):
             "delta": "+15000.00",
             "top": [{"reading_id":..., "username":..., "old_total":..., "new_total":..., "delta":...}, ...]
         }
+
+    shard_state — план и чекпоинты шардов (одно здание = один шард):
+        {"mode": "preview"|"apply",
+         "shards": {"0": {"building": .., "total": .., "processed": ..,
+                          "last_id": .., "done": false, "summary": {...}}}}
+    Чекпоинт коммитится вместе с апдейтами чанка — retry продолжает с last_id.
     """
     __tablename__ = "recalc_jobs"
 
@@ -1071,6 +1134,7 @@ class RecalcJob(Base):
     processed = Column(Integer, nullable=False, default=0)
 
     diff_summary = Column(JSONB, nullable=True)
+    shard_state = Column(JSONB, nullable=True)
 
     started_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     started_by_username = Column(String(128), nullable=True)
@@ -1087,6 +1151,104 @@ class RecalcJob(Base):
     )
 
 
+# ======================================================
+# MONTH CLOSE RUN — закрытие месяца графом этапов
+# ======================================================
+class MonthCloseRun(Base):
+    """Прогон «Закрытие месяца» (services/month_close.py).
+
+    Жизненный цикл:
+        running → done
+                ↘ failed → (resume / retry этапа) → running → ...
+
+    stages — состояние каждого этапа графа:
+        {"close": {"status": "pending|queued|running|done|failed|skipped",
+                   "attempts": 1, "started_at": "...", "finished_at": "...",
+                   "elapsed_ms": 840, "result": {...}, "error": "..."}}
+    context — общий контекст, собранный этапом preload (id комнат/тарифов,
+    флаги графа); options — параметры запуска (next_period_name, ...).
+    Переходы этапов пишутся под SELECT ... FOR UPDATE строки прогона:
+    параллельные этапы завершаются одновременно.
+    """
+    __tablename__ = "month_close_runs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    period_id = Column(Integer, ForeignKey("periods.id", ondelete="CASCADE"), nullable=False)
+    period = relationship("BillingPeriod")
+
+    # running | done | failed
+    status = Column(String(24), nullable=False, default="running")
+
+    options = Column(JSONB, nullable=False, default=dict)
+    context = Column(JSONB, nullable=False, default=dict)
+    stages = Column(JSONB, nullable=False, default=dict)
+
+    started_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    started_by_username = Column(String(128), nullable=True)
+
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=_utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_month_close_runs_period_created", "period_id", "created_at"),
+        Index("idx_month_close_runs_status", "status"),
+    )
+
+
+# ======================================================
+# USER IMPORT JOB — фоновый импорт Жилфонд + Жильцы из Excel
+# ======================================================
+class UserImportJob(Base):
+    """Задача «Умный импорт» (users/import_excel) с прогрессом и чекпоинтом.
+
+    Жизненный цикл:
+        pending → running → done
+                         ↘ failed → (resume) → pending → ...
+
+    Файл лежит на диске (file_path) до успешного завершения. Каждая пачка
+    строк коммитится ВМЕСТЕ с checkpoint_row (номер последней строки Excel),
+    поэтому resume после падения продолжает ровно со следующей строки —
+    без дублей и без повторного прохода уже записанного.
+
+    summary — накопительные счётчики для UI-модалки:
+        {"added_users": .., "updated_users": .., "added_rooms": ..,
+         "updated_rooms": .., "skipped": .., "errors": [...], "errors_truncated": 0}
+    """
+    __tablename__ = "user_import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # pending | running | done | failed
+    status = Column(String(24), nullable=False, default="pending")
+
+    file_path = Column(String(512), nullable=False)
+    file_name = Column(String(255), nullable=True)
+
+    # 0-100; total_rows — оценка по dimension листа (без заголовка)
+    progress = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=False, default=0)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    checkpoint_row = Column(Integer, nullable=False, default=1)
+
+    summary = Column(JSONB, nullable=True)
+
+    started_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    started_by_username = Column(String(128), nullable=True)
+    celery_task_id = Column(String(64), nullable=True)
+
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=_utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_user_import_jobs_status_created", "status", "created_at"),
+    )
+
+
 # ======================================================
 # DEBT IMPORT LOG — история импортов долгов из 1С
 # ======================================================
@@ -1172,6 +1334,104 @@ class DebtImportLog(Base):
     )
 
 
+class DebtSnapshot(Base):
+    """Долг жильца по одному импорту 1С — строка на (импорт, жилец).
+
+    Тот же state, что DebtImportLog.applied_state, но разложенный в строки:
+    история жильца — range-скан по (user_id, started_at), diff двух импортов —
+    по PK (import_log_id, user_id). Ни один запрос не десериализует JSON на
+    тысячи жильцов, и их цена не растёт с числом импортов.
+
+    Пишется слушателем сессии (services/debt_snapshots.py) при каждой записи
+    applied_state — импорт, «пересопоставить», ручная привязка. Строки
+    импорта только заменяются целиком вместе с его applied_state. Статус
+    импорта (completed/reverted) берётся из лога JOIN'ом по PK.
+    """
+    __tablename__ = "debt_snapshots"
+
+    import_log_id = Column(
+        Integer, ForeignKey("debt_import_logs.id", ondelete="CASCADE"), primary_key=True,
+    )
+    user_id = Column(Integer, primary_key=True)
+    # "209" | "205" — копия из лога
+    account_type = Column(String(8), nullable=False)
+    # Копия DebtImportLog.started_at — ключ сортировки истории
+    started_at = Column(DateTime, nullable=False)
+
+    debt = Column(Numeric(12, 2), nullable=False, default=0)
+    overpayment = Column(Numeric(12, 2), nullable=False, default=0)
+
+    username = Column(String(255), nullable=True)
+    room_id = Column(Integer, nullable=True)
+    room_label = Column(String(255), nullable=True)
+
+    __table_args__ = (
+        Index("idx_debt_snapshots_user_started", "user_id", "started_at"),
+    )
+
+
+class PeriodDormStats(Base):
+    """Агрегаты показаний периода по общежитию — строка на (период, общежитие).
+
+    Читают «Сравнение периодов», предпросмотр закрытия и тренды по многим
+    периодам: вместо SUM/COUNT по readings (партиции за все месяцы) —
+    несколько готовых строк. Суммы стоимости — по approved, счётчики
+    черновиков — по неутверждённым. dormitory_key '' — дома / без общежития.
+
+    Поддерживается services/period_stats.py: запись в readings помечает
+    период устаревшим (PeriodStatsMark в той же транзакции), устаревшие
+    периоды пересчитываются при чтении, после закрытия и перерасчёта.
+    """
+    __tablename__ = "period_dorm_stats"
+
+    period_id = Column(
+        Integer, ForeignKey("periods.id", ondelete="CASCADE"), primary_key=True,
+    )
+    dormitory_key = Column(String(255), primary_key=True, default="")
+
+    approved_count = Column(Integer, nullable=False, default=0)
+    draft_count = Column(Integer, nullable=False, default=0)
+    anomaly_drafts = Column(Integer, nullable=False, default=0)
+    # Комнаты с РЕАЛЬНЫМИ показаниями (debt-only черновики 1С не считаются).
+    rooms_submitted = Column(Integer, nullable=False, default=0)
+
+    cost_hot_water = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_cold_water = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_sewage = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_electricity = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_maintenance = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_social_rent = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_waste = Column(Numeric(14, 2), nullable=False, default=0)
+    cost_fixed_part = Column(Numeric(14, 2), nullable=False, default=0)
+    total_cost = Column(Numeric(14, 2), nullable=False, default=0)
+    draft_sum = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class PeriodStatsState(Base):
+    """Когда агрегаты периода пересчитаны: refreshed_xmin — xmin снимка
+    ДО пересчёта; метки с xid >= него могли в пересчёт не попасть."""
+    __tablename__ = "period_stats_state"
+
+    period_id = Column(
+        Integer, ForeignKey("periods.id", ondelete="CASCADE"), primary_key=True,
+    )
+    refreshed_xmin = Column(BigInteger, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False, default=_utcnow)
+
+
+class PeriodStatsMark(Base):
+    """Метка «агрегаты периода устарели» от транзакции, писавшей readings.
+    period_id NULL — затронутые периоды неизвестны (bulk/raw SQL) — все."""
+    __tablename__ = "period_stats_marks"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    period_id = Column(Integer, nullable=True)
+    xid = Column(
+        BigInteger, nullable=False,
+        server_default=text("(pg_current_xact_id()::text)::bigint"),
+    )
+
+
 # (FamilyMember и CertificateRequest удалены 2026-07-14 — фича «Справки»
 # вырезана целиком; таблицы дропает миграция certs_purge_001.)
 
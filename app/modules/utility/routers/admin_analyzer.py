@@ -31,6 +31,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.auth import get_current_user
+from app.core.data_versions import conditional_get
 from app.core.database import get_db
 from app.modules.utility.models import (
     AnalyzerSetting, AnomalyDismissal, MeterReading, User,
@@ -715,6 +716,8 @@ async def get_cohort_analysis(
     ),
     outlier_factor: float = Query(2.0, ge=1.0, le=10.0, description="Множитель median для outliers"),
     current_user: User = Depends(get_current_user),
+    # "periods": ответ несёт имя периода (переименование — новый ETag).
+    _etag: None = Depends(conditional_get("readings@{period_id}", "users", "rooms", "periods")),
     db: AsyncSession = Depends(get_db),
 ):
     """Сравнение жильцов в когортах: общежитие, размер семьи, площадь.
@@ -734,6 +737,7 @@ async def get_cohort_analysis(
 async def get_flag_heatmap(
     period_id: int = Query(..., description="ID периода"),
     current_user: User = Depends(get_current_user),
+    _etag: None = Depends(conditional_get("readings@{period_id}", "users", "rooms")),
     db: AsyncSession = Depends(get_db),
 ):
     """Тепловая карта: флаг × общежитие. Для каждого флага в каждом
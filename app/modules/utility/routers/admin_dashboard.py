@@ -10,7 +10,9 @@ from sqlalchemy.future import select
 from sqlalchemy import func, desc
 
 from app.core.database import get_db
+from app.core.log_writer import stage_audit
 from app.core.request_context import current_request_id
+from app.core.time_utils import utcnow as _utcnow
 from app.modules.utility.models import (
     User, AuditLog
 )
@@ -50,17 +52,18 @@ async def write_audit_log(
         if rid and rid != "-" and "request_id" not in merged_details:
             merged_details["request_id"] = rid
 
-        log_entry = AuditLog(
-            user_id=user_id,
-            username=username,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            details=merged_details or None,
-        )
-        db.add(log_entry)
-        # НЕ делаем commit — он произойдёт в вызывающей транзакции.
+        # НЕ делаем commit — строка уйдёт в audit_log в вызывающей
+        # транзакции (один multi-row INSERT на commit, app/core/log_writer).
         # Это гарантирует что запись в лог атомарна с основным действием.
+        stage_audit(db, {
+            "user_id": user_id,
+            "username": username,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": merged_details or None,
+            "created_at": _utcnow(),
+        })
     except Exception as e:
         # Логирование не должно ломать основную операцию
         logger.error(f"Failed to write audit log: {e}")
@@ -119,10 +122,18 @@ async def get_audit_log(
     action: Optional[str] = Query(None, description="Фильтр по типу действия"),
     entity_type: Optional[str] = Query(None, description="Фильтр по типу сущности"),
     user_id: Optional[int] = Query(None, description="Фильтр по пользователю"),
+    include_archive: bool = Query(
+        False, description="Добавить записи из архива (партиции старше ретеншна)",
+    ),
     current_user: User = Depends(allow_dashboard),
     db: AsyncSession = Depends(get_db)
 ):
-    """Постраничный журнал действий с фильтрацией."""
+    """Постраничный журнал действий с фильтрацией.
+
+    По умолчанию — только живая таблица. include_archive=true дописывает
+    после неё записи из gzip-архивов (services/audit_archive): архивные
+    месяцы всегда старше живых, поэтому порядок «новые первыми» сохраняется.
+    """
     query = select(AuditLog)
     count_query = select(func.count(AuditLog.id))
 
@@ -139,12 +150,15 @@ async def get_audit_log(
         count_query = count_query.where(AuditLog.user_id == user_id)
 
     total = (await db.execute(count_query)).scalar_one()
+    skip = (page - 1) * limit
 
-    rows = (await db.execute(
-        query.order_by(desc(AuditLog.created_at))
-        .offset((page - 1) * limit)
-        .limit(limit)
-    )).scalars().all()
+    rows = []
+    if skip < total:
+        rows = (await db.execute(
+            query.order_by(desc(AuditLog.created_at))
+            .offset(skip)
+            .limit(limit)
+        )).scalars().all()
 
     items = []
     for log in rows:
@@ -158,6 +172,30 @@ async def get_audit_log(
             "created_at": log.created_at.strftime("%d.%m.%Y %H:%M") if log.created_at else None,
         })
 
+    if include_archive:
+        import asyncio
+        from datetime import datetime as _dt
+        from app.modules.utility.services.audit_archive import search_archives
+
+        archive_total, archived = await asyncio.to_thread(
+            search_archives,
+            action=action, entity_type=entity_type, user_id=user_id,
+            skip=max(0, skip - total), limit=limit - len(items),
+        )
+        for log in archived:
+            created = _dt.fromisoformat(log["created_at"]) if log.get("created_at") else None
+            items.append({
+                "id": log.get("id"),
+                "username": log.get("username"),
+                "action": log.get("action"),
+                "entity_type": log.get("entity_type"),
+                "entity_id": log.get("entity_id"),
+                "details": log.get("details"),
+                "created_at": created.strftime("%d.%m.%Y %H:%M") if created else None,
+                "archived": True,
+            })
+        total += archive_total
+
     return {"total": total, "page": page, "size": limit, "items": items}
 
 
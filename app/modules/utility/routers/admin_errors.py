@@ -12,20 +12,23 @@
 
   POST   /api/errors/frontend        — публичный (без auth), но с rate-limit:
                                        клиентский JS присылает window.onerror
-                                       и unhandledrejection-события.
+                                       и unhandledrejection-события; дубли
+                                       схлопываются по отпечатку
+                                       (app/core/error_ingest).
 """
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from sqlalchemy import desc, func, select
+from sqlalchemy import desc, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_user
 from app.core.database import get_db
+from app.core.rate_limit import RateLimit, client_identifier
 from app.core.time_utils import utcnow
 from app.modules.utility.models import ErrorLog, User
 
@@ -58,6 +61,8 @@ class FrontendErrorBody(BaseModel):
     url: Optional[str] = Field(None, max_length=500)     # window.location
     user_agent: Optional[str] = Field(None, max_length=500)
     request_id: Optional[str] = Field(None, max_length=64)
+    # Версия сборки фронтенда — входит в отпечаток (app/core/error_ingest).
+    release: Optional[str] = Field(None, max_length=64)
 
 
 # =====================================================================
@@ -139,27 +144,33 @@ async def errors_stats(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Счётчики для бейджа: всего unresolved, за последние 24ч, по source."""
+    """Счётчики для бейджа: всего unresolved, за последние 24ч, по source.
+
+    Один проход с FILTER по строкам «unresolved ИЛИ за 24ч» (индексы
+    resolved / occurred_at) вместо трёх COUNT'ов. frontend_ingest —
+    агрегатор JS-ошибок этого воркера (app/core/error_ingest).
+    """
     _require_admin(current_user)
 
-    total_unresolved = (await db.execute(
-        select(func.count(ErrorLog.id)).where(ErrorLog.resolved.is_(False))
-    )).scalar_one()
-    last_24h = (await db.execute(
-        select(func.count(ErrorLog.id))
-        .where(ErrorLog.occurred_at >= utcnow() - timedelta(hours=24))
-    )).scalar_one()
-
-    by_source = dict((await db.execute(
-        select(ErrorLog.source, func.count(ErrorLog.id))
-        .where(ErrorLog.resolved.is_(False))
+    cutoff = utcnow() - timedelta(hours=24)
+    unresolved = ErrorLog.resolved.is_(False)
+    recent = ErrorLog.occurred_at >= cutoff
+    rows = (await db.execute(
+        select(
+            ErrorLog.source,
+            func.count(ErrorLog.id).filter(unresolved),
+            func.count(ErrorLog.id).filter(recent),
+        )
+        .where(or_(unresolved, recent))
         .group_by(ErrorLog.source)
-    )).all())
+    )).all()
 
+    from app.core.error_ingest import frontend_ingest
     return {
-        "total_unresolved": total_unresolved,
-        "last_24h": last_24h,
-        "by_source_unresolved": {k: v for k, v in by_source.items()},
+        "total_unresolved": sum(r[1] for r in rows),
+        "last_24h": sum(r[2] for r in rows),
+        "by_source_unresolved": {r[0]: r[1] for r in rows if r[1]},
+        "frontend_ingest": frontend_ingest.stats(),
     }
 
 
@@ -261,62 +272,47 @@ async def delete_error(
 # =====================================================================
 # FRONTEND endpoint (без auth — клиент может быть на login)
 # =====================================================================
-# Простой in-memory rate-limit: не больше N ошибок в минуту с одного IP.
-# Цель — защита от спама от багнутого клиента с while(true) {throw}.
-_FRONTEND_RATE_BUCKET: dict[str, list[datetime]] = {}
-_FRONTEND_MAX_PER_MIN = 30
-
-
-def _frontend_rate_limit_ok(client_ip: str) -> bool:
-    now = utcnow()
-    bucket = _FRONTEND_RATE_BUCKET.get(client_ip, [])
-    # удаляем старше минуты
-    cutoff = now - timedelta(minutes=1)
-    bucket = [t for t in bucket if t >= cutoff]
-    if len(bucket) >= _FRONTEND_MAX_PER_MIN:
-        _FRONTEND_RATE_BUCKET[client_ip] = bucket
-        return False
-    bucket.append(now)
-    _FRONTEND_RATE_BUCKET[client_ip] = bucket
-    return True
+# Не больше N ошибок в минуту с одного IP — защита от спама багнутого
+# клиента с while(true) {throw}. Приблизительный режим: бакет в памяти
+# воркера, в Redis запрос не ходит (app/core/rate_limit.py).
+_FRONTEND_RATE_LIMIT = RateLimit(times=30, seconds=60, scope="errors-frontend")
 
 
 @router.post("/api/errors/frontend")
 async def log_frontend_error(
     payload: FrontendErrorBody,
     request: Request,
-    db: AsyncSession = Depends(get_db),
 ):
     """JS-клиент шлёт сюда window.onerror и unhandledrejection.
 
     Auth не требуется — клиент может быть на login-странице. Защита от
-    флуда через простой rate-limit.
+    флуда: rate-limit на IP + агрегатор по отпечатку (app/core/error_ingest)
+    — одинаковые ошибки копятся и уходят в error_log одной строкой на
+    окно, под всплеском часть событий сэмплируется.
     """
-    client_ip = request.client.host if request.client else "unknown"
-    if not _frontend_rate_limit_ok(client_ip):
+    if await _FRONTEND_RATE_LIMIT.check(request) is not None:
         # Тихо игнорируем, чтобы клиент не зацикливался на retry.
         return {"status": "rate_limited"}
 
-    from app.core.error_logger import log_error
-    await log_error(
-        db,
+    from app.core.error_ingest import frontend_ingest
+    status = frontend_ingest.ingest(
+        message=payload.message,
+        stack=payload.stack,
+        release=payload.release,
         source="frontend",
         level="error",
         http_path=payload.url,
         exc_type=_extract_js_error_type(payload.message, payload.stack),
-        exc_message=payload.message,
-        traceback_str=payload.stack,
         request_id=payload.request_id,
         extra={
             "source_file": payload.source,
             "lineno": payload.lineno,
             "colno": payload.colno,
             "user_agent": payload.user_agent,
-            "client_ip": client_ip,
+            "client_ip": client_identifier(request),
         },
-        run_investigation=False,
     )
-    return {"status": "ok"}
+    return {"status": "ok" if status in ("new", "aggregated") else status}
 
 
 def _extract_js_error_type(message: str, stack: Optional[str]) -> str:
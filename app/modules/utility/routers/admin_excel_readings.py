@@ -35,16 +35,28 @@ logger = logging.getLogger(__name__)
 async def excel_preview(
     file: UploadFile = File(...),
     period_id: Optional[int] = Form(None),
+    refresh: bool = Form(False),
     current_user: User = Depends(allow_billing),
     db: AsyncSession = Depends(get_db),
 ):
     """Парсит Excel и возвращает повердиктный разбор по каждому жильцу.
-    period_id — для корректных сумм (корректировки периода); опционален."""
+    period_id — для корректных сумм (корректировки периода); опционален.
+
+    Разбор кэшируется по sha256 файла + period_id: повторное открытие того
+    же файла отдаётся из кэша (cached=true). refresh=true — пересчитать."""
     if not file.filename or not file.filename.lower().endswith((".xlsx", ".xls")):
         raise HTTPException(400, "Поддерживаются только файлы Excel (.xlsx)")
     content = await file.read()
     if not content:
         raise HTTPException(400, "Файл пустой")
+
+    file_hash = await asyncio.to_thread(svc.preview_file_hash, content)
+    if not refresh:
+        cached = await svc.get_cached_preview(file_hash, period_id)
+        if cached is not None:
+            cached["cached"] = True
+            return cached
+
     try:
         parsed = await asyncio.to_thread(svc.parse_readings_workbook, content)
     except Exception as e:  # noqa: BLE001
@@ -56,7 +68,11 @@ async def excel_preview(
             "В файле не найдено строк с показаниями. Ожидаются листы «горячая»/"
             "«холодная»/«электричество» и колонки: ФИО | Предыдущий месяц | Текущий месяц.",
         )
-    return await svc.build_preview(db, parsed, period_id)
+    preview = await svc.build_preview(db, parsed, period_id)
+    preview["file_hash"] = file_hash
+    await svc.store_preview(file_hash, period_id, preview)
+    preview["cached"] = False
+    return preview
 
 
 class ExcelResource(BaseModel):
@@ -0,0 +1,207 @@
+# app/modules/utility/routers/admin_month_close.py
+"""
+Закрытие месяца одним прогоном — граф этапов через Celery
+(services/month_close.py, tasks/month_close.py).
+
+    POST /api/admin/periods/{period_id}/month-close
+        → создаёт MonthCloseRun (этапы pending/skipped по опциям)
+        → month_close_advance_task ставит в очередь готовые этапы;
+          дальше этапы сами запускают зависимых
+
+    GET /api/admin/month-close/{run_id}
+        → {status, stages: {этап: status/attempts/elapsed_ms/result/error},
+           levels — параллельные уровни графа, context}
+
+    POST /api/admin/month-close/{run_id}/stages/{stage}/retry
+        → перезапуск ОДНОГО упавшего или зависшего этапа (выполненные не повторяются)
+
+    POST /api/admin/month-close/{run_id}/resume
+        → перезапуск всех упавших и зависших этапов прогона
+
+    GET /api/admin/periods/{period_id}/month-close-runs
+        → история прогонов по периоду
+"""
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.database import get_db
+from app.core.dependencies import RoleChecker
+from app.modules.utility.models import BillingPeriod, MonthCloseRun, User
+from app.modules.utility.routers.admin_dashboard import write_audit_log
+from app.modules.utility.services.month_close import (
+    STAGES, build_dag, initial_states, levels, restartable,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin", tags=["Admin Month Close"])
+allow_admin = RoleChecker(["admin"])
+allow_management = RoleChecker(["accountant", "admin"])
+
+
+class MonthCloseStart(BaseModel):
+    # Имя нового периода; пусто — новый период не открывается (и 1С не публикуется).
+    next_period_name: Optional[str] = None
+    generate_norm: bool = False
+    receipts: bool = True
+    onec_publish: bool = True
+
+
+def _run_to_dict(run: MonthCloseRun) -> dict:
+    dag = build_dag(run.options, run.context)
+    return {
+        "id": run.id,
+        "period_id": run.period_id,
+        "status": run.status,
+        "options": run.options,
+        "context": {k: v for k, v in (run.context or {}).items() if not isinstance(v, list)},
+        "stages": {name: (run.stages or {}).get(name) for name in STAGES},
+        "dependencies": {name: list(deps) for name, deps in dag.items()},
+        "levels": levels(dag),
+        "started_by_username": run.started_by_username,
+        "error": run.error,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+@router.post("/periods/{period_id}/month-close")
+async def start_month_close(
+    period_id: int,
+    data: MonthCloseStart,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(allow_admin),
+):
+    """Запускает закрытие месяца графом этапов. Период должен быть активным;
+    второй прогон, пока идёт первый, не запускается (409)."""
+    period = await db.get(BillingPeriod, period_id)
+    if not period:
+        raise HTTPException(404, "Период не найден")
+    if not period.is_active:
+        raise HTTPException(400, f"Период «{period.name}» не активен")
+    next_name = (data.next_period_name or "").strip() or None
+    if next_name == period.name:
+        raise HTTPException(400, "Новый период должен называться иначе, чем закрываемый")
+
+    busy = (await db.execute(
+        select(MonthCloseRun).where(MonthCloseRun.status == "running")
+    )).scalars().first()
+    if busy:
+        raise HTTPException(
+            409,
+            f"Уже идёт закрытие месяца id={busy.id}. Дождитесь завершения.",
+        )
+
+    options = {
+        "next_period_name": next_name,
+        "generate_norm": data.generate_norm,
+        "receipts": data.receipts,
+        "onec_publish": data.onec_publish,
+        "admin_user_id": current_user.id,
+    }
+    run = MonthCloseRun(
+        period_id=period_id,
+        status="running",
+        options=options,
+        context={},
+        stages=initial_states(options),
+        started_by_id=current_user.id,
+        started_by_username=current_user.username,
+    )
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+
+    # Импорт здесь, чтобы Celery-app не тянулся в момент импорта роутера
+    from app.modules.utility.tasks import month_close_advance_task
+
+    month_close_advance_task.delay(run.id)
+
+    await write_audit_log(
+        db=db, user_id=current_user.id, username=current_user.username,
+        action="month_close_start", entity_type="period", entity_id=period.id,
+        details={"run_id": run.id, "period_name": period.name, "options": options},
+    )
+    await db.commit()
+
+    return _run_to_dict(run)
+
+
+@router.get("/month-close/{run_id}", dependencies=[Depends(allow_management)])
+async def get_month_close(run_id: int, db: AsyncSession = Depends(get_db)):
+    run = await db.get(MonthCloseRun, run_id)
+    if not run:
+        raise HTTPException(404, "Прогон не найден")
+    return _run_to_dict(run)
+
+
+async def _restart(db: AsyncSession, run_id: int, current_user: User,
+                   stage: Optional[str]) -> dict:
+    run = await db.get(MonthCloseRun, run_id)
+    if not run:
+        raise HTTPException(404, "Прогон не найден")
+    states = run.stages or {}
+    # Упавшие и зависшие (queued без воркера / running дольше лимита задачи) —
+    # иначе прогон после смерти воркера навсегда «running» и блокирует старт.
+    failed = restartable({name: states.get(name) or {"status": "pending"} for name in STAGES})
+    if stage is not None:
+        if stage not in STAGES:
+            raise HTTPException(404, f"Нет этапа «{stage}»")
+        if stage not in failed:
+            raise HTTPException(
+                400, f"Этап «{stage}» в статусе «{(states.get(stage) or {}).get('status')}» — перезапуск только упавшего или зависшего",
+            )
+    elif not failed:
+        raise HTTPException(400, "В прогоне нет упавших или зависших этапов")
+
+    from app.modules.utility.tasks import month_close_advance_task
+
+    month_close_advance_task.delay(run.id, stage, stage is None)
+
+    await write_audit_log(
+        db=db, user_id=current_user.id, username=current_user.username,
+        action="month_close_retry" if stage else "month_close_resume",
+        entity_type="period", entity_id=run.period_id,
+        details={"run_id": run.id, "stages": [stage] if stage else failed},
+    )
+    await db.commit()
+    return {"run_id": run.id, "restarted": [stage] if stage else failed}
+
+
+@router.post("/month-close/{run_id}/stages/{stage}/retry")
+async def retry_month_close_stage(
+    run_id: int,
+    stage: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(allow_admin),
+):
+    """Перезапуск одного упавшего/зависшего этапа; зависимые пойдут после него сами."""
+    return await _restart(db, run_id, current_user, stage)
+
+
+@router.post("/month-close/{run_id}/resume")
+async def resume_month_close(
+    run_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(allow_admin),
+):
+    """Продолжить прогон: все упавшие и зависшие этапы → pending, выполненные не трогаем."""
+    return await _restart(db, run_id, current_user, None)
+
+
+@router.get("/periods/{period_id}/month-close-runs", dependencies=[Depends(allow_management)])
+async def list_month_close_runs(period_id: int, db: AsyncSession = Depends(get_db)):
+    """История прогонов закрытия по периоду (последние 20)."""
+    runs = (await db.execute(
+        select(MonthCloseRun)
+        .where(MonthCloseRun.period_id == period_id)
+        .order_by(desc(MonthCloseRun.created_at))
+        .limit(20)
+    )).scalars().all()
+    return [_run_to_dict(r) for r in runs]
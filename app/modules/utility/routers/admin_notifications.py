@@ -1,8 +1,10 @@
 """Уведомления для админа — сводка событий требующих внимания.
 
-Это лёгкий poll-endpoint (без websocket'ов). Фронт делает запрос каждые
-30 секунд, обновляет badge на колокольчике в шапке. При клике видно
-список последних событий с глубокими ссылками.
+Badge на колокольчике в шапке + список последних событий с глубокими
+ссылками. Доставка — SSE-поток GET /api/admin/events (services/admin_events):
+сводку считает один процесс на кластер раз в 30 секунд или по событию
+изменения, вкладки только слушают. GET /notifications оставлен для
+fallback-polling'а (браузер/прокси без streaming) и внешних скриптов.
 
 Категории:
   - gsheets_conflicts — строки импорта в статусе conflict (нужна ручная обработка)
@@ -13,8 +15,10 @@
 Не используем отдельную таблицу Notifications — нет необходимости. Все
 события уже есть в БД, мы их просто агрегируем «на лету» одним запросом.
 """
+import asyncio
 from datetime import timedelta
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -47,6 +51,63 @@ async def get_notifications(
     свежие, чтобы badge не показывал «999» для старых проблем которые
     никто не закрыл.
     """
+    return await build_notifications(db, recent_hours=recent_hours, limit=limit)
+
+
+async def _snapshot_from_db() -> dict:
+    """Сводка для push-канала: своя короткая сессия, дефолтные окно/лимит."""
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return await build_notifications(db)
+
+
+@router.get("/events")
+async def admin_events_stream(
+    request: Request,
+    current_user: User = Depends(allow_dashboard),
+    db: AsyncSession = Depends(get_db),
+):
+    """SSE-поток событий админки: `notifications` (сводка) и `job` (прогресс
+    фоновых задач). Первым кадром приходит текущая сводка.
+
+    Соединение с БД держится только на время авторизации — сам поток живёт
+    на Redis pub/sub и не занимает слот пула/PgBouncer.
+    """
+    from app.modules.utility.services.admin_events import (
+        KEEPALIVE_SECONDS, format_sse, get_hub,
+    )
+
+    await db.close()
+    hub = get_hub(_snapshot_from_db)
+    queue = await hub.subscribe()
+
+    async def _stream():
+        try:
+            # retry — пауза EventSource-совместимого реконнекта на клиенте.
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            await hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache, no-transform",
+            "X-Accel-Buffering": "no",   # nginx: не буферизовать поток
+        },
+    )
+
+
+async def build_notifications(db: AsyncSession, recent_hours: int = 72, limit: int = 20) -> dict:
+    """Агрегат категорий уведомлений (общий для GET и push-канала)."""
     cutoff = utcnow() - timedelta(hours=recent_hours)
 
     # 1) GSheets conflicts — счётчик + последние записи
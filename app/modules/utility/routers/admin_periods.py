@@ -1,6 +1,5 @@
 # app/modules/utility/routers/admin_periods.py
 
-import asyncio
 import logging
 from typing import List, Optional
 from decimal import Decimal
@@ -8,15 +7,17 @@ from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc, func, or_
+from sqlalchemy import desc, func
 from fastapi_cache.decorator import cache
 from fastapi_cache import FastAPICache
-from fastapi_limiter.depends import RateLimiter
+from app.core.rate_limit import RateLimit
 
 from app.core.database import get_db
-from app.modules.utility.models import User, BillingPeriod, MeterReading, Room
+from app.modules.utility.models import User, BillingPeriod, Room
 from app.modules.utility.schemas import PeriodCreate, PeriodResponse
+from app.core.data_versions import conditional_get
 from app.core.dependencies import get_current_user, RoleChecker
+from app.modules.utility.services import period_stats
 from app.modules.utility.services.billing import open_new_period
 from app.modules.utility.tasks import close_period_task
 from app.modules.utility.routers.admin_dashboard import write_audit_log
@@ -41,6 +42,9 @@ async def close_period_preview(
         current_user: User = Depends(allow_period_management),
         db: AsyncSession = Depends(get_db)
 ):
+    """Счётчики показаний — из period_dorm_stats (services/period_stats:
+    пересчёт только если период устарел), заселённость — один GROUP BY
+    по жильцам."""
     active_period = (await db.execute(
         select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
     )).scalars().first()
@@ -49,104 +53,38 @@ async def close_period_preview(
         raise HTTPException(status_code=400, detail="Нет активного периода")
 
     pid = active_period.id
-
-    (
-        total_occupied_res,
-        rooms_with_readings_res,
-        drafts_res,
-        anomalies_res,
-        approved_stats_res,
-        draft_sum_res,
-    ) = await asyncio.gather(
-        db.execute(
-            select(func.count(func.distinct(User.room_id))).where(
-                User.is_deleted.is_(False), User.room_id.is_not(None), User.role == "user"
-            )
-        ),
-        db.execute(
-            # «Комнаты с показаниями» — только те, где есть РЕАЛЬНЫЕ
-            # показания. Debt-only черновики от импорта 1С (показания NULL)
-            # сюда НЕ считаются — это финансовое сальдо, не подача.
-            select(func.count(func.distinct(MeterReading.room_id))).where(
-                MeterReading.period_id == pid,
-                or_(
-                    MeterReading.hot_water.is_not(None),
-                    MeterReading.cold_water.is_not(None),
-                    MeterReading.electricity.is_not(None),
-                ),
-            )
-        ),
-        db.execute(
-            select(func.count(MeterReading.id)).where(
-                MeterReading.period_id == pid, MeterReading.is_approved.is_(False)
-            )
-        ),
-        db.execute(
-            select(func.count(MeterReading.id)).where(
-                MeterReading.period_id == pid, MeterReading.is_approved.is_(False),
-                MeterReading.anomaly_score >= 80
-            )
-        ),
-        db.execute(
-            select(
-                func.count(MeterReading.id),
-                func.coalesce(func.sum(MeterReading.total_cost), 0)
-            ).where(
-                MeterReading.period_id == pid, MeterReading.is_approved.is_(True)
-            )
-        ),
-        db.execute(
-            select(func.coalesce(func.sum(MeterReading.total_cost), 0)).where(
-                MeterReading.period_id == pid, MeterReading.is_approved.is_(False)
-            )
-        ),
-    )
-
-    total_occupied_rooms = total_occupied_res.scalar_one()
-    rooms_with_readings = rooms_with_readings_res.scalar_one()
+    await period_stats.ensure_fresh(db, [pid])
+    stats = (await period_stats.load_stats(db, [pid]))[pid]
+    totals = period_stats.totals(stats)
+
+    dorm_totals = {row[0] or "": row[1] for row in (await db.execute(
+        select(Room.dormitory_name, func.count(func.distinct(User.room_id)).label("total_rooms"))
+        .join(User, User.room_id == Room.id)
+        .where(User.is_deleted.is_(False), User.role == "user")
+        .group_by(Room.dormitory_name)
+    )).all()}
+
+    total_occupied_rooms = sum(dorm_totals.values())
+    # «Комнаты с показаниями» — только те, где есть РЕАЛЬНЫЕ показания.
+    # Debt-only черновики от импорта 1С (показания NULL) сюда НЕ считаются —
+    # это финансовое сальдо, не подача.
+    rooms_with_readings = totals["rooms_submitted"]
     rooms_without_readings = max(0, total_occupied_rooms - rooms_with_readings)
-    total_drafts = drafts_res.scalar_one()
-    anomalies_count = anomalies_res.scalar_one()
+    total_drafts = totals["draft_count"]
+    anomalies_count = totals["anomaly_drafts"]
     safe_drafts = max(0, total_drafts - anomalies_count)
 
-    approved_row = approved_stats_res.one()
-    approved_count = approved_row[0]
-    approved_sum = float(approved_row[1])
-    draft_sum = float(draft_sum_res.scalar_one())
-
-    dorm_stats_res, dorm_submitted_res = await asyncio.gather(
-        db.execute(
-            select(Room.dormitory_name, func.count(func.distinct(User.room_id)).label("total_rooms"))
-            .join(User, User.room_id == Room.id)
-            .where(User.is_deleted.is_(False), User.role == "user")
-            .group_by(Room.dormitory_name).order_by(Room.dormitory_name)
-        ),
-        db.execute(
-            # «Сдали по общежитиям» — то же правило: debt-only не считается.
-            select(Room.dormitory_name, func.count(func.distinct(MeterReading.room_id)).label("submitted"))
-            .join(MeterReading, MeterReading.room_id == Room.id)
-            .where(
-                MeterReading.period_id == pid,
-                or_(
-                    MeterReading.hot_water.is_not(None),
-                    MeterReading.cold_water.is_not(None),
-                    MeterReading.electricity.is_not(None),
-                ),
-            )
-            .group_by(Room.dormitory_name)
-        ),
-    )
-
-    dorm_totals = {row[0]: row[1] for row in dorm_stats_res.all()}
-    dorm_submitted = {row[0]: row[1] for row in dorm_submitted_res.all()}
+    approved_count = totals["approved_count"]
+    approved_sum = float(totals["total_cost"])
+    draft_sum = float(totals["draft_sum"])
 
     dormitories = []
-    # Дома (place_type='house') имеют dormitory_name=None — None нельзя
-    # сравнивать со str в sorted(). Кладём None в конец, имя — «Дома».
-    for dorm_name, total in sorted(dorm_totals.items(), key=lambda kv: (kv[0] is None, kv[0] or "")):
-        submitted = dorm_submitted.get(dorm_name, 0)
+    # Дома (place_type='house') имеют dormitory_name=None (ключ '') — кладём
+    # их в конец, имя — «Дома».
+    for dorm_key, total in sorted(dorm_totals.items(), key=lambda kv: (kv[0] == "", kv[0])):
+        submitted = stats.get(dorm_key, {}).get("rooms_submitted", 0)
         dormitories.append({
-            "name": dorm_name or "Дома / без общежития", "total_rooms": total, "submitted": submitted,
+            "name": dorm_key or "Дома / без общежития", "total_rooms": total, "submitted": submitted,
             "missing": total - submitted,
             "percent": round(submitted / total * 100) if total > 0 else 0
         })
@@ -162,6 +100,20 @@ async def close_period_preview(
         "estimated_total": approved_sum + draft_sum, "dormitories": dormitories,
     }
 
+
+def _approved_by_dorm(stats: dict) -> dict:
+    """{общежитие: {"records", cost...}} — только строки с утверждёнными."""
+    data = {}
+    for dorm_key, row in stats.items():
+        if not row["approved_count"]:
+            continue
+        entry = {"records": row["approved_count"]}
+        for field in period_stats.COST_FIELDS:
+            entry[field] = float(row[field])
+        data[dorm_key or "Без общежития"] = entry
+    return data
+
+
 @router.get("/api/admin/periods/compare", summary="Сравнение двух периодов по ресурсам")
 async def compare_periods(
         period_a: int = Query(..., description="ID первого периода"),
@@ -174,35 +126,11 @@ async def compare_periods(
     if not pa or not pb:
         raise HTTPException(status_code=404, detail="Один или оба периода не найдены")
 
-    cost_fields = [
-        "cost_hot_water", "cost_cold_water", "cost_sewage",
-        "cost_electricity", "cost_maintenance", "cost_social_rent",
-        "cost_waste", "cost_fixed_part", "total_cost"
-    ]
-
-    async def _aggregate_period(pid: int):
-        stmt = (
-            select(
-                Room.dormitory_name, func.count(MeterReading.id).label("records"),
-                *[func.coalesce(func.sum(getattr(MeterReading, f)), 0).label(f) for f in cost_fields]
-            )
-            .join(Room, MeterReading.room_id == Room.id)
-            .where(MeterReading.period_id == pid, MeterReading.is_approved.is_(True))
-            .group_by(Room.dormitory_name)
-        )
-        result = await db.execute(stmt)
-        data = {}
-        for row in result.all():
-            dorm = row[0] or "Без общежития"
-            entry = {"records": row[1]}
-            for i, field in enumerate(cost_fields):
-                entry[field] = float(row[2 + i])
-            data[dorm] = entry
-        return data
-
-    data_a, data_b = await asyncio.gather(
-        _aggregate_period(period_a), _aggregate_period(period_b)
-    )
+    cost_fields = list(period_stats.COST_FIELDS)
+
+    await period_stats.ensure_fresh(db, [period_a, period_b])
+    stats = await period_stats.load_stats(db, [period_a, period_b])
+    data_a, data_b = _approved_by_dorm(stats[period_a]), _approved_by_dorm(stats[period_b])
 
     all_dorms = sorted(set(list(data_a.keys()) + list(data_b.keys())))
 
@@ -248,8 +176,41 @@ async def compare_periods(
         "totals": {"records_a": totals_a["records"], "records_b": totals_b["records"], "details": grand_deltas}
     }
 
+
+@router.get("/api/admin/periods/trends", summary="Динамика начислений по периодам")
+async def period_trends(
+        limit: int = Query(12, ge=2, le=120, description="Сколько последних периодов"),
+        dormitory: Optional[str] = Query(None, description="Только это общежитие"),
+        current_user: User = Depends(allow_period_management),
+        db: AsyncSession = Depends(get_db)
+):
+    """Утверждённые начисления N последних периодов (хронологически) —
+    из period_dorm_stats, без сканирования партиций readings."""
+    periods = list(reversed((await db.execute(
+        select(BillingPeriod.id, BillingPeriod.name)
+        .order_by(desc(BillingPeriod.chron_year), desc(BillingPeriod.chron_month),
+                  desc(BillingPeriod.id))
+        .limit(limit)
+    )).all()))
+    ids = [p.id for p in periods]
+    await period_stats.ensure_fresh(db, ids)
+    stats = await period_stats.load_stats(db, ids)
+
+    items = []
+    for p in periods:
+        by_dorm = _approved_by_dorm(stats[p.id])
+        if dormitory is not None:
+            by_dorm = {k: v for k, v in by_dorm.items() if k == dormitory}
+        entry = {"period_id": p.id, "name": p.name,
+                 "records": sum(v["records"] for v in by_dorm.values())}
+        for field in period_stats.COST_FIELDS:
+            entry[field] = round(sum(v[field] for v in by_dorm.values()), 2)
+        entry["dormitories"] = {k: round(v["total_cost"], 2) for k, v in sorted(by_dorm.items())}
+        items.append(entry)
+    return {"periods": items}
+
 @router.post("/api/admin/periods/open", summary="Открыть новый месяц",
-             dependencies=[Depends(RateLimiter(times=1, seconds=10))])
+             dependencies=[Depends(RateLimit(times=1, seconds=10))])
 async def api_open_period(data: PeriodCreate, background_tasks: BackgroundTasks,
                           current_user: User = Depends(allow_period_management), db: AsyncSession = Depends(get_db)):
     try:
@@ -281,7 +242,7 @@ async def api_open_period(data: PeriodCreate, background_tasks: BackgroundTasks,
     return {"status": "opened", "period": new_period.name}
 
 @router.post("/api/admin/periods/close", summary="Закрыть текущий месяц (Фоновая задача)",
-             dependencies=[Depends(RateLimiter(times=1, seconds=30))])
+             dependencies=[Depends(RateLimit(times=1, seconds=30))])
 async def api_close_period(current_user: User = Depends(allow_period_management), db: AsyncSession = Depends(get_db)):
     active_period = (await db.execute(select(BillingPeriod).where(BillingPeriod.is_active.is_(True)))).scalars().first()
     if not active_period:
@@ -302,6 +263,10 @@ async def get_active_period(current_user: User = Depends(get_current_user), db:
     return res.scalars().first()
 
 @router.get("/api/admin/periods/history", response_model=List[PeriodResponse], summary="История всех периодов")
-async def get_all_periods(current_user: User = Depends(allow_period_management), db: AsyncSession = Depends(get_db)):
+async def get_all_periods(
+    current_user: User = Depends(allow_period_management),
+    _etag: None = Depends(conditional_get("periods")),
+    db: AsyncSession = Depends(get_db),
+):
     res = await db.execute(select(BillingPeriod).order_by(desc(BillingPeriod.id)))
     return res.scalars().all()
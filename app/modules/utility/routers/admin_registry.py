@@ -4,25 +4,29 @@
   - боевые MeterReading (QR/приложение/норматив/уже-промоут-gsheets) за период;
   - буфер GSheetsImportRow (необработанные строки импорта до промоута).
 
-Read-only union (сорт по дате, фильтры по источнику/поиску, пагинация). Действия
+Read-only union (сорт по дате, фильтры по источнику/поиску, keyset-пагинация —
+всё в SQL, см. _registry_union). Действия
 (утвердить/переназначить) остаются на существующих эндпоинтах — фронт дёргает их
 по row_type+id. Биллинг-путь подачи НЕ трогаем (Путь B).
 """
 from __future__ import annotations
 
+import base64
+from datetime import date, datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
-from sqlalchemy import select
+from sqlalchemy import and_, case, func, literal_column, or_, select, tuple_, union_all
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.dependencies import RoleChecker
 from app.modules.utility.models import (
-    MeterReading, GSheetsImportRow, BillingPeriod, Tariff, User,
+    MeterReading, GSheetsImportRow, BillingPeriod, Room, Tariff, User,
 )
+from app.modules.utility.services.search_utils import like_contains
 
 router = APIRouter(prefix="/api/admin/registry", tags=["Admin Registry (unified)"])
 allow_management = RoleChecker(["accountant", "admin", "financier"])
@@ -73,6 +77,99 @@ def _fmt_delta(cur, prev) -> Optional[float]:
         return None
 
 
+# =====================================================================
+# SQL-проекция реестра. Раньше эндпоинт грузил ВСЕ MeterReading периода и
+# весь буфер GSheetsImportRow, гидрировал жильцов/комнаты, сортировал и
+# резал страницу в Python — латентность росла линейно с периодом и хвостом
+# буфера. Теперь оба источника — UNION ALL в общую форму строки
+# (row_type, id, ts, status, source, fio, room); фильтры, сорт и keyset-
+# пагинация по (ts, row_type, id) — в БД, гидрируется только видимая страница.
+# =====================================================================
+
+# NULL-метка времени (строка буфера без sheet_timestamp/created_at, показание
+# без created_at) — «самая старая»: как прежний сорт по "" в Python, и keyset
+# без NULL-ов. COALESCE — в обеих ветках UNION.
+_TS_FLOOR = datetime(1900, 1, 1)
+_BUFFER_STATUSES = ["pending", "conflict", "unmatched", "auto_approved"]
+
+
+def _reading_source_sql():
+    """SQL-зеркало _reading_source (код источника без подписи): фильтр
+    source=… и график по дням считаются в БД."""
+    src = MeterReading.source
+    flags = func.upper(func.coalesce(MeterReading.anomaly_flags, ""))
+    known = [(src == raw, code) for raw, (code, _label) in _SOURCE_LABELS.items()]
+    return case(
+        *known,
+        (func.coalesce(src, "") != "", "qr"),
+        (and_(func.coalesce(MeterReading.anomaly_flags, "") == "",
+              MeterReading.hot_water.is_(None),
+              MeterReading.cold_water.is_(None),
+              MeterReading.electricity.is_(None)), "saldo"),
+        (flags.like("%GSHEETS%"), "gsheets"),
+        (flags.like("%MANUAL_RECEIPT%"), "admin"),
+        (or_(*[flags.like(f"%{a}%") for a in (
+            "AUTO_NORM", "AUTO_AVG", "AUTO_GENERATED", "AUTO_NO_HISTORY", "STATIC_RENT",
+        )]), "auto"),
+        else_="qr",
+    )
+
+
+def _registry_union(period_id: Optional[int]):
+    """UNION ALL боевых показаний периода и необработанного буфера."""
+    gs_rows = select(
+        literal_column("'gsheets'").label("row_type"),
+        GSheetsImportRow.id.label("id"),
+        func.coalesce(GSheetsImportRow.sheet_timestamp, GSheetsImportRow.created_at,
+                      _TS_FLOOR).label("ts"),
+        GSheetsImportRow.status.label("status"),
+        literal_column("'buffer'").label("source"),
+        GSheetsImportRow.raw_fio.label("fio"),
+        GSheetsImportRow.raw_room_number.label("room"),
+    ).where(
+        GSheetsImportRow.reading_id.is_(None),
+        GSheetsImportRow.status.in_(_BUFFER_STATUSES),
+    )
+    if period_id is None:
+        return gs_rows.subquery("registry")
+    mr_rows = (
+        select(
+            literal_column("'reading'").label("row_type"),
+            MeterReading.id.label("id"),
+            func.coalesce(MeterReading.created_at, _TS_FLOOR).label("ts"),
+            case((MeterReading.is_approved.is_(True), "approved"), else_="draft").label("status"),
+            _reading_source_sql().label("source"),
+            User.username.label("fio"),
+            func.coalesce(Room.room_number, Room.apartment_number).label("room"),
+        )
+        .select_from(MeterReading)
+        .outerjoin(User, User.id == MeterReading.user_id)
+        .outerjoin(Room, Room.id == MeterReading.room_id)
+        .where(MeterReading.period_id == period_id)
+    )
+    return union_all(mr_rows, gs_rows).subquery("registry")
+
+
+def _encode_cursor(ts: datetime, row_type: str, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_type}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_type, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(ts), row_type, int(row_id)
+    except Exception:
+        raise HTTPException(400, "Некорректный курсор пагинации")
+
+
+def _day_bucket(src: str) -> str:
+    if src in ("qr", "admin", "gsheets", "auto"):
+        return src
+    return "gsheets" if src == "buffer" else "other"
+
+
 @router.get("")
 async def unified_registry(
     period_id: Optional[int] = Query(None),
@@ -83,6 +180,7 @@ async def unified_registry(
     show_saldo: bool = Query(False, description="показывать сальдо-заглушки 1С"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="keyset-курсор next_cursor прошлой страницы"),
     current_user=Depends(allow_management),
     db: AsyncSession = Depends(get_db),
 ):
@@ -94,7 +192,104 @@ async def unified_registry(
             select(BillingPeriod).where(BillingPeriod.is_active)
         )).scalars().first()
 
-    items: list[dict] = []
+    day_date = None
+    if day:
+        try:
+            day_date = date.fromisoformat(day)
+        except ValueError:
+            raise HTTPException(400, "day: ожидается YYYY-MM-DD")
+    after = _decode_cursor(cursor) if cursor else None
+
+    # Перекрытые строки буфера (кейс Хайбуллина 2026-07-15) гасит beat-задача
+    # retire_superseded_gsheets_rows_task — не каждый GET реестра.
+    reg = _registry_union(period.id if period else None)
+
+    # --- Фильтры ---
+    # Сальдо-заглушки 1С скрыты по умолчанию (шум: у них нет показаний, они
+    # носят долг/переплату). Показываются тумблером или фильтром source=saldo.
+    base_filters = []
+    if not show_saldo and source != "saldo":
+        base_filters.append(reg.c.source != "saldo")
+    if source:
+        base_filters.append(reg.c.source == source)
+    if search:
+        pattern = like_contains(search.lower())
+        base_filters.append(or_(reg.c.fio.ilike(pattern), reg.c.room.ilike(pattern)))
+
+    # График месяца и чипы статусов: одна агрегация (день × источник × статус)
+    # после source/search/сальдо, ДО статус- и день-фильтров — по графику
+    # админ кликает день и видит, кто что прислал, с разбивкой по источникам.
+    reg_day = func.date(reg.c.ts)
+    agg_rows = (await db.execute(
+        select(reg_day, reg.c.source, reg.c.status, func.count())
+        .where(*base_filters)
+        .group_by(reg_day, reg.c.source, reg.c.status)
+    )).all()
+
+    days: dict[str, dict] = {}
+    counts: dict[str, int] = {}
+    total = 0
+    for d, src, st, n in agg_rows:
+        counts[st] = counts.get(st, 0) + n
+        if d is not None and d > _TS_FLOOR.date():
+            bucket = days.setdefault(d.isoformat(), {"total": 0, "qr": 0, "admin": 0,
+                                                     "gsheets": 0, "auto": 0, "other": 0})
+            bucket["total"] += n
+            bucket[_day_bucket(src)] += n
+        if (not status or st == status) and (day_date is None or d == day_date):
+            total += n
+
+    # --- Страница: сорт по дате (свежие сверху), keyset по (ts, row_type, id) ---
+    page_filters = list(base_filters)
+    if status:
+        page_filters.append(reg.c.status == status)
+    if day_date is not None:
+        page_filters.append(reg_day == day_date)
+    page_q = (
+        select(reg.c.row_type, reg.c.id, reg.c.ts)
+        .where(*page_filters)
+        .order_by(reg.c.ts.desc(), reg.c.row_type.desc(), reg.c.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        page_q = page_q.where(tuple_(reg.c.ts, reg.c.row_type, reg.c.id) < tuple_(*after))
+    else:
+        page_q = page_q.offset((page - 1) * limit)
+    page_rows = (await db.execute(page_q)).all()
+    next_cursor = None
+    if len(page_rows) > limit:
+        last = page_rows[limit - 1]
+        next_cursor = _encode_cursor(last.ts, last.row_type, last.id)
+    page_rows = page_rows[:limit]
+
+    items = await _hydrate_page(db, page_rows, period)
+
+    # Периоды для селектора (свежие первыми по хронологии). Тайбрейк по id —
+    # непарсимые имена (ordinal 0) не тасуются между запросами: на этот
+    # порядок опирается «+2 предыдущих месяца» модалки ручного ввода.
+    from app.modules.utility.services.period_registry import period_registry
+    registry = await period_registry.get(db, require_id=period.id if period else None)
+    periods_out = [
+        {"id": p.id, "name": p.name, "is_active": p.is_active}
+        for p in reversed(registry.entries)
+    ]
+
+    return {
+        "items": items,
+        "total": total, "page": page, "limit": limit,
+        "next_cursor": next_cursor,
+        "counts": counts,
+        "days": days,
+        "periods": periods_out,
+        "period": period.name if period else None,
+        "period_id": period.id if period else None,
+    }
+
+
+async def _hydrate_page(db: AsyncSession, page_rows, period) -> list[dict]:
+    """Полные строки реестра только для видимой страницы (порядок page_rows)."""
+    reading_ids = [rid for rt, rid, _ts in page_rows if rt == "reading"]
+    gs_ids = [rid for rt, rid, _ts in page_rows if rt == "gsheets"]
 
     # Имена тарифов одним запросом. Эффективный тариф = тариф КОМНАТЫ
     # (room.tariff_id) с fallback на дефолтный id=1 — как в tariff_cache
@@ -107,30 +302,27 @@ async def unified_registry(
             return None
         return tariff_names.get(room.tariff_id) or default_tariff
 
-    # --- Боевые MeterReading за период ---
-    if period:
+    by_key: dict[tuple[str, int], dict] = {}
+
+    # --- Боевые MeterReading страницы ---
+    if reading_ids:
         mr = (await db.execute(
             select(MeterReading)
             .options(selectinload(MeterReading.user), selectinload(MeterReading.room))
-            .where(MeterReading.period_id == period.id)
+            .where(MeterReading.id.in_(reading_ids))
         )).scalars().all()
 
         # Δ к прошлому месяцу — ЕДИНЫЙ канонический prev (pick_prev_pair,
-        # аудит 2026-07-14): одним запросом утверждённые показания этих же
-        # пар (user, room) с именем периода, prev по хронологии имени.
-        from app.modules.utility.services.reading_calculator import build_prev_map
-        pair_users = {r.user_id for r in mr if r.user_id}
-        prev_map: dict = {}
-        if pair_users:
-            cand = (await db.execute(
-                select(MeterReading, BillingPeriod.name)
-                .join(BillingPeriod, BillingPeriod.id == MeterReading.period_id)
-                .where(
-                    MeterReading.user_id.in_(pair_users),
-                    MeterReading.is_approved.is_(True),
-                )
-            )).all()
-            prev_map = build_prev_map(cand, period.name)
+        # аудит 2026-07-14): PrevReadingIndex одним запросом тянет
+        # утверждённые показания ровно этих пар (user, room) за периоды
+        # не позже текущего, prev по хронологии имени.
+        from app.modules.utility.services.prev_reading_index import (
+            PrevKey, PrevReadingIndex,
+        )
+        prev_keys = {PrevKey(r.user_id, r.room_id, period.name)
+                     for r in mr if r.user_id and r.room_id}
+        prev_by_key = await PrevReadingIndex.for_session(db).resolve(db, prev_keys)
+        prev_map = {(k.user_id, k.room_id): v for k, v in prev_by_key.items()}
 
         def _meter_flags(room) -> dict:
             # Оснащённость счётчиками (как в manual-grid-state): None = счётчик
@@ -148,7 +340,7 @@ async def unified_registry(
             prev = prev_map.get((r.user_id, r.room_id))
             if prev is not None and prev.id == r.id:
                 prev = None
-            items.append({
+            by_key[("reading", r.id)] = {
                 "row_type": "reading", "id": r.id,
                 "user_id": r.user_id, "period_id": r.period_id,
                 "source": src, "source_label": label,
@@ -169,141 +361,56 @@ async def unified_registry(
                 "admin_edited": bool(getattr(r, "admin_edited", False)),
                 "meters": _meter_flags(room),
                 "matched": None,
-            })
-
-    # Self-heal (кейс Хайбуллина 2026-07-15): подача из гугл-формы висела
-    # «Конфликтом» вечно, если админ решил месяц другим путём (ручной ввод/
-    # QR/Excel). Гасим перекрытые строки ПЕРЕД выборкой буфера — в ОТДЕЛЬНОЙ
-    # сессии, чтобы ошибка лечения не трогала транзакцию этого GET-а.
-    from app.core.database import AsyncSessionLocal
-    from app.modules.utility.services.gsheets_supersede import retire_superseded_rows
-    try:
-        async with AsyncSessionLocal() as heal_db:
-            stale = (await heal_db.execute(
-                select(GSheetsImportRow).where(
-                    GSheetsImportRow.reading_id.is_(None),
-                    GSheetsImportRow.matched_user_id.isnot(None),
-                    GSheetsImportRow.status.in_(
-                        ["pending", "conflict", "unmatched", "auto_approved"]),
-                )
-            )).scalars().all()
-            if await retire_superseded_rows(heal_db, stale):
-                await heal_db.commit()
-    except Exception:
-        pass   # реестр важнее самолечения — покажем как есть
-
-    # --- Буфер GSheetsImportRow (необработанные, до промоута) ---
-    gs = (await db.execute(
-        select(GSheetsImportRow).where(
-            GSheetsImportRow.reading_id.is_(None),
-            GSheetsImportRow.status.in_(["pending", "conflict", "unmatched", "auto_approved"]),
-        )
-    )).scalars().all()
-
-    # Сопоставленные жильцы буфера — ФИО/комната/тариф одним запросом
-    # (в старом gsheets-UI была колонка «Сопоставлено» — возвращаем её данные).
-    matched_ids = [g.matched_user_id for g in gs if g.matched_user_id]
-    matched_users: dict[int, User] = {}
-    if matched_ids:
-        for u in (await db.execute(
-            select(User).options(selectinload(User.room))
-            .where(User.id.in_(set(matched_ids)))
-        )).scalars().all():
-            matched_users[u.id] = u
-
-    for g in gs:
-        mu = matched_users.get(g.matched_user_id) if g.matched_user_id else None
-        mu_room = mu.room if mu else None
-        items.append({
-            "row_type": "gsheets", "id": g.id,
-            "source": "buffer", "source_label": "📄 Google Sheets (буфер)",
-            "timestamp": (g.sheet_timestamp.isoformat() if g.sheet_timestamp
-                          else (g.created_at.isoformat() if g.created_at else None)),
-            "fio": g.raw_fio,
-            "dormitory": g.raw_dormitory,
-            "room": g.raw_room_number,
-            "tariff": _room_tariff(mu_room),
-            "hot": str(g.hot_water) if g.hot_water is not None else None,
-            "cold": str(g.cold_water) if g.cold_water is not None else None,
-            "elect": None,
-            "delta_hot": None, "delta_cold": None, "delta_elect": None,
-            "admin_edited": False,
-            "status": g.status,
-            "sum": None,
-            "anomaly_score": None,
-            "matched": {
-                "user_id": g.matched_user_id,
-                "fio": mu.username if mu else None,
-                "room": ((mu_room.room_number or mu_room.apartment_number)
-                         if mu_room else None),
-                "score": int(g.match_score or 0),
-                "reason": g.conflict_reason,
-            },
-        })
-
-    # --- Фильтры ---
-    # Сальдо-заглушки 1С скрыты по умолчанию (шум: у них нет показаний, они
-    # носят долг/переплату). Показываются тумблером или фильтром source=saldo.
-    if not show_saldo and source != "saldo":
-        items = [x for x in items if x["source"] != "saldo"]
-    if source:
-        items = [x for x in items if x["source"] == source]
-    if search:
-        s = search.lower()
-        items = [x for x in items
-                 if s in (x["fio"] or "").lower() or s in str(x.get("room") or "").lower()]
+            }
 
-    # График месяца: агрегация по ДНЯМ подачи (после source/search/сальдо,
-    # ДО статус- и день-фильтров) — по нему админ кликает день и видит,
-    # кто что прислал в этот день, с разбивкой по источникам.
-    days: dict[str, dict] = {}
-    for x in items:
-        ts = x.get("timestamp") or ""
-        if len(ts) < 10:
-            continue
-        d = ts[:10]
-        bucket = days.setdefault(d, {"total": 0, "qr": 0, "admin": 0,
-                                     "gsheets": 0, "auto": 0, "other": 0})
-        bucket["total"] += 1
-        src_key = x["source"] if x["source"] in ("qr", "admin", "gsheets", "auto") else (
-            "gsheets" if x["source"] == "buffer" else "other")
-        bucket[src_key] += 1
-
-    # Счётчики статусов ДО статус-фильтра — для чипов-фильтров в UI.
-    counts: dict[str, int] = {}
-    for x in items:
-        counts[x["status"]] = counts.get(x["status"], 0) + 1
-    if status:
-        items = [x for x in items if x["status"] == status]
-    if day:
-        items = [x for x in items if (x.get("timestamp") or "").startswith(day)]
-
-    # --- Сорт по дате (свежие сверху) + пагинация ---
-    items.sort(key=lambda x: x["timestamp"] or "", reverse=True)
-    total = len(items)
-    start = (page - 1) * limit
-
-    # Периоды для селектора (свежие первыми по хронологии имени). Тайбрейк
-    # по id — непарсимые имена (все → (0,0)) не тасуются между запросами:
-    # на этот порядок опирается «+2 предыдущих месяца» модалки ручного ввода.
-    from app.modules.utility.services.period_helpers import period_chron_key
-    all_periods = (await db.execute(select(BillingPeriod))).scalars().all()
-    periods_out = [
-        {"id": p.id, "name": p.name, "is_active": bool(p.is_active)}
-        for p in sorted(all_periods,
-                        key=lambda p: (period_chron_key(p.name), p.id),
-                        reverse=True)
-    ]
+    # --- Буфер GSheetsImportRow страницы (необработанные, до промоута) ---
+    if gs_ids:
+        gs = (await db.execute(
+            select(GSheetsImportRow).where(GSheetsImportRow.id.in_(gs_ids))
+        )).scalars().all()
 
-    return {
-        "items": items[start:start + limit],
-        "total": total, "page": page, "limit": limit,
-        "counts": counts,
-        "days": days,
-        "periods": periods_out,
-        "period": period.name if period else None,
-        "period_id": period.id if period else None,
-    }
+        # Сопоставленные жильцы буфера — ФИО/комната/тариф одним запросом
+        # (в старом gsheets-UI была колонка «Сопоставлено» — возвращаем её данные).
+        matched_ids = {g.matched_user_id for g in gs if g.matched_user_id}
+        matched_users: dict[int, User] = {}
+        if matched_ids:
+            for u in (await db.execute(
+                select(User).options(selectinload(User.room))
+                .where(User.id.in_(matched_ids))
+            )).scalars().all():
+                matched_users[u.id] = u
+
+        for g in gs:
+            mu = matched_users.get(g.matched_user_id) if g.matched_user_id else None
+            mu_room = mu.room if mu else None
+            by_key[("gsheets", g.id)] = {
+                "row_type": "gsheets", "id": g.id,
+                "source": "buffer", "source_label": "📄 Google Sheets (буфер)",
+                "timestamp": (g.sheet_timestamp.isoformat() if g.sheet_timestamp
+                              else (g.created_at.isoformat() if g.created_at else None)),
+                "fio": g.raw_fio,
+                "dormitory": g.raw_dormitory,
+                "room": g.raw_room_number,
+                "tariff": _room_tariff(mu_room),
+                "hot": str(g.hot_water) if g.hot_water is not None else None,
+                "cold": str(g.cold_water) if g.cold_water is not None else None,
+                "elect": None,
+                "delta_hot": None, "delta_cold": None, "delta_elect": None,
+                "admin_edited": False,
+                "status": g.status,
+                "sum": None,
+                "anomaly_score": None,
+                "matched": {
+                    "user_id": g.matched_user_id,
+                    "fio": mu.username if mu else None,
+                    "room": ((mu_room.room_number or mu_room.apartment_number)
+                             if mu_room else None),
+                    "score": int(g.match_score or 0),
+                    "reason": g.conflict_reason,
+                },
+            }
+
+    return [by_key[(rt, rid)] for rt, rid, _ts in page_rows if (rt, rid) in by_key]
 
 
 class RejectBody(BaseModel):
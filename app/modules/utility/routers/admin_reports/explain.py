@@ -81,28 +81,24 @@ async def _build_explain_response(reading_id: int, db: AsyncSession) -> dict:
     if not tariff:
         raise HTTPException(400, "Активный тариф не найден")
 
-    # 3. Предыдущее utverждённое показание для дельт. Ищем по period_id
-    # (не created_at — инцидент may 2026 с подачами заднего числа через
-    # гугл-таблицу). И ПРОПУСКАЕМ synth-prev (AUTO_GENERATED, DATA_OVERFLOW_RESET,
-    # MANUAL_RECEIPT, AUTO_NO_HISTORY) — их значения = 0, использование как
-    # baseline даёт фантастическую дельту в следующем периоде.
+    # 3. Предыдущее утверждённое показание для дельт — канонический выбор
+    # (pick_prev_pair через PrevReadingIndex), как в утверждении и биллинге:
+    # хронология по ИМЕНИ периода (инцидент may 2026 с подачами заднего
+    # числа через гугл-таблицу) и ПРОПУСК synth-prev (AUTO_GENERATED,
+    # DATA_OVERFLOW_RESET, MANUAL_RECEIPT, AUTO_NO_HISTORY) — их значения = 0,
+    # использование как baseline даёт фантастическую дельту в следующем периоде.
     # См. инцидент Капранов 2026-05-21: prev=AUTO_GENERATED с 0/0/0, текущее
     # 1468 ГВС → формула выдавала 818 049 ₽ как «правильный пересчёт».
-    # selectinload(period) — чтобы prev.period.name не дёргал lazy-load в async.
-    from app.modules.utility.services.reading_calculator import is_meaningful_prev
-    prev_candidates = (await db.execute(
-        select(MeterReading)
-        .options(selectinload(MeterReading.period))
-        .where(
-            MeterReading.user_id == user.id,
-            MeterReading.room_id == room.id,
-            MeterReading.is_approved.is_(True),
-            MeterReading.period_id < reading.period_id,
+    # Раньше здесь был свой .limit(20) по period_id — «Проверка расчёта»
+    # могла взять не тот prev, что реальный расчёт.
+    from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+    prev_index = PrevReadingIndex.for_session(db)
+    prev = None
+    if reading.period is not None:
+        await prev_index.load(db, [PrevKey(user.id, room.id, reading.period.name)])
+        prev, _prev_any, _hist = prev_index.pick(
+            user.id, room.id, reading.period.name, exclude_id=reading.id,
         )
-        .order_by(MeterReading.period_id.desc())
-        .limit(20)
-    )).scalars().all()
-    prev = next((c for c in prev_candidates if is_meaningful_prev(c)), None)
 
     # 4. Корректировки за период reading'а
     adj_rows = (await db.execute(
@@ -409,7 +405,7 @@ async def _build_explain_response(reading_id: int, db: AsyncSession) -> dict:
         "previous_reading": (
             {
                 "reading_id": prev.id,
-                "period_name": prev.period.name if prev.period else None,
+                "period_name": prev_index.period_name(prev),
                 "hot_water": f3(p_hot),
                 "cold_water": f3(p_cold),
                 "electricity": f3(p_elect),
@@ -1,20 +1,17 @@
 # Экспорты Excel: сводная ведомость периода и выгрузка начислений в 1С.
 # Вербатим-перенос из admin_reports.py (строки 232-480), поведение 1:1.
 
-import io
 from decimal import Decimal
 from typing import List, Optional
-from urllib.parse import quote
 
 from fastapi import Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
 from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from openpyxl import Workbook
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.xlsx_stream import XlsxStream
 from app.modules.utility.models import (
     User, MeterReading, BillingPeriod, Room, RentalContract,
 )
@@ -47,7 +44,8 @@ async def export_report(
     period = await db.get(BillingPeriod, target_period_id)
     if not period: raise HTTPException(404, "Выбранный период не найден")
 
-    # ИСПРАВЛЕНИЕ: Используем потоковое чтение (yield_per) из БД, чтобы не грузить все в RAM
+    # Потоковое чтение из БД (yield_per) + write-only книга из общего движка
+    # app.core.xlsx_stream: память не растёт с числом жильцов.
     statement = (
         select(User, MeterReading, Room)
         .join(MeterReading, User.id == MeterReading.user_id)
@@ -57,34 +55,27 @@ async def export_report(
             MeterReading.is_approved.is_(True)
         )
         .order_by(Room.dormitory_name, Room.room_number, User.username)
-    ).execution_options(yield_per=1000)
-
-    # ИСПРАВЛЕНИЕ: Используем write_only=True для потоковой записи Excel
-    # (openpyxl не хранит документ в памяти, а пишет напрямую в байтовый буфер)
-    workbook = Workbook(write_only=True)
-    worksheet = workbook.create_sheet("Сводная ведомость")
-
-    headers = ["Общежитие/Комната", "ФИО (Логин)", "Площадь", "Жильцов", "ГВС (руб)", "ХВС (руб)", "Водоотв. (руб)",
-               "Электроэнергия (руб)", "Содержание (руб)", "Наем (руб)", "ТКО (руб)", "Отопление + ОДН (руб)",
-               "Счет 209 (Комм.)", "Счет 205 (Найм)", "ИТОГО (руб)"]
-    worksheet.append(headers)
+    )
 
-    total_sum, total_209, total_205 = ZERO, ZERO, ZERO
+    book = XlsxStream()
+    worksheet = book.sheet("Сводная ведомость", headers=[
+        "Общежитие/Комната", "ФИО (Логин)", "Площадь", "Жильцов", "ГВС (руб)", "ХВС (руб)", "Водоотв. (руб)",
+        "Электроэнергия (руб)", "Содержание (руб)", "Наем (руб)", "ТКО (руб)", "Отопление + ОДН (руб)",
+        "Счет 209 (Комм.)", "Счет 205 (Найм)", "ИТОГО (руб)"])
 
-    # Потоковое получение результатов
-    result = await db.stream(statement)
+    totals = {"sum": ZERO, "209": ZERO, "205": ZERO}
 
-    async for row in result:
+    def _row(row):
         user, reading, room = row
         total_cost = Decimal(reading.total_cost or 0)
         t_209 = Decimal(reading.total_209 or 0)
         t_205 = Decimal(reading.total_205 or 0)
 
-        total_sum += total_cost
-        total_209 += t_209
-        total_205 += t_205
+        totals["sum"] += total_cost
+        totals["209"] += t_209
+        totals["205"] += t_205
 
-        worksheet.append([
+        return [
             room.format_address,
             user.username.split("_deleted_")[0] if user.is_deleted else user.username,
             room.apartment_area,
@@ -92,21 +83,12 @@ async def export_report(
             reading.cost_hot_water, reading.cost_cold_water, reading.cost_sewage, reading.cost_electricity,
             reading.cost_maintenance, reading.cost_social_rent, reading.cost_waste, reading.cost_fixed_part,
             t_209, t_205, total_cost
-        ])
-
-    worksheet.append([""] * 12 + ["ИТОГО:", total_209, total_205, total_sum])
-    filename = f"Report_{period.name.replace(' ', '_')}.xlsx"
-    encoded_filename = quote(filename)
+        ]
 
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
+    await worksheet.extend_from_db(db, statement, _row)
 
-    return StreamingResponse(
-        output,
-        headers={'Content-Disposition': f"attachment; filename*=utf-8''{encoded_filename}"},
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    worksheet.append([""] * 12 + ["ИТОГО:", totals["209"], totals["205"], totals["sum"]])
+    return await book.response(f"Report_{period.name.replace(' ', '_')}.xlsx")
 
 
 def _fmt_contract_1c(rc) -> str:
@@ -189,39 +171,26 @@ async def export_1c(
     if not period:
         raise HTTPException(404, "Выбранный период не найден")
 
-    rows = (await db.execute(
-        select(User, MeterReading, Room)
-        .join(MeterReading, User.id == MeterReading.user_id)
-        .join(Room, User.room_id == Room.id)
-        .where(
-            MeterReading.period_id == target_period_id,
-            MeterReading.is_approved.is_(True),
-            User.is_deleted.is_(False),
-        )
-        .order_by(User.username)
-    )).all()
-
-    # Фильтр по дому/общаге (можно несколько — галочки в модалке).
-    if group:
-        wanted = {g for g in group if g}
-        if wanted:
-            rows = [(u, mr, room) for (u, mr, room) in rows if _report_group(room) in wanted]
+    # Фильтр по дому/общаге (можно несколько — галочки в модалке). Группа
+    # вычисляется из Room в Python (_report_group), поэтому фильтр — в row_fn.
+    wanted = {g for g in (group or []) if g}
 
     # Активные договоры найма одним запросом (последний по дате подписания).
-    uids = [u.id for u, _, _ in rows]
+    # Отдельно от основного стрима: договоров на порядок меньше, чем строк.
     contracts: dict[int, RentalContract] = {}
-    if uids:
-        for rc in (await db.execute(
-            select(RentalContract)
-            .where(RentalContract.user_id.in_(set(uids)), RentalContract.is_active.is_(True))
-            .order_by(RentalContract.id.asc())
-        )).scalars().all():
-            contracts[rc.user_id] = rc  # asc по id → последний перезапишет = самый свежий
+    for rc in (await db.execute(
+        select(RentalContract)
+        .join(MeterReading, MeterReading.user_id == RentalContract.user_id)
+        .where(MeterReading.period_id == target_period_id,
+               MeterReading.is_approved.is_(True),
+               RentalContract.is_active.is_(True))
+        .order_by(RentalContract.id.asc())
+    )).scalars().all():
+        contracts[rc.user_id] = rc  # asc по id → последний перезапишет = самый свежий
 
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Лист_1"
+    book = XlsxStream()
     # Колонка «N» убрана (2026-06-18) — не нужна для загрузки 1С.
+    worksheet = book.sheet("Лист_1")
     worksheet.append([
         "Контрагент", "Договор", "Количество", "Сумма",
         "Вид документа-основания", "Номер (108)", "Дата (109)",
@@ -229,7 +198,11 @@ async def export_1c(
     ])
 
     _acc = (account or "").strip()
-    for user, reading, _room in rows:
+
+    def _row(row):
+        user, reading, room = row
+        if wanted and _report_group(room) not in wanted:
+            return None
         t209 = Decimal(reading.total_209 or 0)
         t205 = Decimal(reading.total_205 or 0)
         if _acc == "209":
@@ -241,17 +214,31 @@ async def export_1c(
         # При выборе конкретного счёта нулевые строки пропускаем (нет начисления
         # по этому счёту — нечего грузить).
         if _acc in ("209", "205") and amount == 0:
-            continue
+            return None
         # Сумма — СТРОКОЙ с ТОЧКОЙ-разделителем (1С требует точку, не запятую).
         # Decimal-str всегда даёт точку независимо от локали Excel.
         sum_str = str(amount.quantize(Decimal("0.01")))
-        worksheet.append([
+        return [
             user.username,
             _fmt_contract_1c(contracts.get(user.id)),
             1,
             sum_str,
             "", "", "", "", "",
-        ])
+        ]
+
+    await worksheet.extend_from_db(
+        db,
+        select(User, MeterReading, Room)
+        .join(MeterReading, User.id == MeterReading.user_id)
+        .join(Room, User.room_id == Room.id)
+        .where(
+            MeterReading.period_id == target_period_id,
+            MeterReading.is_approved.is_(True),
+            User.is_deleted.is_(False),
+        )
+        .order_by(User.username),
+        _row,
+    )
 
     _picked = [g for g in (group or []) if g]
     _acc_suffix = f"_sch{_acc}" if _acc in ("209", "205") else ""
@@ -261,13 +248,4 @@ async def export_1c(
         _suffix = f"{_acc_suffix}_vyborka_{len(_picked)}"
     else:
         _suffix = _acc_suffix
-    filename = f"Vygruzka_1C_{period.name.replace(' ', '_')}{_suffix}.xlsx"
-    encoded_filename = quote(filename)
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return StreamingResponse(
-        output,
-        headers={'Content-Disposition': f"attachment; filename*=utf-8''{encoded_filename}"},
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
+    return await book.response(f"Vygruzka_1C_{period.name.replace(' ', '_')}{_suffix}.xlsx")
@@ -184,19 +184,14 @@ async def get_resident_finance_detail(
     # импортировал «Февраль 2026» в мае, у него period.id > чем у мая, и в
     # таблице февраль появлялся ВЫШЕ майских данных. Из-за этого дельты тоже
     # съезжали (prev определялось по created_at, см. _prev_for ниже).
-    # Теперь сортируем по распарсенному `(year, month)` имени периода —
-    # хронологически. Нестандартные имена («Начальный период», тестовые)
-    # получают ключ (0, 0) и оказываются в самом начале (baseline).
-    all_periods = (await db.execute(select(BillingPeriod))).scalars().all()
-    cur_key = period_chron_key(period.name)
-    # Только периоды у которых биллинговая хронология <= текущей.
-    # Это аналог прежнего `BillingPeriod.id <= period.id`, но корректный.
-    periods_filtered = [p for p in all_periods if period_chron_key(p.name) <= cur_key]
-    periods = sorted(
-        periods_filtered,
-        key=lambda p: period_chron_key(p.name),
-        reverse=True,
-    )[:history_periods]
+    # Теперь — по хранимой хронологии (chron_ordinal из имени) через
+    # реестр периодов. Нестандартные имена («Начальный период», тестовые)
+    # получают ordinal 0 и оказываются в самом начале (baseline).
+    # Только периоды у которых биллинговая хронология <= текущей — аналог
+    # прежнего `BillingPeriod.id <= period.id`, но корректный.
+    from app.modules.utility.services.period_registry import period_registry
+    registry = await period_registry.get(db, require_id=period.id)
+    periods = registry.up_to(period, history_periods)
     period_ids = [p.id for p in periods]
     period_name_map = {p.id: p.name for p in periods}
 
@@ -211,45 +206,25 @@ async def get_resident_finance_detail(
 
     # Для дельт нужно предыдущее approved показание ЖИЛЬЦА В ЭТОЙ КОМНАТЕ
     # в БИЛЛИНГОВОЙ хронологии (не по created_at — задний-числом импорт ломает).
-    # Загружаем ВСЕ его approved readings (а не только за выбранные history N),
-    # потому что предыдущее показание для самого раннего из N может лежать
-    # ВНЕ выборки. Затем строим словарь reading.id → prev_reading.
-    prev_reading_map: dict[int, Optional[MeterReading]] = {}
+    # Канонический выбор (pick_prev_pair через PrevReadingIndex), как в
+    # утверждении, биллинге и «Проверке расчёта»: prev для самого раннего
+    # из N может лежать ВНЕ выборки — индекс одним запросом тянет всю
+    # историю пары до целевого периода. Дубль в том же периоде (debt-черновик
+    # 1С, повторная подача) prev'ом не станет — берутся строго более ранние
+    # месяцы (инцидент Мороз), synth-prev пропускаются.
+    from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+    prev_index = PrevReadingIndex.for_session(db)
     if user.room_id:
-        all_user_readings = (await db.execute(
-            select(MeterReading, BillingPeriod)
-            .join(BillingPeriod, BillingPeriod.id == MeterReading.period_id)
-            .where(
-                MeterReading.user_id == user_id,
-                MeterReading.room_id == user.room_id,
-                MeterReading.is_approved.is_(True),
-            )
-        )).all()
-        # Сортируем хронологически ASC: baseline → старые → новые.
-        all_user_readings_chronological = sorted(
-            all_user_readings,
-            key=lambda row: period_chron_key(row[1].name),
-        )
-        # Двигаемся по цепочке: текущему reading prev = последний из СТРОГО
-        # БОЛЕЕ РАННЕГО периода. Дубль в том же периоде (debt-черновик 1С,
-        # повторная подача) prev'ом быть не должен — иначе дельта считается
-        # против записи с теми же цифрами и показывает 0 (инцидент Мороз).
-        prev_reading: Optional[MeterReading] = None
-        last_key = None
-        prev_of_key: Optional[MeterReading] = None  # prev для текущей группы периода
-        for r, _bp in all_user_readings_chronological:
-            k = period_chron_key(_bp.name)
-            if k != last_key:
-                prev_of_key = prev_reading
-                last_key = k
-            prev_reading_map[r.id] = prev_of_key
-            prev_reading = r
+        await prev_index.load(db, [PrevKey(user_id, user.room_id, period.name)])
 
     def _prev_for(reading):
         """Предыдущее approved показание жильца в биллинговой хронологии
         (а не по `created_at` — задний-числом импорт ломал предыдущую логику,
         см. инцидент мая 2026 с Сорокиным С.А.)."""
-        return prev_reading_map.get(reading.id)
+        name = period_name_map.get(reading.period_id)
+        if not user.room_id or name is None:
+            return None
+        return prev_index.pick(user_id, user.room_id, name, exclude_id=reading.id)[0]
 
     # 4) Корректировки за эти периоды.
     adjustments = []
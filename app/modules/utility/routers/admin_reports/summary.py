@@ -10,10 +10,10 @@ from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.data_versions import conditional_get
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.modules.utility.models import User, MeterReading, BillingPeriod, Room
-from app.modules.utility.services.period_helpers import period_chron_key
 
 from ._shared import _report_group, _unit_label, router
 
@@ -21,7 +21,9 @@ from ._shared import _report_group, _unit_label, router
 @router.get("/api/admin/summary")
 async def get_accountant_summary(
         period_id: Optional[int] = Query(None),
-        current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+        current_user: User = Depends(get_current_user),
+        _etag: None = Depends(conditional_get("readings@{period_id}", "users", "rooms", "periods")),
+        db: AsyncSession = Depends(get_db)
 ):
     if current_user.role not in ("accountant", "admin"): raise HTTPException(status_code=403, detail="Доступ запрещен")
 
@@ -294,6 +296,10 @@ async def get_accountant_summary_v2(
                     "помещениями, а не за людьми.",
     ),
     current_user: User = Depends(get_current_user),
+    # История жильца тянет прошлые периоды — версия readings всей таблицы.
+    _etag: None = Depends(conditional_get(
+        "readings", "adjustments", "users", "rooms", "periods", "tariffs",
+    )),
     db: AsyncSession = Depends(get_db),
 ):
     if current_user.role not in ("accountant", "admin"):
@@ -365,17 +371,16 @@ async def get_accountant_summary_v2(
     # безопасно ссылаться даже когда история пустая.
     period_id_to_key: dict = {}
     if user_ids:
-        all_periods = (await db.execute(select(BillingPeriod))).scalars().all()
-        cur_key = period_chron_key(period.name)
-        # Строго раньше текущего по хронологии (для Δ нужны только прошлые).
-        prev_periods_sorted = sorted(
-            (p for p in all_periods if period_chron_key(p.name) < cur_key),
-            key=lambda p: period_chron_key(p.name),
-            reverse=True,  # DESC — самый свежий первый
-        )[:history_periods]
+        # Реестр периодов (хранимый chron_ordinal, кеш процесса) — без
+        # SELECT всех периодов и разбора имён на каждый запрос.
+        from app.modules.utility.services.period_registry import period_registry
+        registry = await period_registry.get(db, require_id=period.id)
+        # Строго раньше текущего по хронологии (для Δ нужны только прошлые),
+        # DESC — самый свежий первый.
+        prev_periods_sorted = registry.previous(period, history_periods)
         prev_period_ids = [p.id for p in prev_periods_sorted]
-        # period_id → chronological_key — для сортировки readings ниже.
-        period_id_to_key = {p.id: period_chron_key(p.name) for p in prev_periods_sorted}
+        # period_id → chron_ordinal — для сортировки readings ниже.
+        period_id_to_key = {p.id: p.ordinal for p in prev_periods_sorted}
 
         if prev_period_ids:
             hist_rows = (await db.execute(
@@ -396,7 +401,7 @@ async def get_accountant_summary_v2(
             for uid in user_ids:
                 history_map[uid] = sorted(
                     tmp.get(uid, []),
-                    key=lambda r: period_id_to_key.get(r.period_id, (0, 0)),
+                    key=lambda r: period_id_to_key.get(r.period_id, 0),
                 )
 
     # 4) MISSING_RECEIPT — жильцы с комнатой, но без MeterReading в этом периоде.
@@ -454,8 +459,8 @@ async def get_accountant_summary_v2(
                     "missing_count": 0,
                     "reading_ids": [],
                     "residents": [],
-                    "_cost_by_key": {},   # chrono_key -> сумма cost жильцов
-                    "_debt_by_key": {},   # chrono_key -> сумма debt жильцов
+                    "_cost_by_key": {},   # chron_ordinal -> сумма cost жильцов
+                    "_debt_by_key": {},   # chron_ordinal -> сумма debt жильцов
                 }
             return room_acc[room.id]
 
@@ -149,6 +149,22 @@ def _check_tariff_cache() -> dict[str, Any]:
         return {"name": "tariff_cache", "status": "fail", "error": str(e)}
 
 
+def _check_redis_usage() -> dict[str, Any]:
+    """Походы в Redis на запрос по маршрутам (этот воркер) + сверки лимитера.
+
+    Информационная проверка, всегда ok: смотрим, какие маршруты платят
+    сетевой задержкой за кэш/лимитер.
+    """
+    from app.core.rate_limit import local_buckets
+    from app.core.redis_client import top_routes
+
+    return {
+        "name": "redis_usage", "status": "ok",
+        "top_routes": top_routes(),
+        "rate_limit": local_buckets.stats(),
+    }
+
+
 async def _check_gsheets_stuck(db: AsyncSession) -> dict[str, Any]:
     """Сколько строк gsheets застряло в auto_approved без reading_id.
 
@@ -321,6 +337,7 @@ async def health_deep(
     checks.append(await _check_active_period(db))
     checks.append(await _check_active_tariffs(db))
     checks.append(_check_tariff_cache())
+    checks.append(_check_redis_usage())
     checks.append(await _check_gsheets_stuck(db))
     checks.append(await _check_users_without_room(db))
 
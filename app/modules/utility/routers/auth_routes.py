@@ -12,7 +12,7 @@ from sqlalchemy.future import select
 from sqlalchemy import func
 from jose import jwt, JWTError
 
-from fastapi_limiter.depends import RateLimiter
+from app.core.rate_limit import RateLimit
 
 from app.core.database import get_db
 from app.modules.utility.models import User
@@ -71,7 +71,7 @@ PRE_AUTH_TOKEN_EXPIRE_MINUTES = 5  # Короткий временный ток
 # =====================================================================
 @router.post(
     "/api/token",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+    dependencies=[Depends(RateLimit(times=5, seconds=60, exact=True))]
 )
 async def login(
         response: Response,
@@ -201,7 +201,7 @@ async def login(
 # Только после этого получает полноценный access_token с scope="full".
 @router.post(
     "/api/auth/verify-2fa",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[Depends(RateLimit(times=5, seconds=60, exact=True))],
 )
 async def verify_2fa_login(
         response: Response,
@@ -283,12 +283,12 @@ async def setup_2fa(current_user: User = Depends(get_current_user)):
 
 
 # --- 4. АКТИВАЦИЯ 2FA ---
-# RateLimiter защищает от brute-force ПЕРВОГО корректного кода во время
+# RateLimit защищает от brute-force ПЕРВОГО корректного кода во время
 # привязки 2FA (атакующий мог бы запустить перебор по свежему QR-секрету
 # жертвы при MITM-атаке).
 @router.post(
     "/api/auth/activate-2fa",
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))],
+    dependencies=[Depends(RateLimit(times=10, seconds=60, exact=True))],
 )
 async def activate_2fa(
         data: TotpVerify,
@@ -48,14 +48,17 @@ async def _is_submission_day_open(db: AsyncSession) -> tuple[bool, int, int, int
     start_day = _safe_int(start_row.value if start_row else None, 15)
     end_day = _safe_int(end_row.value if end_row else None, 3)
     today_day = _date.today().day
+    return submission_window_open(start_day, end_day, today_day), today_day, start_day, end_day
+
+
+def submission_window_open(start_day: int, end_day: int, today_day: int) -> bool:
+    """Попадает ли день месяца в окно подачи [start_day, end_day]."""
     if start_day <= end_day:
         # Обычное окно внутри одного месяца (напр. 20–25).
-        is_open = start_day <= today_day <= end_day
-    else:
-        # Окно ПЕРЕХОДИТ через границу месяца (напр. 15 → 3 следующего):
-        # открыто с start_day до конца месяца И с 1-го по end_day.
-        is_open = today_day >= start_day or today_day <= end_day
-    return is_open, today_day, start_day, end_day
+        return start_day <= today_day <= end_day
+    # Окно ПЕРЕХОДИТ через границу месяца (напр. 15 → 3 следующего):
+    # открыто с start_day до конца месяца И с 1-го по end_day.
+    return today_day >= start_day or today_day <= end_day
 
 
 # =========================
@@ -9,9 +9,9 @@ from typing import Optional
 from fastapi import Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, func, literal, or_
 from app.core.database import get_db
-from app.modules.utility.models import User, MeterReading, DebtImportLog
+from app.modules.utility.models import User, MeterReading, DebtImportLog, DebtSnapshot
 from app.core.dependencies import get_current_user
 from app.modules.utility.tasks import import_debts_task
 
@@ -26,6 +26,17 @@ from ._shared import (
 # DEBT IMPORT HISTORY
 # =========================================================================
 
+# Поля лога для diff — без applied_state (JSONB на тысячи жильцов).
+_LOG_META = select(
+    DebtImportLog.id, DebtImportLog.account_type, DebtImportLog.started_at,
+    DebtImportLog.applied_state.is_not(None).label("has_state"),
+)
+
+
+async def _log_meta(db: AsyncSession, log_id: int):
+    return (await db.execute(_LOG_META.where(DebtImportLog.id == log_id))).first()
+
+
 @router.get("/debts/import-history", summary="История импортов 1С")
 async def debts_import_history(
     limit: int = Query(50, ge=1, le=200),
@@ -66,7 +77,7 @@ async def debts_import_diff(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Сравнивает applied_state двух импортов одного account_type.
+    """Сравнивает состояние двух импортов одного account_type.
 
     Категории жильцов:
       - new_debtors:  не было в прошлом импорте, появился долг > 0
@@ -77,13 +88,17 @@ async def debts_import_diff(
 
     На жильцов с одинаковой суммой не возвращаем — это шум, отрисуется
     только то что изменилось.
+
+    Читает строки debt_snapshots обоих импортов (PK (import_log_id,
+    user_id)): FULL JOIN в SQL отдаёт только изменившихся жильцов —
+    applied_state на тысячи жильцов не грузится.
     """
     _require_finance(current_user)
 
-    current = await db.get(DebtImportLog, log_id)
+    current = await _log_meta(db, log_id)
     if not current:
         raise HTTPException(404, "Лог не найден")
-    if not current.applied_state:
+    if not current.has_state:
         raise HTTPException(
             400,
             "У этого импорта нет applied_state (импорт до миграции debts_003). "
@@ -92,7 +107,7 @@ async def debts_import_diff(
 
     # Находим предыдущий импорт того же account_type, либо берём указанный.
     if against_id is not None:
-        previous = await db.get(DebtImportLog, against_id)
+        previous = await _log_meta(db, against_id)
         if not previous:
             raise HTTPException(404, "Лог для сравнения не найден")
         if previous.account_type != current.account_type:
@@ -102,7 +117,7 @@ async def debts_import_diff(
             )
     else:
         previous = (await db.execute(
-            select(DebtImportLog)
+            _LOG_META
             .where(
                 DebtImportLog.account_type == current.account_type,
                 DebtImportLog.id < current.id,
@@ -111,7 +126,7 @@ async def debts_import_diff(
             )
             .order_by(desc(DebtImportLog.id))
             .limit(1)
-        )).scalars().first()
+        )).first()
 
     if not previous:
         return {
@@ -121,17 +136,29 @@ async def debts_import_diff(
             "fatal": "Это первый импорт этого счёта — сравнивать не с чем.",
         }
 
-    cur_state = current.applied_state or {}
-    prev_state = previous.applied_state or {}
     account = current.account_type
-    debt_key = f"debt_{account}"
-    over_key = f"overpayment_{account}"
-
-    def _dec(d, key):
-        try:
-            return Decimal(str(d.get(key, "0") or "0"))
-        except Exception:
-            return Decimal("0")
+    cur_s = select(DebtSnapshot).where(DebtSnapshot.import_log_id == current.id).subquery("cur")
+    prev_s = select(DebtSnapshot).where(DebtSnapshot.import_log_id == previous.id).subquery("prev")
+    zero = literal(0)
+    cur_debt_c = func.coalesce(cur_s.c.debt, zero)
+    prev_debt_c = func.coalesce(prev_s.c.debt, zero)
+    cur_over_c = func.coalesce(cur_s.c.overpayment, zero)
+    prev_over_c = func.coalesce(prev_s.c.overpayment, zero)
+    changed = (await db.execute(
+        select(
+            func.coalesce(cur_s.c.user_id, prev_s.c.user_id),
+            cur_debt_c, prev_debt_c, cur_over_c, prev_over_c,
+            # Метаданные берём из cur если есть, иначе из prev (если жилец исчез)
+            func.coalesce(cur_s.c.username, prev_s.c.username),
+            func.coalesce(cur_s.c.room_label, prev_s.c.room_label),
+            func.coalesce(cur_s.c.room_id, prev_s.c.room_id),
+        )
+        .select_from(cur_s.join(prev_s, cur_s.c.user_id == prev_s.c.user_id, full=True))
+        .where(or_(
+            cur_debt_c != prev_debt_c,
+            and_(cur_over_c > 0, prev_over_c == 0),
+        ))
+    )).all()
 
     new_debtors = []
     debt_grew = []
@@ -139,28 +166,14 @@ async def debts_import_diff(
     debt_closed = []
     new_overpay = []
 
-    # Bug AG: applied_state теперь keyed by user_id (раньше room_id — в
-    # коммуналке два жильца перезаписывали друг друга).
-    all_user_ids = set(cur_state.keys()) | set(prev_state.keys())
-    for user_id_str in all_user_ids:
-        cur = cur_state.get(user_id_str, {})
-        prev = prev_state.get(user_id_str, {})
-        cur_debt = _dec(cur, debt_key)
-        prev_debt = _dec(prev, debt_key)
-        cur_over = _dec(cur, over_key)
-        prev_over = _dec(prev, over_key)
-
-        # Метаданные берём из cur если есть, иначе из prev (если жилец исчез)
-        meta_username = cur.get("username") or prev.get("username") or "—"
-        meta_room = cur.get("room_label") or prev.get("room_label") or "—"
-        # room_id хранится внутри applied_state (после Bug AG) либо берём
-        # из cur/prev. Для legacy-логов до Bug AG в applied_state нет user_id,
-        # вместо него стоит room_id — попробуем привести к int безопасно.
-        room_id_val = cur.get("room_id") or prev.get("room_id")
-        try:
-            user_id_int = int(user_id_str)
-        except Exception:
-            user_id_int = None
+    # Bug AG: applied_state (и debt_snapshots) keyed by user_id (раньше
+    # room_id — в коммуналке два жильца перезаписывали друг друга).
+    for (user_id_int, cur_debt, prev_debt, cur_over, prev_over,
+         username, room_label, room_id_val) in changed:
+        cur_debt, prev_debt = Decimal(cur_debt), Decimal(prev_debt)
+        cur_over, prev_over = Decimal(cur_over), Decimal(prev_over)
+        meta_username = username or "—"
+        meta_room = room_label or "—"
 
         if cur_debt > prev_debt:
             entry = {
@@ -251,6 +264,11 @@ async def debts_user_history(
     больше не теряют точки (раньше при смене комнаты история обрывалась).
     UI рисует две линии: 209 (коммунальный) и 205 (найм), плюс tabular
     разрез по каждому импорту.
+
+    Range-скан debt_snapshots по (user_id, started_at) + PK-JOIN на лог:
+    цена — число точек жильца, а не число импортов × размер applied_state.
+    Импорта, где жильца не было, в выборке нет — «0», которое на самом деле
+    «нет данных», не подмешивается.
     """
     _require_finance(current_user)
 
@@ -258,46 +276,34 @@ async def debts_user_history(
     if not user:
         raise HTTPException(404, "Жилец не найден")
 
-    user_id_key = str(user.id)
-
-    # Все completed-импорты с applied_state — отсортированы по дате
-    logs = (await db.execute(
-        select(DebtImportLog)
+    rows = (await db.execute(
+        select(
+            DebtSnapshot.import_log_id, DebtSnapshot.started_at, DebtSnapshot.account_type,
+            DebtSnapshot.debt, DebtSnapshot.overpayment, DebtSnapshot.room_label,
+            DebtImportLog.file_name,
+        )
+        .join(DebtImportLog, DebtImportLog.id == DebtSnapshot.import_log_id)
         .where(
+            DebtSnapshot.user_id == user.id,
             DebtImportLog.status == "completed",
-            DebtImportLog.applied_state.is_not(None),
         )
-        .order_by(DebtImportLog.started_at.asc(), DebtImportLog.id.asc())
-    )).scalars().all()
+        .order_by(DebtSnapshot.started_at.asc(), DebtSnapshot.import_log_id.asc())
+    )).all()
 
     points = []
     last_room_label = None
-    for log in logs:
-        st = log.applied_state or {}
-        entry = st.get(user_id_key)
-        if not entry:
-            # В этот импорт этой комнаты не было — пропускаем точку, чтобы
-            # не подмешивать «0», которое на самом деле «нет данных».
-            continue
-        debt_key = f"debt_{log.account_type}"
-        over_key = f"overpayment_{log.account_type}"
-        try:
-            debt = float(Decimal(str(entry.get(debt_key, "0") or "0")))
-            over = float(Decimal(str(entry.get(over_key, "0") or "0")))
-        except Exception:
-            debt = 0.0
-            over = 0.0
-        # room_label берём из applied_state (denormalized), чтобы не делать
-        # отдельный JOIN. Последнее значение — самое свежее.
-        if entry.get("room_label"):
-            last_room_label = entry["room_label"]
+    for log_id, started_at, account_type, debt, over, room_label, file_name in rows:
+        # room_label denormalized в снимке — без JOIN на room. Последнее
+        # значение — самое свежее.
+        if room_label:
+            last_room_label = room_label
         points.append({
-            "log_id": log.id,
-            "started_at": log.started_at.isoformat() if log.started_at else None,
-            "account_type": log.account_type,
-            "debt": debt,
-            "overpayment": over,
-            "file_name": log.file_name,
+            "log_id": log_id,
+            "started_at": started_at.isoformat() if started_at else None,
+            "account_type": account_type,
+            "debt": float(debt or 0),
+            "overpayment": float(over or 0),
+            "file_name": file_name,
         })
 
     return {
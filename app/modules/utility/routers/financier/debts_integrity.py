@@ -2,12 +2,11 @@
 # Механически выделено из монолитного routers/financier.py (распил на
 # пакет financier/): код перенесён дословно, поведение/пути/тексты 1:1.
 
-from decimal import Decimal
 from typing import Optional
 from fastapi import Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_, desc
+from sqlalchemy import func, desc
 from app.core.database import get_db
 from app.modules.utility.models import User, MeterReading, BillingPeriod, Room, DebtImportLog
 from app.core.dependencies import get_current_user
@@ -30,11 +29,14 @@ async def debts_check_resident_coverage(
     db: AsyncSession = Depends(get_db),
 ):
     """Для конкретного жильца перебирает последние N импортов 1С,
-    парсит архивные xlsx, ищет ФИО (точное совпадение + substring).
+    ищет ФИО в архивных xlsx (точное совпадение + substring).
     Полезно для диагностики «почему у Миронова нет долгов»:
       - если в архивах есть с цифрами → fuzzy-привязка ошиблась, нужен reassign
       - если есть с нулями → нормально, нет долга
       - если нет вообще → жильца не передавали из 1С
+
+    Ищет по ФИО-индексу архива (services/debt_archive_index.py) — xlsx
+    не открывается; индекс старого архива собирается на первом запросе.
     """
     if current_user.role not in ("admin", "financier"):
         raise HTTPException(403, "Недостаточно прав")
@@ -47,32 +49,25 @@ async def debts_check_resident_coverage(
     if not fio_db:
         raise HTTPException(400, "У жильца нет ФИО — нечего искать")
 
-    # Нормализация для substring-сравнения (нижний регистр, без точек,
-    # без двойных пробелов).
-    import re as _re
-    def _norm(s: str) -> str:
-        s = (s or "").lower().replace(".", " ").replace(",", " ")
-        s = _re.sub(r"\s+", " ", s).strip()
-        return s
-
-    fio_db_norm = _norm(fio_db)
-    # Также берём фамилию + первую букву имени для substring-поиска.
-    parts = fio_db_norm.split()
-    surname = parts[0] if parts else ""
+    from app.modules.utility.services.debt_archive_index import (
+        find_resident, load_index, normalize,
+    )
+    fio_db_norm = normalize(fio_db)
 
     logs = (await db.execute(
-        select(DebtImportLog)
+        select(
+            DebtImportLog.id, DebtImportLog.account_type, DebtImportLog.started_at,
+            DebtImportLog.status, DebtImportLog.archive_path,
+        )
         .where(
             DebtImportLog.archive_path.is_not(None),
             DebtImportLog.status.in_(["completed", "reverted"]),
         )
         .order_by(desc(DebtImportLog.id))
         .limit(last_n)
-    )).scalars().all()
+    )).all()
 
-    import openpyxl as _opx
-    import os as _os
-    from decimal import Decimal as _D
+    import asyncio as _asyncio
     results = []
     for log in logs:
         item = {
@@ -84,64 +79,13 @@ async def debts_check_resident_coverage(
             "error": None,
         }
         try:
-            if not _os.path.exists(log.archive_path):
+            # Готовый индекс — чтение маленького gz; сборка (старый архив) —
+            # openpyxl, поэтому в пуле потоков, а не в event loop.
+            index = await _asyncio.to_thread(load_index, log.archive_path)
+            if index is None:
                 item["error"] = "archive_missing"
-                results.append(item)
-                continue
-            wb = _opx.load_workbook(filename=log.archive_path, read_only=True, data_only=True)
-            ws = wb.active
-            # ФИО в ОСВ 1С может быть в любой строковой колонке (зависит
-            # от шаблона выгрузки). Ищем substring фамилии во ВСЕХ
-            # колонках строки.
-            for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-                if not row:
-                    continue
-                # Ищем колонку с ФИО (substring "фамилия" в строковом значении).
-                fio_cell = None
-                fio_col_idx = None
-                for col_idx, cell_val in enumerate(row):
-                    if cell_val is None or not isinstance(cell_val, str):
-                        continue
-                    cell_norm = _norm(cell_val)
-                    if not cell_norm or not surname:
-                        continue
-                    if surname not in cell_norm:
-                        continue
-                    # Sanity: ячейка должна выглядеть как ФИО (несколько слов
-                    # с заглавных букв), а не как «Договор...» или «Сальдо...».
-                    # Фильтруем явные ключевые слова ОСВ.
-                    if any(kw in cell_norm for kw in [
-                        "договор", "сальдо", "оборот", "итого", "период",
-                        "квартир", "общежит", "счёт", "счет", "помещен",
-                    ]):
-                        continue
-                    fio_cell = cell_val
-                    fio_col_idx = col_idx
-                    break
-                if fio_cell is None:
-                    continue
-                fio_cell_norm = _norm(str(fio_cell))
-                # Собираем числовые значения из строки (после колонки ФИО),
-                # чтобы показать сальдо.
-                numeric_cols = []
-                for col_val in row[fio_col_idx + 1:]:
-                    if col_val is None or col_val == "":
-                        continue
-                    try:
-                        d = _D(str(col_val).replace(",", "."))
-                        if d != 0:
-                            numeric_cols.append(float(d))
-                    except Exception:
-                        pass
-                exact = fio_cell_norm == fio_db_norm
-                item["matches"].append({
-                    "row_excel": row_idx,
-                    "col_excel": fio_col_idx + 1,  # 1-based для удобства админа
-                    "fio_in_excel": str(fio_cell).strip(),
-                    "exact_match": exact,
-                    "numeric_values": numeric_cols[:6],
-                })
-            wb.close()
+            else:
+                item["matches"] = find_resident(index, fio_db_norm)
         except Exception as exc:
             item["error"] = f"parse_failed: {exc}"
         results.append(item)
@@ -554,6 +498,15 @@ async def debts_probe_update(
     }
 
 
+async def _active_period_id(db: AsyncSession) -> int:
+    active_period = (await db.execute(
+        select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
+    )).scalars().first()
+    if not active_period:
+        raise HTTPException(404, "Нет активного периода")
+    return active_period.id
+
+
 @router.get(
     "/debts/integrity-check",
     summary="Анализатор: сравнить applied_state свежего импорта с БД (Этап 2)",
@@ -577,202 +530,18 @@ async def debts_integrity_check(
       3) **extra_in_db** — reading с долгом есть, в applied_state юзера
          нет. Симптом: zombie от старого Bug AG (см. /debts/zombie-readings).
 
+    Сверка — один JOIN debt_snapshots ↔ readings в БД, наружу приходят
+    только расходящиеся строки (services/debt_integrity.py).
+
     Read-only. Auto-fix не делает (на каждую категорию — свой инструмент:
     drift → reparse, missing → reparse, extra → cleanup-zombie-readings).
     """
     _require_finance(current_user)
+    period_id = await _active_period_id(db)
 
-    active_period = (await db.execute(
-        select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
-    )).scalars().first()
-    if not active_period:
-        raise HTTPException(404, "Нет активного периода")
-    period_id = active_period.id
-
-    async def _latest_applied(acct: str):
-        log = (await db.execute(
-            select(DebtImportLog)
-            .where(
-                DebtImportLog.account_type == acct,
-                DebtImportLog.status == "completed",
-                DebtImportLog.applied_state.is_not(None),
-            )
-            .order_by(DebtImportLog.id.desc()).limit(1)
-        )).scalars().first()
-        return log
-
-    log_209 = await _latest_applied("209")
-    log_205 = await _latest_applied("205")
-    state_209 = (log_209.applied_state or {}) if log_209 else {}
-    state_205 = (log_205.applied_state or {}) if log_205 else {}
-
-    # Объединяем expected_state по юзерам: для каждого user_id — ожидаемые debt_209/205.
-    expected: dict[int, dict] = {}
-    for uid_str, vals in state_209.items():
-        try:
-            uid = int(uid_str)
-        except Exception:
-            continue
-        expected.setdefault(uid, {"username": None, "room_label": None})
-        expected[uid]["debt_209"] = float(vals.get("debt_209", "0") or 0)
-        expected[uid]["overpayment_209"] = float(vals.get("overpayment_209", "0") or 0)
-        expected[uid]["username"] = vals.get("username")
-        expected[uid]["room_label"] = vals.get("room_label")
-    for uid_str, vals in state_205.items():
-        try:
-            uid = int(uid_str)
-        except Exception:
-            continue
-        expected.setdefault(uid, {"username": None, "room_label": None})
-        expected[uid]["debt_205"] = float(vals.get("debt_205", "0") or 0)
-        expected[uid]["overpayment_205"] = float(vals.get("overpayment_205", "0") or 0)
-        if not expected[uid].get("username"):
-            expected[uid]["username"] = vals.get("username")
-        if not expected[uid].get("room_label"):
-            expected[uid]["room_label"] = vals.get("room_label")
-
-    # Все reading'и активного периода (одной выборкой).
-    readings = (await db.execute(
-        select(MeterReading).where(MeterReading.period_id == period_id)
-    )).scalars().all()
-    readings_by_user: dict[int, "MeterReading"] = {}
-    for r in readings:
-        if r.user_id is not None:
-            readings_by_user[r.user_id] = r
-
-    drift = []
-    missing_in_db = []
-    extra_in_db = []
-
-    THR = 1.0  # порог расхождения в рублях
-
-    # 1+2: сверяем expected → reality
-    for uid, exp in expected.items():
-        r = readings_by_user.get(uid)
-        exp_d209 = exp.get("debt_209", 0.0)
-        exp_o209 = exp.get("overpayment_209", 0.0)
-        exp_d205 = exp.get("debt_205", 0.0)
-        exp_o205 = exp.get("overpayment_205", 0.0)
-        if r is None:
-            # missing — только если ожидалось ненулевое сальдо
-            if max(exp_d209, exp_o209, exp_d205, exp_o205) > THR:
-                missing_in_db.append({
-                    "user_id": uid,
-                    "username": exp.get("username"),
-                    "room_label": exp.get("room_label"),
-                    "expected": {
-                        "debt_209": exp_d209, "overpayment_209": exp_o209,
-                        "debt_205": exp_d205, "overpayment_205": exp_o205,
-                    },
-                })
-            continue
-
-        actual_d209 = float(r.debt_209 or 0)
-        actual_o209 = float(r.overpayment_209 or 0)
-        actual_d205 = float(r.debt_205 or 0)
-        actual_o205 = float(r.overpayment_205 or 0)
-
-        diff_d209 = actual_d209 - exp_d209
-        diff_o209 = actual_o209 - exp_o209
-        diff_d205 = actual_d205 - exp_d205
-        diff_o205 = actual_o205 - exp_o205
-        max_abs_diff = max(abs(diff_d209), abs(diff_o209), abs(diff_d205), abs(diff_o205))
-        if max_abs_diff > THR:
-            drift.append({
-                "user_id": uid,
-                "reading_id": r.id,
-                "username": exp.get("username"),
-                "room_label": exp.get("room_label"),
-                "expected": {
-                    "debt_209": exp_d209, "overpayment_209": exp_o209,
-                    "debt_205": exp_d205, "overpayment_205": exp_o205,
-                },
-                "actual": {
-                    "debt_209": actual_d209, "overpayment_209": actual_o209,
-                    "debt_205": actual_d205, "overpayment_205": actual_o205,
-                },
-                "max_abs_diff": max_abs_diff,
-            })
+    from app.modules.utility.services.debt_integrity import integrity_report
 
-    # 3: reading'и, которых нет в expected (zombie)
-    known = set(expected.keys())
-    user_ids_for_rooms = set()
-    for r in readings:
-        if r.user_id is None:
-            continue
-        if r.user_id in known:
-            continue
-        has_money = (
-            float(r.debt_209 or 0) > THR or float(r.debt_205 or 0) > THR
-            or float(r.overpayment_209 or 0) > THR or float(r.overpayment_205 or 0) > THR
-        )
-        if not has_money:
-            continue
-        user_ids_for_rooms.add(r.user_id)
-
-    # Загружаем username/комнаты для zombie batch'ем
-    extra_users_map = {}
-    extra_rooms_map = {}
-    if user_ids_for_rooms:
-        u_rows = (await db.execute(
-            select(User).where(User.id.in_(user_ids_for_rooms))
-        )).scalars().all()
-        extra_users_map = {u.id: u for u in u_rows}
-        rids = {r.room_id for r in readings if r.user_id in user_ids_for_rooms and r.room_id}
-        if rids:
-            r_rows = (await db.execute(
-                select(Room).where(Room.id.in_(rids))
-            )).scalars().all()
-            extra_rooms_map = {rm.id: rm for rm in r_rows}
-
-    for r in readings:
-        if r.user_id is None or r.user_id in known:
-            continue
-        has_money = (
-            float(r.debt_209 or 0) > THR or float(r.debt_205 or 0) > THR
-            or float(r.overpayment_209 or 0) > THR or float(r.overpayment_205 or 0) > THR
-        )
-        if not has_money:
-            continue
-        u = extra_users_map.get(r.user_id)
-        rm = extra_rooms_map.get(r.room_id) if r.room_id else None
-        extra_in_db.append({
-            "user_id": r.user_id,
-            "reading_id": r.id,
-            "username": u.username if u else None,
-            "room_label": (rm.format_address if rm else None),
-            "actual": {
-                "debt_209": float(r.debt_209 or 0),
-                "overpayment_209": float(r.overpayment_209 or 0),
-                "debt_205": float(r.debt_205 or 0),
-                "overpayment_205": float(r.overpayment_205 or 0),
-            },
-        })
-
-    drift.sort(key=lambda x: -x["max_abs_diff"])
-    extra_in_db.sort(
-        key=lambda x: -(
-            x["actual"]["debt_209"] + x["actual"]["debt_205"]
-            + x["actual"]["overpayment_209"] + x["actual"]["overpayment_205"]
-        )
-    )
-
-    return {
-        "period_id": period_id,
-        "threshold_rub": THR,
-        "latest_209_log_id": log_209.id if log_209 else None,
-        "latest_205_log_id": log_205.id if log_205 else None,
-        "summary": {
-            "drift_count": len(drift),
-            "missing_in_db_count": len(missing_in_db),
-            "extra_in_db_count": len(extra_in_db),
-            "expected_users": len(expected),
-            "actual_readings": len(readings_by_user),
-        },
-        "drift": drift[:200],
-        "missing_in_db": missing_in_db[:200],
-        "extra_in_db": extra_in_db[:200],
-    }
+    return await integrity_report(db, period_id)
 
 
 @router.post(
@@ -796,6 +565,10 @@ async def debts_integrity_fix(
       - **all**: drift + missing вместе.
       - **user**: фикс только для конкретного user_id (точечно).
 
+    drift — один UPDATE ... FROM по тем же CTE, что и integrity-check;
+    missing — один multi-row INSERT. Без повторного прогона диагностики
+    и без лимита в 200 строк.
+
     Extra/Zombie фиксится отдельным endpoint'ом /debts/cleanup-zombie-readings —
     у них нет «ожидаемого значения», только зануление.
 
@@ -803,86 +576,21 @@ async def debts_integrity_fix(
     """
     _require_finance(current_user)
 
-    # Реюзаем диагностику чтобы не дублировать логику расчёта расхождений.
-    data = await debts_integrity_check(current_user=current_user, db=db)
-
-    active_period = (await db.execute(
-        select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
-    )).scalars().first()
-    if not active_period:
-        raise HTTPException(404, "Нет активного периода")
+    if category == "user" and not user_id:
+        raise HTTPException(400, "category=user требует user_id")
+    period_id = await _active_period_id(db)
 
-    from sqlalchemy import update as _sa_update
+    from app.modules.utility.services.debt_integrity import fix_drift, fix_missing
 
+    only_user = user_id if category == "user" else None
     fixed_drift = 0
     fixed_missing = 0
     errors = []
 
-    drift_items = data.get("drift", [])
-    missing_items = data.get("missing_in_db", [])
-
-    # Фильтр по user_id если category=user
-    if category == "user":
-        if not user_id:
-            raise HTTPException(400, "category=user требует user_id")
-        drift_items = [d for d in drift_items if d.get("user_id") == user_id]
-        missing_items = [m for m in missing_items if m.get("user_id") == user_id]
-
-    # 1) drift — UPDATE существующих reading'ов
     if category in ("all", "drift", "user"):
-        for item in drift_items:
-            try:
-                res = await db.execute(
-                    _sa_update(MeterReading)
-                    .where(MeterReading.id == item["reading_id"])
-                    .values(
-                        debt_209=Decimal(str(item["expected"]["debt_209"])),
-                        overpayment_209=Decimal(str(item["expected"]["overpayment_209"])),
-                        debt_205=Decimal(str(item["expected"]["debt_205"])),
-                        overpayment_205=Decimal(str(item["expected"]["overpayment_205"])),
-                    )
-                )
-                if res.rowcount:
-                    fixed_drift += 1
-            except Exception as e:
-                errors.append({
-                    "kind": "drift",
-                    "user_id": item.get("user_id"),
-                    "error": str(e)[:200],
-                })
-
-    # 2) missing — INSERT недостающих reading'ов из applied_state
+        fixed_drift = await fix_drift(db, period_id, only_user)
     if category in ("all", "missing", "user"):
-        for item in missing_items:
-            try:
-                user = await db.get(User, item["user_id"])
-                if not user:
-                    errors.append({
-                        "kind": "missing",
-                        "user_id": item.get("user_id"),
-                        "error": "user не найден в БД",
-                    })
-                    continue
-                new_reading = MeterReading(
-                    user_id=item["user_id"],
-                    room_id=user.room_id,
-                    period_id=active_period.id,
-                    is_approved=False,
-                    debt_209=Decimal(str(item["expected"]["debt_209"])),
-                    overpayment_209=Decimal(str(item["expected"]["overpayment_209"])),
-                    debt_205=Decimal(str(item["expected"]["debt_205"])),
-                    overpayment_205=Decimal(str(item["expected"]["overpayment_205"])),
-                    obor_debit_209=Decimal("0"), obor_credit_209=Decimal("0"),
-                    obor_debit_205=Decimal("0"), obor_credit_205=Decimal("0"),
-                )
-                db.add(new_reading)
-                fixed_missing += 1
-            except Exception as e:
-                errors.append({
-                    "kind": "missing",
-                    "user_id": item.get("user_id"),
-                    "error": str(e)[:200],
-                })
+        fixed_missing, errors = await fix_missing(db, period_id, only_user)
 
     await db.commit()
     logger.info(
@@ -914,41 +622,20 @@ async def debts_zombie_readings(
     reading комнаты — после Bug AG они становятся «висяком» на чужом юзере.
 
     Логика: смотрим последние completed-импорты 209 и 205, собираем все
-    user_id из их applied_state. Все reading'и активного периода с
-    долгом/переплатой, чей user_id НЕ упомянут ни в одном из этих логов —
-    кандидаты на zombie.
+    user_id из их applied_state (строки debt_snapshots). Все reading'и
+    активного периода с долгом/переплатой, чей user_id НЕ упомянут ни в
+    одном из этих логов — кандидаты на zombie (anti-join в SQL).
 
     Read-only. POST /debts/cleanup-zombie-readings занулит их (с
     подтверждением).
     """
     _require_finance(current_user)
+    period_id = await _active_period_id(db)
 
-    active_period = (await db.execute(
-        select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
-    )).scalars().first()
-    if not active_period:
-        raise HTTPException(404, "Нет активного периода")
-    period_id = active_period.id
+    from app.modules.utility.services.debt_integrity import latest_logs, zombie_readings
 
-    async def _latest_applied(acct: str):
-        log = (await db.execute(
-            select(DebtImportLog)
-            .where(
-                DebtImportLog.account_type == acct,
-                DebtImportLog.status == "completed",
-                DebtImportLog.applied_state.is_not(None),
-            )
-            .order_by(DebtImportLog.id.desc()).limit(1)
-        )).scalars().first()
-        return log
-
-    log_209 = await _latest_applied("209")
-    log_205 = await _latest_applied("205")
-    state_209 = (log_209.applied_state or {}) if log_209 else {}
-    state_205 = (log_205.applied_state or {}) if log_205 else {}
-    known_user_ids = set(state_209.keys()) | set(state_205.keys())
-
-    if not known_user_ids:
+    latest = await latest_logs(db)
+    if not latest["known_users"]:
         return {
             "period_id": period_id,
             "count": 0,
@@ -956,67 +643,11 @@ async def debts_zombie_readings(
             "note": "Нет свежих импортов с applied_state — нечего сравнивать.",
         }
 
-    readings = (await db.execute(
-        select(MeterReading)
-        .where(
-            MeterReading.period_id == period_id,
-            or_(
-                MeterReading.debt_209 > 0,
-                MeterReading.debt_205 > 0,
-                MeterReading.overpayment_209 > 0,
-                MeterReading.overpayment_205 > 0,
-            ),
-        )
-    )).scalars().all()
-
-    user_ids_in_db = {r.user_id for r in readings if r.user_id}
-    if not user_ids_in_db:
-        return {"period_id": period_id, "count": 0, "zombies": []}
-
-    users = (await db.execute(
-        select(User).where(User.id.in_(user_ids_in_db))
-    )).scalars().all()
-    users_map = {u.id: u for u in users}
-
-    room_ids = {r.room_id for r in readings if r.room_id}
-    rooms_map = {}
-    if room_ids:
-        rooms = (await db.execute(
-            select(Room).where(Room.id.in_(room_ids))
-        )).scalars().all()
-        rooms_map = {r.id: r for r in rooms}
-
-    zombies = []
-    for r in readings:
-        if not r.user_id:
-            continue
-        if str(r.user_id) in known_user_ids:
-            continue  # есть в свежем импорте — не зомби
-        user = users_map.get(r.user_id)
-        room = rooms_map.get(r.room_id) if r.room_id else None
-        zombies.append({
-            "reading_id": r.id,
-            "user_id": r.user_id,
-            "username": user.username if user else None,
-            "room_id": r.room_id,
-            "room_label": (
-                room.format_address if room else None
-            ),
-            "debt_209": float(r.debt_209 or 0),
-            "overpayment_209": float(r.overpayment_209 or 0),
-            "debt_205": float(r.debt_205 or 0),
-            "overpayment_205": float(r.overpayment_205 or 0),
-            "total_to_clean": (
-                float(r.debt_209 or 0) + float(r.debt_205 or 0)
-                + float(r.overpayment_209 or 0) + float(r.overpayment_205 or 0)
-            ),
-        })
-
-    zombies.sort(key=lambda x: -x["total_to_clean"])
+    zombies = await zombie_readings(db, period_id)
     return {
         "period_id": period_id,
-        "latest_209_log_id": log_209.id if log_209 else None,
-        "latest_205_log_id": log_205.id if log_205 else None,
+        "latest_209_log_id": latest["log_209"],
+        "latest_205_log_id": latest["log_205"],
         "count": len(zombies),
         "zombies": zombies,
     }
@@ -1036,33 +667,21 @@ async def debts_cleanup_zombie_readings(
 
     Reading'и НЕ удаляются (audit/история сохраняется) — только зануляются
     финансовые поля. После этого дашборд показывает 0₽ у соответствующих
-    жильцов.
+    жильцов. Одним UPDATE ... WHERE id IN (zombie-CTE).
 
     Требует ?confirm=YES.
     """
     _require_finance(current_user)
 
-    # Реюзаем логику /debts/zombie-readings — чтобы не дублировать.
+    # Реюзаем /debts/zombie-readings — для ответа и проверки «есть с чем сравнивать».
     result = await debts_zombie_readings(current_user=current_user, db=db)
     zombies = result.get("zombies", [])
     if not zombies:
         return {"status": "ok", "cleaned": 0, "note": "Zombie-reading'ов нет"}
 
-    reading_ids = [z["reading_id"] for z in zombies]
-    from sqlalchemy import update as _sa_update
-    total = 0
-    for rid in reading_ids:
-        res = await db.execute(
-            _sa_update(MeterReading)
-            .where(MeterReading.id == rid)
-            .values(
-                debt_209=Decimal("0.00"),
-                overpayment_209=Decimal("0.00"),
-                debt_205=Decimal("0.00"),
-                overpayment_205=Decimal("0.00"),
-            )
-        )
-        total += res.rowcount or 0
+    from app.modules.utility.services.debt_integrity import clean_zombies
+
+    total = await clean_zombies(db, result["period_id"])
 
     await db.commit()
     logger.info(
@@ -1072,7 +691,7 @@ async def debts_cleanup_zombie_readings(
     return {
         "status": "ok",
         "cleaned": total,
-        "requested": len(reading_ids),
+        "requested": len(zombies),
         "zombies": zombies[:50],
     }
 
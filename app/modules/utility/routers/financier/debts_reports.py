@@ -2,15 +2,14 @@
 # Механически выделено из монолитного routers/financier.py (распил на
 # пакет financier/): код перенесён дословно, поведение/пути/тексты 1:1.
 
-import io
 from app.core.time_utils import utcnow
 from typing import Optional
 from fastapi import Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, or_, desc, asc
 from app.core.database import get_db
+from app.core.xlsx_stream import XlsxStream
 from app.modules.utility.models import User, MeterReading, BillingPeriod, Room, DebtImportLog
 from app.core.dependencies import get_current_user
 from app.modules.utility.schemas import PaginatedResponse, UserDebtResponse
@@ -614,9 +613,6 @@ async def debts_export(
     """
     _require_finance(current_user)
 
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
-
     active_period = (await db.execute(
         select(BillingPeriod).where(BillingPeriod.is_active.is_(True))
     )).scalars().first()
@@ -655,49 +651,33 @@ async def debts_export(
     stmt = stmt.order_by(Room.dormitory_name.asc().nulls_last(),
                          Room.room_number.asc().nulls_last(),
                          User.username.asc())
-    rows = (await db.execute(stmt)).all()
+    book = XlsxStream()
+    ws = book.sheet(
+        "Долги 1С",
+        headers=["ID", "ФИО", "Общежитие", "Комната", "Долг 209", "Перепл. 209",
+                 "Долг 205", "Перепл. 205", "Итого начислено"],
+        widths=[6, 30, 22, 10, 12, 12, 12, 12, 14],
+        header_fill="E9D5FF",
+    )
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Долги 1С"
-    headers = ["ID", "ФИО", "Общежитие", "Комната", "Долг 209", "Перепл. 209",
-               "Долг 205", "Перепл. 205", "Итого начислено"]
-    for i, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=i, value=h)
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="E9D5FF")
-    for i, r in enumerate(rows, 2):
+    def _row(r):
         u, room = r[0], r[1]
-        ws.cell(row=i, column=1, value=u.id)
-        ws.cell(row=i, column=2, value=u.username)
         # housing_001/E2-A: для дома колонка "Общежитие" заполняется
         # улицей+номером дома, "Комната" — номером квартиры. Для общаги
         # сохраняем старое поведение (dormitory_name + room_number).
         if room and room.place_type == "house":
-            _addr = ", ".join(filter(None, [
+            addr = ", ".join(filter(None, [
                 f"ул. {room.street}" if room.street else None,
                 f"д. {room.house_number}" if room.house_number else None,
             ])) or ""
-            ws.cell(row=i, column=3, value=_addr)
-            ws.cell(row=i, column=4, value=(f"кв. {room.apartment_number}" if room.apartment_number else ""))
+            unit = f"кв. {room.apartment_number}" if room.apartment_number else ""
         else:
-            ws.cell(row=i, column=3, value=(room.dormitory_name if room else ""))
-            ws.cell(row=i, column=4, value=(room.room_number if room else ""))
-        ws.cell(row=i, column=5, value=float(r[2] or 0))
-        ws.cell(row=i, column=6, value=float(r[3] or 0))
-        ws.cell(row=i, column=7, value=float(r[4] or 0))
-        ws.cell(row=i, column=8, value=float(r[5] or 0))
-        ws.cell(row=i, column=9, value=float(r[6] or 0))
-    for col, w in [("A", 6), ("B", 30), ("C", 22), ("D", 10),
-                   ("E", 12), ("F", 12), ("G", 12), ("H", 12), ("I", 14)]:
-        ws.column_dimensions[col].width = w
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    fname = f"debts_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{fname}"'},
-    )
+            addr = room.dormitory_name if room else ""
+            unit = room.room_number if room else ""
+        return [
+            u.id, u.username, addr, unit,
+            float(r[2] or 0), float(r[3] or 0), float(r[4] or 0), float(r[5] or 0), float(r[6] or 0),
+        ]
+
+    await ws.extend_from_db(db, stmt, _row)
+    return await book.response(f"debts_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx")
@@ -14,6 +14,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+from datetime import date
 from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, Header, HTTPException
@@ -24,6 +25,7 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_password_hash, verify_password
+from app.core.data_versions import read_versions
 from app.core.database import get_db
 from app.modules.utility.models import (
     BillingPeriod, MeterReading, SupportTicket, User,
@@ -31,12 +33,13 @@ from app.modules.utility.models import (
 from app.modules.utility.schemas import ReadingSchema
 from app.modules.utility.routers.client_readings import (
     perform_reading_submission, _is_submission_day_open,
-    _build_receipt_context,
+    _build_receipt_context, submission_window_open,
 )
 # generate_receipt_pdf — напрямую из сервиса, а НЕ ре-экспортом через
 # client_readings: после вычистки резидентских ручек он там стал
 # неиспользуемым и ruff --fix его удаляет → ре-экспорт ломался (ImportError).
 from app.modules.utility.services.pdf_generator import generate_receipt_pdf
+from app.modules.utility.services import qr_portal_cache
 from app.modules.utility.services.qr_portal import (
     QR_TICKET_SUBJECT, resolve_room_by_token, pick_representative_user_id,
 )
@@ -61,10 +64,14 @@ async def _require_password(room, x_qr_key: str | None) -> None:
     Нет/неверный ключ → 401 password_required (фронт спросит пароль).
     Брутфорс упирается в nginx-rate-limit /api/q/ (8r/s) + медленный argon2.
     """
-    if not room.qr_password_hash:
+    await _require_password_hash(room.qr_password_hash, x_qr_key)
+
+
+async def _require_password_hash(password_hash: str | None, x_qr_key: str | None) -> None:
+    if not password_hash:
         raise HTTPException(status_code=403, detail="password_setup_required")
     ok = bool(x_qr_key) and await asyncio.to_thread(
-        verify_password, x_qr_key, room.qr_password_hash
+        verify_password, x_qr_key, password_hash
     )
     if not ok:
         raise HTTPException(status_code=401, detail="password_required")
@@ -92,13 +99,52 @@ async def portal_state(
     Пароль не установлен → отдаём ТОЛЬКО флаг установки (фронт покажет
     модалку «придумайте пароль»). Кто первый зашёл — тот и установил:
     для анонимного портала это неустранимо, но жилец сразу заметит
-    (его попросят чужой пароль) и админ сбросит. Дальше — обычный гейт."""
-    room = await _resolve_or_404(db, token)
-    if not room.qr_password_hash:
-        return {"password_setup_required": True}
-    await _require_password(room, x_qr_key)
+    (его попросят чужой пароль) и админ сбросит. Дальше — обычный гейт.
+
+    Состояние кешируется по токену (services/qr_portal_cache): повторные
+    открытия портала — попадание в Redis без запросов в БД."""
+    entry = await qr_portal_cache.load_entry(token) if token and len(token) >= 16 else None
+    if entry is None:
+        room = await _resolve_or_404(db, token)
+        if not room.qr_password_hash:
+            return {"password_setup_required": True}
+        # Пароль — ДО тяжёлого расчёта: перебор не должен нагружать БД.
+        await _require_password(room, x_qr_key)
+        entry = await _build_state_entry(db, room)
+        if entry["versions"] is not None:
+            await qr_portal_cache.store_entry(token, entry)
+    else:
+        if not entry["pw"]:
+            return {"password_setup_required": True}
+        await _require_password_hash(entry["pw"], x_qr_key)
+
+    # Окно подачи зависит от СЕГОДНЯШНЕЙ даты — не кешируем, считаем на лету.
+    start_day, end_day = entry["window"]["start"], entry["window"]["end"]
+    today_day = date.today().day
+    return {
+        **entry["state"],
+        "window_open": submission_window_open(start_day, end_day, today_day),
+        "window": {"start": start_day, "end": end_day, "today": today_day},
+    }
+
+
+async def _build_state_entry(db: AsyncSession, room) -> dict:
+    """Состояние портала из БД + версии зависимостей для кеша.
+
+    Версии читаются ДО соответствующих данных: commit между ними сдвинет
+    версию, и store_entry такую запись не сохранит."""
+    room_deps = qr_portal_cache.room_dependencies(room.id)
+    room_versions = await read_versions(room_deps)
+
     period = await _active_period(db)
     rep_id = await pick_representative_user_id(db, room.id, period.id if period else None)
+    room_residents = (await db.execute(
+        select(User.id).where(
+            User.role == "user", User.is_deleted.is_(False), User.room_id == room.id,
+        )
+    )).scalars().all()
+    user_deps = qr_portal_cache.user_dependencies([*room_residents, *([rep_id] if rep_id else [])])
+    user_versions = await read_versions(user_deps)
 
     # Нужно ли вообще подавать счётчики (дом / койко-место / тариф без счётчиков)?
     metered = not _is_house(room)
@@ -137,7 +183,7 @@ async def portal_state(
     if metered and not any(meters.values()):
         metered = False
 
-    day_open, today_day, start_day, end_day = await _is_submission_day_open(db)
+    _day_open, _today_day, start_day, end_day = await _is_submission_day_open(db)
 
     # Текущий черновик периода (для предзаполнения формы «исправить») и
     # утверждённое показание (квитанция готова, форма заблокирована).
@@ -167,36 +213,42 @@ async def portal_state(
             "electricity": str(src.electricity) if src.electricity is not None else "",
         }
 
-    # Все утверждённые показания комнаты (свежие первыми). Из них:
+    # Утверждённые показания комнаты (свежие первыми) — окно HISTORY_WINDOW:
+    # странице нужно последнее реальное и нормативы после него, а не вся
+    # история квартиры. Из них:
     #  - latest_approved → доступность квитанции;
     #  - last_actual → последнее РЕАЛЬНО ПОДАННОЕ жильцом (is_meaningful_prev:
     #    не норматив/авто) — то, с чем сверяется монотонность (#2);
     #  - norm_since → периоды ПОСЛЕ него, где начислено по нормативу (пропуски).
     from app.modules.utility.services.reading_calculator import is_meaningful_prev
     approved_all = (await db.execute(
-        select(MeterReading).options(selectinload(MeterReading.period))
+        select(MeterReading, BillingPeriod.name)
+        .outerjoin(BillingPeriod, BillingPeriod.id == MeterReading.period_id)
         .where(MeterReading.room_id == room.id, MeterReading.is_approved.is_(True))
         .order_by(MeterReading.period_id.desc(), MeterReading.created_at.desc())
-    )).scalars().all()
-    latest_approved = approved_all[0] if approved_all else None
+        .limit(qr_portal_cache.HISTORY_WINDOW)
+    )).all()
+    latest_approved, latest_period_name = approved_all[0] if approved_all else (None, None)
 
-    last_actual_obj = next((r for r in approved_all if is_meaningful_prev(r)), None)
+    last_actual_obj, last_actual_period = next(
+        ((r, nm) for r, nm in approved_all if is_meaningful_prev(r)), (None, None)
+    )
     last_actual = None
     if last_actual_obj and metered:
         last_actual = {
-            "period": last_actual_obj.period.name if last_actual_obj.period else None,
+            "period": last_actual_period,
             "hot_water": str(last_actual_obj.hot_water) if last_actual_obj.hot_water is not None else "—",
             "cold_water": str(last_actual_obj.cold_water) if last_actual_obj.cold_water is not None else "—",
             "electricity": str(last_actual_obj.electricity) if last_actual_obj.electricity is not None else "—",
         }
     norm_since = []
     if last_actual_obj:
-        for r in approved_all:
+        for r, period_name in approved_all:
             if (r.period_id and last_actual_obj.period_id
                     and r.period_id > last_actual_obj.period_id
                     and not is_meaningful_prev(r)):
                 norm_since.append({
-                    "period": r.period.name if r.period else None,
+                    "period": period_name,
                     "amount": round(float(r.total_cost or 0), 2),
                 })
 
@@ -205,11 +257,6 @@ async def portal_state(
     # ручной кнопкой «Выгрузить». Сумма по всем жильцам комнаты (balance_209/205 —
     # нетто на счёт: >0 долг, <0 переплата; есть во всех формах баланса).
     from app.modules.utility.routers.admin_reports import _compute_user_balance
-    room_residents = (await db.execute(
-        select(User.id).where(
-            User.role == "user", User.is_deleted.is_(False), User.room_id == room.id,
-        )
-    )).scalars().all()
     net = 0.0
     for ruid in room_residents:
         b = await _compute_user_balance(db, ruid)
@@ -221,24 +268,34 @@ async def portal_state(
         "overpayment": -net if net < -0.005 else 0.0,
     }
 
-    return {
+    state = {
         "period": period.name if period else None,
         "has_period": bool(period),
         "balance": balance,          # долг/переплата по квартире (опубликованное 1С)
         "metered": metered,
         "meters": meters,            # какие счётчики спрашивать (hot/cold/el)
         "no_residents": rep_id is None,
-        "window_open": day_open,
-        "window": {"start": start_day, "end": end_day, "today": today_day},
         "submitted": bool(draft or approved),
         "approved": bool(approved),         # утверждено → правка закрыта, квитанция готова
         "editable": bool(draft) and not bool(approved),
         "current": cur,
         "receipt_available": bool(latest_approved),
-        "receipt_period": latest_approved.period.name if (latest_approved and latest_approved.period) else None,
+        "receipt_period": latest_period_name if latest_approved else None,
         "last_actual": last_actual,   # последние ВАШИ показания (не норматив)
         "norm_since": norm_since,     # периоды по нормативу после них (пропуски)
     }
+    versions = (
+        room_versions + user_versions
+        if room_versions is not None and user_versions is not None else None
+    )
+    return {
+        "room_id": room.id,
+        "pw": room.qr_password_hash,
+        "window": {"start": start_day, "end": end_day},
+        "deps": room_deps + user_deps,
+        "versions": versions,
+        "state": state,
+    }
 
 
 class PasswordBody(BaseModel):
@@ -376,6 +433,8 @@ async def portal_contact(
     db.add(ticket)
     await db.commit()
     logger.info("[QR-PORTAL] обращение room=%s rep_user=%s", room.id, rep_id)
+    from app.modules.utility.services.admin_events import mark_notifications_dirty
+    await mark_notifications_dirty()
     return {"status": "ok"}
 
 
@@ -7,8 +7,10 @@ from sqlalchemy.future import select
 from sqlalchemy import func, or_, update, and_
 from typing import Optional, List
 
+from app.core.data_versions import conditional_get
 from app.core.database import get_db
 from app.core.time_utils import utcnow
+from app.core.xlsx_stream import XlsxStream
 from app.modules.utility.models import Room, User, MeterReading, BillingPeriod, Tariff
 from app.modules.utility.schemas import RoomCreate, RoomUpdate, RoomResponse, PaginatedResponse, ReplaceMeterSchema, RoomMeterConfigBulk
 from app.core.dependencies import get_current_user, RoleChecker
@@ -20,7 +22,8 @@ allow_management = RoleChecker(["accountant", "admin", "financier"])
 ZERO = Decimal("0.00")
 
 
-@router.get("/analyze", summary="Мощный анализатор Жилфонда", dependencies=[Depends(allow_management)])
+@router.get("/analyze", summary="Мощный анализатор Жилфонда",
+            dependencies=[Depends(allow_management), Depends(conditional_get("rooms", "users"))])
 async def analyze_housing(db: AsyncSession = Depends(get_db)):
     """
     Сканирует весь жилфонд и пользователей на наличие аномалий:
@@ -174,7 +177,8 @@ async def get_buildings(db: AsyncSession = Depends(get_db)):
     return out
 
 
-@router.get("", response_model=PaginatedResponse[RoomResponse], dependencies=[Depends(allow_management)])
+@router.get("", response_model=PaginatedResponse[RoomResponse],
+            dependencies=[Depends(allow_management), Depends(conditional_get("rooms", "users"))])
 async def get_rooms(
         page: int = Query(1, ge=1),
         limit: int = Query(50, ge=1, le=1000),
@@ -438,12 +442,8 @@ async def export_rooms(
     missing_meter: Optional[bool] = Query(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Excel-выгрузка всех отфильтрованных комнат + количество жильцов."""
-    import io
-    from fastapi.responses import StreamingResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
-
+    """Excel-выгрузка всех отфильтрованных комнат + количество жильцов.
+    Стримится из БД в write-only книгу (app.core.xlsx_stream)."""
     # Собираем тот же запрос что и для списка — но без пагинации
     residents_subq = (
         select(
@@ -494,20 +494,19 @@ async def export_rooms(
         )
     q = q.order_by(Room.dormitory_name, Room.room_number)
 
-    rows = (await db.execute(q)).all()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Жилфонд"
-    headers = [
-        "ID", "Общежитие", "Комната", "Площадь м²", "Мест", "Жильцов",
-        "Заполненность", "Тариф", "№ ГВС", "№ ХВС", "№ Электр.",
-    ]
-    for i, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=i, value=h)
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="DBEAFE")
-    for i, (room, residents, tariff_name) in enumerate(rows, 2):
+    book = XlsxStream()
+    ws = book.sheet(
+        "Жилфонд",
+        headers=[
+            "ID", "Общежитие", "Комната", "Площадь м²", "Мест", "Жильцов",
+            "Заполненность", "Тариф", "№ ГВС", "№ ХВС", "№ Электр.",
+        ],
+        widths=[6, 28, 10, 10, 6, 8, 14, 22, 14, 14, 14],
+        header_fill="DBEAFE",
+    )
+
+    def _row(row):
+        room, residents, tariff_name = row
         cap = int(room.total_room_residents or 1)
         r = int(residents or 0)
         status = (
@@ -516,31 +515,14 @@ async def export_rooms(
             else "Частичная" if r > 0
             else "Пустая"
         )
-        ws.cell(row=i, column=1, value=room.id)
-        ws.cell(row=i, column=2, value=room.dormitory_name)
-        ws.cell(row=i, column=3, value=room.room_number)
-        ws.cell(row=i, column=4, value=float(room.apartment_area or 0))
-        ws.cell(row=i, column=5, value=cap)
-        ws.cell(row=i, column=6, value=r)
-        ws.cell(row=i, column=7, value=status)
-        ws.cell(row=i, column=8, value=tariff_name or "")
-        ws.cell(row=i, column=9, value=room.hw_meter_serial or "")
-        ws.cell(row=i, column=10, value=room.cw_meter_serial or "")
-        ws.cell(row=i, column=11, value=room.el_meter_serial or "")
-
-    for col, w in [("A", 6), ("B", 28), ("C", 10), ("D", 10), ("E", 6),
-                   ("F", 8), ("G", 14), ("H", 22), ("I", 14), ("J", 14), ("K", 14)]:
-        ws.column_dimensions[col].width = w
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    fname = f"housing_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{fname}"'},
-    )
+        return [
+            room.id, room.dormitory_name, room.room_number,
+            float(room.apartment_area or 0), cap, r, status, tariff_name or "",
+            room.hw_meter_serial or "", room.cw_meter_serial or "", room.el_meter_serial or "",
+        ]
+
+    await ws.extend_from_db(db, q, _row)
+    return await book.response(f"housing_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx")
 
 
 @router.post("", response_model=RoomResponse, dependencies=[Depends(allow_management)])
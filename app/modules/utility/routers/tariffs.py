@@ -16,12 +16,14 @@ from fastapi_cache import FastAPICache
 from app.core.database import get_db
 from app.modules.utility.models import User, Tariff, Room
 from app.modules.utility.schemas import TariffSchema
+from app.core.data_versions import conditional_get
 from app.core.dependencies import get_current_user, RoleChecker
 
 # ИМПОРТ ДЛЯ ЖУРНАЛА ДЕЙСТВИЙ
 from app.modules.utility.routers.admin_dashboard import write_audit_log
 from app.modules.utility.services.tariff_cache import tariff_cache
 from app.modules.utility.services.calculations import calculate_utilities
+from app.modules.utility.services.tariff_simulator import build_draft_tariff
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +65,7 @@ async def get_tariffs(
             ),
         ),
         current_user: User = Depends(get_current_user),
+        _etag: None = Depends(conditional_get("tariffs")),
         db: AsyncSession = Depends(get_db)
 ):
     """Получить список всех активных тарифов, отсортированных по ID.
@@ -415,76 +418,10 @@ async def preview_calculation(
     """
     # Получаем тариф: либо из формы, либо из БД
     if data.tariff_data:
-        # Пробуем сконвертить в pydantic schema, чтобы не пропустить мусор
-        # Все Decimal-поля защищены: пустые строки / None заменяем на 0.
-        cleaned = {}
-        for k, v in data.tariff_data.items():
-            if v is None or v == "":
-                cleaned[k] = Decimal("0")
-            else:
-                try:
-                    cleaned[k] = Decimal(str(v).replace(",", "."))
-                except Exception:
-                    cleaned[k] = Decimal("0")
-        # Создаём временный объект Tariff для расчёта (без сохранения).
-        # Bug AP: важно передать сезонные поля hw_heating_active /
-        # heating_active. У колонок server_default="true", но он действует
-        # только при INSERT в БД. У in-memory объекта без явного значения
-        # атрибут останется None, и is_hw_heating_active_now() вернёт False
-        # (None → not None → True → return False). Тогда water_heating
-        # обнуляется в calculate_utilities и калькулятор показывает ГВС
-        # как «холодную» (3 × water_supply вместо 3 × (supply + heating)).
-        def _bool_field(key, default=True):
-            v = data.tariff_data.get(key)
-            if v is None:
-                return default
-            return bool(v) if isinstance(v, bool) else str(v).lower() not in ("false", "0", "")
-
-        def _date_field(key):
-            v = data.tariff_data.get(key)
-            if not v:
-                return None
-            from datetime import date as _date, datetime as _dt
-            if isinstance(v, _date):
-                return v
-            try:
-                return _dt.fromisoformat(str(v).split("T")[0]).date()
-            except Exception:
-                return None
-
-        tariff = Tariff(
-            name="__preview__",
-            maintenance_repair=cleaned.get("maintenance_repair", Decimal("0")),
-            social_rent=cleaned.get("social_rent", Decimal("0")),
-            heating=cleaned.get("heating", Decimal("0")),
-            water_heating=cleaned.get("water_heating", Decimal("0")),
-            water_supply=cleaned.get("water_supply", Decimal("0")),
-            sewage=cleaned.get("sewage", Decimal("0")),
-            waste_disposal=cleaned.get("waste_disposal", Decimal("0")),
-            electricity_rate=cleaned.get("electricity_rate", Decimal("0")),
-            per_capita_amount=cleaned.get("per_capita_amount", Decimal("0")),
-            # Bug AP: сезонные флаги — без них калькулятор «убивал» ГВС-подогрев.
-            heating_active=_bool_field("heating_active", True),
-            heating_season_start=_date_field("heating_season_start"),
-            heating_season_end=_date_field("heating_season_end"),
-            hw_heating_active=_bool_field("hw_heating_active", True),
-            hw_heating_season_start=_date_field("hw_heating_season_start"),
-            hw_heating_season_end=_date_field("hw_heating_season_end"),
-            # Bug AT: charge_* — что начисляет тариф. Default True.
-            charge_hot_water=_bool_field("charge_hot_water", True),
-            charge_cold_water=_bool_field("charge_cold_water", True),
-            charge_sewage=_bool_field("charge_sewage", True),
-            charge_electricity=_bool_field("charge_electricity", True),
-            charge_maintenance=_bool_field("charge_maintenance", True),
-            charge_social_rent=_bool_field("charge_social_rent", True),
-            charge_heating=_bool_field("charge_heating", True),
-            charge_waste=_bool_field("charge_waste", True),
-            # Bug AS: singles_skip_* для холостяцких квартир. Default False.
-            singles_skip_maintenance=_bool_field("singles_skip_maintenance", False),
-            singles_skip_social_rent=_bool_field("singles_skip_social_rent", False),
-            singles_skip_heating=_bool_field("singles_skip_heating", False),
-            singles_skip_waste=_bool_field("singles_skip_waste", False),
-        )
+        # Временный объект Tariff для расчёта (без сохранения). Пустые/битые
+        # ставки → 0; сезонные флаги задаются явно (Bug AP), charge_* (Bug AT)
+        # и singles_skip_* (Bug AS) — со значениями по умолчанию.
+        tariff = build_draft_tariff(data.tariff_data)
     elif data.tariff_id:
         tariff = await db.get(Tariff, data.tariff_id)
         if not tariff:
@@ -561,6 +498,83 @@ async def preview_calculation(
     }
 
 
+# =====================================================
+# SIMULATE — черновик тарифа × реальные объёмы жилфонда
+# =====================================================
+class SimulateRequest(BaseModel):
+    """Черновик = base_tariff_id (если задан) + правки tariff_data.
+
+    Кого касается черновик: здание (dormitory_name или street+house_number,
+    как в assign-to-dormitory), иначе помещения на base_tariff_id, иначе
+    весь жилфонд."""
+    tariff_data: dict = Field(default_factory=dict)
+    base_tariff_id: Optional[int] = None
+    period_id: Optional[int] = None  # None = последний период с утверждёнными
+
+    dormitory_name: Optional[str] = None
+    street: Optional[str] = None
+    house_number: Optional[str] = None
+
+    limit: int = Field(default=200, ge=1, le=5000)  # жильцов в ответе
+
+
+@router.post("/simulate", summary="Эффект черновика тарифа на весь жилфонд")
+async def simulate_tariff(
+    data: SimulateRequest,
+    current_user: User = Depends(allow_management_roles),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Не пишет в БД ничего. Применяет черновик к утверждённым показаниям
+    периода (реальные объёмы каждого жильца) и сравнивает с текущими
+    тарифами: итог, дельты по зданиям и по жильцам (по убыванию |дельты|,
+    первые `limit`). Результат кешируется по хешу черновика — повторный
+    прогон того же черновика отдаётся из Redis, пока не изменились
+    показания периода, комнаты, жильцы, тарифы или сезонные настройки.
+    """
+    from app.modules.utility.services import tariff_simulator
+    from app.modules.utility.services.billing import _building_key
+
+    base = None
+    if data.base_tariff_id is not None:
+        base = await db.get(Tariff, data.base_tariff_id)
+        if not base:
+            raise HTTPException(404, "Тариф не найден")
+    if not data.tariff_data and base is None:
+        raise HTTPException(400, "Передайте tariff_data и/или base_tariff_id")
+
+    if data.dormitory_name:
+        building = _building_key(type("R", (), {
+            "place_type": "dormitory", "dormitory_name": data.dormitory_name,
+        })())
+    elif data.street and data.house_number:
+        building = _building_key(type("R", (), {
+            "place_type": "house", "street": data.street, "house_number": data.house_number,
+        })())
+    elif data.street or data.house_number:
+        raise HTTPException(400, "Для дома укажите и street, и house_number")
+    else:
+        building = None
+    scope = {"building": building, "base_tariff_id": data.base_tariff_id}
+
+    period_id = data.period_id or await tariff_simulator.last_period_id(db)
+    if not period_id:
+        raise HTTPException(404, "Нет периода с утверждёнными показаниями")
+
+    draft = tariff_simulator.build_draft_tariff(data.tariff_data, base)
+    result, cached = await tariff_simulator.run_cached(
+        db, draft, period_id=period_id, scope=scope,
+    )
+    if result["period"] is None:
+        raise HTTPException(404, "Период не найден")
+    return {
+        **result,
+        "scope": scope,
+        "cached": cached,
+        "residents": result["residents"][:data.limit],
+    }
+
+
 # =====================================================
 # USAGE — где и сколько применяется тариф
 # =====================================================
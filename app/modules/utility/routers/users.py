@@ -1,6 +1,8 @@
 # app/modules/utility/routers/users.py
 
 import io
+import os
+import asyncio
 import logging
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
@@ -13,20 +15,22 @@ from pydantic import BaseModel, Field
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 from fastapi.responses import StreamingResponse
-from fastapi_limiter.depends import RateLimiter
+from app.core.rate_limit import RateLimit
 
 from app.core.database import get_db
 from app.core.time_utils import utcnow
+from app.core.xlsx_stream import XlsxStream
 from app.modules.utility.models import (
-    User, Room, BillingPeriod, MeterReading, Tariff,
+    User, Room, BillingPeriod, MeterReading, Tariff, UserImportJob,
 )
 from app.modules.utility.schemas import (
     UserCreate, UserResponse, UserUpdate, PaginatedResponse,
     RelocateUserSchema
 )
+from app.core.data_versions import conditional_get
 from app.core.dependencies import get_current_user, RoleChecker
 from app.core.auth import get_password_hash, verify_password, create_access_token
-from app.modules.utility.services.excel_service import import_users_from_excel
+from app.modules.utility.services.user_import import store_upload
 from app.modules.utility.services.user_service import (
     delete_user_service, countable_resident_condition,
 )
@@ -168,7 +172,7 @@ async def initial_setup(
 
 @router.post(
     "/me/change-password",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+    dependencies=[Depends(RateLimit(times=5, seconds=60, exact=True))]
 )
 async def change_password(
         data: ChangeCredentials,
@@ -216,7 +220,7 @@ async def change_password(
 
 @router.post(
     "/me/change-login",
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))]
+    dependencies=[Depends(RateLimit(times=5, seconds=60, exact=True))]
 )
 async def change_login(
         data: ChangeCredentials,
@@ -394,7 +398,11 @@ async def create_user(
     return result.scalars().first()
 
 
-@router.get("", response_model=PaginatedResponse[UserResponse], dependencies=[Depends(allow_fin_acc)])
+@router.get("", response_model=PaginatedResponse[UserResponse],
+            dependencies=[Depends(allow_fin_acc),
+                          # "readings": жилец без комнаты попадает в список только
+                          # с показаниями (countable_resident_condition).
+                          Depends(conditional_get("users", "rooms", "readings"))])
 async def get_users(
         page: int = Query(1, ge=1),
         limit: int = Query(50, ge=1, le=500),
@@ -688,14 +696,16 @@ async def export_users_list(
         tariff_id: Optional[int] = Query(None),
         db: AsyncSession = Depends(get_db),
 ):
-    """Excel-выгрузка всех отфильтрованных жильцов (без пагинации)."""
+    """Excel-выгрузка всех отфильтрованных жильцов (без пагинации).
+
+    Комната и тариф — явными outer join'ами в той же строке (а не
+    selectinload): так результат стримится из БД порциями без догрузок."""
     q = (
-        select(User)
-        .options(selectinload(User.room), selectinload(User.tariff))
+        select(User, Room, Tariff.name)
+        .outerjoin(Room, User.room_id == Room.id)
+        .outerjoin(Tariff, Tariff.id == User.tariff_id)
         .where(User.is_deleted.is_(False), User.role == "user")
     )
-    if search or dormitory or place_type or street:
-        q = q.outerjoin(Room, User.room_id == Room.id)
     if search:
         p = f"%{search}%"
         q = q.where(or_(
@@ -717,57 +727,45 @@ async def export_users_list(
         q = q.where(User.tariff_id == tariff_id)
     q = q.order_by(User.id)
 
-    users = (await db.execute(q)).scalars().all()
+    book = XlsxStream()
+    # 10 колонок: A..J (убраны «Режим оплаты» и «Место работы»).
+    ws = book.sheet(
+        "Жильцы",
+        headers=[
+            "ID", "Логин / ФИО", "Роль", "Тип жильца",
+            "Тип помещения", "Общежитие / Улица", "Комната / Квартира",
+            "Площадь м²", "Проживающих", "Тариф",
+        ],
+        widths=[6, 32, 10, 14, 16, 22, 14, 10, 12, 22],
+        header_fill="DBEAFE",
+    )
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Жильцы"
-    headers = [
-        "ID", "Логин / ФИО", "Роль", "Тип жильца",
-        "Тип помещения", "Общежитие / Улица", "Комната / Квартира",
-        "Площадь м²", "Проживающих", "Тариф",
-    ]
-    for i, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=i, value=h)
-        c.font = Font(bold=True)
-        c.fill = PatternFill("solid", fgColor="DBEAFE")
-    for i, u in enumerate(users, 2):
-        ws.cell(row=i, column=1, value=u.id)
-        ws.cell(row=i, column=2, value=u.username)
-        ws.cell(row=i, column=3, value=u.role)
-        ws.cell(row=i, column=4, value="Семейный" if u.resident_type == "family" else "Холостяк")
+    def _row(row):
+        u, room, tariff_name = row
         # housing_001/E2-C: колонки 5-7 — тип помещения + адрес. Для дома кладём
         # ул+дом в "Общежитие/Улица", квартиру в "Комната/Квартира".
-        if u.room and u.room.place_type == "house":
-            ws.cell(row=i, column=5, value="Дом / квартира")
-            _addr = ", ".join(filter(None, [
-                f"ул. {u.room.street}" if u.room.street else None,
-                f"д. {u.room.house_number}" if u.room.house_number else None,
+        if room and room.place_type == "house":
+            place = "Дом / квартира"
+            addr = ", ".join(filter(None, [
+                f"ул. {room.street}" if room.street else None,
+                f"д. {room.house_number}" if room.house_number else None,
             ])) or ""
-            ws.cell(row=i, column=6, value=_addr)
-            ws.cell(row=i, column=7, value=(f"кв. {u.room.apartment_number}" if u.room.apartment_number else ""))
+            unit = f"кв. {room.apartment_number}" if room.apartment_number else ""
         else:
-            ws.cell(row=i, column=5, value="Общежитие" if u.room else "")
-            ws.cell(row=i, column=6, value=u.room.dormitory_name if u.room else "")
-            ws.cell(row=i, column=7, value=u.room.room_number if u.room else "")
-        ws.cell(row=i, column=8, value=float(u.room.apartment_area) if (u.room and u.room.apartment_area) else 0)
-        ws.cell(row=i, column=9, value=(u.room.total_room_residents if u.room and u.room.total_room_residents else 1))
-        ws.cell(row=i, column=10, value=u.tariff.name if u.tariff else "")
-    # 10 колонок: A..J (убраны «Режим оплаты» и «Место работы»).
-    for col, width in [("A", 6), ("B", 32), ("C", 10), ("D", 14),
-                       ("E", 16), ("F", 22), ("G", 14), ("H", 10), ("I", 12),
-                       ("J", 22)]:
-        ws.column_dimensions[col].width = width
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    fname = f"residents_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx"
-    return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{fname}"'},
-    )
+            place = "Общежитие" if room else ""
+            addr = room.dormitory_name if room else ""
+            unit = room.room_number if room else ""
+        return [
+            u.id, u.username, u.role,
+            "Семейный" if u.resident_type == "family" else "Холостяк",
+            place, addr, unit,
+            float(room.apartment_area) if (room and room.apartment_area) else 0,
+            room.total_room_residents if room and room.total_room_residents else 1,
+            tariff_name or "",
+        ]
+
+    await ws.extend_from_db(db, q, _row)
+    return await book.response(f"residents_{utcnow().strftime('%Y%m%d_%H%M')}.xlsx")
 
 
 @router.get("/{user_id}", response_model=UserResponse, dependencies=[Depends(allow_accountant)])
@@ -1027,24 +1025,107 @@ async def import_users(
     if len(content) > MAX_EXCEL_BYTES:
         raise HTTPException(status_code=413, detail="Файл слишком большой (макс. 20 МБ)")
 
-    # Выполняем импорт
-    result = await import_users_from_excel(content, db)
+    # Импорт уходит в Celery: web-воркер только сохраняет файл и заводит
+    # задачу. Прогресс/итог — GET /import_jobs/{id}, после падения —
+    # POST /import_jobs/{id}/resume (продолжит с checkpoint_row).
+    busy = (await db.execute(
+        select(UserImportJob).where(UserImportJob.status.in_(["pending", "running"]))
+    )).scalars().first()
+    if busy:
+        raise HTTPException(
+            409,
+            f"Уже идёт импорт id={busy.id} (status={busy.status}). Дождитесь завершения.",
+        )
+
+    ext = file.filename.rsplit(".", 1)[-1].lower()
+    file_path = await asyncio.to_thread(store_upload, content, ext)
+
+    job = UserImportJob(
+        status="pending",
+        file_path=file_path,
+        file_name=file.filename[:255],
+        started_by_id=current_user.id,
+        started_by_username=current_user.username,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    # Импорт здесь, чтобы Celery-app не тянулся в момент импорта роутера
+    from app.modules.utility.tasks import import_users_task
+
+    async_result = import_users_task.delay(job.id)
+    job.celery_task_id = async_result.id
 
-    # ЗАПИСЬ В ЖУРНАЛ: Массовый импорт Excel
+    # ЗАПИСЬ В ЖУРНАЛ: Массовый импорт Excel (итоговые счётчики — в задаче)
     await write_audit_log(
         db, current_user.id, current_user.username,
         action="import", entity_type="system",
-        details={
-            "added_users": result.get("added_users", 0),
-            "updated_users": result.get("updated_users", 0),
-            "added_rooms": result.get("added_rooms", 0),
-            "updated_rooms": result.get("updated_rooms", 0)
-        }
+        details={"job_id": job.id, "file_name": job.file_name},
     )
-    # Коммит нужен для сохранения записи в лог (сам excel сервис коммитит свои данные внутри себя)
     await db.commit()
 
-    return result
+    return _import_job_to_dict(job)
+
+
+def _import_job_to_dict(job: UserImportJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "checkpoint_row": job.checkpoint_row,
+        "file_name": job.file_name,
+        "summary": job.summary,
+        "started_by_username": job.started_by_username,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@router.get("/import_jobs/{job_id}", summary="Статус фонового импорта")
+async def get_import_job(
+        job_id: int,
+        current_user: User = Depends(allow_accountant),
+        db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(UserImportJob, job_id)
+    if not job:
+        raise HTTPException(404, "Задача импорта не найдена")
+    return _import_job_to_dict(job)
+
+
+@router.post("/import_jobs/{job_id}/resume", summary="Продолжить упавший импорт")
+async def resume_import_job(
+        job_id: int,
+        current_user: User = Depends(allow_accountant),
+        db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(UserImportJob, job_id)
+    if not job:
+        raise HTTPException(404, "Задача импорта не найдена")
+    if job.status != "failed":
+        raise HTTPException(409, f"Продолжить можно только упавший импорт (status={job.status})")
+    if not os.path.exists(job.file_path):
+        raise HTTPException(410, "Файл импорта удалён с диска — загрузите его заново")
+
+    job.status = "pending"
+    job.error = None
+    await db.commit()
+
+    from app.modules.utility.tasks import import_users_task
+
+    async_result = import_users_task.delay(job.id)
+    job.celery_task_id = async_result.id
+    await write_audit_log(
+        db, current_user.id, current_user.username,
+        action="import_resume", entity_type="system",
+        details={"job_id": job.id, "checkpoint_row": job.checkpoint_row},
+    )
+    await db.commit()
+    return _import_job_to_dict(job)
 
 
 @router.get("/export/template", summary="Скачать шаблон для импорта")
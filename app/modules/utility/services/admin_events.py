@@ -0,0 +1,323 @@
+# app/modules/utility/services/admin_events.py
+"""Push-канал админки: SSE поверх Redis pub/sub.
+
+Раньше каждая открытая вкладка админа раз в 30 секунд дёргала
+/api/admin/notifications (11 COUNT/SELECT), а прогресс пересчёта/импорта
+поллился отдельно. При десятке вкладок — сотни одинаковых запросов в минуту.
+
+Теперь:
+  - сводку уведомлений считает ОДИН процесс на кластер: раз в
+    REFRESH_SECONDS или по событию «dirty» (mark_notifications_dirty*),
+    под Redis-локом SET NX EX. Результат кладётся в SNAPSHOT_KEY и
+    публикуется в CHANNEL;
+  - каждый web-процесс держит один подписчик Redis (AdminEventHub) и
+    раздаёт события в asyncio.Queue своих SSE-клиентов;
+  - Celery-задачи публикуют прогресс job'ов через publish_event_sync.
+
+Формат сообщения в канале — JSON {"event": <тип>, "data": {...}}:
+  notifications — сводка (как GET /api/admin/notifications)
+  job           — {"kind", "job_id", "status", "progress", ...}
+  dirty         — служебное: пересчитать сводку (клиентам не отдаётся)
+
+Ошибки Redis не должны ронять бизнес-операции: publish_* логирует и
+глотает исключения — в худшем случае UI увидит изменение на следующем
+плановом пересчёте.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "admin:events"
+SNAPSHOT_KEY = "admin:notifications:snapshot"
+LOCK_KEY = "admin:notifications:lock"
+
+# Плановый пересчёт сводки (раньше — интервал polling'а каждой вкладки).
+REFRESH_SECONDS = 30
+# Минимальный зазор между пересчётами по «dirty»: пачка событий подряд
+# (массовое утверждение, sync GSheets) даёт один пересчёт, а не сотню.
+DIRTY_DEBOUNCE_SECONDS = 3
+# Keepalive-комментарий SSE: nginx/балансировщики рвут «молчащие» соединения.
+KEEPALIVE_SECONDS = 15
+# Очередь клиента: медленный клиент теряет старые события, а не копит память.
+CLIENT_QUEUE_SIZE = 100
+
+_INTERNAL_EVENTS = {"dirty"}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Кадр text/event-stream: `event:` + `data:` (JSON одной строкой)."""
+    payload = json.dumps(data, ensure_ascii=False, default=str, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _message(event: str, data: Any) -> str:
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False, default=str)
+
+
+# =========================================================================
+# PUBLISH — из web (async) и из Celery (sync)
+# =========================================================================
+async def publish_event(redis, event: str, data: Any) -> None:
+    try:
+        await redis.publish(CHANNEL, _message(event, data))
+    except Exception as exc:
+        logger.warning("[ADMIN_EVENTS] publish %s failed: %s", event, exc)
+
+
+def publish_event_sync(event: str, data: Any) -> None:
+    """Публикация из Celery/sync-кода. Клиент Redis — короткоживущий."""
+    from redis import Redis
+
+    try:
+        client = Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        try:
+            client.publish(CHANNEL, _message(event, data))
+        finally:
+            client.close()
+    except Exception as exc:
+        logger.warning("[ADMIN_EVENTS] publish %s failed: %s", event, exc)
+
+
+def publish_job_progress(kind: str, job_id, status: str,
+                         progress: Optional[int] = None, **extra) -> None:
+    """Прогресс фоновой задачи (recalc / user_import / receipts_zip)."""
+    publish_event_sync("job", {
+        "kind": kind, "job_id": job_id, "status": status,
+        "progress": progress, **extra,
+    })
+
+
+def mark_notifications_dirty_sync() -> None:
+    """Сводка уведомлений устарела — пересчитать вне планового интервала."""
+    publish_event_sync("dirty", {})
+
+
+async def mark_notifications_dirty(redis=None) -> None:
+    if redis is not None:
+        await publish_event(redis, "dirty", {})
+        return
+    from redis import asyncio as aioredis
+
+    client = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+    try:
+        await publish_event(client, "dirty", {})
+    finally:
+        await (getattr(client, "aclose", None) or client.close)()
+
+
+# =========================================================================
+# HUB — один подписчик Redis на процесс, fan-out в очереди клиентов
+# =========================================================================
+SnapshotBuilder = Callable[[], Awaitable[dict]]
+
+
+class AdminEventHub:
+    """Раздаёт события канала CHANNEL локальным SSE-клиентам.
+
+    Фоновые задачи (listener + refresher) стартуют лениво на первом
+    подписчике и останавливаются, когда отключился последний. Старт и стоп
+    идут под одним asyncio.Lock: stop, ждущий отмены задач, не закроет
+    клиент Redis старта, который успел случиться за это время (последняя
+    вкладка закрылась — и тут же открылась новая).
+    """
+
+    def __init__(self, redis_factory: Optional[Callable[[], Any]] = None,
+                 builder: Optional[SnapshotBuilder] = None):
+        self._redis_factory = redis_factory or self._default_redis
+        self._builder = builder
+        self._redis = None
+        self._clients: set[asyncio.Queue] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._dirty: Optional[asyncio.Event] = None   # создаётся в _start (в event loop)
+        self._lifecycle = asyncio.Lock()
+        self.snapshot: Optional[dict] = None
+
+    @staticmethod
+    def _default_redis():
+        from redis import asyncio as aioredis
+        return aioredis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+
+    # --- Подписка клиентов ---
+    async def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._clients.add(queue)
+        async with self._lifecycle:
+            if not self._tasks:
+                self._start()
+        if self.snapshot is None:
+            self.snapshot = await self._load_snapshot()
+        if self.snapshot is not None:
+            queue.put_nowait(("notifications", self.snapshot))
+        return queue
+
+    async def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._clients.discard(queue)
+        async with self._lifecycle:
+            # Пока ждали лок, мог подключиться новый клиент — тогда не стопаем.
+            if not self._clients:
+                await self._stop()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def dispatch(self, raw) -> None:
+        """Сообщение из канала → очереди клиентов."""
+        try:
+            msg = json.loads(raw)
+            event, data = msg["event"], msg.get("data")
+        except (TypeError, ValueError, KeyError):
+            logger.warning("[ADMIN_EVENTS] bad message: %r", raw)
+            return
+        if event in _INTERNAL_EVENTS:
+            if event == "dirty" and self._dirty is not None:
+                self._dirty.set()
+            return
+        if event == "notifications":
+            self.snapshot = data
+        for queue in list(self._clients):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait((event, data))
+
+    # --- Фоновые задачи ---
+    def _start(self) -> None:
+        redis = self._redis = self._redis_factory()
+        self._dirty = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._listen(redis), name="admin-events-listen"),
+            asyncio.create_task(self._refresh_loop(), name="admin-events-refresh"),
+        ]
+
+    async def stop(self) -> None:
+        async with self._lifecycle:
+            await self._stop()
+
+    async def _stop(self) -> None:
+        # Всё, что гасим, — захватываем ДО первого await и закрываем только это.
+        tasks, self._tasks = self._tasks, []
+        redis, self._redis = self._redis, None
+        self.snapshot = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if redis is not None:
+            try:
+                await (getattr(redis, "aclose", None) or redis.close)()
+            except Exception:
+                pass
+
+    async def _listen(self, redis) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.dispatch(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("[ADMIN_EVENTS] pubsub error, reconnect: %s", exc)
+                await asyncio.sleep(2)
+            finally:
+                try:
+                    await pubsub.unsubscribe(CHANNEL)
+                    await (getattr(pubsub, "aclose", None) or pubsub.close)()
+                except Exception:
+                    pass
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=REFRESH_SECONDS)
+                # Trailing debounce: собираем пачку «dirty» и считаем один раз.
+                await asyncio.sleep(DIRTY_DEBOUNCE_SECONDS)
+                reason, lock_seconds = "dirty", DIRTY_DEBOUNCE_SECONDS
+            except asyncio.TimeoutError:
+                reason, lock_seconds = "tick", REFRESH_SECONDS - 1
+            self._dirty.clear()
+            try:
+                await self.refresh(lock_seconds, reason=reason)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[ADMIN_EVENTS] notifications refresh failed")
+
+    # --- Сводка ---
+    async def _load_snapshot(self) -> Optional[dict]:
+        try:
+            raw = await self._redis.get(SNAPSHOT_KEY)
+        except Exception as exc:
+            logger.warning("[ADMIN_EVENTS] snapshot read failed: %s", exc)
+            raw = None
+        if raw:
+            try:
+                return json.loads(raw)
+            except ValueError:
+                pass
+        # Снимка ещё нет (холодный старт) — посчитаем сами под локом.
+        try:
+            return await self.refresh(DIRTY_DEBOUNCE_SECONDS, reason="dirty")
+        except Exception:
+            logger.exception("[ADMIN_EVENTS] initial snapshot failed")
+            return None
+
+    async def refresh(self, lock_seconds: int, *, reason: str = "tick") -> Optional[dict]:
+        """Пересчитать сводку, если в этом окне её ещё никто не считал.
+
+        SET NX EX — один пересчёт на кластер за lock_seconds; проигравшие
+        получат результат через канал. Локи плановый/«dirty» раздельные:
+        плановый пересчёт не глушит реакцию на изменение."""
+        if self._builder is None or self._redis is None:
+            return None
+        lock = f"{LOCK_KEY}:{reason}"
+        if not await self._redis.set(lock, "1", nx=True, ex=max(1, lock_seconds)):
+            return None
+        data = await self._builder()
+        raw = json.dumps(data, ensure_ascii=False, default=str)
+        await self._redis.set(SNAPSHOT_KEY, raw, ex=REFRESH_SECONDS * 4)
+        await self._redis.publish(CHANNEL, _message("notifications", data))
+        self.snapshot = data
+        return data
+
+
+_hub: Optional[AdminEventHub] = None
+
+
+def get_hub(builder: Optional[SnapshotBuilder] = None) -> AdminEventHub:
+    """Процессный singleton хаба."""
+    global _hub
+    if _hub is None:
+        _hub = AdminEventHub(builder=builder)
+    elif builder is not None and _hub._builder is None:
+        _hub._builder = builder
+    return _hub
+
+
+__all__ = [
+    "AdminEventHub",
+    "CHANNEL",
+    "KEEPALIVE_SECONDS",
+    "format_sse",
+    "get_hub",
+    "mark_notifications_dirty",
+    "mark_notifications_dirty_sync",
+    "publish_event",
+    "publish_event_sync",
+    "publish_job_progress",
+]
@@ -65,7 +65,6 @@ async def bulk_approve_drafts(db: AsyncSession, current_user=None):
     if not drafts_rows:
         return {"status": "success", "approved_count": 0}
 
-    room_ids = [row[2].id for row in drafts_rows]
     user_ids = [row[1].id for row in drafts_rows]
 
     # Предыдущее approved показание считаем ПО ПАРЕ (user_id, room_id),
@@ -78,19 +77,15 @@ async def bulk_approve_drafts(db: AsyncSession, current_user=None):
     # расходился с ручным вводом/квитанцией. Теперь: одним запросом тянем
     # утверждённые показания пар + имя периода, prev выбирает pick_prev_pair
     # (хронология имени, is_meaningful_prev — класс «Капранов», приоритет
-    # METER_REPLACEMENT текущего месяца).
-    from app.modules.utility.services.reading_calculator import build_prev_map
+    # METER_REPLACEMENT текущего месяца). Кандидаты — PrevReadingIndex: ровно
+    # эти пары (а не user_id IN × room_id IN) и только периоды ≤ активного.
+    from app.modules.utility.services.prev_reading_index import (
+        PrevKey, PrevReadingIndex,
+    )
 
-    _cand_rows = (await db.execute(
-        select(MeterReading, BillingPeriod.name)
-        .join(BillingPeriod, BillingPeriod.id == MeterReading.period_id)
-        .where(
-            MeterReading.user_id.in_(user_ids),
-            MeterReading.room_id.in_(room_ids),
-            MeterReading.is_approved.is_(True),
-        )
-    )).all()
-    prev_readings_map = build_prev_map(_cand_rows, active_period.name)
+    _prev_keys = [PrevKey(row[1].id, row[2].id, active_period.name) for row in drafts_rows]
+    _prev_by_key = await PrevReadingIndex.for_session(db).resolve(db, _prev_keys)
+    prev_readings_map = {(k.user_id, k.room_id): v for k, v in _prev_by_key.items()}
 
     # Загружаем корректировки (долги / скидки)
     adj_res = await db.execute(
@@ -268,6 +263,9 @@ async def bulk_approve_drafts(db: AsyncSession, current_user=None):
 
     # Пакетное обновление (Chunking). Сохраняет RAM и ускоряет работу БД в разы.
     if update_mappings:
+        # Bulk по PK: агрегаты устаревают только у активного периода.
+        from app.modules.utility.services.period_stats import scope_writes
+        scope_writes(db, [active_period.id])
         chunk_size = 1000
         for i in range(0, len(update_mappings), chunk_size):
             await db.execute(update(MeterReading), update_mappings[i:i + chunk_size])
@@ -0,0 +1,272 @@
+# app/modules/utility/services/audit_archive.py
+"""Партиции и архив журнала действий (audit_log).
+
+audit_log партиционирована помесячно (миграция audit_part_001):
+
+    audit_log_y2026m10  FOR VALUES FROM ('2026-10-01') TO ('2026-11-01')
+
+Обслуживание (maintain_audit_partitions_task, раз в сутки):
+  1. ensure_partitions — партиции на AHEAD_MONTHS месяцев вперёд, чтобы
+     вставки не падали в DEFAULT;
+  2. archive_expired — партиции старше audit.retention_months (настройка
+     analyzer_settings, по умолчанию 24) выгружаются в
+     AUDIT_ARCHIVE_DIR/audit_log_YYYY-MM.jsonl.gz (строки — новые первыми),
+     число строк сверяется, партиция отсоединяется и удаляется.
+     manifest.json — месяц → файл, строки, sha256. Сбой одной партиции
+     логируется, остальные выгружаются.
+
+Чтение: /api/admin/audit-log ходит только в живую таблицу; архивы
+читаются лишь по явному include_archive=true (search_archives — потоковый
+проход по gzip, новые месяцы первыми).
+
+Parquet не используем: pyarrow нет в зависимостях, а gzip-JSONL читается
+стандартной библиотекой и жмётся на журнале в 8-10 раз.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Тот же shared-volume, что и debt_archives (web + worker_heavy + nginx);
+# прямой доступ через nginx закрыт (nginx/conf.d/default.conf).
+AUDIT_ARCHIVE_DIR = "/app/static/generated_files/audit_archives"
+MANIFEST_NAME = "manifest.json"
+AHEAD_MONTHS = 3
+DEFAULT_RETENTION_MONTHS = 24
+# Минимум живой истории: меньше нельзя даже настройкой — журнал нужен
+# для споров по текущему и прошлому периоду.
+MIN_RETENTION_MONTHS = 3
+
+_PARTITION_RE = re.compile(r"^audit_log_y(\d{4})m(\d{2})$")
+_COLUMNS = ("id", "user_id", "username", "action", "entity_type", "entity_id", "details", "created_at")
+
+
+# =========================================================================
+# МЕСЯЦЫ И ИМЕНА ПАРТИЦИЙ
+# =========================================================================
+def add_months(month: date, n: int) -> date:
+    ordinal = month.year * 12 + (month.month - 1) + n
+    return date(ordinal // 12, ordinal % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"audit_log_y{month.year:04d}m{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[date]:
+    """audit_log_y2026m10 → date(2026, 10, 1); DEFAULT и чужие имена → None."""
+    m = _PARTITION_RE.match(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def archive_file_name(month: date) -> str:
+    return f"audit_log_{month.year:04d}-{month.month:02d}.jsonl.gz"
+
+
+def months_ahead(today: date, ahead: int = AHEAD_MONTHS) -> list[date]:
+    """Текущий месяц + `ahead` следующих."""
+    first = today.replace(day=1)
+    return [add_months(first, i) for i in range(ahead + 1)]
+
+
+def expired_months(existing: Iterable[date], today: date, retention_months: int) -> list[date]:
+    """Месяцы партиций, целиком вышедшие за ретеншн (по возрастанию)."""
+    retention_months = max(MIN_RETENTION_MONTHS, retention_months)
+    cutoff = add_months(today.replace(day=1), -retention_months)
+    return sorted(m for m in existing if m < cutoff)
+
+
+# =========================================================================
+# DDL (sync-сессия Celery)
+# =========================================================================
+def list_partitions(db) -> dict[date, str]:
+    from sqlalchemy import text
+
+    rows = db.execute(text("""
+        SELECT c.relname
+          FROM pg_inherits i
+          JOIN pg_class c ON c.oid = i.inhrelid
+          JOIN pg_class p ON p.oid = i.inhparent
+         WHERE p.relname = 'audit_log'
+    """)).scalars().all()
+    out = {}
+    for name in rows:
+        month = parse_partition_name(name)
+        if month:
+            out[month] = name
+    return out
+
+
+def ensure_partitions(db, today: Optional[date] = None) -> list[str]:
+    """Создать недостающие партиции на AHEAD_MONTHS вперёд. Возвращает имена."""
+    from sqlalchemy import text
+
+    today = today or datetime.now(timezone.utc).date()
+    existing = list_partitions(db)
+    created = []
+    for month in months_ahead(today):
+        if month in existing:
+            continue
+        name = partition_name(month)
+        db.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF audit_log '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+    db.commit()
+    return created
+
+
+# =========================================================================
+# ЭКСПОРТ
+# =========================================================================
+def _row_to_dict(row) -> dict:
+    item = dict(zip(_COLUMNS, row))
+    if isinstance(item["created_at"], datetime):
+        item["created_at"] = item["created_at"].isoformat()
+    return item
+
+
+def write_archive(rows: Iterable, path: str) -> tuple[int, str]:
+    """Записать строки в gzip-JSONL атомарно (tmp + rename). → (строк, sha256).
+
+    Порядок строк сохраняется как есть; archive_partition отдаёт их новыми
+    первыми — в порядке чтения iter_archived."""
+    tmp = path + ".part"
+    count = 0
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+        for row in rows:
+            fh.write(json.dumps(_row_to_dict(row), ensure_ascii=False, default=str))
+            fh.write("\n")
+            count += 1
+    digest = hashlib.sha256()
+    with open(tmp, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    os.replace(tmp, path)
+    return count, digest.hexdigest()
+
+
+def read_manifest(archive_dir: str = AUDIT_ARCHIVE_DIR) -> dict:
+    try:
+        with open(os.path.join(archive_dir, MANIFEST_NAME), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest: dict, archive_dir: str) -> None:
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    with open(path + ".part", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + ".part", path)
+
+
+def archive_partition(db, month: date, name: str, archive_dir: str = AUDIT_ARCHIVE_DIR) -> dict:
+    """Выгрузить партицию в архив, сверить число строк, отсоединить и удалить.
+
+    Повтор после падения безопасен: файл перезаписывается, пока партиция
+    на месте; удаляется она только после успешной сверки.
+    """
+    from sqlalchemy import text
+
+    os.makedirs(archive_dir, exist_ok=True)
+    expected = db.execute(text(f'SELECT count(*) FROM "{name}"')).scalar_one()
+    result = db.connection().execution_options(stream_results=True).execute(text(
+        f'SELECT {", ".join(_COLUMNS)} FROM "{name}" ORDER BY created_at DESC, id DESC'
+    ))
+    file_name = archive_file_name(month)
+    rows, sha = write_archive(result, os.path.join(archive_dir, file_name))
+    if rows != expected:
+        raise RuntimeError(f"{name}: выгружено {rows} строк из {expected}")
+
+    manifest = read_manifest(archive_dir)
+    manifest[month.strftime("%Y-%m")] = {
+        "file": file_name, "rows": rows, "sha256": sha,
+        "archived_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    _write_manifest(manifest, archive_dir)
+
+    db.execute(text(f'ALTER TABLE audit_log DETACH PARTITION "{name}"'))
+    db.execute(text(f'DROP TABLE "{name}"'))
+    db.commit()
+    logger.info("[AUDIT-ARCHIVE] %s → %s (%d rows)", name, file_name, rows)
+    return {"partition": name, "file": file_name, "rows": rows}
+
+
+def archive_expired(db, retention_months: int, today: Optional[date] = None,
+                    archive_dir: str = AUDIT_ARCHIVE_DIR) -> list[dict]:
+    today = today or datetime.now(timezone.utc).date()
+    partitions = list_partitions(db)
+    done = []
+    for month in expired_months(partitions, today, retention_months):
+        name = partitions[month]
+        try:
+            done.append(archive_partition(db, month, name, archive_dir))
+        except Exception as exc:
+            # Партиция остаётся на месте — следующий прогон попробует снова;
+            # более свежие месяцы выгружаем сейчас.
+            db.rollback()
+            logger.exception("[AUDIT-ARCHIVE] %s failed", name)
+            done.append({"partition": name, "error": str(exc)[:500]})
+    return done
+
+
+# =========================================================================
+# ЧТЕНИЕ АРХИВА (явный include_archive)
+# =========================================================================
+def iter_archived(archive_dir: str = AUDIT_ARCHIVE_DIR) -> Iterator[dict]:
+    """Записи архивов, новые первыми (месяцы по убыванию, внутри — по убыванию).
+
+    Поток: строки отдаются по мере распаковки — файл уже лежит новыми
+    первыми (archive_partition), в память месяц целиком не читается."""
+    manifest = read_manifest(archive_dir)
+    for key in sorted(manifest, reverse=True):
+        path = os.path.join(archive_dir, manifest[key]["file"])
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+        except (OSError, EOFError) as exc:
+            # Битый хвост gzip — уже отданные строки месяца остаются в выдаче.
+            logger.warning("[AUDIT-ARCHIVE] %s unreadable: %s", path, exc)
+
+
+def search_archives(*, action: Optional[str] = None, entity_type: Optional[str] = None,
+                    user_id: Optional[int] = None, skip: int = 0, limit: int = 30,
+                    archive_dir: str = AUDIT_ARCHIVE_DIR) -> tuple[int, list[dict]]:
+    """(всего совпадений, срез [skip:skip+limit]) — один проход по архивам."""
+    total = 0
+    page = []
+    for item in iter_archived(archive_dir):
+        if action and item.get("action") != action:
+            continue
+        if entity_type and item.get("entity_type") != entity_type:
+            continue
+        if user_id and item.get("user_id") != user_id:
+            continue
+        if skip <= total < skip + limit:
+            page.append(item)
+        total += 1
+    return total, page
+
+
+__all__ = [
+    "AUDIT_ARCHIVE_DIR",
+    "DEFAULT_RETENTION_MONTHS",
+    "archive_expired",
+    "ensure_partitions",
+    "expired_months",
+    "months_ahead",
+    "partition_name",
+    "search_archives",
+]
@@ -16,22 +16,23 @@ total разошёлся с текущей формулой (drift), и:
   4) это НЕ повторный фикс (маркер AUTO_RECALC_FIXED) — анти-цикл: если после
      прошлого авто-фикса снова drift, значит что-то перезаписывает/данные
      битые → сигнал, а не бесконечный пересчёт.
+
+Пересчёт — общий движок drift_engine (prev/тарифы на весь период сразу).
+Фиксы пишутся одним bulk UPDATE по PK, сигналы — одной выборкой
+существующих RECALC_DRIFT + пакетной вставкой новых; в сводке timings_ms.
 """
 from __future__ import annotations
 
 import logging
+import time
 from decimal import Decimal
 
 from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
 
 from app.core.time_utils import utcnow
-from app.modules.utility.models import (
-    Adjustment, BillingPeriod, MeterReading, ResidentProblem, Tariff, User,
-)
-from app.modules.utility.services.calculations import CalculationError
-from app.modules.utility.services.reading_calculator import compute_reading_breakdown
-from app.modules.utility.services.tariff_cache import tariff_cache
+from app.modules.utility.models import Adjustment, MeterReading, ResidentProblem
+from app.modules.utility.services.drift_engine import compute_period_drift, fix_values
+from app.modules.utility.services.period_stats import scope_writes
 
 logger = logging.getLogger(__name__)
 
@@ -46,25 +47,28 @@ def _D(v) -> Decimal:
     return Decimal(str(v)) if v is not None else ZERO
 
 
+def classify(check, has_adjustments: bool):
+    """None — безопасно авто-фиксить, иначе причина сигнала."""
+    r = check.reading
+    if _D(r.hot_water) > FORMAT_THRESHOLD or _D(r.cold_water) > FORMAT_THRESHOLD:
+        return "format_suspect"
+    if check.calc > MAX_SAFE_TOTAL:
+        return "huge_sum"
+    if AUTO_MARK in (r.anomaly_flags or ""):
+        return "repeat_drift"
+    if has_adjustments:
+        return "has_adjustments"
+    return None
+
+
 async def auto_recalc_drift(db, period_id: int) -> dict:
     """Прогоняет активный (или указанный) период: безопасные drift — фиксит,
     опасные/повторные — сигналит. Возвращает сводку."""
-    period = await db.get(BillingPeriod, period_id)
-    if not period:
+    batch = await compute_period_drift(db, period_id)
+    if batch.period is None:
         return {"skipped": "no_period", "period_id": period_id}
-
-    rows = (await db.execute(
-        select(MeterReading)
-        .options(
-            selectinload(MeterReading.user).selectinload(User.room),
-            selectinload(MeterReading.room),
-            selectinload(MeterReading.period),
-        )
-        .where(
-            MeterReading.period_id == period_id,
-            MeterReading.is_approved.is_(True),
-        )
-    )).scalars().all()
+    timings = dict(batch.timings_ms)
+    started = time.monotonic()
 
     # Жильцы с ручными корректировками в этом периоде — их НЕ авто-фиксим
     # (compute_reading_breakdown не учитывает Adjustment, перерасчёт сотрёт их).
@@ -72,168 +76,122 @@ async def auto_recalc_drift(db, period_id: int) -> dict:
         select(Adjustment.user_id).where(Adjustment.period_id == period_id).distinct()
     )).scalars().all())
 
-    from app.modules.utility.routers.settings import _load_seasonal
-    seasonal = await _load_seasonal(db)
-
-    fixed = 0
-    signaled = 0
-    checked = 0
-    signaled_ids: set[int] = set()
-    scan_ts = utcnow()
-
-    for r in rows:
-        user = r.user
-        # КОМНАТА reading'а (r.room), а НЕ текущая комната жильца (user.room).
-        # Иначе после переезда (room A→B) исторический reading периода A
-        # пересчитался бы по тарифу B и авто-перезаписал бы верную квитанцию.
-        # r.room=None (долг на лице без комнаты) → пропускаем: считать нечего.
-        room = r.room
-        if not user or not room:
-            continue
-        tariff = tariff_cache.get_effective_tariff(user=user, room=room)
-        if tariff is None:
-            tariff = (await db.execute(
-                select(Tariff).where(Tariff.is_active.is_(True))
-            )).scalars().first()
-        if tariff is None:
-            continue
-
-        prev = (await db.execute(
-            select(MeterReading)
-            .where(
-                MeterReading.user_id == user.id,
-                MeterReading.room_id == room.id,
-                MeterReading.is_approved.is_(True),
-                MeterReading.period_id < r.period_id,
-            )
-            .order_by(MeterReading.period_id.desc())
-            .limit(1)
-        )).scalars().first()
-
-        heating = seasonal.heating_season_active and tariff.is_heating_active_now()
-        hw = seasonal.hot_water_heating_active and tariff.is_hw_heating_active_now()
-        try:
-            bd = compute_reading_breakdown(
-                user=user, room=room, tariff=tariff,
-                current_hot=r.hot_water or 0,
-                current_cold=r.cold_water or 0,
-                current_elect=r.electricity or 0,
-                prev_reading=prev,
-                heating_season_active=heating,
-                hot_water_heating_active=hw,
-            )
-        except CalculationError:
-            continue
-
-        checked += 1
-        stored = _D(r.total_cost)
-        calc = _D(bd["total_cost"])
-        if abs(calc - stored) <= DRIFT_THRESHOLD:
+    fixes: list[dict] = []
+    signals: dict[int, dict] = {}   # user_id → сигнал (последний reading жильца)
+    signaled = 0                    # показаний под сигналом (как до движка)
+    for check in batch.checks:
+        if abs(check.diff) <= DRIFT_THRESHOLD:
             continue  # расхождения нет
 
         # --- ЕСТЬ расхождение. Предохранители перед авто-фиксом ---
-        flags = r.anomaly_flags or ""
-        is_format_bad = (_D(r.hot_water) > FORMAT_THRESHOLD
-                         or _D(r.cold_water) > FORMAT_THRESHOLD)
-        is_huge = calc > MAX_SAFE_TOTAL
-        already_fixed = AUTO_MARK in flags
-        has_adjustments = user.id in adj_user_ids
-
-        if is_format_bad or is_huge or already_fixed or has_adjustments:
-            reason = (
-                "format_suspect" if is_format_bad else
-                "huge_sum" if is_huge else
-                "repeat_drift" if already_fixed else
-                "has_adjustments"
-            )
-            await _signal_recalc_drift(db, user, r, stored, calc, reason, scan_ts)
-            signaled_ids.add(user.id)
+        reason = classify(check, check.user.id in adj_user_ids)
+        if reason:
+            signals[check.user.id] = _signal_details(check, reason)
             signaled += 1
-        else:
-            # БЕЗОПАСНО: применяем перерасчёт (привести total к формуле).
-            for k in ("cost_hot_water", "cost_cold_water", "cost_sewage",
-                      "cost_electricity", "cost_maintenance", "cost_social_rent",
-                      "cost_waste", "cost_fixed_part"):
-                if k in bd:
-                    setattr(r, k, bd[k])
-            r.total_209 = bd["total_209"]
-            r.total_205 = bd["total_205"]
-            r.total_cost = bd["total_cost"]  # триггер тоже выставит, дублируем явно
-            # Маркер анти-цикла: при повторном drift в след. скане → сигнал.
-            r.anomaly_flags = (flags + "," + AUTO_MARK).strip(",") if flags else AUTO_MARK
-            fixed += 1
-            logger.info(
-                "[auto_recalc] fixed reading=%s user=%s %.2f→%.2f",
-                r.id, user.id, float(stored), float(calc),
-            )
+            continue
+        # БЕЗОПАСНО: применяем перерасчёт (привести total к формуле).
+        # Маркер анти-цикла: при повторном drift в след. скане → сигнал.
+        flags = check.reading.anomaly_flags or ""
+        fixes.append(fix_values(
+            check, (flags + "," + AUTO_MARK).strip(",") if flags else AUTO_MARK,
+        ))
+        logger.info(
+            "[auto_recalc] fixed reading=%s user=%s %.2f→%.2f",
+            check.reading.id, check.user.id, float(check.stored), float(check.calc),
+        )
+
+    if fixes:
+        # ORM bulk UPDATE по PK (id, created_at) — один executemany. Период
+        # по PK не виден — агрегаты (period_stats) устаревают только у этого.
+        scope_writes(db, [period_id])
+        await db.execute(update(MeterReading), fixes)
+
+    scan_ts = utcnow()
+    await _upsert_signals(db, signals, scan_ts)
 
     # Авто-resolve RECALC_DRIFT, исчезнувшие в этом прогоне (drift пропал —
     # пофикшен авто или исправлен вручную). Резолвим ТОЛЬКО свой тип
     # (RECALC_DRIFT), чтобы не трогать сигналы scan_resident_problems. И только
-    # если реально сканировали (rows непусто) — иначе при пустом периоде стёрли
-    # бы все сигналы. Исключаем signaled_ids явно (autoflush=False: их last_seen
-    # ещё не в БД к моменту UPDATE).
-    if rows:
+    # если реально сканировали (checks/errors непусты) — иначе при пустом
+    # периоде стёрли бы все сигналы. Исключаем signaled явно (autoflush=False:
+    # их last_seen ещё не в БД к моменту UPDATE).
+    if batch.checks or batch.errors:
         resolve_stmt = update(ResidentProblem).where(
             ResidentProblem.problem_type == "RECALC_DRIFT",
             ResidentProblem.status.in_(["open", "acknowledged"]),
         )
-        if signaled_ids:
+        if signals:
             resolve_stmt = resolve_stmt.where(
-                ResidentProblem.user_id.notin_(list(signaled_ids)))
+                ResidentProblem.user_id.notin_(list(signals)))
         await db.execute(resolve_stmt.values(status="resolved", resolved_at=scan_ts))
 
     await db.commit()
+    timings["write"] = int((time.monotonic() - started) * 1000)
     logger.info(
-        "[auto_recalc] period=%s checked=%d fixed=%d signaled=%d",
-        period_id, checked, fixed, signaled,
+        "[auto_recalc] period=%s checked=%d fixed=%d signaled=%d timings=%s",
+        period_id, len(batch.checks), len(fixes), signaled, timings,
     )
     return {
-        "period": period.name,
-        "checked": checked,
-        "fixed": fixed,
+        "period": batch.period.name,
+        "checked": len(batch.checks),
+        "fixed": len(fixes),
         "signaled": signaled,
+        "timings_ms": timings,
     }
 
 
-async def _signal_recalc_drift(db, user, reading, stored, calc, reason, now):
-    """Создаёт/обновляет сигнал RECALC_DRIFT в Мониторе проблем жильцов."""
+_REASON_RU = {
+    "format_suspect": "битый формат показаний (потеряна точка)",
+    "huge_sum": "пересчёт даёт нереальную сумму",
+    "repeat_drift": "повторное расхождение после авто-перерасчёта",
+    "has_adjustments": "есть ручные корректировки — нужен ручной перерасчёт",
+}
+
+
+def _signal_details(check, reason: str) -> dict:
     severity = "critical" if reason in ("format_suspect", "huge_sum") else "high"
-    score = 90 if severity == "critical" else 60
-    reason_ru = {
-        "format_suspect": "битый формат показаний (потеряна точка)",
-        "huge_sum": "пересчёт даёт нереальную сумму",
-        "repeat_drift": "повторное расхождение после авто-перерасчёта",
-        "has_adjustments": "есть ручные корректировки — нужен ручной перерасчёт",
-    }.get(reason, reason)
-    details = {
-        "reading_id": reading.id,
-        "stored_total": float(stored),
-        "calc_total": float(calc),
-        "diff": float(calc - stored),
-        "reason": reason,
-        "reason_ru": reason_ru,
+    return {
+        "severity": severity,
+        "score": 90 if severity == "critical" else 60,
+        "details": {
+            "reading_id": check.reading.id,
+            "stored_total": float(check.stored),
+            "calc_total": float(check.calc),
+            "diff": float(check.diff),
+            "reason": reason,
+            "reason_ru": _REASON_RU.get(reason, reason),
+        },
+    }
+
+
+async def _upsert_signals(db, signals: dict[int, dict], now) -> None:
+    """Создаёт/обновляет сигналы RECALC_DRIFT в Мониторе проблем жильцов:
+    одна выборка открытых сигналов этих жильцов, новые — пакетной вставкой."""
+    if not signals:
+        return
+    existing = {
+        p.user_id: p for p in (await db.execute(
+            select(ResidentProblem).where(
+                ResidentProblem.user_id.in_(list(signals)),
+                ResidentProblem.problem_type == "RECALC_DRIFT",
+                ResidentProblem.status != "resolved",
+            ).order_by(ResidentProblem.id)
+        )).scalars().all()
     }
-    existing = (await db.execute(
-        select(ResidentProblem).where(
-            ResidentProblem.user_id == user.id,
-            ResidentProblem.problem_type == "RECALC_DRIFT",
-            ResidentProblem.status != "resolved",
-        )
-    )).scalars().first()
     title = "Расхождение расчёта (нужна проверка)"
-    if existing:
-        existing.last_seen_at = now
-        existing.score = score
-        existing.severity = severity
-        existing.title = title
-        existing.details = details
-    else:
-        db.add(ResidentProblem(
-            user_id=user.id, problem_type="RECALC_DRIFT", severity=severity,
-            score=score, title=title, details=details, status="open",
-            first_detected_at=now, last_seen_at=now,
-        ))
+    for user_id, signal in signals.items():
+        problem = existing.get(user_id)
+        if problem:
+            problem.last_seen_at = now
+            problem.score = signal["score"]
+            problem.severity = signal["severity"]
+            problem.title = title
+            problem.details = signal["details"]
+        else:
+            db.add(ResidentProblem(
+                user_id=user_id, problem_type="RECALC_DRIFT", title=title,
+                status="open", first_detected_at=now, last_seen_at=now, **signal,
+            ))
 
 
 __all__ = ["auto_recalc_drift"]
@@ -0,0 +1,174 @@
+# app/modules/utility/services/debt_archive_index.py
+"""ФИО-индекс архивных xlsx импортов 1С (sidecar-файл рядом с архивом).
+
+Диагностика «есть ли жилец в последних N выгрузках 1С»
+(/debts/check-resident-coverage) открывала каждый архив openpyxl'ом и
+обходила все ячейки всех строк — на десятке импортов это секунды на
+КАЖДЫЙ запрос. Теперь у архива `<id>.xlsx` лежит `<id>.xlsx.fio.json.gz`:
+
+    {"v": 1, "size": <байт xlsx>, "mtime": <mtime xlsx>,
+     "rows": [[row_excel, [[col, "ФИО как в ячейке"], ...],
+                          [[col, сумма], ...]], ...]}
+
+  * cells — строковые ячейки строки, похожие на ФИО: с буквами и без
+    ключевых слов ОСВ («договор», «сальдо», «итого», ...). Остальное
+    поиск по фамилии всё равно отбрасывал;
+  * nums — ненулевые числовые значения строки с номером колонки: сальдо
+    показываются только ПРАВЕЕ найденной колонки ФИО, как раньше.
+
+Индекс строится один раз — при импорте (tasks/debts.py), а для старых
+архивов лениво на первом запросе. Размер/mtime xlsx в индексе: заменили
+файл — индекс пересоберётся. Лежит в том же каталоге debt_archives, что
+закрыт в nginx (403), и удаляется retention-задачей вместе с архивом.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+from decimal import Decimal
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".fio.json.gz"
+INDEX_VERSION = 1
+
+# Ячейки с этими словами — шапка/итоги ОСВ, а не ФИО.
+NON_FIO_KEYWORDS = (
+    "договор", "сальдо", "оборот", "итого", "период",
+    "квартир", "общежит", "счёт", "счет", "помещен",
+)
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def normalize(s: str) -> str:
+    """Нижний регистр, точки/запятые → пробел, без двойных пробелов."""
+    s = (s or "").lower().replace(".", " ").replace(",", " ")
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def index_path(archive_path: str) -> str:
+    return archive_path + INDEX_SUFFIX
+
+
+def _number(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        d = Decimal(str(value).replace(",", "."))
+    except Exception:
+        return None
+    return float(d) if d.is_finite() and d != 0 else None
+
+
+def build_index(archive_path: str) -> dict:
+    """Разобрать xlsx один раз → индекс (без записи на диск)."""
+    import openpyxl
+
+    stat = os.stat(archive_path)
+    rows = []
+    wb = openpyxl.load_workbook(filename=archive_path, read_only=True, data_only=True)
+    try:
+        for row_idx, row in enumerate(wb.active.iter_rows(values_only=True), start=1):
+            if not row:
+                continue
+            cells = []
+            for col_idx, value in enumerate(row):
+                if not isinstance(value, str):
+                    continue
+                norm = normalize(value)
+                if not norm or not _LETTER_RE.search(norm):
+                    continue
+                if any(kw in norm for kw in NON_FIO_KEYWORDS):
+                    continue
+                cells.append([col_idx, value.strip()])
+            if not cells:
+                continue
+            nums = []
+            for col_idx, value in enumerate(row):
+                number = _number(value)
+                if number is not None:
+                    nums.append([col_idx, number])
+            rows.append([row_idx, cells, nums])
+    finally:
+        wb.close()
+    return {"v": INDEX_VERSION, "size": stat.st_size, "mtime": int(stat.st_mtime), "rows": rows}
+
+
+def write_index(archive_path: str) -> dict:
+    index = build_index(archive_path)
+    target = index_path(archive_path)
+    with open(target + ".part", "wb") as fh:
+        fh.write(gzip.compress(json.dumps(index, ensure_ascii=False).encode("utf-8"), mtime=0))
+    os.replace(target + ".part", target)
+    return index
+
+
+def _fresh(index: dict, archive_path: str) -> bool:
+    try:
+        stat = os.stat(archive_path)
+    except OSError:
+        return True  # xlsx удалён — индекс остаётся единственным источником
+    return (index.get("v") == INDEX_VERSION and index.get("size") == stat.st_size
+            and index.get("mtime") == int(stat.st_mtime))
+
+
+def load_index(archive_path: str) -> Optional[dict]:
+    """Индекс архива; нет/устарел — собрать и сохранить. None — нет ни того, ни другого."""
+    target = index_path(archive_path)
+    if os.path.exists(target):
+        try:
+            with gzip.open(target, "rb") as fh:
+                index = json.loads(fh.read())
+            if _fresh(index, archive_path):
+                return index
+        except (OSError, ValueError) as exc:
+            logger.warning("[DEBT-INDEX] broken %s, rebuilding: %s", target, exc)
+    if not os.path.exists(archive_path):
+        return None
+    return write_index(archive_path)
+
+
+def find_resident(index: dict, fio_norm: str) -> list[dict]:
+    """Строки, где первая ФИО-ячейка содержит фамилию (как старый перебор xlsx)."""
+    parts = fio_norm.split()
+    surname = parts[0] if parts else ""
+    if not surname:
+        return []
+    matches = []
+    for row_idx, cells, nums in index.get("rows", []):
+        for col_idx, raw in cells:
+            cell_norm = normalize(raw)
+            if surname not in cell_norm:
+                continue
+            matches.append({
+                "row_excel": row_idx,
+                "col_excel": col_idx + 1,  # 1-based для удобства админа
+                "fio_in_excel": raw,
+                "exact_match": cell_norm == fio_norm,
+                "numeric_values": [v for c, v in nums if c > col_idx][:6],
+            })
+            break
+    return matches
+
+
+def remove_index(archive_path: str) -> None:
+    try:
+        os.remove(index_path(archive_path))
+    except FileNotFoundError:
+        pass
+
+
+__all__ = [
+    "INDEX_SUFFIX",
+    "build_index",
+    "find_resident",
+    "index_path",
+    "load_index",
+    "normalize",
+    "remove_index",
+    "write_index",
+]
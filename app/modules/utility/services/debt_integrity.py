@@ -0,0 +1,330 @@
+# app/modules/utility/services/debt_integrity.py
+"""Сверка долгов активного периода с последними импортами 1С — в SQL.
+
+Раньше integrity-check / zombie-readings тянули applied_state двух
+последних импортов (JSONB на тысячи жильцов), разворачивали их в Python,
+грузили ВСЕ показания периода и догружали users/rooms — на каждый вызов,
+и integrity-fix вызывал всё это ещё раз, а потом обновлял строки по одной.
+
+Теперь «ожидаемое» — реляционная проекция последних импортов: строки
+debt_snapshots (по строке на импорт × жилец) последнего completed-лога
+209 и 205. Сверка — JOIN expected ↔ actual в одном запросе, который
+возвращает только расходящиеся строки; исправления — те же CTE в
+UPDATE ... FROM / INSERT / UPDATE ... WHERE id IN, без Python-слияния.
+
+CTE:
+  latest   — последний completed-импорт каждого счёта (с applied_state);
+  expected — долги/переплаты по user_id из debt_snapshots этих импортов
+             (жилец только в одном счёте → у другого 0, как раньше);
+  actual   — показание жильца в активном периоде (одно на user_id —
+             последнее по id).
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.utility.services.period_stats import scope_writes
+
+# Порог расхождения в рублях.
+THRESHOLD = 1.0
+
+MONEY = ("debt_209", "overpayment_209", "debt_205", "overpayment_205")
+
+_LATEST = """
+latest AS (
+    SELECT DISTINCT ON (account_type) id, account_type
+    FROM debt_import_logs
+    WHERE status = 'completed' AND applied_state IS NOT NULL
+      AND account_type IN ('209', '205')
+    ORDER BY account_type, id DESC
+),
+known AS (
+    SELECT DISTINCT s.user_id FROM debt_snapshots s JOIN latest l ON l.id = s.import_log_id
+)
+"""
+
+_CTES = _LATEST + """,
+expected AS (
+    SELECT s.user_id,
+           COALESCE(SUM(s.debt) FILTER (WHERE s.account_type = '209'), 0) AS debt_209,
+           COALESCE(SUM(s.overpayment) FILTER (WHERE s.account_type = '209'), 0) AS overpayment_209,
+           COALESCE(SUM(s.debt) FILTER (WHERE s.account_type = '205'), 0) AS debt_205,
+           COALESCE(SUM(s.overpayment) FILTER (WHERE s.account_type = '205'), 0) AS overpayment_205,
+           -- метаданные: сначала из 209, потом из 205
+           (array_agg(s.username ORDER BY s.account_type DESC)
+                FILTER (WHERE s.username IS NOT NULL))[1] AS username,
+           (array_agg(s.room_label ORDER BY s.account_type DESC)
+                FILTER (WHERE s.room_label IS NOT NULL))[1] AS room_label
+    FROM debt_snapshots s
+    JOIN latest l ON l.id = s.import_log_id
+    GROUP BY s.user_id
+),
+actual AS (
+    SELECT DISTINCT ON (user_id) id, user_id, room_id,
+           COALESCE(debt_209, 0) AS debt_209,
+           COALESCE(overpayment_209, 0) AS overpayment_209,
+           COALESCE(debt_205, 0) AS debt_205,
+           COALESCE(overpayment_205, 0) AS overpayment_205
+    FROM readings
+    WHERE period_id = :period_id AND user_id IS NOT NULL
+    ORDER BY user_id, id DESC
+)
+"""
+
+_DIFF = ("GREATEST(ABS(a.debt_209 - e.debt_209), ABS(a.overpayment_209 - e.overpayment_209), "
+         "ABS(a.debt_205 - e.debt_205), ABS(a.overpayment_205 - e.overpayment_205))")
+_EXPECTED_MAX = "GREATEST(e.debt_209, e.overpayment_209, e.debt_205, e.overpayment_205)"
+_ACTUAL_MAX = "GREATEST(a.debt_209, a.overpayment_209, a.debt_205, a.overpayment_205)"
+_ACTUAL_SUM = "(a.debt_209 + a.debt_205 + a.overpayment_209 + a.overpayment_205)"
+_USER_FILTER = "(CAST(:user_id AS INTEGER) IS NULL OR e.user_id = CAST(:user_id AS INTEGER))"
+
+_E_COLS = ", ".join(f"e.{c} AS e_{c}" for c in MONEY)
+_A_COLS = ", ".join(f"a.{c} AS a_{c}" for c in MONEY)
+_E_NULLS = ", ".join(f"NULL::numeric AS e_{c}" for c in MONEY)
+_A_NULLS = ", ".join(f"NULL::numeric AS a_{c}" for c in MONEY)
+
+DIVERGENCE_SQL = f"""
+WITH {_CTES},
+diverged AS (
+    SELECT 'drift' AS kind, e.user_id, a.id AS reading_id, a.room_id,
+           e.username, e.room_label, {_E_COLS}, {_A_COLS}, {_DIFF} AS magnitude
+    FROM expected e JOIN actual a ON a.user_id = e.user_id
+    WHERE {_DIFF} > :threshold
+    UNION ALL
+    SELECT 'missing', e.user_id, NULL, NULL,
+           e.username, e.room_label, {_E_COLS}, {_A_NULLS}, {_EXPECTED_MAX}
+    FROM expected e LEFT JOIN actual a ON a.user_id = e.user_id
+    WHERE a.id IS NULL AND {_EXPECTED_MAX} > :threshold
+    UNION ALL
+    SELECT 'extra', a.user_id, a.id, a.room_id,
+           u.username, NULL, {_E_NULLS}, {_A_COLS}, {_ACTUAL_SUM}
+    FROM actual a
+    LEFT JOIN expected e ON e.user_id = a.user_id
+    LEFT JOIN users u ON u.id = a.user_id
+    WHERE e.user_id IS NULL AND {_ACTUAL_MAX} > :threshold
+)
+SELECT * FROM (
+    SELECT d.*,
+           COUNT(*) OVER (PARTITION BY kind) AS kind_total,
+           ROW_NUMBER() OVER (PARTITION BY kind ORDER BY magnitude DESC, user_id) AS rn
+    FROM diverged d
+) ranked
+WHERE rn <= :limit
+ORDER BY kind, rn
+"""
+
+TOTALS_SQL = f"""
+WITH {_CTES}
+SELECT (SELECT id FROM latest WHERE account_type = '209') AS log_209,
+       (SELECT id FROM latest WHERE account_type = '205') AS log_205,
+       (SELECT COUNT(*) FROM expected) AS expected_users,
+       (SELECT COUNT(*) FROM actual) AS actual_readings
+"""
+
+LATEST_SQL = f"""
+WITH {_LATEST}
+SELECT (SELECT id FROM latest WHERE account_type = '209') AS log_209,
+       (SELECT id FROM latest WHERE account_type = '205') AS log_205,
+       (SELECT COUNT(*) FROM known) AS known_users
+"""
+
+FIX_DRIFT_SQL = f"""
+WITH {_CTES},
+drift AS (
+    SELECT a.id AS reading_id, e.*
+    FROM expected e JOIN actual a ON a.user_id = e.user_id
+    WHERE {_DIFF} > :threshold AND {_USER_FILTER}
+)
+UPDATE readings r
+SET debt_209 = d.debt_209, overpayment_209 = d.overpayment_209,
+    debt_205 = d.debt_205, overpayment_205 = d.overpayment_205
+FROM drift d
+WHERE r.id = d.reading_id
+RETURNING r.id
+"""
+
+MISSING_SQL = f"""
+WITH {_CTES}
+SELECT e.user_id, u.id AS existing_user_id, u.room_id,
+       e.debt_209, e.overpayment_209, e.debt_205, e.overpayment_205
+FROM expected e
+LEFT JOIN actual a ON a.user_id = e.user_id
+LEFT JOIN users u ON u.id = e.user_id
+WHERE a.id IS NULL AND {_EXPECTED_MAX} > :threshold AND {_USER_FILTER}
+"""
+
+# Зомби: показание с долгом/переплатой, чей жилец не упомянут ни в одном
+# из последних импортов (даже с нулём).
+_ZOMBIE_CTES = f"""
+{_LATEST},
+zombies AS (
+    SELECT r.id, r.user_id, r.room_id,
+           COALESCE(r.debt_209, 0) AS debt_209, COALESCE(r.overpayment_209, 0) AS overpayment_209,
+           COALESCE(r.debt_205, 0) AS debt_205, COALESCE(r.overpayment_205, 0) AS overpayment_205
+    FROM readings r
+    WHERE r.period_id = :period_id AND r.user_id IS NOT NULL
+      AND (r.debt_209 > 0 OR r.debt_205 > 0 OR r.overpayment_209 > 0 OR r.overpayment_205 > 0)
+      AND NOT EXISTS (SELECT 1 FROM known k WHERE k.user_id = r.user_id)
+)
+"""
+
+ZOMBIES_SQL = f"""
+WITH {_ZOMBIE_CTES}
+SELECT z.*, u.username
+FROM zombies z LEFT JOIN users u ON u.id = z.user_id
+ORDER BY (z.debt_209 + z.debt_205 + z.overpayment_209 + z.overpayment_205) DESC, z.id
+"""
+
+CLEAN_ZOMBIES_SQL = f"""
+WITH {_ZOMBIE_CTES}
+UPDATE readings
+SET debt_209 = 0, overpayment_209 = 0, debt_205 = 0, overpayment_205 = 0
+WHERE id IN (SELECT id FROM zombies)
+RETURNING id
+"""
+
+
+def _money(row, prefix: str) -> dict:
+    return {c: float(row[f"{prefix}{c}"] or 0) for c in MONEY}
+
+
+async def _room_labels(db: AsyncSession, room_ids) -> dict[int, str]:
+    """format_address — свойство модели, поэтому только для отданных строк."""
+    from sqlalchemy import select
+    from app.modules.utility.models import Room
+
+    room_ids = {rid for rid in room_ids if rid}
+    if not room_ids:
+        return {}
+    rooms = (await db.execute(select(Room).where(Room.id.in_(room_ids)))).scalars().all()
+    return {room.id: room.format_address for room in rooms}
+
+
+async def integrity_report(db: AsyncSession, period_id: int, limit: int = 200) -> dict:
+    """drift / missing_in_db / extra_in_db активного периода (до limit на категорию)."""
+    rows = (await db.execute(text(DIVERGENCE_SQL), {
+        "period_id": period_id, "threshold": THRESHOLD, "limit": limit,
+    })).mappings().all()
+    totals = (await db.execute(text(TOTALS_SQL), {"period_id": period_id})).mappings().one()
+
+    labels = await _room_labels(db, (r["room_id"] for r in rows if r["kind"] == "extra"))
+    out = {"drift": [], "missing_in_db": [], "extra_in_db": []}
+    counts = {"drift": 0, "missing": 0, "extra": 0}
+    for r in rows:
+        counts[r["kind"]] = int(r["kind_total"])
+        if r["kind"] == "drift":
+            out["drift"].append({
+                "user_id": r["user_id"], "reading_id": r["reading_id"],
+                "username": r["username"], "room_label": r["room_label"],
+                "expected": _money(r, "e_"), "actual": _money(r, "a_"),
+                "max_abs_diff": float(r["magnitude"]),
+            })
+        elif r["kind"] == "missing":
+            out["missing_in_db"].append({
+                "user_id": r["user_id"], "username": r["username"],
+                "room_label": r["room_label"], "expected": _money(r, "e_"),
+            })
+        else:
+            out["extra_in_db"].append({
+                "user_id": r["user_id"], "reading_id": r["reading_id"],
+                "username": r["username"], "room_label": labels.get(r["room_id"]),
+                "actual": _money(r, "a_"),
+            })
+
+    return {
+        "period_id": period_id,
+        "threshold_rub": THRESHOLD,
+        "latest_209_log_id": totals["log_209"],
+        "latest_205_log_id": totals["log_205"],
+        "summary": {
+            "drift_count": counts["drift"],
+            "missing_in_db_count": counts["missing"],
+            "extra_in_db_count": counts["extra"],
+            "expected_users": int(totals["expected_users"]),
+            "actual_readings": int(totals["actual_readings"]),
+        },
+        **out,
+    }
+
+
+async def fix_drift(db: AsyncSession, period_id: int, user_id: Optional[int] = None) -> int:
+    """Один UPDATE ... FROM: показания с расхождением → значения импорта."""
+    # Raw SQL — период из statement не виден, задаём его для period_stats.
+    scope_writes(db, [period_id])
+    res = await db.execute(text(FIX_DRIFT_SQL), {
+        "period_id": period_id, "threshold": THRESHOLD, "user_id": user_id,
+    })
+    return len(res.all())
+
+
+async def fix_missing(db: AsyncSession, period_id: int,
+                      user_id: Optional[int] = None) -> tuple[int, list[dict]]:
+    """Недостающие показания одним multi-row INSERT (черновиком, с нулевыми
+    оборотами). Жилец, которого нет в users, — в errors."""
+    from decimal import Decimal
+    from sqlalchemy import insert
+    from app.modules.utility.models import MeterReading
+
+    rows = (await db.execute(text(MISSING_SQL), {
+        "period_id": period_id, "threshold": THRESHOLD, "user_id": user_id,
+    })).mappings().all()
+    errors = [
+        {"kind": "missing", "user_id": r["user_id"], "error": "user не найден в БД"}
+        for r in rows if r["existing_user_id"] is None
+    ]
+    zero = Decimal("0")
+    values = [
+        {
+            "user_id": r["user_id"], "room_id": r["room_id"], "period_id": period_id,
+            "is_approved": False,
+            **{c: r[c] for c in MONEY},
+            "obor_debit_209": zero, "obor_credit_209": zero,
+            "obor_debit_205": zero, "obor_credit_205": zero,
+        }
+        for r in rows if r["existing_user_id"] is not None
+    ]
+    if values:
+        await db.execute(insert(MeterReading.__table__), values)
+    return len(values), errors
+
+
+async def latest_logs(db: AsyncSession) -> dict:
+    """{log_209, log_205, known_users} — последние импорты и сколько в них жильцов."""
+    return dict((await db.execute(text(LATEST_SQL))).mappings().one())
+
+
+async def zombie_readings(db: AsyncSession, period_id: int) -> list[dict]:
+    """Показания с долгом/переплатой, чьих жильцов нет в последних импортах."""
+    rows = (await db.execute(text(ZOMBIES_SQL), {"period_id": period_id})).mappings().all()
+    labels = await _room_labels(db, (r["room_id"] for r in rows))
+    return [
+        {
+            "reading_id": r["id"], "user_id": r["user_id"], "username": r["username"],
+            "room_id": r["room_id"], "room_label": labels.get(r["room_id"]),
+            **{c: float(r[c]) for c in MONEY},
+            "total_to_clean": float(sum(r[c] for c in MONEY)),
+        }
+        for r in rows
+    ]
+
+
+async def clean_zombies(db: AsyncSession, period_id: int) -> int:
+    """Один UPDATE: занулить debt_*/overpayment_* у зомби (предикат
+    пересчитывается в самом UPDATE — заново импортированного не тронем)."""
+    scope_writes(db, [period_id])
+    res = await db.execute(text(CLEAN_ZOMBIES_SQL), {"period_id": period_id})
+    return len(res.all())
+
+
+__all__ = [
+    "THRESHOLD",
+    "clean_zombies",
+    "fix_drift",
+    "fix_missing",
+    "integrity_report",
+    "latest_logs",
+    "zombie_readings",
+]
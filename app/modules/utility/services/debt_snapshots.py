@@ -0,0 +1,127 @@
+# app/modules/utility/services/debt_snapshots.py
+"""debt_snapshots — applied_state импортов 1С, разложенный в строки.
+
+applied_state ({user_id: {debt_209, overpayment_209, ..., room_label}})
+пишут четыре места: сам импорт (debt_import), «пересопоставить»
+черновики (debts_staged) и ручные привязки (debts_match). Чтобы ни одно
+не разошлось с таблицей, строки пишет слушатель after_flush Session: если
+у DebtImportLog изменился applied_state — строки этого импорта заменяются
+в той же транзакции (DELETE + multi-row INSERT). Слушатель регистрируется
+при импорте модуля — app/core/database.py импортирует его и в web, и в
+Celery.
+
+Для строки берётся долг/переплата СВОЕГО счёта импорта (debt_209 у 209,
+debt_205 у 205) — как в diff и истории жильца.
+"""
+from __future__ import annotations
+
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, event, insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK = 1000
+_TABLE = "debt_import_logs"
+
+
+def _money(value) -> Decimal:
+    try:
+        return Decimal(str(value if value not in (None, "") else "0")).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return Decimal("0.00")
+
+
+def _text(value, limit: int = 255) -> Optional[str]:
+    return str(value)[:limit] if value not in (None, "") else None
+
+
+def snapshot_rows(log_id: int, account_type: str, started_at,
+                  applied_state: Optional[dict]) -> list[dict]:
+    """Строки debt_snapshots одного импорта (ключи не-user_id пропускаются)."""
+    rows = []
+    for key, entry in (applied_state or {}).items():
+        if not isinstance(entry, dict) or not str(key).isdigit():
+            continue
+        room_id = entry.get("room_id")
+        rows.append({
+            "import_log_id": log_id,
+            "user_id": int(key),
+            "account_type": account_type,
+            "started_at": started_at,
+            "debt": _money(entry.get(f"debt_{account_type}")),
+            "overpayment": _money(entry.get(f"overpayment_{account_type}")),
+            "username": _text(entry.get("username")),
+            "room_id": int(room_id) if str(room_id or "").isdigit() else None,
+            "room_label": _text(entry.get("room_label")),
+        })
+    return rows
+
+
+def replace_snapshots(connection, log_id: int, account_type: str, started_at,
+                      applied_state: Optional[dict]) -> int:
+    """Заменить строки импорта log_id (Core, на переданном соединении)."""
+    from app.modules.utility.models import DebtSnapshot
+
+    table = DebtSnapshot.__table__
+    connection.execute(delete(table).where(table.c.import_log_id == log_id))
+    rows = snapshot_rows(log_id, account_type, started_at, applied_state)
+    for i in range(0, len(rows), INSERT_CHUNK):
+        connection.execute(insert(table), rows[i:i + INSERT_CHUNK])
+    return len(rows)
+
+
+def _changed_logs(objects: Iterable) -> list:
+    from sqlalchemy import inspect as sa_inspect
+
+    out = []
+    for obj in objects:
+        if getattr(obj, "__tablename__", None) != _TABLE:
+            continue
+        if sa_inspect(obj).attrs.applied_state.history.has_changes():
+            out.append(obj)
+    return out
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_snapshots(session, _flush_context):
+    logs = _changed_logs((*session.new, *session.dirty))
+    if not logs:
+        return
+    connection = session.connection()
+    for log in logs:
+        replace_snapshots(connection, log.id, log.account_type, log.started_at, log.applied_state)
+
+
+def backfill(db, log_ids: Optional[list[int]] = None) -> dict:
+    """Пересобрать строки из applied_state логов (sync Session). Идемпотентно."""
+    from sqlalchemy import select
+    from app.modules.utility.models import DebtImportLog
+
+    query = select(
+        DebtImportLog.id, DebtImportLog.account_type,
+        DebtImportLog.started_at, DebtImportLog.applied_state,
+    ).where(DebtImportLog.applied_state.is_not(None)).order_by(DebtImportLog.id)
+    if log_ids:
+        query = query.where(DebtImportLog.id.in_(log_ids))
+
+    logs = rows = 0
+    # По одному логу: applied_state — тысячи жильцов, все сразу не держим.
+    ids = [r[0] for r in db.execute(query.with_only_columns(DebtImportLog.id)).all()]
+    for log_id in ids:
+        log = db.execute(query.where(DebtImportLog.id == log_id)).first()
+        rows += replace_snapshots(db.connection(), log.id, log.account_type,
+                                  log.started_at, log.applied_state)
+        logs += 1
+        db.commit()
+    return {"logs": logs, "rows": rows}
+
+
+__all__ = [
+    "backfill",
+    "replace_snapshots",
+    "snapshot_rows",
+]
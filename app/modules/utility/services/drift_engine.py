@@ -0,0 +1,196 @@
+# app/modules/utility/services/drift_engine.py
+"""Общий движок drift-проверки периода: хранимый total ↔ текущая формула.
+
+Им пользуются оба анализатора — read-only отчёт
+(recalc_drift_analyzer.detect_drift_in_period) и ночной авто-перерасчёт
+(auto_recalc_drift.auto_recalc_drift). Раньше каждый на КАЖДЫЙ reading
+делал свой SELECT предыдущего показания (по period_id — ретроактивные
+периоды давали не тот prev) и запасной SELECT активного тарифа.
+
+Теперь на период фиксированное число запросов:
+  1) approved-reading'и периода + жилец + комната (selectinload);
+  2) кандидаты prev для всех пар (user_id, room_id) — PrevReadingIndex,
+     канонический pick_prev_pair, как у «Проверить расчёт»;
+  3) сезонные флаги — один раз; тариф — из tariff_cache (запасной
+     активный тариф читается максимум один раз на прогон).
+Дальше compute_reading_breakdown в плотном цикле без SQL. Время этапов
+возвращается в timings_ms — видно, во что упирается ночной прогон.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.modules.utility.models import (
+    BillingPeriod, MeterReading, Room, Tariff, User,
+)
+from app.modules.utility.services.calculations import CalculationError
+from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+from app.modules.utility.services.reading_calculator import compute_reading_breakdown
+from app.modules.utility.services.tariff_cache import tariff_cache
+
+# Поля стоимости, которые перерасчёт пишет в reading.
+COST_FIELDS = (
+    "cost_hot_water", "cost_cold_water", "cost_sewage",
+    "cost_electricity", "cost_maintenance", "cost_social_rent",
+    "cost_waste", "cost_fixed_part",
+)
+
+
+def _dec(v) -> Decimal:
+    return Decimal(str(v)) if v is not None else Decimal("0")
+
+
+@dataclass(slots=True)
+class DriftCheck:
+    """Один пересчитанный reading."""
+    reading: MeterReading
+    user: User
+    room: Room
+    breakdown: dict
+    stored: Decimal
+    calc: Decimal
+
+    @property
+    def diff(self) -> Decimal:
+        return self.calc - self.stored
+
+
+@dataclass(slots=True)
+class DriftBatch:
+    period: Optional[BillingPeriod]
+    checks: list[DriftCheck] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+    timings_ms: dict = field(default_factory=dict)
+
+
+class _Stopwatch:
+    def __init__(self):
+        self.timings: dict[str, int] = {}
+        self._last = time.monotonic()
+
+    def lap(self, name: str) -> None:
+        now = time.monotonic()
+        self.timings[name] = int((now - self._last) * 1000)
+        self._last = now
+
+
+async def compute_period_drift(db, period_id: int, *, limit: Optional[int] = None) -> DriftBatch:
+    """Пересчитывает все approved-reading'и периода. Без записи в БД."""
+    watch = _Stopwatch()
+    period = await db.get(BillingPeriod, period_id)
+    if not period:
+        return DriftBatch(period=None)
+
+    stmt = (
+        select(MeterReading)
+        .options(selectinload(MeterReading.user), selectinload(MeterReading.room))
+        .where(
+            MeterReading.period_id == period_id,
+            MeterReading.is_approved.is_(True),
+        )
+        .order_by(MeterReading.id)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    readings = list((await db.execute(stmt)).scalars().all())
+    watch.lap("load_readings")
+
+    # Комната reading'а (r.room), НЕ текущая комната жильца — иначе после
+    # переезда история считалась бы по тарифу новой комнаты.
+    index = PrevReadingIndex.for_session(db)
+    await index.load(db, [
+        PrevKey(r.user_id, r.room_id, period.name)
+        for r in readings if r.user and r.room
+    ])
+    watch.lap("load_prev")
+
+    from app.modules.utility.routers.settings import _load_seasonal
+    seasonal = await _load_seasonal(db)
+
+    fallback: list = []  # [Tariff | None] — запасной тариф, читается ≤ 1 раза
+
+    async def _fallback_tariff():
+        if not fallback:
+            fallback.append((await db.execute(
+                select(Tariff).where(Tariff.is_active.is_(True))
+            )).scalars().first())
+        return fallback[0]
+
+    # Сезонные флаги зависят только от тарифа — считаем на тариф, не на reading.
+    season_flags: dict[int, tuple[bool, bool]] = {}
+    batch = DriftBatch(period=period)
+    for r in readings:
+        user, room = r.user, r.room
+        if not user or not room:
+            batch.errors.append({"reading_id": r.id, "reason": "no_user_or_room"})
+            continue
+        tariff = tariff_cache.get_effective_tariff(user=user, room=room)
+        if tariff is None:
+            tariff = await _fallback_tariff()
+        if tariff is None:
+            batch.errors.append({
+                "reading_id": r.id, "user_id": user.id, "reason": "no_active_tariff",
+            })
+            continue
+        flags = season_flags.get(tariff.id)
+        if flags is None:
+            flags = season_flags[tariff.id] = (
+                seasonal.heating_season_active and tariff.is_heating_active_now(),
+                seasonal.hot_water_heating_active and tariff.is_hw_heating_active_now(),
+            )
+
+        prev = index.pick(user.id, room.id, period.name, exclude_id=r.id)[0]
+        try:
+            bd = compute_reading_breakdown(
+                user=user, room=room, tariff=tariff,
+                current_hot=r.hot_water or 0,
+                current_cold=r.cold_water or 0,
+                current_elect=r.electricity or 0,
+                prev_reading=prev,
+                heating_season_active=flags[0],
+                hot_water_heating_active=flags[1],
+            )
+        except CalculationError as e:
+            batch.errors.append({
+                "reading_id": r.id, "user_id": user.id, "reason": f"calc_error: {e}",
+            })
+            continue
+        batch.checks.append(DriftCheck(
+            reading=r, user=user, room=room, breakdown=bd,
+            stored=_dec(r.total_cost), calc=_dec(bd["total_cost"]),
+        ))
+    watch.lap("compute")
+
+    batch.timings_ms = watch.timings
+    return batch
+
+
+def fix_values(check: DriftCheck, anomaly_flags: Optional[str]) -> dict:
+    """Параметры bulk UPDATE по PK для одного reading'а: стоимость и итоги
+    из breakdown (отсутствующие компоненты — как были) + флаги."""
+    r, bd = check.reading, check.breakdown
+    values = {"id": r.id, "created_at": r.created_at}
+    for k in COST_FIELDS:
+        values[k] = bd[k] if k in bd else getattr(r, k)
+    values.update(
+        total_209=bd["total_209"],
+        total_205=bd["total_205"],
+        total_cost=bd["total_cost"],  # триггер тоже выставит, дублируем явно
+        anomaly_flags=anomaly_flags,
+    )
+    return values
+
+
+__all__ = [
+    "COST_FIELDS",
+    "DriftBatch",
+    "DriftCheck",
+    "compute_period_drift",
+    "fix_values",
+]
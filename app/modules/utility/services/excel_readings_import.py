@@ -262,18 +262,38 @@ async def _load_adjustments(
     return out
 
 
-def _norm_volumes(tariff: Tariff, user: User, room: Room) -> tuple[Decimal, Decimal, Decimal]:
+class _NormVolumes:
     """Объёмы по нормативу для не подавших — через ПРОВЕРЕННУЮ функцию
-    авто-добивки (_growing_norm_volumes, miss_count=0 → без санкции ×1)."""
-    from app.modules.utility.services.billing import _growing_norm_volumes
-    from app.modules.utility.services.calculations import paying_residents
-    residents = D(paying_residents(user, room))
-    vol_hot, vol_cold, vol_el, _coef = _growing_norm_volumes(
-        tariff, residents, miss_count=0, room=room,
-    )
-    total = D(room.total_room_residents if room and room.total_room_residents else 1)
-    share_el = max(ZERO, (residents / total) * vol_el) if total > ZERO else ZERO
-    return vol_hot, vol_cold, share_el
+    авто-добивки (_growing_norm_volumes, miss_count=0 → без санкции ×1),
+    один расчёт на группу, а не на жильца.
+
+    _growing_norm_volumes при miss_count=0 зависит только от тарифа (charge_*
+    и нормативы) и флагов счётчиков комнаты — на здание это 2-3 группы на
+    сотни строк. Доля электричества (residents/total) досчитывается по строке."""
+
+    def __init__(self):
+        self._by_group: dict[tuple, tuple[Decimal, Decimal, Decimal]] = {}
+
+    def __call__(self, tariff: Tariff, user: User, room: Room) -> tuple[Decimal, Decimal, Decimal]:
+        from app.modules.utility.services.billing import _growing_norm_volumes
+        from app.modules.utility.services.calculations import paying_residents
+        residents = D(paying_residents(user, room))
+        group = (
+            id(tariff),
+            getattr(room, "has_hw_meter", None),
+            getattr(room, "has_cw_meter", None),
+            getattr(room, "has_el_meter", None),
+        )
+        vols = self._by_group.get(group)
+        if vols is None:
+            vol_hot, vol_cold, vol_el, _coef = _growing_norm_volumes(
+                tariff, residents, miss_count=0, room=room,
+            )
+            vols = self._by_group[group] = (vol_hot, vol_cold, vol_el)
+        vol_hot, vol_cold, vol_el = vols
+        total = D(room.total_room_residents if room and room.total_room_residents else 1)
+        share_el = max(ZERO, (residents / total) * vol_el) if total > ZERO else ZERO
+        return vol_hot, vol_cold, share_el
 
 
 def _consumption_volumes(
@@ -360,28 +380,15 @@ def _build_match_indexes_sync() -> tuple[dict, list, dict, dict]:
     return umap, ukeys, ubyid, amap
 
 
-async def build_preview(
-    db: AsyncSession, parsed: dict, period_id: Optional[int],
-    forced_match: Optional[dict] = None,
-) -> dict:
-    """На каждого человека из Excel: матч ФИО→жилец, прогон анализаторов,
-    предварительная сумма, агрегированный вердикт. Ничего не пишет.
-
-    forced_match: {key → user_id} — для строк, где админ уже назначил жильца
-    (переназначение/создание/правка ФИО при пересчёте) — fuzzy пропускаем."""
+def _match_people_sync(parsed: dict, forced_match: dict) -> dict:
+    """Стадия «матч»: индексы жильцов (sync-сессия) + сопоставление ВСЕХ ФИО.
+    Чистый CPU после загрузки индексов — идёт в потоке, параллельно с
+    батч-загрузками async-сессии в build_preview."""
     from app.modules.utility.services.gsheets_sync import match_user, _fuzzy_threshold
-    from app.modules.utility.services.reading_validators import validate_meter_reading
-    from app.modules.utility.services.tariff_cache import tariff_cache
 
-    forced_match = forced_match or {}
-    # Матчер синхронный (sync Session) — строим индексы в потоке. match_user
-    # чистый (без БД), зовём прямо в async-цикле.
-    users_map, users_keys, users_by_id, aliases_map = await asyncio.to_thread(
-        _build_match_indexes_sync
-    )
+    users_map, users_keys, users_by_id, aliases_map = _build_match_indexes_sync()
     fuzzy_thr = _fuzzy_threshold()
 
-    # ── Фаза 1: матч всех ФИО (чисто), сбор найденных user_id ──
     matched_rows: list[tuple[dict, dict, int, bool]] = []  # (row, info, score, conflict)
     items: list[dict] = []
     counts = {"ok": 0, "warning": 0, "error": 0, "unmatched": 0, "norm": 0}
@@ -416,26 +423,31 @@ async def build_preview(
         matched_ids.add(info["id"])
         matched_rows.append((row, info, score, bool(conflict)))
 
-    # ── Батч-загрузка: жильцы с комнатами, сезонные настройки, корректировки ──
-    from app.modules.utility.routers.settings import _load_seasonal
-    from app.modules.utility.services.reading_validators import validate_total_cost
-    seasonal = await _load_seasonal(db)
-    # Сверка с буфером Google Sheets за окно вокруг выбранного месяца.
-    period = await db.get(BillingPeriod, period_id) if period_id else None
-    window = _gsheets_window(period.name if period else None)
-    gs_by_fio, gs_by_uid = await _load_gsheets_lookup(db, window)
-    users_by_id_orm: dict[int, User] = {}
-    if matched_ids:
-        for u in (await db.execute(
-            select(User).options(selectinload(User.room)).where(User.id.in_(matched_ids))
-        )).scalars().all():
-            users_by_id_orm[u.id] = u
-    adj_by_user = await _load_adjustments(db, list(matched_ids), period_id)
-    fallback_tariff = (await db.execute(
-        select(Tariff).where(Tariff.is_active)
-    )).scalars().first()
+    return {"items": items, "matched_rows": matched_rows,
+            "counts": counts, "matched_ids": matched_ids}
+
+
+def _analyze_matched(
+    matched_rows: list[tuple[dict, dict, int, bool]],
+    parsed: dict,
+    users_by_id_orm: dict[int, User],
+    adj_by_user: dict[int, dict[str, Decimal]],
+    fallback_tariff: Optional[Tariff],
+    seasonal,
+    items: list[dict],
+    counts: dict,
+) -> None:
+    """Стадия «анализ»: вердикт и предварительная сумма по каждому
+    сматченному. Все данные уже загружены батчем — ни одного запроса в
+    цикле, поэтому стадия целиком уходит в поток (не держит event loop
+    на листе в 1000+ жильцов)."""
+    from app.modules.utility.services.reading_validators import (
+        validate_meter_reading, validate_total_cost,
+    )
+    from app.modules.utility.services.tariff_cache import tariff_cache
+
+    norm_volumes = _NormVolumes()
 
-    # ── Фаза 2: анализ каждого сматченного (без запросов в цикле) ──
     for row, info, score, conflict in matched_rows:
         rec = parsed["people"][row["key"]]
         user = users_by_id_orm.get(info["id"])
@@ -507,7 +519,7 @@ async def build_preview(
                 vol_hot, vol_cold, share_el = _consumption_volumes(user, room, cur, prev)
                 row["status"] = "submitted"
             else:
-                vol_hot, vol_cold, share_el = _norm_volumes(tariff, user, room)
+                vol_hot, vol_cold, share_el = norm_volumes(tariff, user, room)
                 row["status"] = "norm"
                 row["reasons"].append("Не подал показания — начислим по нормативу")
                 if verdict == "ok":
@@ -528,7 +540,7 @@ async def build_preview(
             row["reasons"].append(f"Тариф не настроен: {ce}")
             verdict = "error"
         except Exception as ex:  # noqa: BLE001
-            logger.warning("[EXCEL-IMPORT] preview calc failed fio=%s: %s", fio, ex)
+            logger.warning("[EXCEL-IMPORT] preview calc failed fio=%s: %s", row["fio"], ex)
             row["reasons"].append("Ошибка расчёта — проверьте тариф/комнату")
             verdict = "error"
 
@@ -536,6 +548,56 @@ async def build_preview(
         counts[verdict] = counts.get(verdict, 0) + 1
         items.append(row)
 
+
+async def build_preview(
+    db: AsyncSession, parsed: dict, period_id: Optional[int],
+    forced_match: Optional[dict] = None,
+) -> dict:
+    """На каждого человека из Excel: матч ФИО→жилец, прогон анализаторов,
+    предварительная сумма, агрегированный вердикт. Ничего не пишет.
+
+    Конвейер: матч (поток, своя sync-сессия) идёт ПАРАЛЛЕЛЬНО с загрузками,
+    не зависящими от него (сезонные, период, буфер GSheets, тариф-fallback);
+    затем жильцы/корректировки найденных — по одному запросу; затем анализ
+    в потоке без единого запроса в цикле.
+
+    forced_match: {key → user_id} — для строк, где админ уже назначил жильца
+    (переназначение/создание/правка ФИО при пересчёте) — fuzzy пропускаем."""
+    from app.modules.utility.routers.settings import _load_seasonal
+
+    forced_match = forced_match or {}
+    match_stage = asyncio.create_task(
+        asyncio.to_thread(_match_people_sync, parsed, forced_match)
+    )
+    try:
+        seasonal = await _load_seasonal(db)
+        # Сверка с буфером Google Sheets за окно вокруг выбранного месяца.
+        period = await db.get(BillingPeriod, period_id) if period_id else None
+        window = _gsheets_window(period.name if period else None)
+        gs_by_fio, gs_by_uid = await _load_gsheets_lookup(db, window)
+        fallback_tariff = (await db.execute(
+            select(Tariff).where(Tariff.is_active)
+        )).scalars().first()
+    finally:
+        matched = await match_stage
+
+    items: list[dict] = matched["items"]
+    counts: dict = matched["counts"]
+    matched_ids: set[int] = matched["matched_ids"]
+
+    users_by_id_orm: dict[int, User] = {}
+    if matched_ids:
+        for u in (await db.execute(
+            select(User).options(selectinload(User.room)).where(User.id.in_(matched_ids))
+        )).scalars().all():
+            users_by_id_orm[u.id] = u
+    adj_by_user = await _load_adjustments(db, list(matched_ids), period_id)
+
+    await asyncio.to_thread(
+        _analyze_matched, matched["matched_rows"], parsed, users_by_id_orm,
+        adj_by_user, fallback_tariff, seasonal, items, counts,
+    )
+
     # Сверка с Google Sheets — на каждую строку (вкл. ненайденных, по ФИО).
     gs_present = gs_mismatch = 0
     for row in items:
@@ -570,6 +632,64 @@ async def build_preview(
     }
 
 
+# =====================================================================
+# Кэш превью по хэшу файла — повторное открытие того же Excel мгновенно
+# =====================================================================
+# Превью зависит от файла, периода и справочников (жильцы/тарифы/буфер
+# GSheets). Кэшируем на PREVIEW_CACHE_TTL в том же Redis, что fastapi-cache;
+# утверждение импорта сбрасывает весь namespace. Redis недоступен — просто
+# без кэша.
+PREVIEW_CACHE_NAMESPACE = "excel_preview"
+PREVIEW_CACHE_TTL = 15 * 60
+
+
+def preview_file_hash(content: bytes) -> str:
+    import hashlib
+    return hashlib.sha256(content).hexdigest()
+
+
+def _preview_cache_key(file_hash: str, period_id: Optional[int]) -> str:
+    from fastapi_cache import FastAPICache
+    return f"{FastAPICache.get_prefix()}:{PREVIEW_CACHE_NAMESPACE}:{file_hash}:{period_id or 0}"
+
+
+async def get_cached_preview(file_hash: str, period_id: Optional[int]) -> Optional[dict]:
+    import json
+    from fastapi_cache import FastAPICache
+    try:
+        raw = await FastAPICache.get_backend().get(_preview_cache_key(file_hash, period_id))
+    except Exception as e:  # noqa: BLE001
+        logger.debug("[EXCEL-IMPORT] preview cache get skipped: %s", e)
+        return None
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+async def store_preview(file_hash: str, period_id: Optional[int], preview: dict) -> None:
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from fastapi_cache import FastAPICache
+    try:
+        blob = json.dumps(jsonable_encoder(preview), ensure_ascii=False)
+        await FastAPICache.get_backend().set(
+            _preview_cache_key(file_hash, period_id), blob, expire=PREVIEW_CACHE_TTL,
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.debug("[EXCEL-IMPORT] preview cache set skipped: %s", e)
+
+
+async def invalidate_previews() -> None:
+    from fastapi_cache import FastAPICache
+    try:
+        await FastAPICache.clear(namespace=PREVIEW_CACHE_NAMESPACE)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("[EXCEL-IMPORT] preview cache clear failed: %s", e)
+
+
 def _res_label(r: str) -> str:
     return {"hot": "ГВС", "cold": "ХВС", "elect": "Электр."}.get(r, r)
 
@@ -714,7 +834,8 @@ async def recompute_preview(
 # COMMIT — создание утверждённых MeterReading прямо в финотчётность
 # =====================================================================
 
-async def _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff, seasonal) -> bool:
+def _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff, seasonal,
+                          prev_existing: set[int]) -> bool:
     """Создаёт baseline-показание за ПРЕДЫДУЩИЙ период из колонки «Предыдущий»
     Excel (2026-06-18). Зачем: текущий месяц считается как дельта от предыдущего,
     и без СОХРАНЁННОГО предыдущего показания (а) предыдущий месяц не виден в
@@ -722,14 +843,10 @@ async def _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff, sea
 
     Это baseline (только площадь/наём, без расхода) — расход предыдущего месяца
     нельзя посчитать без ЕГО предыдущего (позапрошлого). Идемпотентно: если за
-    prev-период у жильца уже есть approved-показание — НЕ трогаем (импорт по
-    порядку месяцев сам построит цепочку с расходом)."""
-    ex = (await db.execute(select(MeterReading.id).where(
-        MeterReading.user_id == user.id,
-        MeterReading.period_id == prev_period_id,
-        MeterReading.is_approved.is_(True),
-    ).limit(1))).scalars().first()
-    if ex:
+    prev-период у жильца уже есть approved-показание (prev_existing — загружен
+    одним запросом на весь импорт) — НЕ трогаем (импорт по порядку месяцев сам
+    построит цепочку с расходом)."""
+    if user.id in prev_existing:
         return False
     prev = {r: _num((dec.get(r) or {}).get("prev")) for r in _RES_KEYS}
     if all(prev[r] is None for r in _RES_KEYS):
@@ -747,9 +864,21 @@ async def _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff, sea
         anomaly_flags=f"{EXCEL_FLAG},BASELINE", anomaly_score=0,
         **costs_for_model_fields(costs),
     ))
+    prev_existing.add(user.id)
     return True
 
 
+async def _approved_user_ids(db: AsyncSession, user_ids: set[int], period_id: int) -> set[int]:
+    """user_id с утверждённым показанием за период — одним запросом."""
+    return set((await db.execute(
+        select(MeterReading.user_id).where(
+            MeterReading.user_id.in_(user_ids),
+            MeterReading.period_id == period_id,
+            MeterReading.is_approved.is_(True),
+        ).distinct()
+    )).scalars().all())
+
+
 async def commit_import(
     db: AsyncSession, period_id: int, decisions: list[dict], actor: Optional[User],
     prev_period_id: Optional[int] = None,
@@ -770,47 +899,52 @@ async def commit_import(
 
     from app.modules.utility.routers.settings import _load_seasonal
     seasonal = await _load_seasonal(db)
-    dec_ids = [d.get("user_id") for d in decisions if d.get("user_id")]
-    adj_by_user = await _load_adjustments(db, dec_ids, period_id)
+    decided_uids = {d.get("user_id") for d in decisions if d.get("user_id")}
+    adj_by_user = await _load_adjustments(db, list(decided_uids), period_id)
     fallback_tariff = (await db.execute(
         select(Tariff).where(Tariff.is_active)
     )).scalars().first()
 
+    # Всё, что раньше читалось по 2-3 запроса на жильца, — одним запросом
+    # на импорт: жильцы с комнатами, уже утверждённые за период (анти-дубль)
+    # и за prev-период (идемпотентность baseline).
+    users_by_id: dict[int, User] = {}
+    existing: set[int] = set()
+    prev_existing: set[int] = set()
+    if decided_uids:
+        users_by_id = {u.id: u for u in (await db.execute(
+            select(User).options(selectinload(User.room)).where(User.id.in_(decided_uids))
+        )).scalars().all()}
+        # Анти-дубль: уже есть утверждённый reading за этот период у ЖИЛЬЦА.
+        # БЕЗ фильтра по room_id (2026-06-18): на readings нет UNIQUE(user_id,
+        # period_id), и фильтр по room_id давал обход — если прежний reading
+        # был в другой/NULL комнате, импорт плодил ВТОРОЙ approved за период
+        # (баг дубля Петрова за май). Один жилец = одно показание за период.
+        existing = await _approved_user_ids(db, decided_uids, period_id)
+        if prev_period_id:
+            prev_existing = await _approved_user_ids(db, decided_uids, prev_period_id)
+
     created = skipped_existing = failed = prev_created = 0
     errors: list[dict] = []
     # Холостяцкие квартиры: коммуналка делится поровну. Запоминаем по одной
     # посчитанной (делёной) квитанции на квартиру и после цикла тиражируем её
     # на жильцов квартиры, которых НЕ было в импорте (см. propagate ниже).
-    decided_uids = {d.get("user_id") for d in decisions if d.get("user_id")}
     singles_sources: dict = {}
+    norm_volumes = _NormVolumes()
 
     for dec in decisions:
         uid = dec.get("user_id")
         if not uid:
             continue
         try:
-            user = (await db.execute(
-                select(User).options(selectinload(User.room)).where(User.id == uid)
-            )).scalars().first()
+            user = users_by_id.get(uid)
             if not user or not user.room:
                 failed += 1
                 errors.append({"user_id": uid, "reason": "нет помещения"})
                 continue
             room = user.room
 
-            # Анти-дубль: уже есть утверждённый reading за этот период у ЖИЛЬЦА.
-            # БЕЗ фильтра по room_id (2026-06-18): на readings нет UNIQUE(user_id,
-            # period_id), и фильтр по room_id давал обход — если прежний reading
-            # был в другой/NULL комнате, импорт плодил ВТОРОЙ approved за период
-            # (баг дубля Петрова за май). Один жилец = одно показание за период.
-            exists = (await db.execute(
-                select(MeterReading.id).where(
-                    MeterReading.user_id == uid,
-                    MeterReading.period_id == period_id,
-                    MeterReading.is_approved.is_(True),
-                ).limit(1)
-            )).scalars().first()
-            if exists:
+            if uid in existing:
                 skipped_existing += 1
                 continue
 
@@ -824,7 +958,8 @@ async def commit_import(
             # (база для расчёта текущего + видимость в финотчёте).
             if prev_period_id:
                 try:
-                    if await _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff, seasonal):
+                    if _ensure_prev_baseline(db, user, room, dec, prev_period_id, tariff,
+                                             seasonal, prev_existing):
                         prev_created += 1
                 except Exception as ex:  # noqa: BLE001
                     logger.warning("[EXCEL-IMPORT] prev baseline user=%s: %s", uid, ex)
@@ -834,7 +969,7 @@ async def commit_import(
             prev = {r: _num((dec.get(r) or {}).get("prev")) for r in _RES_KEYS}
 
             if status == "norm":
-                vol_hot, vol_cold, share_el = _norm_volumes(tariff, user, room)
+                vol_hot, vol_cold, share_el = norm_volumes(tariff, user, room)
                 flags = f"AUTO_NORM,{EXCEL_FLAG}"
                 # Показания не меняем — берём последние известные (prev из Excel
                 # или текущие в комнате), счётчик не «крутим».
@@ -871,6 +1006,7 @@ async def commit_import(
             room.last_cold_water = read_cold
             room.last_electricity = read_el
             db.add(room)
+            existing.add(uid)
             created += 1
 
             # Запоминаем источник для тиражирования по холостяцкой квартире.
@@ -917,6 +1053,8 @@ async def commit_import(
                      "prev_created": prev_created, "period": period.name},
         )
     await db.commit()
+    # Утверждение меняет данные превью (анти-дубль, показания) — сбрасываем.
+    await invalidate_previews()
     return {
         "status": "ok", "period": period.name,
         "created": created, "skipped_existing": skipped_existing,
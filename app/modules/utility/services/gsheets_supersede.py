@@ -28,7 +28,9 @@ retention чистит его как rejected). Уведомление жиль
 нетерминальный И reading_id IS NULL), чтобы не перетереть параллельный
 approve/reject другим админом.
 
-Вызывается self-heal'ом из unified_registry (отдельная сессия).
+Вызывается периодической задачей retire_superseded_gsheets_rows_task
+(retire_stale_buffer_rows). Раньше — self-heal'ом в каждом GET реестра:
+загрузка всего нерешённого буфера на каждый просмотр страницы.
 Коммит — на вызывающем.
 """
 from __future__ import annotations
@@ -130,3 +132,17 @@ async def retire_superseded_rows(
         )
         retired += res.rowcount or 0
     return retired
+
+
+async def retire_stale_buffer_rows(db: AsyncSession) -> int:
+    """Прогон по всему нерешённому буферу: сопоставленные строки без
+    reading_id → retire_superseded_rows. Возвращает число погашенных."""
+    rows = (await db.execute(
+        select(GSheetsImportRow).where(
+            GSheetsImportRow.reading_id.is_(None),
+            GSheetsImportRow.matched_user_id.isnot(None),
+            GSheetsImportRow.status.in_(_UNRESOLVED),
+            GSheetsImportRow.match_score >= _TRUSTED_SCORE,
+        )
+    )).scalars().all()
+    return await retire_superseded_rows(db, rows)
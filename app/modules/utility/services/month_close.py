@@ -0,0 +1,349 @@
+# app/modules/utility/services/month_close.py
+"""Закрытие месяца как граф этапов (DAG) с общим контекстом прогона.
+
+Раньше закрытие месяца — последовательность ручных кнопок/задач: наём
+домов, «без условий», норматив, холостяки, закрытие, квитанции, новый
+период, выгрузка 1С. Каждый шаг заново грузил период/тарифы/комнаты,
+независимые шаги ждали друг друга, а упавший шаг приходилось искать
+по логам и перезапускать всю цепочку.
+
+Здесь этапы — узлы графа с явными зависимостями (DEPENDENCIES). Прогон
+(MonthCloseRun) хранит состояние каждого этапа; Celery-этап по
+завершении сам ставит в очередь этапы, чьи зависимости выполнены
+(tasks/month_close.py), поэтому независимые ветки идут параллельно:
+
+    preload ─┬─ static_rent ────────┬─ auto_norm ─ singles ─ close ─┬─ receipts
+             └─ unconditional_norm ─┘                               └─ open_next ─ onec_publish
+
+  * preload один раз собирает общий контекст (период, id холостяцких
+    комнат, тарифы «без условий», пересечение с домами) и кладёт его в
+    run.context — этапы берут id оттуда, а не ищут заново. ORM-объекты
+    между процессами воркеров не передать, поэтому общий контекст — это
+    id и флаги, а не загруженные строки;
+  * static_rent и unconditional_norm независимы, КРОМЕ домов на тарифе
+    «без условий»: обе функции пропускают жильца «если reading уже есть»,
+    и параллельно создали бы два начисления. Если preload нашёл такие
+    комнаты, граф добавляет ребро static_rent → unconditional_norm;
+  * выключенные опциями этапы сразу «skipped» и считаются выполненными.
+
+Функции графа (build_dag / initial_states / ready_stages / levels) —
+чистые: ни БД, ни Celery; их покрывают unit-тесты.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Порядок = порядок показа в UI.
+STAGES = (
+    "preload",
+    "static_rent",
+    "unconditional_norm",
+    "auto_norm",
+    "singles",
+    "close",
+    "receipts",
+    "open_next",
+    "onec_publish",
+)
+
+DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    "preload": (),
+    "static_rent": ("preload",),
+    "unconditional_norm": ("preload",),
+    "auto_norm": ("static_rent", "unconditional_norm"),
+    "singles": ("auto_norm",),
+    "close": ("singles",),
+    "receipts": ("close",),
+    "open_next": ("close",),
+    "onec_publish": ("open_next",),
+}
+
+# Этап считается выполненным для зависимых.
+SATISFIED = ("done", "skipped")
+
+# running дольше жёсткого лимита Celery-задачи (+ запас на переходы
+# состояний) — воркер мёртв, этап можно запускать заново.
+STALE_RUNNING_SECONDS = settings.CELERY_TASK_TIME_LIMIT + 60
+
+
+# =========================================================================
+# ГРАФ (чистые функции)
+# =========================================================================
+def build_dag(options: Optional[dict], context: Optional[dict]) -> dict[str, tuple[str, ...]]:
+    """Зависимости этапов с учётом контекста preload."""
+    dag = dict(DEPENDENCIES)
+    if (context or {}).get("house_unconditional_rooms"):
+        dag["unconditional_norm"] = dag["unconditional_norm"] + ("static_rent",)
+    return dag
+
+
+def disabled_stages(options: Optional[dict]) -> set[str]:
+    options = options or {}
+    disabled = set()
+    if not options.get("generate_norm"):
+        disabled.add("auto_norm")
+    if not options.get("receipts", True):
+        disabled.add("receipts")
+    if not options.get("next_period_name"):
+        disabled.update(("open_next", "onec_publish"))
+    elif not options.get("onec_publish", True):
+        disabled.add("onec_publish")
+    return disabled
+
+
+def initial_states(options: Optional[dict]) -> dict[str, dict]:
+    disabled = disabled_stages(options)
+    return {
+        stage: {"status": "skipped" if stage in disabled else "pending", "attempts": 0}
+        for stage in STAGES
+    }
+
+
+def ready_stages(dag: dict[str, tuple[str, ...]], states: dict[str, dict]) -> list[str]:
+    """pending-этапы, все зависимости которых выполнены (в порядке STAGES)."""
+    return [
+        stage for stage in STAGES
+        if states[stage]["status"] == "pending"
+        and all(states[dep]["status"] in SATISFIED for dep in dag[stage])
+    ]
+
+
+def run_status(states: dict[str, dict]) -> str:
+    """running — есть что выполнять; failed — упал этап и ждать больше нечего."""
+    statuses = [s["status"] for s in states.values()]
+    if all(s in SATISFIED for s in statuses):
+        return "done"
+    if "failed" in statuses and not any(s in ("queued", "running") for s in statuses):
+        return "failed"
+    return "running"
+
+
+def levels(dag: dict[str, tuple[str, ...]]) -> list[list[str]]:
+    """Топологические уровни: этапы одного уровня могут идти параллельно."""
+    depth: dict[str, int] = {}
+    for stage in STAGES:  # STAGES уже топологически упорядочен
+        depth[stage] = 1 + max((depth[d] for d in dag[stage]), default=-1)
+    out: list[list[str]] = [[] for _ in range(max(depth.values()) + 1)]
+    for stage in STAGES:
+        out[depth[stage]].append(stage)
+    return out
+
+
+def is_stuck(state: dict, now: Optional[datetime] = None) -> bool:
+    """Этап «завис»: воркер умер (acks_late + reject_on_worker_lost — задача
+    вернётся в очередь, но могла и потеряться) или сообщение пропало.
+
+      queued  — всегда можно переставить: лишнее сообщение отсечёт
+                _begin_stage (этап уже не queued);
+      running — только если started_at старше жёсткого лимита задачи:
+                живой этап столько не идёт, его убил бы time_limit.
+    """
+    status = state.get("status")
+    if status == "queued":
+        return True
+    if status != "running":
+        return False
+    started = state.get("started_at")
+    if not started:
+        return True
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now - datetime.fromisoformat(started)).total_seconds() > STALE_RUNNING_SECONDS
+
+
+def restartable(states: dict[str, dict], now: Optional[datetime] = None) -> list[str]:
+    """Упавшие и зависшие этапы — их перезапускают retry/resume."""
+    return [
+        name for name in STAGES
+        if states[name]["status"] == "failed" or is_stuck(states[name], now)
+    ]
+
+
+def reset_failed(states: dict[str, dict], stage: Optional[str] = None,
+                 now: Optional[datetime] = None) -> list[str]:
+    """Упавшие и зависшие (is_stuck) → pending (один этап или все).
+    Выполненные и живые этапы не трогаем."""
+    reset = []
+    stuck = set(restartable(states, now))
+    for name in ([stage] if stage else STAGES):
+        if name in stuck:
+            states[name]["status"] = "pending"
+            states[name].pop("error", None)
+            states[name].pop("task_id", None)
+            reset.append(name)
+    return reset
+
+
+# =========================================================================
+# ЭТАПЫ
+# =========================================================================
+async def _preload(db: AsyncSession, period_id: int, options: dict, context: dict) -> dict:
+    from app.modules.utility.models import BillingPeriod, Room, Tariff
+    from app.modules.utility.services.calculations import is_unconditional
+
+    period = await db.get(BillingPeriod, period_id)
+    if not period:
+        raise ValueError(f"Период id={period_id} не найден")
+    if not period.is_active:
+        raise ValueError(f"Период «{period.name}» не активен — закрывать нечего")
+
+    uncond_ids = sorted(
+        t.id for t in (await db.execute(select(Tariff).where(Tariff.is_active))).scalars().all()
+        if is_unconditional(t)
+    )
+    singles_room_ids = list((await db.execute(
+        select(Room.id).where(Room.is_singles_apartment.is_(True)).order_by(Room.id)
+    )).scalars().all())
+    house_uncond = 0
+    if uncond_ids:
+        house_uncond = (await db.execute(
+            select(func.count(Room.id)).where(
+                Room.place_type == "house", Room.tariff_id.in_(uncond_ids),
+            )
+        )).scalar() or 0
+
+    return {
+        "period_name": period.name,
+        "unconditional_tariff_ids": uncond_ids,
+        "singles_room_ids": singles_room_ids,
+        "house_unconditional_rooms": int(house_uncond),
+    }
+
+
+async def _static_rent(db, period_id, options, context):
+    from app.modules.utility.services.billing import charge_static_rent_for_houses
+    return await charge_static_rent_for_houses(db, period_id)
+
+
+async def _unconditional_norm(db, period_id, options, context):
+    from app.modules.utility.services.billing import charge_unconditional_norm
+    if not context.get("unconditional_tariff_ids"):
+        return {"status": "ok", "created": 0, "reason": "no_unconditional_tariffs"}
+    return await charge_unconditional_norm(db, period_id)
+
+
+async def _auto_norm(db, period_id, options, context):
+    from app.modules.utility.services.billing import auto_fill_period_readings
+    return await auto_fill_period_readings(db, period_id)
+
+
+async def _singles(db, period_id, options, context):
+    from app.modules.utility.models import Room
+    from app.modules.utility.services.room_assignment import recount_singles_residents
+    from app.modules.utility.services.singles_billing import equalize_singles_room
+
+    room_ids = context.get("singles_room_ids") or []
+    rooms = (await db.execute(select(Room).where(Room.id.in_(room_ids)))).scalars().all() if room_ids else []
+    equalized, errors = 0, []
+    for room in rooms:
+        await recount_singles_residents(db, room.id)
+        await db.flush()
+        try:
+            res = await equalize_singles_room(db, room=room, period_id=period_id)
+        except Exception as ex:  # noqa: BLE001
+            errors.append({"room_id": room.id, "reason": str(ex)[:200]})
+            continue
+        if res.get("status") == "equalized":
+            equalized += 1
+    await db.commit()
+    return {"rooms": len(rooms), "equalized": equalized, "errors": errors}
+
+
+async def _close(db, period_id, options, context):
+    from app.modules.utility.models import BillingPeriod
+    from app.modules.utility.services.billing import close_current_period
+
+    period = await db.get(BillingPeriod, period_id)
+    if period is not None and not period.is_active:
+        # Повтор этапа после падения на commit'е/очистке кэша — период уже закрыт.
+        return {"status": "already_closed"}
+    active = (await db.execute(
+        select(BillingPeriod.id).where(BillingPeriod.is_active.is_(True))
+    )).scalar()
+    if active != period_id:
+        raise ValueError(f"Активен другой период (id={active}) — закрытие прогона id={period_id} отменено")
+    result = await close_current_period(
+        db=db, admin_user_id=options.get("admin_user_id"), generate_norm=False,
+    )
+    await db.commit()
+    return result
+
+
+async def _open_next(db, period_id, options, context):
+    from app.modules.utility.models import BillingPeriod
+    from app.modules.utility.services.billing import charge_static_rent_for_houses, open_new_period
+
+    name = options["next_period_name"]
+    existing = (await db.execute(
+        select(BillingPeriod).where(BillingPeriod.name == name)
+    )).scalars().first()
+    if existing is not None and existing.is_active:
+        new_period = existing  # повтор этапа: период уже открыт этим прогоном
+    else:
+        new_period = await open_new_period(db, name)
+        await db.commit()
+    # Наём домов сразу при открытии — как у авто-открытия (check_auto_period_task).
+    rent = await charge_static_rent_for_houses(db, new_period.id)
+    return {"period_id": new_period.id, "period_name": new_period.name,
+            "static_rent_created": rent.get("created")}
+
+
+async def _onec_publish(db, period_id, options, context):
+    from app.modules.utility.services.onec_publish import (
+        publish_onec_debts, record_autopublish_status,
+    )
+    result = await publish_onec_debts(db, guard=True)
+    await record_autopublish_status(db, result)
+    return result
+
+
+# receipts — синхронная Celery-задача, её выполняет tasks/month_close.py.
+ASYNC_STAGES = {
+    "preload": _preload,
+    "static_rent": _static_rent,
+    "unconditional_norm": _unconditional_norm,
+    "auto_norm": _auto_norm,
+    "singles": _singles,
+    "close": _close,
+    "open_next": _open_next,
+    "onec_publish": _onec_publish,
+}
+
+# Этапы, после которых меняется список периодов (кэш GET /periods).
+PERIOD_CHANGING = ("close", "open_next")
+
+
+def compact_result(result) -> Optional[dict]:
+    """Итог этапа для run.stages: без превью-списков (они на тысячи строк)."""
+    if not isinstance(result, dict):
+        return None
+    return {
+        k: v for k, v in result.items()
+        if not isinstance(v, (list, dict)) or (k == "errors" and len(v) <= 20)
+    }
+
+
+__all__ = [
+    "ASYNC_STAGES",
+    "DEPENDENCIES",
+    "PERIOD_CHANGING",
+    "STAGES",
+    "STALE_RUNNING_SECONDS",
+    "build_dag",
+    "compact_result",
+    "initial_states",
+    "is_stuck",
+    "levels",
+    "ready_stages",
+    "reset_failed",
+    "restartable",
+    "run_status",
+]
@@ -0,0 +1,137 @@
+# app/modules/utility/services/move_candidates.py
+"""Кандидаты на переезд: жильцы, подающие показания из «чужой» комнаты.
+
+Use case: Шиян переехал 504 → 212, но админ забыл оформить переезд в
+системе. В GSheets за февраль лежит подача из 504, за март-май — из 212.
+Детектор находит таких жильцов и предлагает оформить move-to-room.
+
+Раньше эндпоинт на каждый вызов тянул все сопоставленные строки
+gsheets_import_rows за год и группировал их в Python. Теперь источник —
+сводка gsheets_room_submissions (жилец, комната, месяц → row_count),
+которую ведёт триггер на строках импорта (миграция gsheets_moves_001):
+
+  1) CANDIDATES_SQL — SUM по сводке за окно месяцев, только для жильцов,
+     у которых HAVING нашёл подачи не из текущей User.room_id ПОСЛЕ месяца
+     заселения в неё (открытая RoomAssignment). Подачи из старой комнаты
+     до оформленного переезда кандидатом не делают — иначе сигнал горел
+     бы до конца окна уже после move-to-room. Сам месяц переезда тоже не
+     считается: в нём законно есть подачи из обеих комнат;
+  2) жильцы и комнаты кандидатов — по одному запросу.
+
+Читают: GET /api/admin/users/move-candidates (окно — год) и сканер
+сигналов жильцов (ROOM_MOVE_SUSPECT, окно — MOVE_WINDOW_MONTHS).
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import select, text
+
+from app.modules.utility.models import Room, User
+
+# Окно сканера: подачи за текущий и два предыдущих месяца.
+MOVE_WINDOW_MONTHS = 3
+
+CANDIDATES_SQL = text("""
+    WITH moved_in AS (
+        SELECT user_id, date_trunc('month', MAX(moved_in_at))::date AS month
+        FROM room_assignments
+        WHERE moved_out_at IS NULL
+        GROUP BY user_id
+    )
+    SELECT s.user_id, s.room_id, SUM(s.row_count)::integer AS row_count
+    FROM gsheets_room_submissions s
+    WHERE s.month >= :start AND s.month < :end
+      AND s.user_id IN (
+        SELECT c.user_id
+        FROM gsheets_room_submissions c
+        JOIN users u ON u.id = c.user_id
+        LEFT JOIN moved_in m ON m.user_id = c.user_id
+        WHERE c.month >= :start AND c.month < :end
+        GROUP BY c.user_id
+        HAVING COUNT(*) FILTER (
+            WHERE c.room_id IS DISTINCT FROM u.room_id
+              AND (m.month IS NULL OR c.month > m.month)
+        ) > 0
+      )
+    GROUP BY s.user_id, s.room_id
+""")
+
+
+def month_window(today: date, months: int = MOVE_WINDOW_MONTHS) -> tuple[date, date]:
+    """[первое число (months-1) месяцев назад; первое число следующего месяца)."""
+    ordinal = today.year * 12 + today.month - 1
+    first = ordinal - (months - 1)
+    return date(first // 12, first % 12 + 1, 1), date((ordinal + 1) // 12, (ordinal + 1) % 12 + 1, 1)
+
+
+def _room_info(room) -> dict:
+    return {
+        "dormitory_name": room.dormitory_name if room else None,
+        "room_number": room.room_number if room else None,
+    }
+
+
+def assemble(rows: Iterable, users_by_id: dict, rooms_by_id: dict) -> list[dict]:
+    """(user_id, room_id, row_count) → кандидаты в формате эндпоинта:
+    сначала текущая комната жильца, потом по числу подач; кандидаты — по
+    числу подач НЕ из текущей комнаты, больше — выше."""
+    per_user: dict[int, dict[int, int]] = {}
+    for uid, rid, count in rows:
+        per_user.setdefault(uid, {})[rid] = int(count)
+
+    candidates = []
+    for uid, counts in per_user.items():
+        user = users_by_id.get(uid)
+        if not user:
+            continue
+        current_room_id = user.room_id
+        if all(rid == current_room_id for rid in counts):
+            continue
+        seen_rooms = [
+            {
+                "room_id": rid,
+                **_room_info(rooms_by_id.get(rid)),
+                "row_count": count,
+                "is_current": rid == current_room_id,
+            }
+            for rid, count in sorted(counts.items())
+        ]
+        seen_rooms.sort(key=lambda r: (not r["is_current"], -r["row_count"]))
+        current_room = rooms_by_id.get(current_room_id) if current_room_id else None
+        candidates.append({
+            "user_id": uid,
+            "username": user.username,
+            "full_name": user.full_name,
+            "current_room": {
+                "id": current_room.id,
+                **_room_info(current_room),
+            } if current_room else None,
+            "seen_rooms": seen_rooms,
+            "rows_total": sum(counts.values()),
+            "rows_other": sum(r["row_count"] for r in seen_rooms if not r["is_current"]),
+        })
+    candidates.sort(key=lambda c: c["rows_other"], reverse=True)
+    return candidates
+
+
+async def find_move_candidates(db, start: date, end: date) -> list[dict]:
+    """Кандидаты на переезд по подачам с месяцем в [start, end)."""
+    rows = (await db.execute(CANDIDATES_SQL, {"start": start, "end": end})).all()
+    if not rows:
+        return []
+    uids = {uid for uid, _rid, _n in rows}
+    users = (await db.execute(select(User).where(User.id.in_(uids)))).scalars().all()
+    room_ids = {rid for _uid, rid, _n in rows} | {u.room_id for u in users if u.room_id}
+    rooms = (await db.execute(select(Room).where(Room.id.in_(room_ids)))).scalars().all()
+    return assemble(rows, {u.id: u for u in users}, {r.id: r for r in rooms})
+
+
+__all__ = [
+    "CANDIDATES_SQL",
+    "MOVE_WINDOW_MONTHS",
+    "assemble",
+    "find_move_candidates",
+    "month_window",
+]
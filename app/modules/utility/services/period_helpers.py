@@ -83,3 +83,24 @@ def period_chron_key(name: Optional[str]) -> Tuple[int, int]:
     """
     parsed = parse_period_name(name)
     return parsed if parsed else (0, 0)
+
+
+def chron_ordinal(name: Optional[str]) -> int:
+    """Сквозной номер биллингового месяца: year*12 + month («Май 2026» →
+    24317). Соседние месяцы отличаются на 1, так что «N периодов назад» —
+    диапазон ordinal. Непарсимые имена → 0 (как (0, 0) у period_chron_key).
+
+    Хранится в BillingPeriod.chron_ordinal (periods_chron_001) — SQL может
+    сортировать/фильтровать по хронологии без разбора имени.
+    """
+    year, month = period_chron_key(name)
+    return year * 12 + month if year else 0
+
+
+def period_ordinal(period) -> int:
+    """Ordinal периода: сохранённый chron_ordinal, а для объекта без него
+    (фейковые периоды в тестах, до миграции) — разбор имени."""
+    stored = getattr(period, "chron_ordinal", None)
+    if stored is not None:
+        return stored
+    return chron_ordinal(getattr(period, "name", None))
@@ -0,0 +1,136 @@
+# app/modules/utility/services/period_registry.py
+"""In-process реестр биллинговых периодов в хронологическом порядке.
+
+Периодов — десятки, меняются раз в месяц, а читаются на каждом отчёте:
+summary v2, карточка жильца, сканер проблем тянули `select(BillingPeriod)`
+целиком и сортировали разбором имени на каждый запрос. Реестр держит
+(id, name, chron_ordinal, is_active) отсортированными по хронологии:
+
+    reg = await period_registry.get(db)
+    reg.previous(period, 6)        # 6 периодов строго раньше, свежие первыми
+    reg.up_to(period, 12)          # 12 периодов ≤ period (включая его)
+
+Кеш — как у analyzer_config: TTL 60 секунд на процесс + сброс по
+after_insert/after_update BillingPeriod в этом процессе. Неизвестный id
+(период создан другим воркером) — принудительная перезагрузка.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event, select
+
+from app.modules.utility.models import BillingPeriod
+from app.modules.utility.services.period_helpers import period_ordinal
+
+_CACHE_TTL_SECONDS = 60
+
+
+class PeriodEntry(NamedTuple):
+    id: int
+    name: str
+    ordinal: int
+    is_active: bool
+
+
+class PeriodSnapshot:
+    """Неизменяемый снимок: периоды по (ordinal, id) по возрастанию."""
+
+    def __init__(self, entries: list[PeriodEntry]):
+        self.entries = sorted(entries, key=lambda e: (e.ordinal, e.id))
+        self.by_id = {e.id: e for e in self.entries}
+        self._ordinals = [e.ordinal for e in self.entries]
+
+    def ordinal(self, period) -> int:
+        """Ordinal по id или объекту периода."""
+        if isinstance(period, int):
+            entry = self.by_id.get(period)
+            return entry.ordinal if entry else 0
+        return period_ordinal(period)
+
+    def previous(self, period, n: Optional[int] = None) -> list[PeriodEntry]:
+        """Периоды СТРОГО раньше по хронологии, самые свежие первыми."""
+        idx = bisect_left(self._ordinals, self.ordinal(period))
+        out = self.entries[:idx][::-1]
+        return out[:n] if n is not None else out
+
+    def up_to(self, period, n: Optional[int] = None) -> list[PeriodEntry]:
+        """Периоды с хронологией ≤ period (включая его), свежие первыми."""
+        idx = bisect_right(self._ordinals, self.ordinal(period))
+        out = self.entries[:idx][::-1]
+        return out[:n] if n is not None else out
+
+    def last(self, n: int) -> list[PeriodEntry]:
+        """N хронологически последних периодов, старые → новые."""
+        return self.entries[-n:] if n > 0 else []
+
+
+class PeriodRegistry:
+    def __init__(self):
+        self._snapshot: Optional[PeriodSnapshot] = None
+        self._loaded_at: float = 0.0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _query():
+        return select(
+            BillingPeriod.id, BillingPeriod.name,
+            BillingPeriod.chron_ordinal, BillingPeriod.is_active,
+        )
+
+    def _fresh(self, require_id: Optional[int]) -> Optional[PeriodSnapshot]:
+        snap = self._snapshot
+        if snap is None or time.time() - self._loaded_at >= _CACHE_TTL_SECONDS:
+            return None
+        if require_id is not None and require_id not in snap.by_id:
+            return None
+        return snap
+
+    def _set(self, rows) -> PeriodSnapshot:
+        snap = PeriodSnapshot([
+            PeriodEntry(pid, name, ordinal or 0, bool(is_active))
+            for pid, name, ordinal, is_active in rows
+        ])
+        with self._lock:
+            self._snapshot = snap
+            self._loaded_at = time.time()
+        return snap
+
+    async def get(self, db, *, require_id: Optional[int] = None) -> PeriodSnapshot:
+        """Снимок реестра; require_id — перезагрузить, если периода нет."""
+        snap = self._fresh(require_id)
+        if snap is not None:
+            return snap
+        return self._set((await db.execute(self._query())).all())
+
+    def get_sync(self, db, *, require_id: Optional[int] = None) -> PeriodSnapshot:
+        snap = self._fresh(require_id)
+        if snap is not None:
+            return snap
+        return self._set(db.execute(self._query()).all())
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._loaded_at = 0.0
+
+
+period_registry = PeriodRegistry()
+
+
+@event.listens_for(BillingPeriod, "after_insert")
+@event.listens_for(BillingPeriod, "after_update")
+@event.listens_for(BillingPeriod, "after_delete")
+def _invalidate_on_change(_mapper, _connection, _target):
+    period_registry.invalidate()
+
+
+__all__ = [
+    "PeriodEntry",
+    "PeriodSnapshot",
+    "PeriodRegistry",
+    "period_registry",
+]
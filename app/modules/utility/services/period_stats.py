@@ -0,0 +1,351 @@
+# app/modules/utility/services/period_stats.py
+"""period_dorm_stats — агрегаты показаний периода по общежитиям.
+
+«Сравнение периодов» на каждый вызов считало SUM по approved-показаниям
+двух периодов с JOIN rooms, предпросмотр закрытия — шесть агрегатов по
+активному периоду при каждом открытии диалога. Теперь оба (и тренды по
+многим периодам) читают готовые строки (период, общежитие).
+
+Актуальность без Redis и без блокировок на горячем пути:
+
+  * слушатели Session: любая запись в readings (flush ORM-объектов,
+    bulk/raw statement) добавляет в той же транзакции метку
+    period_stats_marks(period_id, xid). Периоды — из объектов, из
+    `period_id = / IN` в WHERE bulk-statement'а или из параметров
+    INSERT, для bulk по PK — из scope_writes (пакетное утверждение,
+    перерасчёт); иначе метка без периода (устарело всё). Новый период и
+    переименование общежития комнаты — тоже метки;
+  * пересчёт периода (DELETE + INSERT ... SELECT одним GROUP BY)
+    запоминает xmin снимка, взятого ДО агрегата. Период устарел, если
+    нет состояния или есть метка с xid >= этого xmin — транзакция,
+    которая могла в агрегат не попасть. Откат записи откатывает и метку;
+  * читатели (ensure_fresh) пересчитывают только устаревшие из
+    запрошенных; после закрытия периода и перерасчёта — refresh_stale
+    сразу, чтобы диалоги открывались по готовым строкам.
+
+Полная пересборка: python -m app.scripts.rebuild_period_stats.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+COST_FIELDS = (
+    "cost_hot_water", "cost_cold_water", "cost_sewage",
+    "cost_electricity", "cost_maintenance", "cost_social_rent",
+    "cost_waste", "cost_fixed_part", "total_cost",
+)
+COUNT_FIELDS = ("approved_count", "draft_count", "anomaly_drafts", "rooms_submitted")
+ANOMALY_SCORE = 80
+
+_PENDING_KEY = "period_stats_pending"
+_MARKED_KEY = "period_stats_marked"
+_SCOPE_KEY = "period_stats_scope"
+_ALL = None  # метка «все периоды»
+
+# Реальные показания (debt-only черновики 1С без показаний не в счёт).
+_HAS_VALUES = "(r.hot_water IS NOT NULL OR r.cold_water IS NOT NULL OR r.electricity IS NOT NULL)"
+
+STALE_SQL = text("""
+    SELECT p.id FROM periods p
+    LEFT JOIN period_stats_state s ON s.period_id = p.id
+    WHERE (CAST(:ids AS integer[]) IS NULL OR p.id = ANY(CAST(:ids AS integer[])))
+      AND (s.period_id IS NULL OR EXISTS (
+            SELECT 1 FROM period_stats_marks m
+            WHERE m.xid >= s.refreshed_xmin
+              AND (m.period_id = p.id OR m.period_id IS NULL)))
+    ORDER BY p.id
+""")
+
+LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('period_dorm_stats'))")
+XMIN_SQL = text("SELECT (pg_snapshot_xmin(pg_current_snapshot())::text)::bigint")
+DELETE_SQL = text("DELETE FROM period_dorm_stats WHERE period_id = ANY(CAST(:ids AS integer[]))")
+AGGREGATE_SQL = text(f"""
+    INSERT INTO period_dorm_stats (
+        period_id, dormitory_key, {", ".join(COUNT_FIELDS)},
+        {", ".join(COST_FIELDS)}, draft_sum
+    )
+    SELECT r.period_id, COALESCE(rm.dormitory_name, ''),
+           COUNT(*) FILTER (WHERE r.is_approved IS TRUE),
+           COUNT(*) FILTER (WHERE r.is_approved IS FALSE),
+           COUNT(*) FILTER (WHERE r.is_approved IS FALSE AND r.anomaly_score >= {ANOMALY_SCORE}),
+           COUNT(DISTINCT r.room_id) FILTER (WHERE {_HAS_VALUES}),
+           {", ".join(
+               f"COALESCE(SUM(r.{f}) FILTER (WHERE r.is_approved IS TRUE), 0)"
+               for f in COST_FIELDS
+           )},
+           COALESCE(SUM(r.total_cost) FILTER (WHERE r.is_approved IS FALSE), 0)
+    FROM readings r
+    LEFT JOIN rooms rm ON rm.id = r.room_id
+    WHERE r.period_id = ANY(CAST(:ids AS integer[]))
+    GROUP BY r.period_id, COALESCE(rm.dormitory_name, '')
+""")
+STATE_SQL = text("""
+    INSERT INTO period_stats_state (period_id, refreshed_xmin, refreshed_at)
+    SELECT unnest(CAST(:ids AS integer[])), :xmin, timezone('utc', now())
+    ON CONFLICT (period_id) DO UPDATE
+        SET refreshed_xmin = EXCLUDED.refreshed_xmin,
+            refreshed_at = EXCLUDED.refreshed_at
+""")
+# Метки, которые уже ничего не значат: периодные — старше пересчёта своего
+# периода, общие — старше самого раннего пересчёта (и все периоды посчитаны).
+CLEANUP_SQL = (
+    text("""
+        DELETE FROM period_stats_marks m USING period_stats_state s
+        WHERE m.period_id = s.period_id AND m.xid < s.refreshed_xmin
+    """),
+    text("""
+        DELETE FROM period_stats_marks
+        WHERE period_id IS NULL
+          AND xid < (SELECT MIN(refreshed_xmin) FROM period_stats_state)
+          AND NOT EXISTS (
+              SELECT 1 FROM periods p
+              WHERE NOT EXISTS (SELECT 1 FROM period_stats_state s WHERE s.period_id = p.id))
+    """),
+)
+
+
+# =========================================================================
+# МЕТКИ — слушатели Session
+# =========================================================================
+def _mark_rows(periods: Iterable[Optional[int]]) -> list[dict]:
+    periods = set(periods)
+    if _ALL in periods:
+        return [{"period_id": None}]
+    return [{"period_id": pid} for pid in sorted(periods)]
+
+
+def _write_marks(session, periods: set) -> None:
+    """Метки в текущей транзакции; одна и та же — не чаще раза на транзакцию."""
+    marked = session.info.setdefault(_MARKED_KEY, set())
+    periods = periods - marked
+    if not periods or _ALL in marked:
+        return
+    from app.modules.utility.models import PeriodStatsMark
+
+    session.connection().execute(insert(PeriodStatsMark.__table__), _mark_rows(periods))
+    marked.update(periods)
+
+
+def _object_periods(session) -> set:
+    from sqlalchemy import inspect as sa_inspect
+
+    periods: set = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table == "readings":
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            hist = sa_inspect(obj).attrs.period_id.history
+            periods.update(p for p in (*hist.added, *hist.deleted, *hist.unchanged) if p is not None)
+        elif table == "periods" and obj in session.new:
+            periods.add(obj.id)
+        elif table == "rooms" and obj in session.dirty:
+            if sa_inspect(obj).attrs.dormitory_name.history.has_changes():
+                periods.add(_ALL)
+    return periods
+
+
+def _where_periods(where) -> Optional[set]:
+    """period_id из верхнеуровневого AND-условия (`= :x` / `IN :xs`)."""
+    if where is None:
+        return None
+    clauses = (
+        where.clauses
+        if isinstance(where, BooleanClauseList) and where.operator is operators.and_
+        else [where]
+    )
+    for clause in clauses:
+        if not isinstance(clause, BinaryExpression):
+            continue
+        if getattr(clause.left, "key", None) != "period_id":
+            continue
+        if not isinstance(clause.right, BindParameter):
+            continue
+        value = clause.right.effective_value
+        if clause.operator is operators.eq and value is not None:
+            return {value}
+        if clause.operator is operators.in_op and value is not None:
+            return set(value)
+    return None
+
+
+def statement_periods(orm_execute_state) -> set:
+    """Периоды, которые задевает bulk/raw запись в readings; {None} — неизвестно."""
+    if orm_execute_state.is_insert:
+        params = orm_execute_state.parameters
+        rows = params if isinstance(params, list) else [params] if params else []
+        periods = {row.get("period_id") for row in rows}
+        return periods if rows and _ALL not in periods else {_ALL}
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        periods = _where_periods(getattr(orm_execute_state.statement, "whereclause", None))
+        if periods is not None:
+            return periods
+    return {_ALL}
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, _flush_context):
+    periods = _object_periods(session)
+    if periods:
+        _write_marks(session, periods)
+
+
+def scope_writes(session, period_ids: Iterable[int]) -> None:
+    """Bulk-записи readings по PK до конца транзакции относятся к этим
+    периодам (иначе такая запись помечает устаревшими все периоды)."""
+    info = getattr(session, "sync_session", session).info
+    info.setdefault(_SCOPE_KEY, set()).update(period_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _stage_statement(orm_execute_state):
+    from app.core.data_versions import written_table
+
+    if written_table(orm_execute_state) != "readings":
+        return
+    info = orm_execute_state.session.info
+    periods = statement_periods(orm_execute_state)
+    if _ALL in periods and info.get(_SCOPE_KEY):
+        periods = set(info[_SCOPE_KEY])
+    info.setdefault(_PENDING_KEY, set()).update(periods)
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_statements(session):
+    periods = session.info.pop(_PENDING_KEY, None)
+    if periods:
+        _write_marks(session, periods)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_marks(session):
+    session.info.pop(_MARKED_KEY, None)
+    session.info.pop(_SCOPE_KEY, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_marks(session, previous_transaction):
+    # Откат (и SAVEPOINT тоже) мог унести уже вставленные метки — следующая
+    # запись поставит их заново. Отложенные statement'ы внешней транзакции
+    # при откате SAVEPOINT остаются.
+    session.info.pop(_MARKED_KEY, None)
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+        session.info.pop(_SCOPE_KEY, None)
+
+
+# =========================================================================
+# ПЕРЕСЧЁТ И ЧТЕНИЕ (AsyncSession)
+# =========================================================================
+async def stale_periods(db, period_ids: Optional[list[int]] = None) -> list[int]:
+    """Устаревшие периоды из period_ids (None — из всех)."""
+    ids = list(period_ids) if period_ids is not None else None
+    return list((await db.execute(STALE_SQL, {"ids": ids})).scalars().all())
+
+
+async def refresh(db, period_ids: list[int]) -> None:
+    """Пересчитать агрегаты периодов (в транзакции вызывающего)."""
+    if not period_ids:
+        return
+    ids = sorted(set(period_ids))
+    await db.execute(LOCK_SQL)
+    xmin = (await db.execute(XMIN_SQL)).scalar_one()
+    await db.execute(DELETE_SQL, {"ids": ids})
+    await db.execute(AGGREGATE_SQL, {"ids": ids})
+    await db.execute(STATE_SQL, {"ids": ids, "xmin": xmin})
+    for stmt in CLEANUP_SQL:
+        await db.execute(stmt)
+
+
+async def ensure_fresh(db, period_ids: list[int]) -> list[int]:
+    """Пересчитать устаревшие из period_ids и закоммитить. → пересчитанные."""
+    stale = await stale_periods(db, period_ids)
+    if stale:
+        await refresh(db, stale)
+        await db.commit()
+    return stale
+
+
+async def refresh_stale(db) -> list[int]:
+    """Все устаревшие периоды — после закрытия/перерасчёта."""
+    stale = await stale_periods(db)
+    if stale:
+        await refresh(db, stale)
+        await db.commit()
+    return stale
+
+
+async def load_stats(db, period_ids: list[int]) -> dict[int, dict[str, dict]]:
+    """{period_id: {dormitory_key: {поле: значение}}} — суммы Decimal."""
+    from sqlalchemy import select
+    from app.modules.utility.models import PeriodDormStats
+
+    rows = (await db.execute(
+        select(PeriodDormStats).where(PeriodDormStats.period_id.in_(period_ids))
+    )).scalars().all()
+    out: dict[int, dict[str, dict]] = {pid: {} for pid in period_ids}
+    for row in rows:
+        out[row.period_id][row.dormitory_key] = stats_dict(row)
+    return out
+
+
+def stats_dict(row) -> dict:
+    data = {f: int(getattr(row, f) or 0) for f in COUNT_FIELDS}
+    data.update({f: Decimal(getattr(row, f) or 0) for f in (*COST_FIELDS, "draft_sum")})
+    return data
+
+
+def totals(dorms: dict[str, dict]) -> dict:
+    """Сумма строк общежитий периода."""
+    out = dict.fromkeys(COUNT_FIELDS, 0)
+    out.update(dict.fromkeys((*COST_FIELDS, "draft_sum"), Decimal("0")))
+    for data in dorms.values():
+        for key in out:
+            out[key] += data[key]
+    return out
+
+
+# =========================================================================
+# ПЕРЕСБОРКА (sync Session) — скрипт, Celery
+# =========================================================================
+def rebuild(db, period_ids: Optional[list[int]] = None, *, stale_only: bool = False) -> dict:
+    """Пересчитать периоды (None — все; stale_only — только устаревшие из
+    них) по одному на транзакцию. Идемпотентно."""
+    if stale_only:
+        period_ids = list(db.execute(STALE_SQL, {"ids": period_ids}).scalars())
+    elif period_ids is None:
+        period_ids = list(db.execute(text("SELECT id FROM periods ORDER BY id")).scalars())
+    for pid in period_ids:
+        db.execute(LOCK_SQL)
+        xmin = db.execute(XMIN_SQL).scalar_one()
+        db.execute(DELETE_SQL, {"ids": [pid]})
+        db.execute(AGGREGATE_SQL, {"ids": [pid]})
+        db.execute(STATE_SQL, {"ids": [pid], "xmin": xmin})
+        db.commit()
+    for stmt in CLEANUP_SQL:
+        db.execute(stmt)
+    db.commit()
+    return {"periods": len(period_ids)}
+
+
+__all__ = [
+    "COST_FIELDS",
+    "COUNT_FIELDS",
+    "ensure_fresh",
+    "load_stats",
+    "rebuild",
+    "refresh",
+    "refresh_stale",
+    "scope_writes",
+    "stale_periods",
+    "statement_periods",
+    "stats_dict",
+    "totals",
+]
@@ -0,0 +1,213 @@
+# app/modules/utility/services/prev_reading_index.py
+"""Батч-резолвер «предыдущего показания» для многих жильцов сразу.
+
+Канон выбора prev — reading_calculator.pick_prev_pair (хронология по ИМЕНИ
+периода, is_meaningful_prev, приоритет METER_REPLACEMENT текущего месяца).
+Но КАНДИДАТОВ для него каждый путь тянул сам: find_prev_reading — отдельный
+запрос на жильца, массовое утверждение — user_id IN × room_id IN по всей
+истории, квитанции и «Проверка расчёта» — свои .limit(20) по period_id
+(ретроактивные периоды давали не тот prev). На N жильцов — N запросов.
+
+PrevReadingIndex принимает набор ключей (user_id, room_id, имя целевого
+периода) и одним запросом грузит утверждённые показания ровно этих пар
+и только за периоды не позже самого позднего целевого (фильтр по
+хранимому BillingPeriod.chron_ordinal). Дальше выбор prev — чистый
+pick_prev_pair в памяти. Индекс живёт в `db.info` (память
+на время транзакции): повторные обращения к тем же парам БД не трогают.
+Слушатели Session сбрасывают его на commit/rollback и на любую запись в
+readings (flush MeterReading, bulk/raw statement) — следующий for_session
+отдаст свежий индекс, а не кандидатов до записи или из чужой транзакции.
+
+Использование (async):
+    index = PrevReadingIndex.for_session(db)
+    await index.load(db, [PrevKey(uid, rid, period.name) for ...])
+    prev, prev_any, history = index.pick(uid, rid, period.name)
+
+В Celery (sync-сессия) — то же через load_sync.
+"""
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.modules.utility.models import BillingPeriod, MeterReading
+from app.modules.utility.services.period_helpers import chron_ordinal
+from app.modules.utility.services.reading_calculator import pick_prev_pair
+
+# Ключ памяти в Session.info — один индекс на сессию (= на запрос).
+_SESSION_KEY = "prev_reading_index"
+
+# Пар в одном tuple-IN: держим размер запроса разумным на «весь жилфонд».
+PAIRS_CHUNK = 1000
+
+
+class PrevKey(NamedTuple):
+    user_id: int
+    room_id: int
+    period_name: str
+
+
+class PrevReadingIndex:
+    """Память кандидатов prev по парам (user_id, room_id).
+
+    Для каждой загруженной пары хранится список (reading, period_name) всех
+    утверждённых показаний с chron_ordinal ≤ `_bound[pair]`. Запрос на более
+    поздний период, чем загружено, догружает пару заново.
+    """
+
+    def __init__(self):
+        self._rows: dict[tuple[int, int], list] = {}
+        self._bound: dict[tuple[int, int], int] = {}
+        self._period_names: dict[int, str] = {}
+
+    @classmethod
+    def for_session(cls, db) -> "PrevReadingIndex":
+        """Индекс, привязанный к сессии. Фейковые сессии без .info (тесты)
+        получают свежий индекс."""
+        info = getattr(db, "info", None)
+        if not isinstance(info, dict):
+            return cls()
+        index = info.get(_SESSION_KEY)
+        if index is None:
+            index = info[_SESSION_KEY] = cls()
+        return index
+
+    # --- Планирование ---
+    def _plan(self, keys: Iterable) -> tuple[list, int]:
+        """Пары, которые надо (до)загрузить, и верхняя граница chron_ordinal."""
+        need: dict[tuple[int, int], int] = {}
+        for user_id, room_id, period_name in keys:
+            if user_id is None or room_id is None:
+                continue
+            pair = (user_id, room_id)
+            tkey = chron_ordinal(period_name)
+            bound = self._bound.get(pair)
+            if bound is not None and bound >= tkey:
+                continue
+            if tkey > need.get(pair, -1):
+                need[pair] = tkey
+        if not need:
+            return [], 0
+        return list(need), max(need.values())
+
+    @staticmethod
+    def _candidates_query(pairs: list, bound: int):
+        return (
+            select(MeterReading, BillingPeriod.name)
+            .join(BillingPeriod, BillingPeriod.id == MeterReading.period_id)
+            .where(
+                tuple_(MeterReading.user_id, MeterReading.room_id).in_(pairs),
+                MeterReading.is_approved.is_(True),
+                BillingPeriod.chron_ordinal <= bound,
+            )
+        )
+
+    def _store(self, pairs: list, bound: int, rows) -> None:
+        for pair in pairs:
+            self._rows[pair] = []
+            self._bound[pair] = bound
+        for reading, period_name in rows:
+            self._period_names[reading.id] = period_name
+            self._rows.setdefault((reading.user_id, reading.room_id), []).append(
+                (reading, period_name)
+            )
+
+    # --- Загрузка ---
+    async def load(self, db, keys: Iterable) -> None:
+        pairs, bound = self._plan(keys)
+        if not pairs:
+            return
+        for i in range(0, len(pairs), PAIRS_CHUNK):
+            chunk = pairs[i:i + PAIRS_CHUNK]
+            rows = (await db.execute(self._candidates_query(chunk, bound))).all()
+            self._store(chunk, bound, rows)
+
+    def load_sync(self, db, keys: Iterable) -> None:
+        pairs, bound = self._plan(keys)
+        if not pairs:
+            return
+        for i in range(0, len(pairs), PAIRS_CHUNK):
+            chunk = pairs[i:i + PAIRS_CHUNK]
+            rows = db.execute(self._candidates_query(chunk, bound)).all()
+            self._store(chunk, bound, rows)
+
+    # --- Выбор ---
+    def pick(self, user_id, room_id, period_name, *, exclude_id=None):
+        """Тройка pick_prev_pair для пары. Пара должна быть загружена
+        (load/load_sync) — незагруженная даёт (None, None, [])."""
+        rows = self._rows.get((user_id, room_id), [])
+        if exclude_id is not None:
+            rows = [(r, nm) for r, nm in rows if r.id != exclude_id]
+        return pick_prev_pair(rows, period_name)
+
+    def period_name(self, reading) -> Optional[str]:
+        """Имя периода загруженного кандидата — без lazy-load reading.period
+        (в async-сессии он недоступен)."""
+        return self._period_names.get(reading.id) if reading is not None else None
+
+    def prev_map(self, keys: Iterable) -> dict:
+        """{PrevKey: prev_meaningful | None} для уже загруженных ключей."""
+        return {PrevKey(*k): self.pick(*k)[0] for k in keys}
+
+    async def resolve(self, db, keys: Iterable) -> dict:
+        keys = list(keys)
+        await self.load(db, keys)
+        return self.prev_map(keys)
+
+    def resolve_sync(self, db, keys: Iterable) -> dict:
+        keys = list(keys)
+        self.load_sync(db, keys)
+        return self.prev_map(keys)
+
+    def invalidate(self, pairs: Optional[Iterable] = None) -> None:
+        """Сбросить память (целиком или по парам) — после записи approved
+        показаний, если в той же сессии снова нужен prev."""
+        if pairs is None:
+            self._rows.clear()
+            self._bound.clear()
+            self._period_names.clear()
+            return
+        for pair in pairs:
+            self._rows.pop(tuple(pair), None)
+            self._bound.pop(tuple(pair), None)
+
+
+# =========================================================================
+# Сброс памяти сессии. Регистрируются при импорте модуля — в database.py
+# не нужны: индекс в db.info кладёт только for_session отсюда же.
+# =========================================================================
+def _forget(session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _forget_on_flush(session, _flush_context):
+    if any(isinstance(obj, MeterReading)
+           for obj in (*session.new, *session.dirty, *session.deleted)):
+        _forget(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _forget_on_statement(orm_execute_state):
+    from app.core.data_versions import written_table
+
+    if written_table(orm_execute_state) == "readings":
+        _forget(orm_execute_state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_on_commit(session):
+    _forget(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_on_rollback(session, previous_transaction):
+    # soft — и когда транзакция в БД ещё не начиналась; откат SAVEPOINT
+    # внешнюю транзакцию не трогает.
+    if not previous_transaction.nested:
+        _forget(session)
+
+
+__all__ = ["PrevKey", "PrevReadingIndex", "PAIRS_CHUNK"]
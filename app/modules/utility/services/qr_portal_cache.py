@@ -0,0 +1,100 @@
+# app/modules/utility/services/qr_portal_cache.py
+"""Кеш состояния QR-портала по токену комнаты.
+
+/api/q/{token}/state жильцы обновляют десятки раз в окно подачи (nginx
+пускает 8 r/s на IP), а каждый вызов — резолв токена, представитель,
+черновик/утверждённое, вся утверждённая история комнаты, балансы всех
+жильцов (2 запроса на каждого). Теперь состояние лежит в Redis:
+
+    qr:state:<sha256(token)> → {room_id, pw, window, deps, versions, state}
+
+Инвалидация — write-through через реестр версий (app/core/data_versions):
+любой commit, задевший показания/жильцов/комнату (подача, утверждение,
+отклонение, замена счётчика, переселение, пароль/токен), двигает
+"room@<id>" / "user@<id>"; активный период, тарифы и настройки окна —
+"periods" / "tariffs" / "system_settings". Запись кеша помнит версии своих
+зависимостей; расхождение → промах и пересчёт из БД.
+
+Горячий путь: GET записи + HMGET версий — в БД не ходим. Окно подачи
+(открыто ли СЕГОДНЯ) считается на лету из сохранённых start/end.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Iterable, Optional
+
+from app.core.data_versions import read_versions
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "qr:state:"
+# Страховочный TTL: записи мимо Session (psql) версии не двигают.
+ENTRY_TTL_SECONDS = 3600
+# Сколько утверждённых показаний комнаты нужно странице: последнее
+# реальное + периоды по нормативу после него. Год — с запасом.
+HISTORY_WINDOW = 12
+
+
+def _redis():
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+def entry_key(token: str) -> str:
+    """Токен в ключе не храним — только его хеш."""
+    return _KEY_PREFIX + hashlib.sha256(token.encode()).hexdigest()
+
+
+def room_dependencies(room_id: int) -> list[str]:
+    return [f"room@{room_id}", "room@*", "periods", "tariffs", "system_settings"]
+
+
+def user_dependencies(user_ids: Iterable[int]) -> list[str]:
+    return [*(f"user@{uid}" for uid in sorted(set(user_ids))), "user@*"]
+
+
+async def load_entry(token: str) -> Optional[dict]:
+    """Запись кеша, если все её зависимости не менялись; иначе None."""
+    try:
+        raw = await _redis().get(entry_key(token))
+    except Exception as exc:
+        logger.warning("[QR_CACHE] read failed: %s", exc)
+        return None
+    if not raw:
+        return None
+    try:
+        entry = json.loads(raw)
+    except ValueError:
+        return None
+    versions = await read_versions(entry.get("deps") or [])
+    if versions is None or versions != entry.get("versions"):
+        return None
+    return entry
+
+
+async def store_entry(token: str, entry: dict) -> None:
+    """Сохранить, если версии зависимостей не сдвинулись за время расчёта
+    (иначе данные могли быть прочитаны до чужого commit'а)."""
+    current = await read_versions(entry["deps"])
+    if current is None or current != entry["versions"]:
+        return
+    try:
+        await _redis().set(
+            entry_key(token), json.dumps(entry, ensure_ascii=False, default=str),
+            ex=ENTRY_TTL_SECONDS,
+        )
+    except Exception as exc:
+        logger.warning("[QR_CACHE] write failed: %s", exc)
+
+
+__all__ = [
+    "ENTRY_TTL_SECONDS",
+    "HISTORY_WINDOW",
+    "entry_key",
+    "load_entry",
+    "room_dependencies",
+    "store_entry",
+    "user_dependencies",
+]
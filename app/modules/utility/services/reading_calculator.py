@@ -391,24 +391,17 @@ async def find_prev_reading(db, *, user_id, room_id, target_period_name,
     """Канонический async-выбор prev: утверждённые показания ЖИЛЬЦА В ЭТОЙ
     КОМНАТЕ (кроме exclude_id), период задан → pick_prev_pair.
 
+    Кандидатов грузит PrevReadingIndex сессии: только периоды не позже
+    целевого, повторный вызов для той же пары в запросе — без SQL.
     Возвращает ту же тройку, что pick_prev_pair.
     """
-    from sqlalchemy import select as _select
-    from app.modules.utility.models import BillingPeriod as _BP
-
-    q = (
-        _select(MeterReading, _BP.name)
-        .join(_BP, _BP.id == MeterReading.period_id)
-        .where(
-            MeterReading.user_id == user_id,
-            MeterReading.room_id == room_id,
-            MeterReading.is_approved.is_(True),
-        )
+    from app.modules.utility.services.prev_reading_index import (
+        PrevKey, PrevReadingIndex,
     )
-    if exclude_id is not None:
-        q = q.where(MeterReading.id != exclude_id)
-    rows = (await db.execute(q)).all()
-    return pick_prev_pair(rows, target_period_name)
+
+    index = PrevReadingIndex.for_session(db)
+    await index.load(db, [PrevKey(user_id, room_id, target_period_name)])
+    return index.pick(user_id, room_id, target_period_name, exclude_id=exclude_id)
 
 
 __all__ = [
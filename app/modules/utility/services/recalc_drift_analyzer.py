@@ -11,7 +11,9 @@
 анализатор находит их батчем по периоду — раньше пришлось бы кликать
 «Проверить» по каждой строке вручную.
 
-Используется в /api/admin/analyzer/recalc-drift?period_id=N.
+Используется в /api/admin/analyzer/recalc-drift?period_id=N. Загрузка
+и пересчёт — общий с авто-перерасчётом движок drift_engine (фиксированное
+число запросов на период, timings_ms в ответе).
 
 Это не «sanity»-анализатор (как reading_validators) и не «аномалия» в
 поведенческом смысле (как anomaly_detector). Это AUDIT-анализатор —
@@ -24,20 +26,7 @@ import logging
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-
-from app.modules.utility.models import (
-    BillingPeriod,
-    MeterReading,
-    Tariff,
-    User,
-)
-from app.modules.utility.services.calculations import CalculationError
-from app.modules.utility.services.reading_calculator import (
-    compute_reading_breakdown,
-)
-from app.modules.utility.services.tariff_cache import tariff_cache
+from app.modules.utility.services.drift_engine import compute_period_drift
 
 logger = logging.getLogger(__name__)
 
@@ -76,118 +65,26 @@ async def detect_drift_in_period(
             "abs_diff_sum": "...",     # сумма abs(diff) — масштаб «дрейфа»
             "max_diff_abs": "...",
         },
+        "timings_ms": {...},       # этапы движка: загрузка / prev / расчёт
       }
     """
     thresh = threshold if threshold is not None else DEFAULT_DRIFT_THRESHOLD
 
-    period = await db.get(BillingPeriod, period_id)
-    if not period:
+    batch = await compute_period_drift(db, period_id, limit=limit)
+    if batch.period is None:
         return {
             "period": None, "checked": 0, "drifted": [], "errors": [],
             "stats": {}, "fatal": f"period_id={period_id} не найден",
         }
 
-    # Тянем reading'и + жильца + комнату + период одним запросом, чтобы
-    # не делать N отдельных запросов в цикле (классический N+1).
-    stmt = (
-        select(MeterReading)
-        .options(
-            selectinload(MeterReading.user).selectinload(User.room),
-            selectinload(MeterReading.room),
-            selectinload(MeterReading.period),
-        )
-        .where(
-            MeterReading.period_id == period_id,
-            MeterReading.is_approved.is_(True),
-        )
-        .order_by(MeterReading.id)
-    )
-    if limit is not None:
-        stmt = stmt.limit(limit)
-    readings = list((await db.execute(stmt)).scalars().all())
-
     drifted: list[dict] = []
-    errors: list[dict] = []
     total_diff_sum = Decimal("0")
     abs_diff_sum = Decimal("0")
     max_abs = Decimal("0")
-    checked = 0
-
-    # Сезонные флаги читаем ОДИН раз перед циклом — иначе
-    # +1 запрос на каждый reading. compute_reading_breakdown будет считать
-    # с тем же набором переключателей, что и реальный /api/calculate,
-    # иначе drift-анализатор будет находить ложные расхождения.
-    from app.modules.utility.routers.settings import _load_seasonal
-    _seasonal = await _load_seasonal(db)
-
-    for r in readings:
-        user = r.user
-        # Комната reading'а (r.room), НЕ текущая комната жильца — иначе у всех
-        # переехавших анализатор покажет ложный «дрейф» (история считалась бы
-        # по тарифу новой комнаты). r.room=None (долг без комнаты) → ниже skip.
-        room = r.room
-
-        # Reading без жильца/комнаты — реально такого быть не должно,
-        # но не падаем.
-        if not user or not room:
-            errors.append({
-                "reading_id": r.id, "reason": "no_user_or_room",
-            })
-            continue
-
-        # Тариф — через тот же кеш, что использует основной расчёт.
-        tariff = tariff_cache.get_effective_tariff(user=user, room=room)
-        if tariff is None:
-            tariff = (await db.execute(
-                select(Tariff).where(Tariff.is_active.is_(True))
-            )).scalars().first()
-        if tariff is None:
-            errors.append({
-                "reading_id": r.id, "user_id": user.id,
-                "reason": "no_active_tariff",
-            })
-            continue
-
-        # Prev — хронологически предыдущий, по period_id (см. инцидент may 2026).
-        prev_q = await db.execute(
-            select(MeterReading)
-            .options(selectinload(MeterReading.period))
-            .where(
-                MeterReading.user_id == user.id,
-                MeterReading.room_id == room.id,
-                MeterReading.is_approved.is_(True),
-                MeterReading.period_id < r.period_id,
-            )
-            .order_by(MeterReading.period_id.desc())
-            .limit(1)
-        )
-        prev = prev_q.scalars().first()
-
-        # Считаем — может упасть на CalculationError при пустом тарифе.
-        # Per-tariff (heating_active+даты) AND global emergency override.
-        _heating = _seasonal.heating_season_active and tariff.is_heating_active_now()
-        _hw = _seasonal.hot_water_heating_active and tariff.is_hw_heating_active_now()
-        try:
-            breakdown = compute_reading_breakdown(
-                user=user, room=room, tariff=tariff,
-                current_hot=r.hot_water or 0,
-                current_cold=r.cold_water or 0,
-                current_elect=r.electricity or 0,
-                prev_reading=prev,
-                heating_season_active=_heating,
-                hot_water_heating_active=_hw,
-            )
-        except CalculationError as e:
-            errors.append({
-                "reading_id": r.id, "user_id": user.id,
-                "reason": f"calc_error: {e}",
-            })
-            continue
 
-        checked += 1
-        stored = Decimal(str(r.total_cost or 0))
-        calc = Decimal(str(breakdown["total_cost"]))
-        diff = calc - stored
+    for check in batch.checks:
+        r, user, room = check.reading, check.user, check.room
+        stored, calc, diff = check.stored, check.calc, check.diff
         abs_diff = abs(diff)
         total_diff_sum += diff
         abs_diff_sum += abs_diff
@@ -210,7 +107,7 @@ async def detect_drift_in_period(
                 "diff": f"{diff:+.2f}",
                 "diff_pct": diff_pct,
                 "anomaly_flags": r.anomaly_flags,
-                "is_baseline": breakdown["is_baseline"],
+                "is_baseline": check.breakdown["is_baseline"],
             })
 
     # Сортируем по abs(diff) убывания — самые большие расхождения сверху.
@@ -219,16 +116,17 @@ async def detect_drift_in_period(
     )
 
     return {
-        "period": {"id": period.id, "name": period.name},
-        "checked": checked,
+        "period": {"id": batch.period.id, "name": batch.period.name},
+        "checked": len(batch.checks),
         "drifted_count": len(drifted),
         "drifted": drifted,
-        "errors": errors,
-        "errors_count": len(errors),
+        "errors": batch.errors,
+        "errors_count": len(batch.errors),
         "threshold": f"{thresh}",
         "stats": {
             "total_diff_sum": f"{total_diff_sum:+.2f}",
             "abs_diff_sum": f"{abs_diff_sum:.2f}",
             "max_diff_abs": f"{max_abs:.2f}",
         },
+        "timings_ms": batch.timings_ms,
     }
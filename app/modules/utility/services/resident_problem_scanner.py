@@ -12,6 +12,8 @@
   • HIGH_DEBT     — крупная задолженность сверх порога;
   • FORMAT_SUSPECT— битый формат (>99999, потеряна точка);
   • METER_FROZEN  — показания счётчика «замерли» 3+ периода.
+  • ROOM_MOVE_SUSPECT — GSheets-подачи из комнаты, отличной от текущей
+    (неоформленный переезд; services/move_candidates.py).
 
 «Активные жильцы» = те, у кого есть approved-readings за последние периоды
 (есть baseline для сравнения).
@@ -28,7 +30,7 @@ from sqlalchemy.orm import selectinload
 
 from app.core.time_utils import utcnow
 from app.modules.utility.models import (
-    BillingPeriod, MeterReading, ResidentProblem, User,
+    MeterReading, ResidentProblem, User,
 )
 from app.modules.utility.services.finance_analyzer import analyze_finance
 
@@ -55,6 +57,9 @@ _PROBLEM_META = {
     # title уточняются по kind через override в _upsert_problem; здесь — дефолт
     # для авто-резолва и fallback. См. services/room_audit.py.
     "ROOM_TYPE_MISMATCH": ("high", "Несоответствие типа квартиры"),
+    # GSheets-подачи из комнаты, отличной от User.room_id: похоже, жилец
+    # переехал, а переезд не оформлен. См. services/move_candidates.py.
+    "ROOM_MOVE_SUSPECT": ("medium", "Подаёт показания из другой комнаты"),
 }
 
 # Финансовые флаги finance_analyzer → наши problem_type.
@@ -66,24 +71,6 @@ _FINANCE_FLAG_MAP = {
     "OVERPAY_SUSPECT": "OVERPAY_SUSPECT",
 }
 
-_MONTHS_RU = {
-    "январь": 1, "февраль": 2, "март": 3, "апрель": 4, "май": 5, "июнь": 6,
-    "июль": 7, "август": 8, "сентябрь": 9, "октябрь": 10, "ноябрь": 11, "декабрь": 12,
-}
-
-
-def _chrono_key(period: BillingPeriod):
-    """(год, месяц) из period.name «Май 2026» — хронологическая сортировка
-    (period_id ненадёжен, периоды заводились не по календарю)."""
-    name = (period.name or "").strip().lower().split()
-    if len(name) == 2 and name[0] in _MONTHS_RU:
-        try:
-            return (int(name[1]), _MONTHS_RU[name[0]], period.id or 0)
-        except (ValueError, TypeError):
-            pass
-    return (0, 0, period.id or 0)
-
-
 def _D(v) -> Decimal:
     return Decimal(str(v)) if v is not None else ZERO
 
@@ -91,7 +78,7 @@ def _D(v) -> Decimal:
 def _detect_for_user(
     user: User,
     readings_by_period: dict,        # period_id -> MeterReading (только этого user)
-    periods_chrono: list,            # BillingPeriod, старые → новые
+    periods_chrono: list,            # PeriodEntry, старые → новые
 ) -> list[dict]:
     """Возвращает список обнаруженных проблем для жильца:
     [{type, score, details}, ...]."""
@@ -208,10 +195,12 @@ async def scan_resident_problems(db: AsyncSession) -> dict:
     scan_start = utcnow()
 
     # 1. Последние периоды (хронологически: старые → новые).
-    all_periods = (await db.execute(select(BillingPeriod))).scalars().all()
-    if not all_periods:
+    # Хронология — хранимый chron_ordinal (period_id ненадёжен, периоды
+    # заводились не по календарю), реестр периодов без разбора имён.
+    from app.modules.utility.services.period_registry import period_registry
+    periods_chrono = (await period_registry.get(db)).last(PERIODS_WINDOW)
+    if not periods_chrono:
         return {"scanned_users": 0, "problems_open": 0, "skipped": "no_periods"}
-    periods_chrono = sorted(all_periods, key=_chrono_key)[-PERIODS_WINDOW:]
     period_ids = [p.id for p in periods_chrono]
 
     # 2. Approved-readings за окно + жильцы.
@@ -278,6 +267,32 @@ async def scan_resident_problems(db: AsyncSession) -> dict:
     except Exception:
         logger.exception("[resident_scan] room type audit failed")
 
+    # 4c. Неоформленный переезд: GSheets-подачи за последние месяцы из
+    #     комнаты, отличной от текущей. HAVING по сводке
+    #     gsheets_room_submissions (её ведёт триггер) — строки импорта не
+    #     читаем. Изолируем так же, как аудит типа квартиры.
+    move_count = 0
+    try:
+        from app.modules.utility.services.move_candidates import (
+            find_move_candidates, month_window,
+        )
+        for c in await find_move_candidates(db, *month_window(scan_start.date())):
+            detected_keys.add((c["user_id"], "ROOM_MOVE_SUSPECT"))
+            await _upsert_problem(
+                db, c["user_id"], "ROOM_MOVE_SUSPECT",
+                score=min(40 + 60 * c["rows_other"] // c["rows_total"], 100),
+                details={
+                    "current_room": c["current_room"],
+                    "seen_rooms": c["seen_rooms"],
+                    "rows_total": c["rows_total"],
+                    "rows_other": c["rows_other"],
+                },
+            )
+            open_count += 1
+            move_count += 1
+    except Exception:
+        logger.exception("[resident_scan] move candidates failed")
+
     # 5. Авто-resolve: закрываем open/acknowledged сигналы, НЕ обнаруженные в
     #    этом скане. Исключаем detected_keys ЯВНО (tuple notin_) — нельзя
     #    полагаться только на last_seen_at < scan_start: при autoflush=False
@@ -315,6 +330,7 @@ async def scan_resident_problems(db: AsyncSession) -> dict:
         "scanned_users": len(by_user),
         "problems_detected": open_count,
         "room_mismatches": room_mismatch_count,
+        "move_candidates": move_count,
         "periods": [p.name for p in periods_chrono],
     }
 
@@ -41,7 +41,6 @@ from datetime import date as _date
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.utility.models import (
@@ -50,7 +49,6 @@ from app.modules.utility.models import (
 from app.modules.utility.services.calculations import (
     calculate_utilities, costs_for_model_fields, D,
 )
-from app.modules.utility.services.period_helpers import period_chron_key
 
 logger = logging.getLogger(__name__)
 
@@ -121,8 +119,8 @@ async def recalc_skip_chain(
         "applied": True,
       }
     """
-    # 1. Тянем всю историю в этой паре (user_id, room_id), отсортированно
-    #    по БИЛЛИНГОВОЙ ХРОНОЛОГИИ (period_chron_key из BillingPeriod.name).
+    # 1. История пары (user_id, room_id) ДО периода current_reading в
+    #    БИЛЛИНГОВОЙ ХРОНОЛОГИИ (по имени периода, не по period_id).
     #
     #    Раньше сортировали по `period_id ASC`, предполагая что period_id
     #    монотонен по биллинговому месяцу. Это допущение СЛОМАЛОСЬ когда
@@ -132,23 +130,23 @@ async def recalc_skip_chain(
     #    Размазывание дельты в шаге 5 ставило бо́льшее показание Февралю,
     #    чем Апрелю → счётчик «упал» (-4.33 у Калачёва, инцидент 28.05.2026).
     #
-    #    Биллинговая хронология парсится из имени периода через
-    #    period_chron_key (period_helpers.py). «Начальный период» → (0,0),
-    #    обычные «Май 2026» → (2026, 5). После сортировки итерируемся в
-    #    правильном хронологическом порядке независимо от порядка создания.
-    rows = (await db.execute(
-        select(MeterReading, BillingPeriod)
-        .join(BillingPeriod, MeterReading.period_id == BillingPeriod.id)
-        .where(
-            MeterReading.user_id == user.id,
-            MeterReading.room_id == room.id,
-            MeterReading.is_approved.is_(True),
-            MeterReading.id != current_reading.id,
-        )
-    )).all()
-    history = [r for r, _p in sorted(
-        rows, key=lambda row: period_chron_key(row[1].name)
-    )]
+    #    Кандидатов грузит PrevReadingIndex сессии (тот же, что у
+    #    find_prev_reading): одним запросом, только периоды не позже
+    #    текущего. earlier_desc из pick — показания СТРОГО более ранних
+    #    месяцев, свежие первыми («Начальный период» — в самом конце).
+    from app.modules.utility.services.prev_reading_index import (
+        PrevKey, PrevReadingIndex,
+    )
+
+    period = await db.get(BillingPeriod, current_reading.period_id)
+    if period is None:
+        return None
+    index = PrevReadingIndex.for_session(db)
+    await index.load(db, [PrevKey(user.id, room.id, period.name)])
+    _prev, _prev_any, earlier_desc = index.pick(
+        user.id, room.id, period.name, exclude_id=current_reading.id,
+    )
+    history = list(reversed(earlier_desc))
 
     if not history:
         return None  # некомпенсировать нечего
@@ -0,0 +1,519 @@
+# app/modules/utility/services/tariff_simulator.py
+"""Симулятор тарифа: черновик × реальные объёмы всего жилфонда.
+
+/api/tariffs/preview считает черновик на ОДНОМ наборе объёмов «типового
+жильца» — до assign-to-dormitory бухгалтерия не видела, во что изменение
+обойдётся реальным домам и людям. Здесь черновик применяется ко всем
+утверждённым показаниям последнего периода (или заданного):
+
+  1) загрузка — фиксированное число запросов, как у drift_engine:
+     approved-reading'и периода + жилец + комната, кандидаты prev одним
+     PrevReadingIndex, сезонные флаги один раз, тарифы из tariff_cache;
+  2) расчёт — плотный цикл без SQL: на каждую строку ДВА вызова
+     compute_reading_breakdown (текущий тариф и черновик) с одним и тем же
+     prev, т.е. на тех же объёмах и по той же формуле, что и биллинг;
+  3) свёртка — дельты по зданиям (billing._building_key) и по жильцам.
+
+В БД ничего не пишется: черновик — transient Tariff вне сессии.
+
+Результат кешируется в Redis по хешу черновика + скоупа + периода:
+
+    tariff:sim:<sha256> → {deps, versions, result}
+
+Инвалидация — через реестр версий (app/core/data_versions), как у
+qr_portal_cache: запись помнит версии readings@<период>, readings@<период
+до него> (там почти всегда лежит prev — правка prev меняет объёмы), rooms,
+users, tariffs, system_settings; любой commit по ним — промах и пересчёт.
+prev из более ранних периодов (жилец пропустил месяц) — в пределах TTL.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import aliased, selectinload
+
+from app.core.data_versions import read_versions
+from app.modules.utility.models import BillingPeriod, MeterReading, Tariff
+from app.modules.utility.services.calculations import CalculationError
+from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+from app.modules.utility.services.reading_calculator import compute_reading_breakdown
+from app.modules.utility.services.tariff_cache import tariff_cache
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "tariff:sim:"
+# Страховочный TTL: записи мимо Session (psql) версии не двигают.
+ENTRY_TTL_SECONDS = 3600
+# Сколько ошибок расчёта отдаём в ответе (остальные — только счётчиком).
+ERRORS_LIMIT = 50
+
+# Поля черновика. Денежные/объёмные — Decimal («12,5» → 12.5, пусто → 0).
+DECIMAL_FIELDS = (
+    "maintenance_repair", "social_rent", "heating", "water_heating",
+    "water_supply", "sewage", "waste_disposal", "electricity_rate",
+    "per_capita_amount",
+    "hw_norm_per_capita", "cw_norm_per_capita", "el_norm_per_capita",
+)
+# Флаги и их значения по умолчанию для черновика без базового тарифа.
+BOOL_FIELDS = {
+    "heating_active": True,
+    "hw_heating_active": True,
+    "charge_hot_water": True,
+    "charge_cold_water": True,
+    "charge_sewage": True,
+    "charge_electricity": True,
+    "charge_maintenance": True,
+    "charge_social_rent": True,
+    "charge_heating": True,
+    "charge_waste": True,
+    "singles_skip_maintenance": False,
+    "singles_skip_social_rent": False,
+    "singles_skip_heating": False,
+    "singles_skip_waste": False,
+}
+DATE_FIELDS = (
+    "heating_season_start", "heating_season_end",
+    "hw_heating_season_start", "hw_heating_season_end",
+)
+COST_FIELDS = (
+    "cost_hot_water", "cost_cold_water", "cost_sewage",
+    "cost_electricity", "cost_maintenance", "cost_social_rent",
+    "cost_waste", "cost_fixed_part",
+)
+
+
+# =========================================================================
+# ЧЕРНОВИК ТАРИФА
+# =========================================================================
+def _decimal(value) -> Decimal:
+    if value is None or value == "":
+        return Decimal("0")
+    try:
+        return Decimal(str(value).replace(",", "."))
+    except Exception:
+        return Decimal("0")
+
+
+def _bool(value, default: bool) -> bool:
+    if value is None:
+        return default
+    return bool(value) if isinstance(value, bool) else str(value).lower() not in ("false", "0", "")
+
+
+def _date(value) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).split("T")[0]).date()
+    except Exception:
+        return None
+
+
+def build_draft_tariff(data: dict, base: Optional[Tariff] = None) -> Tariff:
+    """Transient Tariff (без сессии) из полей формы.
+
+    Без `base` — как раньше в preview: отсутствующие ставки = 0, флаги —
+    значения по умолчанию. С `base` — копия базового тарифа, поверх
+    которой ложатся только присланные поля (правка существующего тарифа).
+
+    Bug AP: сезонные флаги задаются явно — server_default действует только
+    при INSERT, у in-memory объекта без значения атрибут None, и
+    is_hw_heating_active_now() считал бы подогрев ГВС выключенным.
+    """
+    values: dict = {}
+    for name in DECIMAL_FIELDS:
+        if name in data:
+            values[name] = _decimal(data[name])
+        else:
+            values[name] = _decimal(getattr(base, name, None)) if base is not None else Decimal("0")
+    for name, default in BOOL_FIELDS.items():
+        fallback = _bool(getattr(base, name, None), default) if base is not None else default
+        values[name] = _bool(data.get(name), fallback)
+    for name in DATE_FIELDS:
+        values[name] = _date(data[name]) if name in data else getattr(base, name, None)
+    tariff_type = data.get("tariff_type") or getattr(base, "tariff_type", None)
+    if tariff_type:
+        values["tariff_type"] = str(tariff_type)
+    return Tariff(name="__draft__", **values)
+
+
+def draft_hash(tariff: Tariff, *, period_id: int, scope: dict) -> str:
+    """Хеш РЕЗУЛЬТАТНЫХ полей черновика + периода + скоупа. Одинаковый
+    черновик, присланный целиком или правкой базового тарифа, даёт один хеш."""
+    payload = {
+        "tariff": {
+            name: getattr(tariff, name, None)
+            for name in (*DECIMAL_FIELDS, *BOOL_FIELDS, *DATE_FIELDS, "tariff_type")
+        },
+        "period_id": period_id,
+        "scope": scope,
+    }
+    for name in DECIMAL_FIELDS:
+        # 12.5 и 12.50 — одна ставка.
+        payload["tariff"][name] = str(payload["tariff"][name].normalize())
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# =========================================================================
+# РАСЧЁТ
+# =========================================================================
+@dataclass(slots=True)
+class SimRow:
+    """Пара «текущий тариф ↔ черновик» для одного reading'а."""
+    reading_id: int
+    user_id: int
+    username: Optional[str]
+    room_id: int
+    room_number: Optional[str]
+    building: str
+    current_tariff_id: Optional[int]
+    current: dict
+    draft: dict
+
+    @property
+    def delta(self) -> Decimal:
+        return self.draft["total_cost"] - self.current["total_cost"]
+
+
+@dataclass(slots=True)
+class Simulation:
+    period: Optional[BillingPeriod]
+    rows: list[SimRow] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+    skipped_out_of_scope: int = 0
+    timings_ms: dict = field(default_factory=dict)
+
+
+async def last_period_id(db) -> Optional[int]:
+    """Последний по хронологии период с утверждёнными показаниями."""
+    has_approved = exists().where(
+        MeterReading.period_id == BillingPeriod.id,
+        MeterReading.is_approved.is_(True),
+    )
+    return (await db.execute(
+        select(BillingPeriod.id).where(has_approved)
+        .order_by(BillingPeriod.chron_ordinal.desc(), BillingPeriod.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+
+
+def in_scope(room, current_tariff, scope: dict) -> bool:
+    """Кого касается черновик.
+
+      building        — все помещения здания (как assign-to-dormitory);
+      base_tariff_id  — помещения, где сейчас действует этот тариф (правка);
+      ничего          — весь жилфонд.
+    """
+    building = scope.get("building")
+    if building is not None:
+        from app.modules.utility.services.billing import _building_key
+        return _building_key(room) == building
+    base_id = scope.get("base_tariff_id")
+    if base_id is not None:
+        return current_tariff is not None and current_tariff.id == base_id
+    return True
+
+
+def _season(seasonal, tariff) -> tuple[bool, bool]:
+    return (
+        seasonal.heating_season_active and tariff.is_heating_active_now(),
+        seasonal.hot_water_heating_active and tariff.is_hw_heating_active_now(),
+    )
+
+
+async def simulate(db, draft: Tariff, *, period_id: int, scope: dict) -> Simulation:
+    """Черновик против текущих тарифов на approved-показаниях периода.
+    Без записи в БД."""
+    from app.modules.utility.routers.settings import _load_seasonal
+    from app.modules.utility.services.billing import _building_key
+
+    started = last = time.monotonic()
+    timings: dict[str, int] = {}
+
+    def _lap(name: str) -> None:
+        nonlocal last
+        now = time.monotonic()
+        timings[name] = int((now - last) * 1000)
+        last = now
+
+    period = await db.get(BillingPeriod, period_id)
+    if not period:
+        return Simulation(period=None)
+
+    readings = list((await db.execute(
+        select(MeterReading)
+        .options(selectinload(MeterReading.user), selectinload(MeterReading.room))
+        .where(
+            MeterReading.period_id == period_id,
+            MeterReading.is_approved.is_(True),
+        )
+        .order_by(MeterReading.id)
+    )).scalars().all())
+    _lap("load_readings")
+
+    sim = Simulation(period=period)
+    targets = []
+    for r in readings:
+        user, room = r.user, r.room
+        if not user or not room:
+            sim.errors.append({"reading_id": r.id, "reason": "no_user_or_room"})
+            continue
+        current = tariff_cache.get_effective_tariff(user=user, room=room)
+        if not in_scope(room, current, scope):
+            sim.skipped_out_of_scope += 1
+            continue
+        targets.append((r, current))
+
+    # Комната reading'а (r.room), НЕ текущая комната жильца — как в drift_engine.
+    index = PrevReadingIndex.for_session(db)
+    await index.load(db, [PrevKey(r.user_id, r.room_id, period.name) for r, _ in targets])
+    seasonal = await _load_seasonal(db)
+    _lap("load_prev")
+
+    draft_flags = _season(seasonal, draft)
+    season_flags: dict[int, tuple[bool, bool]] = {}
+    for r, current in targets:
+        user, room = r.user, r.room
+        prev = index.pick(user.id, room.id, period.name, exclude_id=r.id)[0]
+        volumes = dict(
+            user=user, room=room,
+            current_hot=r.hot_water or 0,
+            current_cold=r.cold_water or 0,
+            current_elect=r.electricity or 0,
+            prev_reading=prev,
+        )
+        try:
+            if current is None:
+                # Тарифа нет вовсе — «было» 0, весь черновик = прирост.
+                now_bd = dict.fromkeys((*COST_FIELDS, "total_cost", "total_209", "total_205"),
+                                       Decimal("0"))
+            else:
+                flags = season_flags.get(current.id)
+                if flags is None:
+                    flags = season_flags[current.id] = _season(seasonal, current)
+                now_bd = compute_reading_breakdown(
+                    tariff=current, heating_season_active=flags[0],
+                    hot_water_heating_active=flags[1], **volumes,
+                )
+            draft_bd = compute_reading_breakdown(
+                tariff=draft, heating_season_active=draft_flags[0],
+                hot_water_heating_active=draft_flags[1], **volumes,
+            )
+        except CalculationError as e:
+            sim.errors.append({
+                "reading_id": r.id, "user_id": user.id, "reason": f"calc_error: {e}",
+            })
+            continue
+        sim.rows.append(SimRow(
+            reading_id=r.id, user_id=user.id, username=user.username,
+            room_id=room.id, room_number=room.room_number,
+            building=_building_key(room),
+            current_tariff_id=current.id if current is not None else None,
+            current=now_bd, draft=draft_bd,
+        ))
+    _lap("compute")
+    timings["total"] = int((time.monotonic() - started) * 1000)
+    sim.timings_ms = timings
+    return sim
+
+
+def _money(value: Decimal) -> float:
+    return float(round(value, 2))
+
+
+def _pct(old: Decimal, new: Decimal) -> float:
+    if old == 0:
+        return 0.0 if new == 0 else 100.0
+    return round(float((new - old) / abs(old) * 100), 1)
+
+
+def summarize(sim: Simulation) -> dict:
+    """Свёртка в JSON-ответ: итог, здания, жильцы (по убыванию |дельты|)."""
+    buildings: dict[str, dict] = defaultdict(lambda: {
+        "residents": 0, "current": Decimal("0"), "draft": Decimal("0"),
+        "increased": 0, "decreased": 0, "max_increase": Decimal("0"),
+    })
+    components = dict.fromkeys(COST_FIELDS, Decimal("0"))
+    total_current = total_draft = Decimal("0")
+    increased = decreased = 0
+    for row in sim.rows:
+        cur, new, delta = row.current["total_cost"], row.draft["total_cost"], row.delta
+        b = buildings[row.building]
+        b["residents"] += 1
+        b["current"] += cur
+        b["draft"] += new
+        b["max_increase"] = max(b["max_increase"], delta)
+        if delta > 0:
+            b["increased"] += 1
+            increased += 1
+        elif delta < 0:
+            b["decreased"] += 1
+            decreased += 1
+        total_current += cur
+        total_draft += new
+        for name in COST_FIELDS:
+            components[name] += row.draft.get(name, Decimal("0")) - row.current.get(name, Decimal("0"))
+
+    by_building = [
+        {
+            "building": name,
+            "residents": b["residents"],
+            "current": _money(b["current"]),
+            "draft": _money(b["draft"]),
+            "delta": _money(b["draft"] - b["current"]),
+            "delta_pct": _pct(b["current"], b["draft"]),
+            "increased": b["increased"],
+            "decreased": b["decreased"],
+            "max_increase": _money(b["max_increase"]),
+        }
+        for name, b in buildings.items()
+    ]
+    by_building.sort(key=lambda x: abs(x["delta"]), reverse=True)
+
+    rows = sorted(sim.rows, key=lambda row: abs(row.delta), reverse=True)
+    residents = [
+        {
+            "reading_id": row.reading_id,
+            "user_id": row.user_id,
+            "username": row.username,
+            "room_id": row.room_id,
+            "room_number": row.room_number,
+            "building": row.building,
+            "current_tariff_id": row.current_tariff_id,
+            "current": _money(row.current["total_cost"]),
+            "draft": _money(row.draft["total_cost"]),
+            "delta": _money(row.delta),
+            "delta_209": _money(row.draft["total_209"] - row.current["total_209"]),
+            "delta_205": _money(row.draft["total_205"] - row.current["total_205"]),
+        }
+        for row in rows
+    ]
+    return {
+        "period": {"id": sim.period.id, "name": sim.period.name} if sim.period else None,
+        "totals": {
+            "residents": len(sim.rows),
+            "current": _money(total_current),
+            "draft": _money(total_draft),
+            "delta": _money(total_draft - total_current),
+            "delta_pct": _pct(total_current, total_draft),
+            "increased": increased,
+            "decreased": decreased,
+            "unchanged": len(sim.rows) - increased - decreased,
+            "components": {name: _money(v) for name, v in components.items()},
+            "skipped_out_of_scope": sim.skipped_out_of_scope,
+            "errors": len(sim.errors),
+        },
+        "buildings": by_building,
+        "residents": residents,
+        "errors": sim.errors[:ERRORS_LIMIT],
+        "timings_ms": sim.timings_ms,
+    }
+
+
+# =========================================================================
+# КЕШ РЕЗУЛЬТАТОВ
+# =========================================================================
+def _redis():
+    from app.core.redis_client import get_redis
+    return get_redis()
+
+
+async def previous_period_id(db, period_id: int) -> Optional[int]:
+    """Период, хронологически предшествующий period_id (источник prev)."""
+    current = aliased(BillingPeriod)
+    ordinal = select(current.chron_ordinal).where(current.id == period_id).scalar_subquery()
+    return (await db.execute(
+        select(BillingPeriod.id).where(BillingPeriod.chron_ordinal < ordinal)
+        .order_by(BillingPeriod.chron_ordinal.desc(), BillingPeriod.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+
+
+def dependencies(period_id: int, prev_period_id: Optional[int] = None) -> list[str]:
+    keys = [f"readings@{period_id}", "readings@*", "rooms", "users", "tariffs", "system_settings"]
+    if prev_period_id is not None:
+        keys.insert(1, f"readings@{prev_period_id}")
+    return keys
+
+
+async def load_result(key: str) -> Optional[dict]:
+    """Результат из кеша, если его зависимости не менялись; иначе None."""
+    try:
+        raw = await _redis().get(_KEY_PREFIX + key)
+    except Exception as exc:
+        logger.warning("[TARIFF_SIM] cache read failed: %s", exc)
+        return None
+    if not raw:
+        return None
+    try:
+        entry = json.loads(raw)
+    except ValueError:
+        return None
+    versions = await read_versions(entry.get("deps") or [])
+    if versions is None or versions != entry.get("versions"):
+        return None
+    return entry.get("result")
+
+
+async def store_result(key: str, deps: list[str], versions: Optional[list[str]], result: dict) -> None:
+    """Сохранить, если версии зависимостей не сдвинулись за время расчёта
+    (`versions` прочитаны ДО загрузки данных)."""
+    if versions is None:
+        return
+    current = await read_versions(deps)
+    if current != versions:
+        return
+    entry = {"deps": deps, "versions": versions, "result": result}
+    try:
+        await _redis().set(
+            _KEY_PREFIX + key, json.dumps(entry, ensure_ascii=False, default=str),
+            ex=ENTRY_TTL_SECONDS,
+        )
+    except Exception as exc:
+        logger.warning("[TARIFF_SIM] cache write failed: %s", exc)
+
+
+async def run_cached(db, draft: Tariff, *, period_id: int, scope: dict) -> tuple[dict, bool]:
+    """(результат, из_кеша). Версии читаются ДО расчёта — параллельный
+    commit даст промах в следующий раз, а не устаревший кеш."""
+    key = draft_hash(draft, period_id=period_id, scope=scope)
+    cached = await load_result(key)
+    if cached is not None:
+        return cached, True
+    deps = dependencies(period_id, await previous_period_id(db, period_id))
+    versions = await read_versions(deps)
+    result = summarize(await simulate(db, draft, period_id=period_id, scope=scope))
+    result["draft_hash"] = key
+    if result["period"] is not None:
+        await store_result(key, deps, versions, result)
+    return result, False
+
+
+__all__ = [
+    "ENTRY_TTL_SECONDS",
+    "SimRow",
+    "Simulation",
+    "build_draft_tariff",
+    "dependencies",
+    "draft_hash",
+    "in_scope",
+    "last_period_id",
+    "load_result",
+    "previous_period_id",
+    "run_cached",
+    "simulate",
+    "store_result",
+    "summarize",
+]
@@ -0,0 +1,574 @@
+# app/modules/utility/services/user_import.py
+"""
+Пакетный возобновляемый импорт «Жилфонд + Жильцы» из Excel.
+
+Раньше import_users_from_excel грузил весь workbook в web-воркер и шёл
+построчно: flush на каждую новую комнату, move_user_to_room на каждого
+переехавшего — импорт всего жилфонда держал воркер минутами, а падение
+на середине откатывало всё.
+
+Теперь (Celery-задача import_users_task):
+  1) лист читается read-only в отдельном потоке-парсере и отдаётся пачками
+     по BATCH_ROWS через ограниченную очередь — разбор следующей пачки идёт
+     параллельно с записью текущей;
+  2) существующие комнаты/жильцы пачки ищутся ОДНИМ запросом каждого вида;
+  3) комнаты пишутся одним multi-row INSERT ... ON CONFLICT DO UPDATE по
+     uq_room_dorm_addr, новые жильцы — INSERT ... ON CONFLICT DO NOTHING,
+     существующие — bulk UPDATE по PK, история проживания — set-based;
+  4) пачка коммитится вместе с checkpoint_row задачи — resume после падения
+     продолжает со следующей строки.
+
+Формат колонок Excel (с 2-й строки):
+  0: Логин (ФИО), 1: Пароль, 2: Общежитие, 3: № Комнаты, 4: Площадь,
+  5: Мест в комнате, 6: Жильцов (платит за), 7: № ГВС, 8: № ХВС,
+  9: № Электр., 10: Место работы, 11: Тарифный профиль, 12: Тип жильца
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import load_workbook
+from sqlalchemy import case, func, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.auth import get_password_hash
+from app.core.time_utils import utcnow
+from app.modules.utility.models import (
+    PlaceType, Room, RoomAssignment, Tariff, User, UserImportJob,
+)
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+# Файлы импорта живут рядом с архивами 1С, до успешного завершения задачи
+# (нужны для resume). Каталог создаётся лениво при сохранении.
+USER_IMPORT_DIR = "/app/static/generated_files/user_imports"
+
+# Строк на одну транзакцию/чекпоинт. 500 — multi-row INSERT остаётся в
+# пределах лимита параметров asyncpg/psycopg и коммит не держит локи долго.
+BATCH_ROWS = 500
+
+# Сколько текстов ошибок храним в summary (остальные только считаем).
+ERRORS_LIMIT = 500
+
+# Глубина очереди парсер → писатель: парсер опережает запись не больше чем
+# на 2 пачки, память — константа.
+_PREFETCH_BATCHES = 2
+
+_SINGLE_ALIASES = ("single", "холостяк", "холост", "койко", "койко-место")
+_NOTE = "excel-import"
+
+
+@dataclass(slots=True)
+class ImportRow:
+    row_index: int
+    username: Optional[str]
+    password: Optional[str]
+    explicit_password: bool
+    dormitory: str
+    room_number: str
+    apartment_area: Decimal
+    total_room_residents: int
+    residents_count: int
+    hw_serial: Optional[str]
+    cw_serial: Optional[str]
+    el_serial: Optional[str]
+    workplace: Optional[str]
+    tariff_id: Optional[int]
+    resident_type: str
+
+
+def _cell(row: tuple, idx: int) -> Optional[str]:
+    if len(row) > idx and row[idx]:
+        return str(row[idx]).strip() or None
+    return None
+
+
+def parse_row(
+    row_index: int, row: tuple, tariffs: Dict[str, int], errors: List[str],
+) -> Optional[ImportRow]:
+    """Разбор одной строки листа. None — строка пустая или без адреса
+    (во втором случае в errors добавляется текст). Предупреждения по
+    числам/тарифу тоже пишутся в errors, но строка импортируется."""
+    if not row or not any(row):
+        return None
+
+    username = _cell(row, 0)
+    password = _cell(row, 1) or username
+    dormitory = _cell(row, 2)
+    room_number = _cell(row, 3)
+
+    if not dormitory or not room_number:
+        errors.append(f"Строка {row_index}: Не указано 'Общежитие' или 'Номер комнаты'")
+        return None
+
+    try:
+        apartment_area = Decimal(str(row[4]).replace(',', '.')) if len(row) > 4 and row[4] else ZERO
+        total_room_residents = int(row[5]) if len(row) > 5 and row[5] else 1
+        residents_count = int(row[6]) if len(row) > 6 and row[6] else 1
+    except Exception:
+        apartment_area, total_room_residents, residents_count = ZERO, 1, 1
+        errors.append(f"Строка {row_index}: Ошибка в числовых данных (Площадь/Места). Установлены нули.")
+
+    tariff_id = None
+    tariff_name_raw = _cell(row, 11)
+    if tariff_name_raw:
+        tariff_id = tariffs.get(tariff_name_raw.lower())
+        if tariff_id is None:
+            errors.append(
+                f"Строка {row_index}: Тариф '{tariff_name_raw}' не найден. Применен тариф по умолчанию.")
+
+    # Тип жильца: 'single'/'холостяк'/'койко' → single, всё остальное → family.
+    # billing_mode всегда by_meter (per_capita — legacy, см. calculate_utilities).
+    rt_raw = (_cell(row, 12) or "").lower()
+    resident_type = "single" if rt_raw in _SINGLE_ALIASES else "family"
+
+    return ImportRow(
+        row_index=row_index,
+        username=username,
+        password=password,
+        explicit_password=bool(password and password != username),
+        dormitory=dormitory,
+        room_number=room_number,
+        apartment_area=apartment_area,
+        total_room_residents=total_room_residents,
+        residents_count=residents_count,
+        hw_serial=_cell(row, 7),
+        cw_serial=_cell(row, 8),
+        el_serial=_cell(row, 9),
+        workplace=_cell(row, 10),
+        tariff_id=tariff_id,
+        resident_type=resident_type,
+    )
+
+
+def count_sheet_rows(file_path: str) -> int:
+    """Оценка числа строк данных по dimension листа (без заголовка)."""
+    wb = load_workbook(filename=file_path, read_only=True, data_only=True)
+    try:
+        return max((wb.active.max_row or 1) - 1, 0)
+    finally:
+        wb.close()
+
+
+def iter_row_batches(
+    file_path: str,
+    tariffs: Dict[str, int],
+    *,
+    start_row: int = 2,
+    batch_size: int = BATCH_ROWS,
+) -> Iterator[Tuple[int, int, int, List[ImportRow], List[str]]]:
+    """Стримит лист пачками: (последняя строка Excel, строк прочитано,
+    строк пропущено, разобранные строки, ошибки разбора).
+
+    Чтение и разбор идут в отдельном потоке: openpyxl в read-only режиме
+    держит в памяти только текущую строку, очередь ограничена
+    _PREFETCH_BATCHES — пока писатель коммитит пачку N, парсер уже готовит
+    N+1. Исключение парсера пробрасывается в вызывающий поток.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=_PREFETCH_BATCHES)
+    stop = threading.Event()
+    done = object()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        wb = None
+        try:
+            wb = load_workbook(filename=file_path, read_only=True, data_only=True)
+            rows: List[ImportRow] = []
+            errors: List[str] = []
+            seen = skipped = 0
+            last_row = start_row - 1
+            for row_index, row in enumerate(
+                wb.active.iter_rows(min_row=start_row, values_only=True), start=start_row,
+            ):
+                last_row = row_index
+                seen += 1
+                parsed = parse_row(row_index, row, tariffs, errors)
+                if parsed is not None:
+                    rows.append(parsed)
+                elif row and any(row):
+                    skipped += 1
+                if seen >= batch_size:
+                    if not _put((last_row, seen, skipped, rows, errors)):
+                        return
+                    rows, errors, seen, skipped = [], [], 0, 0
+            if seen and not _put((last_row, seen, skipped, rows, errors)):
+                return
+            _put(done)
+        except BaseException as exc:  # noqa: BLE001 — пробрасываем в писателя
+            _put(exc)
+        finally:
+            if wb is not None:
+                wb.close()
+
+    producer = threading.Thread(target=_produce, name="user-import-parser", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+
+def load_active_tariffs(db: Session) -> Dict[str, int]:
+    return {
+        t.name.strip().lower(): t.id
+        for t in db.execute(select(Tariff).where(Tariff.is_active.is_(True))).scalars()
+    }
+
+
+def _merge_room_rows(rows: List[ImportRow]) -> Dict[Tuple[str, str], dict]:
+    """Одна запись на комнату пачки: ON CONFLICT DO UPDATE не допускает
+    двух строк с одним ключом в одном INSERT. Поля сливаются как при
+    построчном проходе — последнее непустое/положительное значение."""
+    merged: Dict[Tuple[str, str], dict] = {}
+    for r in rows:
+        key = (r.dormitory, r.room_number)
+        item = merged.get(key)
+        if item is None:
+            merged[key] = {
+                "place_type": PlaceType.DORMITORY,
+                "dormitory_name": r.dormitory,
+                "room_number": r.room_number,
+                "apartment_area": r.apartment_area,
+                "total_room_residents": r.total_room_residents,
+                "hw_meter_serial": r.hw_serial,
+                "cw_meter_serial": r.cw_serial,
+                "el_meter_serial": r.el_serial,
+            }
+            continue
+        if r.apartment_area > 0:
+            item["apartment_area"] = r.apartment_area
+        if r.total_room_residents > 0:
+            item["total_room_residents"] = r.total_room_residents
+        for field, value in (("hw_meter_serial", r.hw_serial),
+                             ("cw_meter_serial", r.cw_serial),
+                             ("el_meter_serial", r.el_serial)):
+            if value:
+                item[field] = value
+    return merged
+
+
+def _upsert_rooms(db: Session, rows: List[ImportRow]) -> Tuple[Dict[Tuple[str, str], tuple], int, int]:
+    merged = _merge_room_rows(rows)
+    if not merged:
+        return {}, 0, 0
+    stmt = pg_insert(Room).values(list(merged.values()))
+    ex = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Room.dormitory_name, Room.room_number],
+        index_where=text("place_type = 'dormitory'"),
+        set_={
+            "apartment_area": case(
+                (ex.apartment_area > 0, ex.apartment_area), else_=Room.apartment_area),
+            "total_room_residents": case(
+                (ex.total_room_residents > 0, ex.total_room_residents),
+                else_=Room.total_room_residents),
+            "hw_meter_serial": func.coalesce(ex.hw_meter_serial, Room.hw_meter_serial),
+            "cw_meter_serial": func.coalesce(ex.cw_meter_serial, Room.cw_meter_serial),
+            "el_meter_serial": func.coalesce(ex.el_meter_serial, Room.el_meter_serial),
+            # onupdate ORM-колонки в ON CONFLICT DO UPDATE сам не срабатывает.
+            "updated_at": utcnow(),
+        },
+    ).returning(
+        Room.id, Room.dormitory_name, Room.room_number,
+        Room.is_singles_apartment, Room.total_room_residents,
+        # xmax = 0 ⇔ строка вставлена, а не обновлена (Postgres-специфика).
+        literal_column("(xmax = 0)").label("inserted"),
+    )
+    rooms: Dict[Tuple[str, str], tuple] = {}
+    added = 0
+    for rid, dorm, number, is_singles, trr, inserted in db.execute(stmt):
+        rooms[(dorm, number)] = (rid, bool(is_singles), trr)
+        added += 1 if inserted else 0
+    return rooms, added, len(rooms) - added
+
+
+def apply_batch(
+    db: Session,
+    rows: List[ImportRow],
+    password_cache: Dict[str, str],
+    errors: List[str],
+) -> Dict[str, int]:
+    """Записывает пачку. Commit делает вызывающий (вместе с чекпоинтом)."""
+    stats = {"added_users": 0, "updated_users": 0, "added_rooms": 0,
+             "updated_rooms": 0, "skipped": 0}
+    if not rows:
+        return stats
+
+    rooms, stats["added_rooms"], stats["updated_rooms"] = _upsert_rooms(db, rows)
+
+    # Одна строка на жильца (последняя в пачке побеждает — как при
+    # построчном проходе, где поздняя строка перезаписывала раннюю).
+    by_name: Dict[str, ImportRow] = {}
+    for r in rows:
+        if r.username:
+            by_name[r.username.lower()] = r
+    if not by_name:
+        return stats
+
+    existing = {
+        lname: (uid, room_id, is_deleted)
+        for uid, lname, room_id, is_deleted in db.execute(
+            select(User.id, func.lower(User.username), User.room_id, User.is_deleted)
+            .where(func.lower(User.username).in_(list(by_name)))
+        )
+    }
+
+    def _hash(password: str) -> str:
+        hashed = password_cache.get(password)
+        if hashed is None:
+            hashed = password_cache[password] = get_password_hash(password)
+        return hashed
+
+    new_users: List[dict] = []
+    updates: List[dict] = []
+    moves: List[Tuple[int, Optional[int], int]] = []  # (user_id, old_room, new_room)
+    for lname, r in by_name.items():
+        room_id, is_singles, room_trr = rooms[(r.dormitory, r.room_number)]
+        # Холостяцкая комната → жилец single, что бы ни лежало в Excel.
+        resident_type = "single" if is_singles else r.resident_type
+        residents_count = 1 if resident_type == "single" else r.residents_count
+        found = existing.get(lname)
+
+        if found is None:
+            new_users.append({
+                "username": r.username,
+                "login": r.username,  # учётка по умолчанию = ФИО, жилец сменит сам
+                "hashed_password": _hash(r.password),
+                "role": "user",
+                "workplace": r.workplace,
+                "residents_count": residents_count,
+                "room_id": room_id,
+                "tariff_id": r.tariff_id,
+                "resident_type": resident_type,
+                "billing_mode": "by_meter",
+                "is_deleted": False,
+            })
+            continue
+
+        uid, old_room_id, is_deleted = found
+        if is_deleted:
+            errors.append(
+                f"Строка {r.row_index}: Жилец '{r.username}' удалён — восстановите его вручную")
+            stats["skipped"] += 1
+            continue
+
+        params = {"id": uid, "workplace": r.workplace, "residents_count": residents_count}
+        if r.tariff_id is not None:
+            params["tariff_id"] = r.tariff_id
+        # resident_type обновляем только при явном single — чтобы не
+        # «пересадить» уже корректно настроенных family.
+        if resident_type == "single":
+            params["resident_type"] = "single"
+            params["billing_mode"] = "by_meter"
+        if r.explicit_password:
+            params["hashed_password"] = _hash(r.password)
+        if old_room_id != room_id:
+            # Переезд: как в move_user_to_room — тип жильца по комнате,
+            # у семьи число людей берётся из Жилфонда.
+            params["room_id"] = room_id
+            params["resident_type"] = resident_type
+            if resident_type == "family":
+                params["residents_count"] = int(room_trr) if room_trr and int(room_trr) > 0 else 1
+            moves.append((uid, old_room_id, room_id))
+        updates.append(params)
+
+    if updates:
+        db.execute(update(User), updates)
+        stats["updated_users"] = len(updates)
+
+    seeded: List[Tuple[int, int]] = []
+    if new_users:
+        inserted = db.execute(
+            pg_insert(User).values(new_users)
+            .on_conflict_do_nothing()
+            .returning(User.id, User.username, User.room_id)
+        ).all()
+        stats["added_users"] = len(inserted)
+        seeded = [(uid, rid) for uid, _, rid in inserted]
+        if len(inserted) < len(new_users):
+            # Конфликт по uq_user_login_lower: ФИО совпало с чужим логином.
+            got = {name.lower() for _, name, _ in inserted}
+            for item in new_users:
+                if item["username"].lower() not in got:
+                    r = by_name[item["username"].lower()]
+                    errors.append(
+                        f"Строка {r.row_index}: Логин '{r.username}' уже занят другим жильцом")
+                    stats["skipped"] += 1
+
+    _apply_assignments(db, seeded, moves)
+    return stats
+
+
+def _apply_assignments(
+    db: Session,
+    seeded: List[Tuple[int, int]],
+    moves: List[Tuple[int, Optional[int], int]],
+) -> None:
+    """История проживания пачкой — set-based эквивалент move_user_to_room:
+    закрыть активные записи переехавших, открыть новые, поправить is_vacant
+    и делитель счётчиков singles-комнат."""
+    now = utcnow()
+    if moves:
+        db.execute(
+            update(RoomAssignment)
+            .where(
+                RoomAssignment.user_id.in_([uid for uid, _, _ in moves]),
+                RoomAssignment.moved_out_at.is_(None),
+            )
+            .values(
+                moved_out_at=now,
+                note=func.coalesce(RoomAssignment.note, "") + f" | out: {_NOTE}",
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    opened = [{"user_id": uid, "room_id": rid, "moved_in_at": now,
+               "note": f"{_NOTE} (bulk seed)"} for uid, rid in seeded]
+    opened += [{"user_id": uid, "room_id": rid, "moved_in_at": now, "note": _NOTE}
+               for uid, _, rid in moves]
+    if not opened:
+        return
+    db.execute(pg_insert(RoomAssignment).values(opened))
+
+    new_room_ids = {o["room_id"] for o in opened}
+    old_room_ids = {old for _, old, _ in moves if old is not None} - new_room_ids
+    db.execute(
+        update(Room)
+        .where(Room.id.in_(new_room_ids), Room.is_vacant.is_(True))
+        .values(is_vacant=False)
+        .execution_options(synchronize_session=False)
+    )
+    if old_room_ids:
+        has_residents = (
+            select(User.id)
+            .where(User.room_id == Room.id, User.is_deleted.is_(False))
+            .exists()
+        )
+        db.execute(
+            update(Room)
+            .where(Room.id.in_(old_room_ids), ~has_residents)
+            .values(is_vacant=True)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Аудит #13: делитель счётчиков singles = число активных жильцов.
+    active_count = (
+        select(func.count(User.id))
+        .where(User.room_id == Room.id, User.is_deleted.is_(False), User.role == "user")
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Room)
+        .where(Room.id.in_(new_room_ids | old_room_ids), Room.is_singles_apartment.is_(True))
+        .values(total_room_residents=func.greatest(active_count, 1))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _empty_summary() -> dict:
+    return {"added_users": 0, "updated_users": 0, "added_rooms": 0,
+            "updated_rooms": 0, "skipped": 0, "errors": [], "errors_truncated": 0}
+
+
+def _merge_summary(summary: dict, stats: Dict[str, int], errors: List[str]) -> dict:
+    merged = dict(summary)
+    for key, value in stats.items():
+        merged[key] = merged.get(key, 0) + value
+    room = ERRORS_LIMIT - len(merged["errors"])
+    merged["errors"] = merged["errors"] + errors[:max(room, 0)]
+    merged["errors_truncated"] += max(len(errors) - max(room, 0), 0)
+    return merged
+
+
+def publish_import_progress(job: UserImportJob) -> None:
+    """Прогресс в push-канал админки (services/admin_events)."""
+    from app.modules.utility.services.admin_events import publish_job_progress
+    publish_job_progress(
+        "user_import", job.id, job.status, job.progress,
+        processed=job.processed_rows, total=job.total_rows, error=job.error,
+    )
+
+
+def run_import_job(db: Session, job_id: int) -> dict:
+    """Исполняет (или продолжает с checkpoint_row) UserImportJob."""
+    job = db.get(UserImportJob, job_id)
+    if job is None:
+        return {"status": "missing"}
+    if job.status == "done":
+        return {"status": "done", "summary": job.summary}
+
+    job.status = "running"
+    job.error = None
+    if job.summary is None:
+        job.summary = _empty_summary()
+    if not job.total_rows:
+        job.total_rows = count_sheet_rows(job.file_path)
+    db.commit()
+
+    tariffs = load_active_tariffs(db)
+    password_cache: Dict[str, str] = {}
+    start_row = (job.checkpoint_row or 1) + 1
+    logger.info("[USER_IMPORT] job %s: start from row %s (total≈%s)",
+                job_id, start_row, job.total_rows)
+
+    for last_row, seen, skipped, rows, errors in iter_row_batches(
+        job.file_path, tariffs, start_row=start_row,
+    ):
+        stats = apply_batch(db, rows, password_cache, errors)
+        stats["skipped"] += skipped
+        job.summary = _merge_summary(job.summary, stats, errors)
+        job.processed_rows += seen
+        job.checkpoint_row = last_row
+        if job.total_rows:
+            job.progress = min(99, job.processed_rows * 100 // job.total_rows)
+        # Данные пачки и чекпоинт — одна транзакция: resume не повторит и
+        # не пропустит ни одной строки.
+        db.commit()
+        publish_import_progress(job)
+
+    job.status = "done"
+    job.progress = 100
+    job.finished_at = utcnow()
+    db.commit()
+    publish_import_progress(job)
+
+    try:
+        os.remove(job.file_path)
+    except OSError:
+        logger.warning("[USER_IMPORT] job %s: не удалось удалить %s", job_id, job.file_path)
+    return {"status": "done", "summary": job.summary}
+
+
+def store_upload(content: bytes, ext: str) -> str:
+    """Сохраняет загруженный xlsx в USER_IMPORT_DIR под уникальным именем."""
+    import uuid
+    os.makedirs(USER_IMPORT_DIR, exist_ok=True)
+    file_path = os.path.join(USER_IMPORT_DIR, f"{uuid.uuid4().hex}.{ext}")
+    with open(file_path, "wb") as buffer:
+        buffer.write(content)
+    return file_path
@@ -18,6 +18,7 @@ from ._shared import SessionLocalSync, get_sync_db, sync_db_session  # noqa: F40
 from .receipts import generate_receipt_task, start_bulk_receipt_generation  # noqa: F401
 from .debts import import_debts_task, onec_autopublish_task  # noqa: F401
 from .autofill import auto_fill_missing_readings_task  # noqa: F401
+from .audit_retention import maintain_audit_partitions_task  # noqa: F401
 from .debt_retention import cleanup_debt_archives_task  # noqa: F401
 from .periods import (  # noqa: F401
     activate_scheduled_tariffs_task,
@@ -26,8 +27,14 @@ from .periods import (  # noqa: F401
     run_async_close_period,
 )
 from .anomalies import detect_anomalies_task, run_arsenal_analyzer_task  # noqa: F401
-from .gsheets import sync_gsheets_task  # noqa: F401
-from .recalc import recalc_period_apply_task, recalc_period_preview_task  # noqa: F401
+from .gsheets import retire_superseded_gsheets_rows_task, sync_gsheets_task  # noqa: F401
+from .recalc import (  # noqa: F401
+    recalc_merge_task,
+    recalc_period_apply_task,
+    recalc_period_preview_task,
+    recalc_shard_task,
+)
+from .user_import import import_users_task  # noqa: F401
 from .maintenance import (  # noqa: F401
     auto_recalc_drift_task,
     charge_houses_rent_task,
@@ -37,6 +44,7 @@ from .maintenance import (  # noqa: F401
     scan_resident_problems_task,
     system_health_task,
 )
+from .month_close import month_close_advance_task, month_close_stage_task  # noqa: F401
 
 __all__ = [
     "SessionLocalSync",
@@ -48,6 +56,7 @@ __all__ = [
     "onec_autopublish_task",
     "auto_fill_missing_readings_task",
     "cleanup_debt_archives_task",
+    "maintain_audit_partitions_task",
     "run_async_close_period",
     "close_period_task",
     "check_auto_period_task",
@@ -55,8 +64,12 @@ __all__ = [
     "run_arsenal_analyzer_task",
     "detect_anomalies_task",
     "sync_gsheets_task",
+    "retire_superseded_gsheets_rows_task",
     "recalc_period_preview_task",
     "recalc_period_apply_task",
+    "recalc_shard_task",
+    "recalc_merge_task",
+    "import_users_task",
     "cleanup_gsheets_old_rows_task",
     "cleanup_outlier_readings_task",
     "scan_resident_problems_task",
@@ -64,4 +77,6 @@ __all__ = [
     "charge_houses_rent_task",
     "cleanup_qr_tickets_task",
     "system_health_task",
+    "month_close_advance_task",
+    "month_close_stage_task",
 ]
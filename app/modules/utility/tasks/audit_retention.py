@@ -0,0 +1,39 @@
+# Обслуживание партиций audit_log: заранее заводим месяцы вперёд,
+# выгружаем в архив и отсоединяем вышедшие за ретеншн.
+
+from app.worker import celery
+
+from ._shared import logger, sync_db_session
+
+
+@celery.task(name="maintain_audit_partitions_task")
+def maintain_audit_partitions_task() -> dict:
+    """Ежедневно в 03:40 (см. worker.py beat_schedule).
+
+      - партиции audit_log на 3 месяца вперёд (вставки не уходят в DEFAULT);
+      - партиции старше analyzer_settings.audit.retention_months (default 24)
+        → gzip-JSONL в audit_archives + DETACH/DROP (services/audit_archive).
+
+    Ошибка выгрузки одной партиции не отменяет остальные (archive_expired
+    логирует её и идёт дальше): партиция остаётся на месте, следующий прогон
+    попробует снова.
+    """
+    from app.modules.utility.services import audit_archive
+    from app.modules.utility.services.analyzer_config import config
+
+    retention = config.get_int(
+        "audit.retention_months", audit_archive.DEFAULT_RETENTION_MONTHS,
+    )
+    with sync_db_session() as db:
+        created = audit_archive.ensure_partitions(db)
+        try:
+            archived = audit_archive.archive_expired(db, retention)
+        except Exception as exc:
+            db.rollback()
+            logger.exception("[AUDIT-RETENTION] archive failed")
+            archived = [{"error": str(exc)[:500]}]
+
+    logger.info(
+        f"[AUDIT-RETENTION] created {len(created)} partitions, archived {len(archived)}"
+    )
+    return {"created": created, "archived": archived}
@@ -29,6 +29,7 @@ def cleanup_debt_archives_task() -> dict:
     from sqlalchemy import select
     from app.modules.utility.models import DebtImportLog
     from app.modules.utility.services.analyzer_config import config
+    from app.modules.utility.services.debt_archive_index import remove_index
 
     default_retention = config.get_int("debt.archive_retention_days", 730)
 
@@ -50,6 +51,8 @@ def cleanup_debt_archives_task() -> dict:
                 continue
 
             path = log.archive_path
+            if path:
+                remove_index(path)  # ФИО-индекс архива — вместе с xlsx
             if path and os.path.exists(path):
                 try:
                     os.remove(path)
@@ -59,6 +59,14 @@ def import_debts_task(
 
     # Архивные файлы НЕ удаляем — они привязаны к DebtImportLog.archive_path
     # и используются для скачивания / диагностики. Удалит retention-task.
+    # ФИО-индекс архива строим сразу — диагностика покрытия жильца читает
+    # его, а не xlsx. Ошибка индекса импорт не валит (соберётся лениво).
+    if "/debt_archives/" in file_path:
+        try:
+            from app.modules.utility.services.debt_archive_index import write_index
+            write_index(file_path)
+        except Exception as error:
+            logger.warning(f"[IMPORT] FIO index build failed for {file_path}: {error}")
     # Файлы из legacy temp_imports — удаляем как раньше.
     if "/temp_imports/" in file_path:
         try:
@@ -1,6 +1,9 @@
-# Синхронизация показаний из Google Sheets (ручной запуск + beat).
+# Синхронизация показаний из Google Sheets (ручной запуск + beat) и
+# автопогашение перекрытых строк буфера (beat).
 # Вербатим-перенос из tasks.py (строки 846-884), поведение 1:1.
 
+import asyncio
+
 from app.worker import celery
 from app.core.config import settings
 
@@ -44,5 +47,50 @@ def sync_gsheets_task(sheet_id: str = "", gid: str = "", limit: int | None = Non
         logger.info("[GSHEETS] GSHEETS_SHEET_ID не задан — автосинк пропущен")
         return {"skipped": True, "reason": "no_sheet_id"}
 
+    from app.modules.utility.services.admin_events import mark_notifications_dirty_sync
+
     with sync_db_session() as db:
-        return sync_gsheets(db, effective_id, effective_gid, limit=limit)
+        result = sync_gsheets(db, effective_id, effective_gid, limit=limit)
+    # Новые conflict/unmatched — колокольчик админки обновится сразу.
+    mark_notifications_dirty_sync()
+    return result
+
+
+@celery.task(name="retire_superseded_gsheets_rows_task")
+def retire_superseded_gsheets_rows_task():
+    """Гасит строки буфера, чей месяц админ уже решил другим путём (ручной
+    ввод/QR/Excel) — см. gsheets_supersede. Раньше это делал каждый GET
+    реестра; теперь — beat раз в несколько минут."""
+    async def _run():
+        # Свой engine на вызов (как scan_resident_problems_task): asyncio.run
+        # создаёт новый event loop, asyncpg-коннекты привязаны к loop'у.
+        from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession as _AS
+        from sqlalchemy.orm import sessionmaker as _smaker
+        from app.modules.utility.services.gsheets_supersede import retire_stale_buffer_rows
+        _engine = create_async_engine(
+            settings.DATABASE_URL_ASYNC,
+            echo=False, future=True, pool_pre_ping=True,
+            connect_args={"prepared_statement_cache_size": 0,
+                          "statement_cache_size": 0, "command_timeout": 60},
+        )
+        _mk = _smaker(bind=_engine, class_=_AS, expire_on_commit=False, autoflush=False)
+        try:
+            async with _mk() as db:
+                retired = await retire_stale_buffer_rows(db)
+                if retired:
+                    await db.commit()
+                return {"retired": retired}
+        finally:
+            await _engine.dispose()
+
+    try:
+        result = asyncio.run(_run())
+    except Exception as e:
+        logger.exception("[retire_superseded_gsheets_rows_task] crashed")
+        return {"crashed": True, "error": str(e)}
+    if result["retired"]:
+        logger.info("[retire_superseded_gsheets_rows_task] %s", result)
+        # Конфликты ушли из буфера — колокольчик админки обновится сразу.
+        from app.modules.utility.services.admin_events import mark_notifications_dirty_sync
+        mark_notifications_dirty_sync()
+    return result
@@ -229,6 +229,9 @@ def scan_resident_problems_task():
     try:
         result = asyncio.run(_run())
         logger.info("[scan_resident_problems_task] %s", result)
+        # Колокольчик админки: пересчитать сводку сразу, не ждать интервала.
+        from app.modules.utility.services.admin_events import mark_notifications_dirty_sync
+        mark_notifications_dirty_sync()
         return result
     except Exception as e:
         logger.exception("[scan_resident_problems_task] crashed")
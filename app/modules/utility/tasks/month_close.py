@@ -0,0 +1,235 @@
+# Закрытие месяца графом этапов: один Celery-этап = одна задача, очередь
+# этапов ведёт сам прогон (month_close_runs). Граф и этапы —
+# services/month_close.py.
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.worker import celery
+from app.modules.utility.services.admin_events import publish_job_progress
+
+from ._shared import logger, sync_db_session
+
+
+# ==========================================================================
+# ПЕРЕХОДЫ СОСТОЯНИЙ
+# ==========================================================================
+# Каждый переход — короткая транзакция под SELECT ... FOR UPDATE строки
+# прогона: параллельные этапы (static_rent ∥ unconditional_norm,
+# receipts ∥ open_next) завершаются одновременно и иначе затёрли бы
+# stages друг друга. JSONB переприсваиваем копией — иначе SQLAlchemy не
+# увидит изменение вложенного dict.
+# Задачи готовых этапов отправляются ПОСЛЕ commit'а: этап-воркер должен
+# увидеть свой статус queued.
+# ==========================================================================
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+def _locked_run(db, run_id: int):
+    from app.modules.utility.models import MonthCloseRun
+    return db.query(MonthCloseRun).filter(MonthCloseRun.id == run_id).with_for_update().first()
+
+
+def _copy_stages(run) -> dict:
+    return {name: dict(state) for name, state in (run.stages or {}).items()}
+
+
+def _schedule(run, stages: dict) -> list[str]:
+    """Отметить готовые этапы queued и пересчитать статус прогона (в транзакции)."""
+    from app.modules.utility.services.month_close import build_dag, ready_stages, run_status
+
+    ready = ready_stages(build_dag(run.options, run.context), stages)
+    for stage in ready:
+        stages[stage]["status"] = "queued"
+    run.stages = stages
+    run.status = run_status(stages)
+    if run.status == "done":
+        run.finished_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        run.error = None
+    elif run.status == "failed":
+        run.finished_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    return ready
+
+
+def _dispatch(run_id: int, ready: list[str]) -> None:
+    for stage in ready:
+        month_close_stage_task.delay(run_id, stage)
+
+
+@celery.task(name="month_close_advance_task")
+def month_close_advance_task(run_id: int, reset: str | None = None, reset_all: bool = False) -> list[str]:
+    """Запустить готовые этапы прогона (старт из роутера); reset/reset_all —
+    сперва вернуть упавшие и зависшие этапы в pending (retry одного этапа /
+    resume всего прогона). Возвращает поставленные в очередь этапы."""
+    from app.modules.utility.services.month_close import reset_failed
+
+    with sync_db_session() as db:
+        run = _locked_run(db, run_id)
+        if run is None:
+            return []
+        stages = _copy_stages(run)
+        if reset or reset_all:
+            reset_failed(stages, reset)
+        ready = _schedule(run, stages)
+        db.commit()
+    _dispatch(run_id, ready)
+    return ready
+
+
+def _can_enter(state: dict, task_id: str | None) -> bool:
+    """queued — обычный старт. running — повторная доставка после смерти
+    воркера (acks_late + reject_on_worker_lost): то же сообщение (task_id
+    совпадает) или этап завис дольше лимита задачи. Иначе — дубль доставки
+    или этап сброшен, не выполняем."""
+    from app.modules.utility.services.month_close import is_stuck
+
+    status = state.get("status")
+    if status == "queued":
+        return True
+    if status != "running":
+        return False
+    return bool(task_id and state.get("task_id") == task_id) or is_stuck(state)
+
+
+def _begin_stage(run_id: int, stage: str, task_id: str | None = None):
+    with sync_db_session() as db:
+        run = _locked_run(db, run_id)
+        if run is None or not _can_enter((run.stages or {}).get(stage, {}), task_id):
+            return None
+        stages = _copy_stages(run)
+        state = stages[stage]
+        state.update(status="running", started_at=_now_iso(), finished_at=None,
+                     task_id=task_id, attempts=int(state.get("attempts") or 0) + 1)
+        state.pop("error", None)
+        run.stages = stages
+        db.commit()
+        return {
+            "period_id": run.period_id,
+            "options": dict(run.options or {}),
+            "context": dict(run.context or {}),
+        }
+
+
+def _finish_stage(run_id: int, stage: str, elapsed_ms: int,
+                  result=None, error: str | None = None) -> list[str]:
+    from app.modules.utility.services.month_close import compact_result
+
+    with sync_db_session() as db:
+        run = _locked_run(db, run_id)
+        if run is None:
+            return []
+        stages = _copy_stages(run)
+        state = stages[stage]
+        state.update(finished_at=_now_iso(), elapsed_ms=elapsed_ms)
+        if error is None:
+            state["status"] = "done"
+            state["result"] = compact_result(result)
+            if stage == "preload":
+                run.context = {**(run.context or {}), **result}
+        else:
+            state["status"] = "failed"
+            state["error"] = error[:2000]
+            run.error = f"{stage}: {error[:500]}"
+        ready = _schedule(run, stages)
+        status = run.status
+        db.commit()
+    _dispatch(run_id, ready)
+    publish_job_progress("month_close", run_id, status, stage=stage,
+                         stage_status="failed" if error else "done", elapsed_ms=elapsed_ms)
+    return ready
+
+
+# ==========================================================================
+# ВЫПОЛНЕНИЕ ЭТАПА
+# ==========================================================================
+
+async def _run_async_stage(stage: str, info: dict):
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession as _AS
+    from sqlalchemy.orm import sessionmaker as _smaker
+    from app.modules.utility.services.month_close import ASYNC_STAGES, PERIOD_CHANGING
+
+    _engine = create_async_engine(
+        settings.DATABASE_URL_ASYNC,
+        echo=False, future=True, pool_pre_ping=True,
+        connect_args={"prepared_statement_cache_size": 0,
+                      "statement_cache_size": 0, "command_timeout": 120},
+    )
+    _mk = _smaker(bind=_engine, class_=_AS, expire_on_commit=False, autoflush=False)
+    try:
+        async with _mk() as db:
+            try:
+                result = await ASYNC_STAGES[stage](
+                    db, info["period_id"], info["options"], info["context"],
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+    finally:
+        await _engine.dispose()
+
+    if stage in PERIOD_CHANGING:
+        await _clear_periods_cache()
+    return result
+
+
+async def _clear_periods_cache() -> None:
+    """Кэш GET /periods (FastAPICache, namespace periods) — как run_async_close_period."""
+    try:
+        from fastapi_cache import FastAPICache
+        from fastapi_cache.backends.redis import RedisBackend
+        from redis import asyncio as aioredis
+
+        redis = aioredis.from_url(settings.REDIS_URL, encoding="utf8", decode_responses=True)
+        FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+        await FastAPICache.clear(namespace="periods")
+        await redis.close()
+    except Exception as e:
+        logger.warning(f"[month_close] periods cache not cleared: {e}")
+
+
+def _run_receipts(info: dict) -> dict:
+    from .receipts import start_bulk_receipt_generation
+
+    result = start_bulk_receipt_generation.run(info["period_id"]) or {}
+    if result.get("status") == "error":
+        raise RuntimeError(result.get("message") or "receipts failed")
+    return result
+
+
+@celery.task(bind=True, name="month_close_stage_task", queue="heavy")
+def month_close_stage_task(self, run_id: int, stage: str):
+    """Один этап прогона закрытия месяца.
+
+    Ошибка этапа НЕ ретраится Celery: этап помечается failed, зависимые
+    этапы не запускаются, уже идущие параллельные ветки дорабатывают.
+    Перезапуск — POST .../stages/{stage}/retry (только этот этап) или
+    .../resume (все упавшие и зависшие); выполненные этапы не повторяются.
+    Повторная доставка после смерти воркера продолжает этап (см. _can_enter).
+    """
+    info = _begin_stage(run_id, stage, self.request.id)
+    if info is None:
+        return {"run_id": run_id, "stage": stage, "skipped": True}
+
+    logger.info(f"[month_close] run={run_id} stage={stage} start")
+    started = time.monotonic()
+    try:
+        if stage == "receipts":
+            result = _run_receipts(info)
+        else:
+            result = asyncio.run(_run_async_stage(stage, info))
+    except Exception as e:
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        logger.exception(f"[month_close] run={run_id} stage={stage} failed")
+        _finish_stage(run_id, stage, elapsed_ms, error=str(e) or type(e).__name__)
+        return {"run_id": run_id, "stage": stage, "status": "failed", "error": str(e)}
+
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    ready = _finish_stage(run_id, stage, elapsed_ms, result=result)
+    logger.info(f"[month_close] run={run_id} stage={stage} done in {elapsed_ms} ms → {ready}")
+    return {"run_id": run_id, "stage": stage, "status": "done",
+            "elapsed_ms": elapsed_ms, "next": ready}
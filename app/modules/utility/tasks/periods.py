@@ -46,6 +46,14 @@ async def run_async_close_period(admin_user_id: int):
                 result = await close_current_period(db=db, admin_user_id=admin_user_id)
                 await db.commit()
                 await FastAPICache.clear(namespace="periods")
+                # Агрегаты закрытого и нового периода — сразу после закрытия
+                # (best-effort: иначе пересчитаются при первом чтении).
+                try:
+                    from app.modules.utility.services.period_stats import refresh_stale
+                    await refresh_stale(db)
+                except Exception:
+                    await db.rollback()
+                    logger.exception("[CLOSE_PERIOD] period_dorm_stats refresh failed")
                 return result
             except Exception as e:
                 await db.rollback()
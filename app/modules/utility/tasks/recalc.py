@@ -4,6 +4,7 @@
 from datetime import datetime, timezone
 
 from app.worker import celery
+from app.modules.utility.services.admin_events import publish_job_progress
 from app.modules.utility.services.reading_calculator import is_meaningful_prev
 
 from ._shared import logger, sync_db_session
@@ -18,9 +19,10 @@ from ._shared import logger, sync_db_session
 #
 # Эта пара задач (_preview и _apply) пересчитывает ВСЕ approved MeterReading
 # за данный period_id с текущим эффективным тарифом (Room → User → default).
-# Работает поблочно по chunk_size — защита от OOM на 10k+ записях.
-# Progress сохраняется в recalc_jobs.progress/processed, чтобы UI мог показывать
-# живой progress-bar через polling.
+# Период режется на шарды по зданиям (chord), внутри шарда — keyset-чанки
+# с чекпоинтом в recalc_jobs.shard_state (см. блок «Шардирование» ниже).
+# Progress сохраняется в recalc_jobs.progress/processed и публикуется событием
+# `job` в push-канал админки (services/admin_events) — UI не поллит.
 # ==========================================================================
 
 def _recalc_compute_one(db_session, reading, user, room, prev_reading, tariffs_by_active,
@@ -174,20 +176,365 @@ def _recalc_compute_one(db_session, reading, user, room, prev_reading, tariffs_b
     return new_fields
 
 
-def _recalc_run(job_id: int, apply: bool):
-    """Общая логика для preview и apply. Разница — пишем ли результаты в БД.
+def _publish_recalc(job) -> None:
+    publish_job_progress(
+        "recalc", job.id, job.status, job.progress,
+        processed=job.processed, total=job.total_readings, error=job.error,
+    )
+
+
+# --------------------------------------------------------------------------
+# Шардирование (окт 2026). Раньше один воркер шёл по периоду OFFSET/LIMIT-
+# чанками (квадратично на больших периодах), для каждого чанка тянул ВСЮ
+# утверждённую историю его жильцов, а падение означало рестарт с нуля.
+# Теперь:
+#   * шард = здание комнаты жильца (общага / дом). Комнаты не пересекают
+#     здания, singles-выравнивание — внутри комнаты, поэтому шарды
+#     независимы и идут параллельно Celery chord'ом;
+#   * внутри шарда keyset по MeterReading.id, история для prev — окно
+#     HISTORY_PERIODS предыдущих периодов (пары без осмысленного prev в
+#     окне добираются отдельным запросом — результат как у полной истории);
+#   * чекпоинт шарда (last_id + частичный итог) пишется в
+#     recalc_jobs.shard_state ТОЙ ЖЕ транзакцией, что и апдейты чанка, —
+#     retry / повторная доставка продолжает ровно со следующего id;
+#   * callback recalc_merge_task сливает итоги шардов в diff_summary.
+# --------------------------------------------------------------------------
+CHUNK = 500
+HISTORY_PERIODS = 12
+TOP_SIZE = 30
+SHARD_MAX_RETRIES = 3
+
+# Статус задачи, пока идёт прогон (preview / apply).
+_RUNNING = {False: "preview_pending", True: "apply_pending"}
+
+
+def _mode(apply: bool) -> str:
+    return "apply" if apply else "preview"
+
+
+def _building_key():
+    """SQL-ключ шарда по комнате жильца: общага → dormitory_name, дом →
+    «улица, дом», жилец без комнаты → ''."""
+    from sqlalchemy import func
+    from app.modules.utility.models import Room
+
+    return func.coalesce(Room.dormitory_name, Room.street + ", " + Room.house_number, "")
+
+
+def _period_readings(db, period_id: int):
+    """Утверждённые показания периода с join'ом на комнату ЖИЛЬЦА (именно её
+    берёт _recalc_compute_one)."""
+    from app.modules.utility.models import MeterReading, Room, User
+
+    return (
+        db.query(MeterReading)
+        .join(User, User.id == MeterReading.user_id)
+        .outerjoin(Room, Room.id == User.room_id)
+        .filter(
+            MeterReading.period_id == period_id,
+            MeterReading.is_approved.is_(True),
+        )
+    )
 
-    Идея реализации:
-      * один проход по всем approved readings периода, батчами по 500;
-      * для каждой записи считаем новые поля, сравниваем total_cost;
-      * собираем агрегат: increased/decreased/unchanged + топ-30 по |delta|;
-      * при apply=True — обновляем записи чанком через bulk_update_mappings.
+
+def _plan_shards(db, period_id: int) -> list[tuple[str, int]]:
+    """[(здание, число показаний)] — один GROUP BY вместо count + обхода."""
+    from sqlalchemy import func
+    from app.modules.utility.models import MeterReading
+
+    key = _building_key()
+    rows = (
+        _period_readings(db, period_id)
+        .with_entities(key, func.count(MeterReading.id))
+        .group_by(key)
+        .order_by(key)
+        .all()
+    )
+    return [(building, int(count)) for building, count in rows]
+
+
+def _history_floor(db, period_id: int) -> int:
+    """Минимальный id из HISTORY_PERIODS периодов строго до текущего (prev
+    ищется по period_id, см. _find_prev). Нет предыдущих — сам period_id."""
+    from app.modules.utility.models import BillingPeriod
+
+    ids = [
+        pid for (pid,) in db.query(BillingPeriod.id)
+        .filter(BillingPeriod.id < period_id)
+        .order_by(BillingPeriod.id.desc())
+        .limit(HISTORY_PERIODS)
+        .all()
+    ]
+    return min(ids) if ids else period_id
+
+
+def _find_prev(candidates: list, period_id: int):
+    """prev — последнее осмысленное утверждённое показание пары СТРОГО до
+    периода (по period_id, а не created_at — иначе recalc недетерминирован).
+    Synth-reading'и (AUTO_GENERATED/DATA_OVERFLOW_RESET/MANUAL_RECEIPT)
+    пропускаем — их обнулённые значения дают фантастическую дельту при
+    следующей реальной подаче. См. is_meaningful_prev."""
+    pid = period_id or 0
+    for cand in reversed(candidates):
+        if (cand.period_id or 0) >= pid:
+            continue
+        if not is_meaningful_prev(cand):
+            continue
+        return cand
+    return None
+
+
+def _load_prev_candidates(db, chunk: list, period_id: int, floor: int) -> dict:
+    """{(user_id, room_id): [история по возрастанию]} для пар чанка.
+
+    Сначала окно [floor, period_id); пары без осмысленного prev в окне
+    (новые жильцы, долгие перерывы) добираются запросом `period_id < floor`
+    только по ним. Сортировка ИСКЛЮЧИТЕЛЬНО period_id + created_at + id —
+    стабильный порядок (детерминизм, may 2026).
     """
+    from app.modules.utility.models import MeterReading
+
+    pairs = {(r.user_id, r.room_id) for r in chunk if r.user_id and r.room_id}
+
+    def _fetch(wanted: set, *period_filter) -> dict:
+        out: dict[tuple[int, int], list] = {}
+        if not wanted:
+            return out
+        for mr in db.query(MeterReading).filter(
+            MeterReading.user_id.in_({u for u, _ in wanted}),
+            MeterReading.room_id.in_({r for _, r in wanted}),
+            MeterReading.is_approved.is_(True),
+            *period_filter,
+        ).order_by(
+            MeterReading.user_id,
+            MeterReading.room_id,
+            MeterReading.period_id,
+            MeterReading.created_at,
+            MeterReading.id,
+        ).all():
+            pair = (mr.user_id, mr.room_id)
+            if pair in wanted:
+                out.setdefault(pair, []).append(mr)
+        return out
+
+    by_pair = {}
+    if floor < period_id:
+        by_pair = _fetch(
+            pairs, MeterReading.period_id >= floor, MeterReading.period_id < period_id,
+        )
+    missing = {p for p in pairs if _find_prev(by_pair.get(p, []), period_id) is None}
+    for pair, older in _fetch(missing, MeterReading.period_id < floor).items():
+        by_pair[pair] = older + by_pair.get(pair, [])
+    return by_pair
+
+
+def _empty_summary() -> dict:
+    """Частичный итог шарда (суммы — строки Decimal без округления)."""
+    return {
+        "total": 0, "unchanged": 0, "increased": 0, "decreased": 0,
+        "sum_old": "0", "sum_new": "0", "top": [],
+    }
+
+
+def _merge_summaries(parts) -> dict:
+    """Сложить частичные итоги; топ — TOP_SIZE крупнейших |delta|."""
     from decimal import Decimal
-    from sqlalchemy.orm import selectinload
-    from app.modules.utility.models import RecalcJob, MeterReading, BillingPeriod, Tariff, User
 
-    CHUNK = 500
+    merged = _empty_summary()
+    sum_old = sum_new = Decimal("0")
+    top = []
+    for part in parts:
+        for field in ("total", "unchanged", "increased", "decreased"):
+            merged[field] += int(part.get(field) or 0)
+        sum_old += Decimal(str(part.get("sum_old") or 0))
+        sum_new += Decimal(str(part.get("sum_new") or 0))
+        top.extend(part.get("top") or [])
+    top.sort(key=lambda item: abs(Decimal(item["delta"])), reverse=True)
+    merged.update(sum_old=str(sum_old), sum_new=str(sum_new), top=top[:TOP_SIZE])
+    return merged
+
+
+def _diff_summary(parts) -> dict:
+    """Итог шардов в формате diff_summary для UI-модалки."""
+    from decimal import Decimal
+
+    merged = _merge_summaries(parts)
+    sum_old = Decimal(merged["sum_old"])
+    sum_new = Decimal(merged["sum_new"])
+    return {
+        **merged,
+        "sum_old": str(sum_old.quantize(Decimal("0.01"))),
+        "sum_new": str(sum_new.quantize(Decimal("0.01"))),
+        "delta": str((sum_new - sum_old).quantize(Decimal("0.01"))),
+    }
+
+
+def _recalc_chunk(db, chunk, prev_by_pair, fallback_tariff, seasonal, apply: bool):
+    """Посчитать чанк: (частичный итог, апдейты для apply)."""
+    from decimal import Decimal
+
+    part = _empty_summary()
+    sum_old = sum_new = Decimal("0")
+    top = []
+    updates = []
+    for r in chunk:
+        part["total"] += 1
+        user = r.user
+        room = user.room if user else None
+        if not user or not room:
+            # ломаные данные — пропускаем
+            continue
+
+        # ХОЛОСТЯЦКИЕ комнаты НЕ пересчитываем поштучно: их счёт
+        # делится ПОРОВНУ отдельным singles-выравниванием
+        # (equalize_singles_room / эндпоинт fix-singles). Поштучный
+        # пересчёт по ЛИЧНОМУ prev откатил бы соседа без истории в
+        # baseline (Миронов 389 вместо 1333). 2026-06-18.
+        if bool(getattr(room, "is_singles_apartment", False)):
+            part["unchanged"] += 1
+            continue
+
+        prev = _find_prev(prev_by_pair.get((r.user_id, r.room_id), []), r.period_id)
+
+        # Per-tariff внутри _recalc_compute_one — там tariff
+        # выбирается через tariff_cache для каждой строки,
+        # поэтому seasonal-логику применяем там же.
+        new_fields = _recalc_compute_one(
+            db, r, user, room, prev, fallback_tariff,
+            global_heating_on=seasonal.heating_season_active,
+            global_hw_on=seasonal.hot_water_heating_active,
+        )
+
+        old_total = Decimal(str(r.total_cost or 0))
+        new_total = Decimal(str(new_fields["total_cost"] or 0))
+        delta = new_total - old_total
+        sum_old += old_total
+        sum_new += new_total
+
+        if delta == 0:
+            part["unchanged"] += 1
+        elif delta > 0:
+            part["increased"] += 1
+        else:
+            part["decreased"] += 1
+
+        if delta != 0:
+            top.append((abs(delta), {
+                "reading_id": r.id,
+                "user_id": user.id,
+                "username": user.username,
+                "room": room.format_address if room else "",
+                "old_total": str(old_total),
+                "new_total": str(new_total),
+                "delta": str(delta),
+            }))
+
+        if apply:
+            updates.append({"id": r.id, **new_fields})
+
+    top.sort(key=lambda x: x[0], reverse=True)
+    part.update(sum_old=str(sum_old), sum_new=str(sum_new), top=[item for _, item in top[:TOP_SIZE]])
+    return part, updates
+
+
+def _apply_updates(db, updates: list, job_id: int) -> None:
+    # ИСПРАВЛЕНИЕ (may 2026): раньше использовался
+    # db.bulk_update_mappings(MeterReading, updates) с передачей составного
+    # PK (id, created_at). Но MeterReading партиционирована по created_at,
+    # и bulk_update тихо возвращал rowcount=0 — admin жал «Перерасчёт» 5
+    # раз и каждый раз видел те же 29 изменений.
+    #
+    # Now: explicit per-row UPDATE по id (SERIAL уникален сам по себе, без
+    # created_at). И главное — ТОЧНО пишет, плюс логируем rowcount.
+    from sqlalchemy import update as _sa_update
+    from app.modules.utility.models import MeterReading
+
+    total_affected = 0
+    for upd in updates:
+        values = {k: v for k, v in upd.items() if k != "id"}
+        res = db.execute(
+            _sa_update(MeterReading)
+            .where(MeterReading.id == upd["id"])
+            .values(**values)
+        )
+        total_affected += res.rowcount or 0
+    logger.info(
+        "[RECALC] apply chunk: requested=%d affected=%d job=%d",
+        len(updates), total_affected, job_id,
+    )
+
+
+def _checkpoint(db, job_id: int, shard: str, state: dict, processed: int, apply: bool):
+    """Атомарно записать чекпоинт шарда и прибавить processed.
+
+    jsonb_set + processed = processed + n в одном UPDATE — шарды пишут в
+    одну строку recalc_jobs параллельно без потерянных обновлений. Условие
+    на статус — заодно проверка отмены: None → задачу отменили (или она
+    упала), вызывающий откатывает чанк.
+    """
+    import json
+    from sqlalchemy import text
+
+    return db.execute(text("""
+        UPDATE recalc_jobs
+           SET shard_state = jsonb_set(shard_state, CAST(:path AS text[]), CAST(:state AS jsonb)),
+               processed = processed + :n,
+               progress = LEAST(99, (processed + :n) * 100 / GREATEST(total_readings, 1))
+         WHERE id = :job_id AND status = :status
+     RETURNING processed, progress, total_readings
+    """), {
+        "path": "{shards,%s}" % shard,
+        "state": json.dumps(state, ensure_ascii=False),
+        "n": processed,
+        "job_id": job_id,
+        "status": _RUNNING[apply],
+    }).first()
+
+
+def _load_run_context(db, job):
+    """Период, fallback-тариф, сезонные флаги — общие для планировщика и шардов."""
+    from app.modules.utility.models import BillingPeriod, Tariff
+
+    period = db.query(BillingPeriod).filter(BillingPeriod.id == job.period_id).first()
+    if not period:
+        raise ValueError(f"Период id={job.period_id} не найден")
+
+    # Берём любой активный тариф как fallback — вдруг ни user, ни room
+    # не указывают эффективный тариф.
+    fallback_tariff = (
+        db.query(Tariff).filter(Tariff.is_active).order_by(Tariff.id).first()
+    )
+    if not fallback_tariff:
+        raise ValueError("Нет ни одного активного тарифа — пересчёт невозможен")
+
+    # Сезонные флаги читаем ОДИН раз на прогон шарда. compute использует
+    # тот же набор флагов что и /api/calculate, иначе recalc находил бы
+    # ложный «дрейф».
+    from app.modules.utility.routers.settings import load_seasonal_sync
+    return period, fallback_tariff, load_seasonal_sync(db)
+
+
+def _fail_job(job_id: int, error: str) -> None:
+    from app.modules.utility.models import RecalcJob
+
+    with sync_db_session() as db:
+        job = db.query(RecalcJob).filter(RecalcJob.id == job_id).first()
+        if job and job.status in _RUNNING.values():
+            job.status = "failed"
+            job.error = error[:2000]
+            db.commit()
+            _publish_recalc(job)
+
+
+def _recalc_run(job_id: int, apply: bool):
+    """Планировщик preview/apply: шарды по зданиям → chord → merge.
+
+    Повторная доставка задачи (acks_late) с тем же режимом не сбрасывает
+    чекпоинты: готовые шарды не пересчитываются, незаконченные продолжают
+    с last_id.
+    """
+    from celery import chord
+    from app.modules.utility.models import RecalcJob
 
     with sync_db_session() as db:
         job = db.query(RecalcJob).filter(RecalcJob.id == job_id).first()
@@ -200,248 +547,41 @@ def _recalc_run(job_id: int, apply: bool):
             return {"status": "cancelled"}
 
         try:
-            # Фиксируем запущенный статус
-            job.status = "apply_pending" if apply else "preview_pending"
-            job.progress = 0
-            job.processed = 0
-            db.commit()
-
-            period = db.query(BillingPeriod).filter(BillingPeriod.id == job.period_id).first()
-            if not period:
-                raise ValueError(f"Период id={job.period_id} не найден")
-
-            # Берём любой активный тариф как fallback — вдруг ни user, ни room
-            # не указывают эффективный тариф.
-            fallback_tariff = (
-                db.query(Tariff).filter(Tariff.is_active).order_by(Tariff.id).first()
-            )
-            if not fallback_tariff:
-                raise ValueError("Нет ни одного активного тарифа — пересчёт невозможен")
-
-            total_q = db.query(MeterReading).filter(
-                MeterReading.period_id == period.id,
-                MeterReading.is_approved.is_(True),
-            )
-            total = total_q.count()
+            job.status = _RUNNING[apply]
+            state = job.shard_state or {}
+            if state.get("mode") != _mode(apply):
+                period, _tariff, _seasonal = _load_run_context(db, job)
+                plan = _plan_shards(db, period.id)
+                state = {
+                    "mode": _mode(apply),
+                    "shards": {
+                        str(i): {
+                            "building": building, "total": count, "last_id": 0,
+                            "processed": 0, "done": False, "summary": _empty_summary(),
+                        }
+                        for i, (building, count) in enumerate(plan)
+                    },
+                }
+                job.shard_state = state
+            shards = state["shards"]
+            total = sum(s["total"] for s in shards.values())
             job.total_readings = total
+            job.processed = sum(s["processed"] for s in shards.values())
+            job.progress = int(job.processed / total * 100) if total else 0
             db.commit()
+            _publish_recalc(job)
 
             if total == 0:
                 job.status = "preview_ready" if not apply else "done"
                 job.progress = 100
-                job.diff_summary = {
-                    "total": 0, "unchanged": 0, "increased": 0, "decreased": 0,
-                    "sum_old": "0.00", "sum_new": "0.00", "delta": "0.00", "top": [],
-                }
+                job.diff_summary = _diff_summary([])
                 if apply:
                     job.applied_at = datetime.now(timezone.utc).replace(tzinfo=None)
                 db.commit()
+                _publish_recalc(job)
                 return {"status": job.status, "total": 0}
 
-            # Сезонные флаги читаем ОДИН раз перед обходом всех reading'ов.
-            # При перерасчёте 5000 квитанций без этого было бы 5000 SELECT'ов
-            # за SystemSetting. compute использует тот же набор флагов что
-            # и /api/calculate, иначе recalc находил бы ложный «дрейф».
-            from app.modules.utility.routers.settings import load_seasonal_sync
-            _seasonal = load_seasonal_sync(db)
-
-            unchanged = increased = decreased = 0
-            sum_old = Decimal("0")
-            sum_new = Decimal("0")
-            top_diffs = []  # [(abs_delta, dict_item)]
-
-            offset = 0
-            while offset < total:
-                # Важно: readings — это ORM-объекты, user+room подгружаем eager
-                # чтобы внутри чанка не было N+1.
-                chunk = (
-                    db.query(MeterReading)
-                    .options(
-                        selectinload(MeterReading.user).selectinload(User.room),
-                    )
-                    .filter(
-                        MeterReading.period_id == period.id,
-                        MeterReading.is_approved.is_(True),
-                    )
-                    .order_by(MeterReading.id)
-                    .offset(offset)
-                    .limit(CHUNK)
-                    .all()
-                )
-                if not chunk:
-                    break
-
-                # ОПТИМИЗАЦИЯ N+1 (apr 2026): раньше для каждой записи в chunk
-                # делался отдельный SELECT на prev MeterReading по паре
-                # (user_id, room_id). На 5000 readings = 5000 round-trip'ов до БД.
-                # Теперь один запрос за весь chunk, in-memory поиск prev.
-                #
-                # ДЕТЕРМИНИЗМ (may 2026): сортировка ИСКЛЮЧИТЕЛЬНО по
-                # period_id + created_at + id (стабильный порядок). Раньше
-                # сортировка была только по created_at — при readings с
-                # одинаковым timestamp порядок плыл между вызовами,
-                # «Перерасчёт» давал разные суммы при одном и том же тарифе.
-                chunk_user_ids = list({r.user_id for r in chunk if r.user_id})
-                chunk_room_ids = list({r.room_id for r in chunk if r.room_id})
-
-                prev_by_pair: dict[tuple[int, int], list] = {}
-                if chunk_user_ids and chunk_room_ids:
-                    for mr in db.query(MeterReading).filter(
-                        MeterReading.user_id.in_(chunk_user_ids),
-                        MeterReading.room_id.in_(chunk_room_ids),
-                        MeterReading.is_approved.is_(True),
-                    ).order_by(
-                        MeterReading.user_id,
-                        MeterReading.room_id,
-                        MeterReading.period_id,
-                        MeterReading.created_at,
-                        MeterReading.id,
-                    ).all():
-                        prev_by_pair.setdefault((mr.user_id, mr.room_id), []).append(mr)
-
-                updates = []
-                for r in chunk:
-                    user = r.user
-                    room = user.room if user else None
-                    if not user or not room:
-                        # ломаные данные — пропускаем
-                        continue
-
-                    # ХОЛОСТЯЦКИЕ комнаты НЕ пересчитываем поштучно: их счёт
-                    # делится ПОРОВНУ отдельным singles-выравниванием
-                    # (equalize_singles_room / эндпоинт fix-singles). Поштучный
-                    # пересчёт по ЛИЧНОМУ prev откатил бы соседа без истории в
-                    # baseline (Миронов 389 вместо 1333). 2026-06-18.
-                    if bool(getattr(room, "is_singles_apartment", False)):
-                        unchanged += 1
-                        continue
-
-                    # prev ищется ПО ПАРЕ (user_id, room_id), по period_id (а не
-                    # created_at — иначе recalc недетерминирован). Пропускаем
-                    # synth-reading'и (AUTO_GENERATED/DATA_OVERFLOW_RESET/MANUAL_RECEIPT)
-                    # — их обнулённые значения дают фантастическую дельту при
-                    # следующей реальной подаче. См. is_meaningful_prev.
-                    prev = None
-                    r_pid = r.period_id or 0
-                    for cand in reversed(prev_by_pair.get((r.user_id, r.room_id), [])):
-                        if (cand.period_id or 0) >= r_pid:
-                            continue
-                        if not is_meaningful_prev(cand):
-                            continue
-                        prev = cand
-                        break
-
-                    # Per-tariff внутри _recalc_compute_one — там tariff
-                    # выбирается через tariff_cache для каждой строки,
-                    # поэтому seasonal-логику применяем там же.
-                    new_fields = _recalc_compute_one(
-                        db, r, user, room, prev, fallback_tariff,
-                        global_heating_on=_seasonal.heating_season_active,
-                        global_hw_on=_seasonal.hot_water_heating_active,
-                    )
-
-                    old_total = Decimal(str(r.total_cost or 0))
-                    new_total = Decimal(str(new_fields["total_cost"] or 0))
-                    delta = new_total - old_total
-                    sum_old += old_total
-                    sum_new += new_total
-
-                    if delta == 0:
-                        unchanged += 1
-                    elif delta > 0:
-                        increased += 1
-                    else:
-                        decreased += 1
-
-                    # Поддерживаем отсортированный топ по |delta|, размер <=30
-                    if delta != 0:
-                        item = {
-                            "reading_id": r.id,
-                            "user_id": user.id,
-                            "username": user.username,
-                            "room": room.format_address if room else "",
-                            "old_total": str(old_total),
-                            "new_total": str(new_total),
-                            "delta": str(delta),
-                        }
-                        top_diffs.append((abs(delta), item))
-                        # Каждые 100 сравнений уменьшаем хвост — экономия памяти.
-                        if len(top_diffs) > 200:
-                            top_diffs.sort(key=lambda x: x[0], reverse=True)
-                            top_diffs = top_diffs[:30]
-
-                    if apply:
-                        updates.append({"id": r.id, "created_at": r.created_at, **{k: v for k, v in new_fields.items()}})
-
-                if apply and updates:
-                    # ИСПРАВЛЕНИЕ (may 2026): раньше использовался
-                    # db.bulk_update_mappings(MeterReading, updates) с
-                    # передачей составного PK (id, created_at). Но
-                    # MeterReading партиционирована по created_at, и
-                    # bulk_update тихо возвращал rowcount=0 — admin
-                    # жал «Перерасчёт» 5 раз и каждый раз видел те же
-                    # 29 изменений (apply не писал, повторный preview
-                    # снова обнаруживал расхождение).
-                    #
-                    # Now: explicit per-row UPDATE по id (SERIAL уникален
-                    # сам по себе, без created_at). Чуть медленнее (500
-                    # round-trips на chunk), но apply делается раз в
-                    # сутки админом — нагрузка приемлема. И главное —
-                    # ТОЧНО пишет, плюс логируем rowcount для отладки.
-                    from sqlalchemy import update as _sa_update
-                    total_affected = 0
-                    for upd in updates:
-                        rid = upd["id"]
-                        values = {
-                            k: v for k, v in upd.items()
-                            if k not in ("id", "created_at")
-                        }
-                        res = db.execute(
-                            _sa_update(MeterReading)
-                            .where(MeterReading.id == rid)
-                            .values(**values)
-                        )
-                        total_affected += res.rowcount or 0
-                    logger.info(
-                        "[RECALC] apply chunk: requested=%d affected=%d job=%d",
-                        len(updates), total_affected, job_id,
-                    )
-
-                offset += CHUNK
-                job.processed = min(offset, total)
-                job.progress = int(job.processed / total * 100) if total else 100
-                db.commit()
-
-                # Повторная проверка: админ мог отменить
-                db.refresh(job)
-                if job.status == "cancelled":
-                    logger.info(f"[RECALC] job {job_id} cancelled mid-run")
-                    db.rollback()
-                    return {"status": "cancelled"}
-
-            top_diffs.sort(key=lambda x: x[0], reverse=True)
-            top_items = [item for _, item in top_diffs[:30]]
-
-            job.diff_summary = {
-                "total": total,
-                "unchanged": unchanged,
-                "increased": increased,
-                "decreased": decreased,
-                "sum_old": str(sum_old.quantize(Decimal("0.01"))),
-                "sum_new": str(sum_new.quantize(Decimal("0.01"))),
-                "delta": str((sum_new - sum_old).quantize(Decimal("0.01"))),
-                "top": top_items,
-            }
-            if apply:
-                job.status = "done"
-                job.applied_at = datetime.now(timezone.utc).replace(tzinfo=None)
-            else:
-                job.status = "preview_ready"
-            job.progress = 100
-            db.commit()
-            logger.info(f"[RECALC] job {job_id} finished (apply={apply}) — {total} readings")
-            return {"status": job.status, "total": total}
-
+            pending = [key for key, s in shards.items() if not s["done"]]
         except Exception as exc:
             db.rollback()
             logger.exception(f"[RECALC] job {job_id} failed")
@@ -450,8 +590,127 @@ def _recalc_run(job_id: int, apply: bool):
                 job2.status = "failed"
                 job2.error = str(exc)[:2000]
                 db.commit()
+                _publish_recalc(job2)
             return {"status": "failed", "error": str(exc)}
 
+    if not pending:
+        return _recalc_merge_run(job_id, apply)
+
+    chord(
+        [recalc_shard_task.si(job_id, key, apply) for key in pending]
+    )(recalc_merge_task.si(job_id, apply))
+    logger.info(
+        "[RECALC] job %d dispatched (apply=%s): %d shards, %d readings",
+        job_id, apply, len(pending), total,
+    )
+    return {"status": "dispatched", "shards": len(pending), "total": total}
+
+
+def _recalc_shard_run(job_id: int, shard: str, apply: bool):
+    """Прогон одного здания keyset-чанками с чекпоинтом после каждого."""
+    from sqlalchemy.orm import selectinload
+    from app.modules.utility.models import MeterReading, RecalcJob, User
+
+    with sync_db_session() as db:
+        job = db.query(RecalcJob).filter(RecalcJob.id == job_id).first()
+        if not job or job.status != _RUNNING[apply]:
+            return {"status": "skipped", "shard": shard}
+        state = dict(((job.shard_state or {}).get("shards") or {}).get(shard) or {})
+        if not state or state.get("done"):
+            return {"status": "done", "shard": shard}
+
+        period, fallback_tariff, seasonal = _load_run_context(db, job)
+        floor = _history_floor(db, period.id)
+        building = state["building"]
+
+        while not state["done"]:
+            # Важно: readings — это ORM-объекты, user+room подгружаем eager
+            # чтобы внутри чанка не было N+1.
+            chunk = (
+                _period_readings(db, period.id)
+                .options(selectinload(MeterReading.user).selectinload(User.room))
+                .filter(_building_key() == building, MeterReading.id > state["last_id"])
+                .order_by(MeterReading.id)
+                .limit(CHUNK)
+                .all()
+            )
+            prev_by_pair = _load_prev_candidates(db, chunk, period.id, floor)
+            part, updates = _recalc_chunk(
+                db, chunk, prev_by_pair, fallback_tariff, seasonal, apply,
+            )
+            if apply and updates:
+                from app.modules.utility.services.period_stats import scope_writes
+                scope_writes(db, [period.id])
+                _apply_updates(db, updates, job_id)
+
+            state = {
+                **state,
+                "last_id": chunk[-1].id if chunk else state["last_id"],
+                "processed": state["processed"] + len(chunk),
+                "done": len(chunk) < CHUNK,
+                "summary": _merge_summaries([state["summary"], part]),
+            }
+            row = _checkpoint(db, job_id, shard, state, len(chunk), apply)
+            if row is None:
+                # Админ отменил (или другой шард уронил задачу) — чанк откатываем.
+                db.rollback()
+                logger.info(f"[RECALC] job {job_id} shard {shard} stopped mid-run")
+                return {"status": "cancelled", "shard": shard}
+            db.commit()
+            publish_job_progress(
+                "recalc", job_id, _RUNNING[apply], row.progress,
+                processed=row.processed, total=row.total_readings, error=None,
+            )
+
+        logger.info(
+            "[RECALC] job %d shard %s (%s) done — %d readings",
+            job_id, shard, building, state["processed"],
+        )
+        return {"status": "done", "shard": shard}
+
+
+def _recalc_merge_run(job_id: int, apply: bool):
+    """Callback chord'а: слить итоги шардов и закрыть задачу."""
+    from app.modules.utility.models import RecalcJob
+
+    with sync_db_session() as db:
+        job = db.query(RecalcJob).filter(RecalcJob.id == job_id).first()
+        if not job or job.status != _RUNNING[apply]:
+            # cancelled / failed — итог уже зафиксирован
+            return {"status": job.status if job else "not_found"}
+
+        shards = (job.shard_state or {}).get("shards") or {}
+        unfinished = [s["building"] or "—" for s in shards.values() if not s["done"]]
+        if unfinished:
+            job.status = "failed"
+            job.error = "Не завершены шарды: " + ", ".join(unfinished)[:1900]
+            db.commit()
+            _publish_recalc(job)
+            return {"status": "failed", "error": job.error}
+
+        job.diff_summary = _diff_summary(s["summary"] for s in shards.values())
+        if apply:
+            job.status = "done"
+            job.applied_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        else:
+            job.status = "preview_ready"
+        job.processed = job.total_readings
+        job.progress = 100
+        db.commit()
+        _publish_recalc(job)
+        if apply:
+            # Агрегаты периода (сравнение, тренды) — сразу, а не при первом чтении.
+            try:
+                from app.modules.utility.services.period_stats import rebuild
+                rebuild(db, [job.period_id], stale_only=True)
+            except Exception:
+                logger.exception(f"[RECALC] job {job_id}: period_dorm_stats refresh failed")
+        logger.info(
+            f"[RECALC] job {job_id} finished (apply={apply}) — "
+            f"{job.total_readings} readings, {len(shards)} shards"
+        )
+        return {"status": job.status, "total": job.total_readings}
+
 
 @celery.task(name="recalc_period_preview_task")
 def recalc_period_preview_task(job_id: int):
@@ -461,5 +720,27 @@ def recalc_period_preview_task(job_id: int):
 
 @celery.task(name="recalc_period_apply_task")
 def recalc_period_apply_task(job_id: int):
-    """Применяет пересчитанные значения к БД (bulk_update)."""
+    """Применяет пересчитанные значения к БД (per-row UPDATE по шардам)."""
     return _recalc_run(job_id, apply=True)
+
+
+@celery.task(name="recalc_shard_task", bind=True, max_retries=SHARD_MAX_RETRIES)
+def recalc_shard_task(self, job_id: int, shard: str, apply: bool):
+    """Шард перерасчёта (одно здание). Ошибка → retry с чекпоинта; после
+    исчерпания попыток задача помечается failed, а результат возвращается
+    обычным значением — иначе chord не вызовет merge и статус завис бы."""
+    try:
+        return _recalc_shard_run(job_id, shard, apply)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"[RECALC] job {job_id} shard {shard} failed, retry: {exc}")
+            raise self.retry(exc=exc, countdown=15 * (self.request.retries + 1))
+        logger.exception(f"[RECALC] job {job_id} shard {shard} failed")
+        _fail_job(job_id, f"Шард {shard}: {exc}")
+        return {"status": "failed", "shard": shard, "error": str(exc)}
+
+
+@celery.task(name="recalc_merge_task")
+def recalc_merge_task(job_id: int, apply: bool):
+    """Callback chord'а шардов: агрегированный diff_summary и финальный статус."""
+    return _recalc_merge_run(job_id, apply)
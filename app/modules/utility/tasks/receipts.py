@@ -13,7 +13,8 @@ from app.worker import celery
 from app.modules.utility.models import MeterReading, Tariff, BillingPeriod, Adjustment, User
 from app.modules.utility.services.pdf_generator import generate_receipt_pdf
 from app.modules.utility.services.s3_client import s3_service
-from app.modules.utility.services.reading_calculator import is_meaningful_prev
+from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+from app.modules.utility.services.admin_events import publish_job_progress
 
 from ._shared import logger, sync_db_session
 
@@ -63,24 +64,16 @@ def generate_receipt_task(reading_id: int) -> dict:
             if not tariff:
                 raise ValueError("No active tariffs found in the system for receipt generation.")
 
-            # Поиск prev по period_id (детерминированно) + пропуск reading'ов
-            # с обнулёнными значениями (AUTO_GENERATED / DATA_OVERFLOW_RESET /
-            # MANUAL_RECEIPT) — их hot/cold/elect = 0 даёт фантастическую дельту
-            # при следующей реальной подаче (см. is_meaningful_prev).
-            prev_candidates = (
-                db.query(MeterReading)
-                .filter(
-                    MeterReading.room_id == room.id,
-                    MeterReading.is_approved.is_(True),
-                    MeterReading.period_id < (reading.period_id or 0),
-                )
-                .order_by(MeterReading.period_id.desc())
-                .limit(20)
-                .all()
-            )
-            prev_reading = next(
-                (c for c in prev_candidates if is_meaningful_prev(c)),
-                None,
+            # Канонический prev (pick_prev_pair через PrevReadingIndex):
+            # жилец В ЭТОЙ КОМНАТЕ, хронология по имени периода, пропуск
+            # синтетических (AUTO_GENERATED / DATA_OVERFLOW_RESET /
+            # MANUAL_RECEIPT) — см. is_meaningful_prev. Раньше здесь был
+            # свой .limit(20) по period_id всей комнаты: ретроактивный
+            # период давал prev, отличный от того, что видел биллинг.
+            prev_index = PrevReadingIndex.for_session(db)
+            prev_index.load_sync(db, [PrevKey(user.id, room.id, period.name)])
+            prev_reading, _prev_any, _hist = prev_index.pick(
+                user.id, room.id, period.name, exclude_id=reading.id,
             )
 
             adjustments = (
@@ -139,6 +132,7 @@ def start_bulk_receipt_generation(period_id: int):
     отправляет в S3 одним файлом. Решает проблему DDoS базы, Redis и S3.
     """
     logger.info(f"[ZIP] Start bulk generation period={period_id}")
+    task_id = start_bulk_receipt_generation.request.id
     try:
       with sync_db_session() as db:
         period = db.query(BillingPeriod).filter(BillingPeriod.id == period_id).first()
@@ -161,6 +155,7 @@ def start_bulk_receipt_generation(period_id: int):
         default_tariff = db.query(Tariff).filter(Tariff.is_active).order_by(Tariff.id).first()
 
         failed_ids = []
+        prev_index = PrevReadingIndex.for_session(db)
 
         # Импорт tariff_cache вынесен из горячего цикла (раньше делался на каждой
         # квитанции). Сам кеш Singleton — повторный import дешёвый, но синтаксический
@@ -186,9 +181,8 @@ def start_bulk_receipt_generation(period_id: int):
                     # На 1000 квитанций = 2000 round-trip'ов до Postgres.
                     # Теперь preload одним батчем на весь chunk:
                     #   - Adjustments по (user_id IN chunk_users, period_id == period)
-                    #   - prev_readings по (room_id IN chunk_rooms, is_approved, asc by created_at)
+                    #   - prev — PrevReadingIndex по парам (user, room) chunk'а
                     chunk_user_ids = list({r.user_id for r in readings})
-                    chunk_room_ids = list({r.room_id for r in readings if r.room_id})
 
                     adjustments_by_user: dict[int, list] = {}
                     if chunk_user_ids:
@@ -198,40 +192,22 @@ def start_bulk_receipt_generation(period_id: int):
                         ).all():
                             adjustments_by_user.setdefault(adj.user_id, []).append(adj)
 
-                    # Все approved readings для нужных комнат — в Python для каждого r
-                    # ищем последний по period_id (детерминированно). Сортировка
-                    # period_id, created_at, id гарантирует стабильный порядок при
-                    # повторных вызовах. Пропускаем reading'и с обнулёнными значениями
-                    # (AUTO_GENERATED, DATA_OVERFLOW_RESET, MANUAL_RECEIPT) — см.
-                    # is_meaningful_prev.
-                    readings_by_room: dict[int, list] = {}
-                    if chunk_room_ids:
-                        for mr in db.query(MeterReading).filter(
-                            MeterReading.room_id.in_(chunk_room_ids),
-                            MeterReading.is_approved.is_(True),
-                        ).order_by(
-                            MeterReading.room_id,
-                            MeterReading.period_id,
-                            MeterReading.created_at,
-                            MeterReading.id,
-                        ).all():
-                            readings_by_room.setdefault(mr.room_id, []).append(mr)
+                    # Канонический prev (как в биллинге и утверждении): пара
+                    # (user, room), хронология по имени периода, только
+                    # утверждённые показания периодов ≤ текущего. Раньше тянулась
+                    # ВСЯ история комнат chunk'а и prev выбирался по period_id.
+                    prev_index.load_sync(db, [
+                        PrevKey(r.user_id, r.room_id, period.name)
+                        for r in readings if r.room_id
+                    ])
 
                     for r in readings:
                         try:
                             adjustments = adjustments_by_user.get(r.user_id, [])
 
-                            # Предыдущее показание: последний approved в той же комнате
-                            # СТРОГО ДО r.period_id, с пропуском синтетических.
-                            prev_reading = None
-                            r_pid = r.period_id or 0
-                            for cand in reversed(readings_by_room.get(r.room_id, [])):
-                                if (cand.period_id or 0) >= r_pid:
-                                    continue
-                                if not is_meaningful_prev(cand):
-                                    continue
-                                prev_reading = cand
-                                break
+                            prev_reading, _prev_any, _hist = prev_index.pick(
+                                r.user_id, r.room_id, period.name, exclude_id=r.id,
+                            )
 
                             # Через единый кеш: Room.tariff_id → User.tariff_id → default
                             tariff = tariff_cache.get_effective_tariff(user=r.user, room=r.user.room) or default_tariff
@@ -251,6 +227,16 @@ def start_bulk_receipt_generation(period_id: int):
                             logger.error(f"Error generating PDF for reading {r.id}: {e}")
                             failed_ids.append(r.id)
 
+                    # Кандидаты prev нужны только своему chunk'у — не копим
+                    # историю всего жилфонда в памяти воркера.
+                    prev_index.invalidate()
+
+                    done = min(i + chunk_size, len(reading_ids))
+                    publish_job_progress(
+                        "receipts_zip", task_id, "running", done * 100 // len(reading_ids),
+                        processed=done, total=len(reading_ids), period_id=period_id,
+                    )
+
             if failed_ids:
                 logger.warning(f"[ZIP] {len(failed_ids)} PDF(s) failed: {failed_ids}")
 
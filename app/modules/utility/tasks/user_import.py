@@ -0,0 +1,31 @@
+# Фоновый «Умный импорт» Жилфонд + Жильцы из Excel (users/import_excel):
+# пачки с чекпоинтом в user_import_jobs, resume продолжает с checkpoint_row.
+
+from app.worker import celery
+from app.modules.utility.services.user_import import publish_import_progress, run_import_job
+
+from ._shared import logger, sync_db_session
+
+
+@celery.task(name="import_users_task")
+def import_users_task(job_id: int) -> dict:
+    """Исполняет UserImportJob. Без autoretry: упавшая задача остаётся
+    в failed с чекпоинтом, админ жмёт «Продолжить» (POST .../resume) —
+    повтор вслепую на битом файле только жёг бы воркер."""
+    from app.modules.utility.models import UserImportJob
+
+    with sync_db_session() as db:
+        try:
+            result = run_import_job(db, job_id)
+        except Exception as exc:
+            db.rollback()
+            logger.exception(f"[USER_IMPORT] job {job_id} failed")
+            job = db.get(UserImportJob, job_id)
+            if job:
+                job.status = "failed"
+                job.error = str(exc)[:2000]
+                db.commit()
+                publish_import_progress(job)
+            return {"status": "failed", "error": str(exc)}
+    logger.info(f"[USER_IMPORT] job {job_id} finished: {result.get('status')}")
+    return result
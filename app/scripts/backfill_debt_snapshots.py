@@ -0,0 +1,38 @@
+"""Пересборка debt_snapshots из applied_state импортов 1С.
+
+Миграция debt_snap_001 уже заполняет таблицу одним INSERT ... SELECT.
+Скрипт нужен, если строки разошлись с applied_state (правка лога руками в
+БД, восстановление из бэкапа без таблицы): строки каждого лога заменяются
+целиком по одному логу на транзакцию. Идемпотентно.
+
+Использование:
+
+    # Все логи с applied_state:
+    docker exec utility_calc_web_jkh python -m app.scripts.backfill_debt_snapshots
+
+    # Конкретные логи:
+    docker exec utility_calc_web_jkh python -m app.scripts.backfill_debt_snapshots --log-id 812 --log-id 813
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from typing import Optional
+
+from app.core.database import sync_db_session
+from app.modules.utility.services.debt_snapshots import backfill
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--log-id", type=int, action="append", default=None,
+                        help="id DebtImportLog (можно несколько раз)")
+    args = parser.parse_args(argv)
+
+    with sync_db_session() as db:
+        stats = backfill(db, args.log_id)
+    print(f"Логов: {stats['logs']}, строк debt_snapshots: {stats['rows']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
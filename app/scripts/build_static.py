@@ -0,0 +1,303 @@
+"""Сборка статики с хешем в имени файла (cache-busting) + предсжатие.
+
+Проблема: JS/CSS отдавались по стабильным URL (js/app.js, style.css), и
+nginx был вынужден ставить им `expires epoch` — браузер ревалидирует
+КАЖДЫЙ модуль админки на каждой загрузке (~40 запросов с 304). Immutable
+без хеша в URL уже стрелял (30 дней старого фронта после деплоя).
+
+Что делает скрипт (запускается при сборке образа, Dockerfile, ПОВЕРХ
+копии static/ внутри образа — исходники в git не меняются):
+
+  1. каждому .js/.css кладёт рядом копию `name.<hash10>.ext`
+     (sha256 содержимого), оригинал остаётся — его продолжают отдавать
+     dev-режиму (StaticFiles) и старым HTML, закэшированным до деплоя;
+  2. import-спецификаторы ES-модулей ('../core/api.js', import('./x.js'))
+     внутри хешированных копий переписываются на хешированные имена.
+     Поэтому хеш модуля зависит и от его зависимостей: правка api.js
+     меняет имя и app.js, который его импортирует. Циклы импортов
+     (сильно связные компоненты) получают общий хеш;
+  3. HTML (*.html в корне и components/**) переписываются: src/href на
+     локальные .js/.css → хешированные имена;
+  4. для хешированных файлов пишутся .gz (nginx gzip_static) и .br, если
+     установлен модуль brotli (brotli_static — только в nginx с модулем
+     ngx_brotli; в стоковом образе он не используется);
+  5. asset-manifest.json — «исходный путь → хешированный путь».
+
+`--check` ничего не пишет: проверяет, что все ссылки HTML и импорты JS
+указывают на существующие файлы (после сборки — в т.ч. хешированные).
+
+Использование:
+
+    python -m app.scripts.build_static static
+    python -m app.scripts.build_static static --check
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from argparse import ArgumentParser
+from typing import Iterator, Optional
+
+MANIFEST_NAME = "asset-manifest.json"
+HASH_LEN = 10
+ASSET_EXTENSIONS = (".js", ".css")
+# Рантайм-каталоги на shared-volume — не часть сборки.
+SKIP_DIRS = {"generated_files", "apps"}
+
+HASHED_RE = re.compile(r"\.[0-9a-f]{%d}\.(?:js|css)$" % HASH_LEN)
+# from './x.js' | import './x.js' | import('./x.js') — только относительные.
+IMPORT_RE = re.compile(
+    r"""(\bfrom\s*|\bimport\s*\(\s*|\bimport\s+)(['"])(\.{1,2}/[^'"\s]+?\.js)\2"""
+)
+# Строки-комментарии (//, /*, * в JSDoc): примеры импортов в шапках модулей.
+COMMENT_LINE_RE = re.compile(r"^\s*(?://|/?\*).*$", re.MULTILINE)
+HTML_REF_RE = re.compile(
+    r"""(\b(?:src|href)\s*=\s*)(["'])([^"'#?]+?\.(?:js|css))([?#][^"']*)?\2""",
+    re.IGNORECASE,
+)
+
+
+# =========================================================================
+# ОБХОД ДЕРЕВА
+# =========================================================================
+def _walk(root: str, extensions: tuple[str, ...]) -> Iterator[str]:
+    """Относительные пути (через «/») файлов с нужными расширениями."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath == root:
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.endswith(extensions):
+                yield os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/")
+
+
+def source_assets(root: str) -> list[str]:
+    """JS/CSS-исходники (без уже хешированных копий прошлых сборок)."""
+    return [p for p in _walk(root, ASSET_EXTENSIONS) if not HASHED_RE.search(p)]
+
+
+def html_files(root: str) -> list[str]:
+    return list(_walk(root, (".html",)))
+
+
+def hashed_name(path: str, digest: str) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_LEN]}{ext}"
+
+
+def _join(directory: str, name: str) -> str:
+    return f"{directory}/{name}" if directory else name
+
+
+def _resolve(base_dir: str, ref: str) -> str:
+    """Ссылка относительно каталога base_dir → нормализованный путь от корня."""
+    joined = ref.lstrip("/") if ref.startswith("/") else _join(base_dir, ref)
+    return os.path.normpath(joined).replace(os.sep, "/")
+
+
+def _page_base(path: str) -> str:
+    # Компоненты вставляются в admin.html — их относительные ссылки
+    # резолвятся от корня страницы, а не от каталога компонента.
+    return "" if path.startswith("components/") else os.path.dirname(path)
+
+
+def _relative(base_dir: str, target: str) -> str:
+    rel = os.path.relpath(target, base_dir or ".").replace(os.sep, "/")
+    return rel if rel.startswith("../") else f"./{rel}"
+
+
+def _read(root: str, path: str) -> str:
+    with open(os.path.join(root, path), encoding="utf-8") as fh:
+        return fh.read()
+
+
+def _write(root: str, path: str, data: bytes) -> None:
+    full = os.path.join(root, path)
+    with open(full + ".part", "wb") as fh:
+        fh.write(data)
+    os.replace(full + ".part", full)
+
+
+# =========================================================================
+# ГРАФ ИМПОРТОВ И ХЕШИ
+# =========================================================================
+def module_imports(path: str, source: str) -> list[str]:
+    """Относительные импорты модуля (строки-комментарии с примерами — мимо)."""
+    base = os.path.dirname(path)
+    code = COMMENT_LINE_RE.sub("", source)
+    return [_resolve(base, m.group(3)) for m in IMPORT_RE.finditer(code)]
+
+
+def _components(graph: dict[str, list[str]]) -> list[list[str]]:
+    """Сильно связные компоненты (Тарьян), зависимости — раньше зависящих."""
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    out: list[list[str]] = []
+
+    def visit(node: str) -> None:
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for dep in graph[node]:
+            if dep not in graph:
+                continue
+            if dep not in index:
+                visit(dep)
+                low[node] = min(low[node], low[dep])
+            elif dep in on_stack:
+                low[node] = min(low[node], index[dep])
+        if low[node] == index[node]:
+            component = []
+            while True:
+                item = stack.pop()
+                on_stack.discard(item)
+                component.append(item)
+                if item == node:
+                    break
+            out.append(sorted(component))
+
+    for node in sorted(graph):
+        if node not in index:
+            visit(node)
+    return out
+
+
+def _rewrite_imports(path: str, source: str, manifest: dict[str, str]) -> str:
+    base = os.path.dirname(path)
+
+    def repl(m: re.Match) -> str:
+        target = manifest.get(_resolve(base, m.group(3)))
+        if target is None:
+            return m.group(0)
+        return f"{m.group(1)}{m.group(2)}{_relative(base, target)}{m.group(2)}"
+
+    return IMPORT_RE.sub(repl, source)
+
+
+def plan_assets(root: str) -> tuple[dict[str, str], dict[str, bytes]]:
+    """→ (manifest исходник→хешированный, содержимое хешированных копий)."""
+    sources = {p: _read(root, p) for p in source_assets(root)}
+    graph = {
+        p: module_imports(p, src) if p.endswith(".js") else []
+        for p, src in sources.items()
+    }
+    manifest: dict[str, str] = {}
+    outputs: dict[str, bytes] = {}
+    for component in _components(graph):
+        # Хеш компоненты: содержимое членов + имена внешних зависимостей
+        # (уже посчитанные — Тарьян отдаёт зависимости раньше).
+        digest = hashlib.sha256()
+        for path in component:
+            digest.update(path.encode())
+            digest.update(sources[path].encode())
+            for dep in graph[path]:
+                if dep not in component:
+                    digest.update(manifest.get(dep, dep).encode())
+        hex_digest = digest.hexdigest()
+        for path in component:
+            manifest[path] = hashed_name(path, hex_digest)
+        for path in component:
+            text = sources[path]
+            if path.endswith(".js"):
+                text = _rewrite_imports(path, text, manifest)
+            outputs[manifest[path]] = text.encode("utf-8")
+    return manifest, outputs
+
+
+def rewrite_html(path: str, source: str, manifest: dict[str, str]) -> str:
+    """src/href на локальные .js/.css → хешированные имена (стиль ссылки сохраняется)."""
+    base = _page_base(path)
+
+    def repl(m: re.Match) -> str:
+        ref = m.group(3)
+        if "//" in ref:
+            return m.group(0)
+        target = manifest.get(_resolve(base, ref))
+        if target is None:
+            return m.group(0)
+        if ref.startswith("/"):
+            new = "/" + target
+        else:
+            new = _join(os.path.dirname(ref), os.path.basename(target))
+        return f"{m.group(1)}{m.group(2)}{new}{m.group(4) or ''}{m.group(2)}"
+
+    return HTML_REF_RE.sub(repl, source)
+
+
+# =========================================================================
+# СБОРКА
+# =========================================================================
+def _compressed(data: bytes) -> dict[str, bytes]:
+    # mtime=0 — одинаковый вход даёт побайтно одинаковый .gz (кэш слоёв docker).
+    out = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return out
+    out[".br"] = brotli.compress(data, quality=11)
+    return out
+
+
+def build(root: str) -> dict[str, str]:
+    """Собрать статику в каталоге root (на месте). Возвращает manifest."""
+    manifest, outputs = plan_assets(root)
+    for path, data in outputs.items():
+        _write(root, path, data)
+        for suffix, packed in _compressed(data).items():
+            _write(root, path + suffix, packed)
+
+    for path in html_files(root):
+        source = _read(root, path)
+        rewritten = rewrite_html(path, source, manifest)
+        if rewritten != source:
+            _write(root, path, rewritten.encode("utf-8"))
+
+    _write(root, MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True).encode())
+    return manifest
+
+
+def check(root: str) -> list[str]:
+    """Ссылки HTML и импорты JS, указывающие на несуществующие файлы."""
+    missing = []
+    for path in html_files(root):
+        base = _page_base(path)
+        for m in HTML_REF_RE.finditer(_read(root, path)):
+            ref = m.group(3)
+            if "//" in ref:
+                continue
+            if not os.path.isfile(os.path.join(root, _resolve(base, ref))):
+                missing.append(f"{path}: {ref}")
+    for path in _walk(root, (".js",)):
+        for ref in module_imports(path, _read(root, path)):
+            if not os.path.isfile(os.path.join(root, ref)):
+                missing.append(f"{path}: {ref}")
+    return missing
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("root", nargs="?", default="static", help="каталог статики")
+    parser.add_argument("--check", action="store_true", help="только проверить ссылки")
+    args = parser.parse_args(argv)
+
+    if not args.check:
+        manifest = build(args.root)
+        print(f"Хешировано {len(manifest)} файлов → {os.path.join(args.root, MANIFEST_NAME)}")
+
+    missing = check(args.root)
+    for item in missing:
+        print(f"НЕ НАЙДЕНО  {item}", file=sys.stderr)
+    if missing:
+        return 1
+    print("Все ссылки на JS/CSS резолвятся.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+"""Пересборка period_dorm_stats — агрегатов показаний (период, общежитие).
+
+Миграция period_stats_001 уже заполняет таблицу одним INSERT ... SELECT, а
+слушатели сессии помечают периоды устаревшими при любой записи readings.
+Скрипт нужен для записей мимо приложения (psql, восстановление из бэкапа):
+каждый период пересчитывается целиком, по одному на транзакцию.
+Идемпотентно.
+
+Использование:
+
+    # Все периоды:
+    docker exec utility_calc_web_jkh python -m app.scripts.rebuild_period_stats
+
+    # Только устаревшие:
+    docker exec utility_calc_web_jkh python -m app.scripts.rebuild_period_stats --stale
+
+    # Конкретные периоды:
+    docker exec utility_calc_web_jkh python -m app.scripts.rebuild_period_stats --period-id 41 --period-id 42
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from typing import Optional
+
+from app.core.database import sync_db_session
+from app.modules.utility.services.period_stats import rebuild
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--period-id", type=int, action="append", default=None,
+                        help="id BillingPeriod (можно несколько раз)")
+    parser.add_argument("--stale", action="store_true",
+                        help="только периоды с метками устаревания")
+    args = parser.parse_args(argv)
+
+    with sync_db_session() as db:
+        stats = rebuild(db, args.period_id, stale_only=args.stale)
+    print(f"Периодов пересчитано: {stats['periods']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+import pytest
+
+from app.modules.utility.models import Room, Tariff, User
+from app.modules.utility.services import excel_readings_import as svc
+from app.tests.performance.helpers import (
+    FakeExecuteResult,
+    SequencedAsyncSession,
+    env_float,
+    env_int,
+    timed_async,
+)
+
+_SURNAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Волков", "Зайцев"]
+
+
+def _tariff() -> Tariff:
+    return Tariff(
+        id=1, name="Базовый", is_active=True,
+        maintenance_repair=Decimal("30.5"), social_rent=Decimal("5.1"),
+        heating=Decimal("25"), water_heating=Decimal("150"), water_supply=Decimal("40"),
+        sewage=Decimal("35"), waste_disposal=Decimal("6.5"),
+        electricity_per_sqm=Decimal("1.2"), electricity_rate=Decimal("5.5"),
+        per_capita_amount=Decimal("0"), hw_norm_per_capita=Decimal("3"),
+        cw_norm_per_capita=Decimal("7"), el_norm_per_capita=Decimal("100"),
+        norm_coefficient=Decimal("3"), tariff_type="family",
+    )
+
+
+def _fio(idx: int) -> str:
+    return f"{_SURNAMES[idx % len(_SURNAMES)]} Жилец{idx} Тестович"
+
+
+def _fixture(residents: int):
+    """1 комната на 2 жильцов; каждый 5-й не подал (норматив), каждый 50-й —
+    откат счётчика (warning)."""
+    from app.modules.utility.services.gsheets_sync import normalize_fio
+
+    users, people = [], {}
+    users_map, by_id = {}, {}
+    for idx in range(residents):
+        room = Room(
+            id=idx // 2 + 1, dormitory_name=f"Общ {idx % 4}", room_number=str(100 + idx // 2),
+            apartment_area=Decimal("18.50"), total_room_residents=2,
+            has_hw_meter=True, has_cw_meter=True, has_el_meter=True,
+            is_singles_apartment=False, place_type="dormitory",
+        )
+        user = User(id=idx + 1, username=_fio(idx), residents_count=1,
+                    resident_type="family", billing_mode="by_meter", role="user")
+        user.room = room
+        users.append(user)
+        info = {"id": user.id, "username": user.username, "room_id": room.id,
+                "room_number": room.room_number, "place_type": "dormitory"}
+        users_map[normalize_fio(user.username)] = info
+        by_id[user.id] = info
+
+        key = normalize_fio(user.username)
+        hot_prev, cold_prev = Decimal(100 + idx % 50), Decimal(300 + idx % 70)
+        if idx % 5 == 0:
+            hot, cold = {"prev": hot_prev, "cur": None}, {"prev": cold_prev, "cur": None}
+        elif idx % 50 == 1:
+            hot, cold = {"prev": hot_prev, "cur": hot_prev - 2}, {"prev": cold_prev, "cur": cold_prev + 4}
+        else:
+            hot, cold = {"prev": hot_prev, "cur": hot_prev + 2}, {"prev": cold_prev, "cur": cold_prev + 4}
+        people[key] = {"fio": user.username, "hot": hot, "cold": cold, "elect": {}}
+
+    parsed = {"people": people, "meters_present": ["hot", "cold"], "skipped_rows": 0}
+    indexes = (users_map, list(users_map), by_id, {})
+    return users, parsed, indexes
+
+
+@pytest.fixture
+def preview_env(monkeypatch):
+    from app.modules.utility.routers import settings as settings_router
+    from app.modules.utility.services import gsheets_sync
+    from app.modules.utility.services.analyzer_config import config
+    from app.modules.utility.services.tariff_cache import tariff_cache
+
+    tariff = _tariff()
+
+    async def _seasonal(_db):
+        return settings_router.SeasonalSettingsSchema(heating_season_active=True, hot_water_heating_active=True)
+
+    monkeypatch.setattr(settings_router, "_load_seasonal", _seasonal)
+    monkeypatch.setattr(gsheets_sync, "_fuzzy_threshold", lambda: 85)
+    # Пороги валидаторов — дефолтные, без похода в analyzer_settings.
+    monkeypatch.setattr(config, "_ensure_loaded", lambda: None)
+    monkeypatch.setattr(tariff_cache, "get_effective_tariff", lambda user=None, room=None: tariff)
+
+    def _run(residents: int):
+        users, parsed, indexes = _fixture(residents)
+        monkeypatch.setattr(svc, "_build_match_indexes_sync", lambda: indexes)
+        db = SequencedAsyncSession(
+            FakeExecuteResult(scalar_values=[tariff]),   # fallback-тариф
+            FakeExecuteResult(scalar_values=users),      # жильцы найденных
+        )
+        duration, preview = timed_async(svc.build_preview(db, parsed, None))
+        return duration, preview, db
+
+    return _run
+
+
+@pytest.mark.perf
+def test_excel_preview_verdicts_small_sheet(preview_env):
+    _, preview, db = preview_env(50)
+
+    counts = preview["counts"]
+    assert preview["total_people"] == 50
+    assert counts["unmatched"] == 0
+    assert counts["norm"] == 10
+    assert counts["warning"] >= 10 + 1     # норматив + откат счётчика
+    assert all(item["preview_total"] is not None for item in preview["items"])
+    # Батч-загрузка: фиксированное число запросов, не зависящее от числа строк.
+    assert len(db.statements) == 2
+
+
+@pytest.mark.perf
+@pytest.mark.slow
+def test_excel_preview_1000_residents_under_budget(preview_env):
+    residents = env_int("PERF_EXCEL_PREVIEW_RESIDENTS", 1_000)
+    budget = env_float("PERF_EXCEL_PREVIEW_BUDGET_SECONDS", 10.0)
+
+    duration, preview, db = preview_env(residents)
+
+    assert preview["total_people"] == residents
+    assert preview["counts"]["unmatched"] == 0
+    assert len(db.statements) == 2
+    assert duration < budget, (
+        f"Превью {residents} жильцов заняло {duration:.2f} сек (бюджет {budget:.2f})"
+    )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import tracemalloc
+from decimal import Decimal
+from time import perf_counter
+
+import pytest
+from openpyxl import load_workbook
+
+from app.core.xlsx_stream import XlsxStream
+from app.tests.performance.helpers import env_float, env_int
+
+
+class _FakeStreamResult:
+    """Имитация AsyncResult.partitions(): строки генерируются лениво, как
+    server-side cursor — в памяти одновременно только одна партиция."""
+
+    def __init__(self, row_count: int):
+        self._row_count = row_count
+
+    async def partitions(self, size: int):
+        for start in range(0, self._row_count, size):
+            stop = min(start + size, self._row_count)
+            yield [
+                (idx, f"Resident {idx}", f"Dorm {idx % 40}", str(100 + idx % 300),
+                 Decimal("18.50"), Decimal(idx % 5000) / 7)
+                for idx in range(start, stop)
+            ]
+
+
+class _FakeStatement:
+    def execution_options(self, **_kwargs):
+        return self
+
+
+class _StreamingSession:
+    def __init__(self, row_count: int):
+        self._row_count = row_count
+
+    async def stream(self, _statement):
+        return _FakeStreamResult(self._row_count)
+
+
+async def _export(row_count: int) -> tuple[int, int]:
+    book = XlsxStream()
+    sheet = book.sheet(
+        "Жильцы",
+        headers=["ID", "ФИО", "Общежитие", "Комната", "Площадь", "Долг"],
+        widths=[6, 30, 20, 10, 10, 12],
+        header_fill="DBEAFE",
+    )
+    written = await sheet.extend_from_db(
+        _StreamingSession(row_count), _FakeStatement(), lambda r: list(r),
+    )
+    spool = await book.save()
+    try:
+        spool.seek(0, 2)
+        size = spool.tell()
+        spool.seek(0)
+        if row_count <= 1000:
+            wb = load_workbook(spool, read_only=True)
+            rows = list(wb["Жильцы"].iter_rows(values_only=True))
+            wb.close()
+            assert rows[0][0] == "ID"
+            assert len(rows) == row_count + 1
+    finally:
+        spool.close()
+    return written, size
+
+
+def _measure_peak(row_count: int) -> int:
+    tracemalloc.start()
+    try:
+        written, size = asyncio.run(_export(row_count))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert written == row_count
+    assert size > 0
+    return peak
+
+
+@pytest.mark.perf
+def test_xlsx_stream_small_export_roundtrip():
+    written, size = asyncio.run(_export(500))
+    assert written == 500
+    assert size > 0
+
+
+@pytest.mark.perf
+@pytest.mark.slow
+def test_xlsx_stream_50k_rows_under_budget():
+    row_count = env_int("PERF_XLSX_STREAM_ROWS", 50_000)
+    budget = env_float("PERF_XLSX_STREAM_BUDGET_SECONDS", 30.0)
+
+    started = perf_counter()
+    written, size = asyncio.run(_export(row_count))
+    duration = perf_counter() - started
+
+    assert written == row_count
+    assert size > 0
+    assert duration < budget, (
+        f"Экспорт {row_count} строк занял {duration:.2f} сек (бюджет {budget:.2f})"
+    )
+
+
+@pytest.mark.perf
+@pytest.mark.slow
+def test_xlsx_stream_memory_does_not_grow_with_rows():
+    """Пиковая память выгрузки в 10 раз большего объёма почти не отличается
+    (write-only + spool). tracemalloc замедляет openpyxl в ~7 раз, поэтому
+    по умолчанию меряем 1k vs 10k; для полного прогона — PERF_XLSX_MEMORY_ROWS=50000."""
+    row_count = env_int("PERF_XLSX_MEMORY_ROWS", 10_000)
+    max_peak_mb = env_float("PERF_XLSX_STREAM_MAX_PEAK_MB", 32.0)
+
+    small_peak = _measure_peak(max(row_count // 10, 100))
+    peak = _measure_peak(row_count)
+
+    assert peak < max_peak_mb * 1024 * 1024, (
+        f"Пиковая память {peak / 1024 / 1024:.1f} МБ превышает {max_peak_mb:.0f} МБ"
+    )
+    # Рост памяти на 10× больших данных — не более чем вдвое (на деле ~константа).
+    assert peak < small_peak * 2, (
+        f"Память растёт с числом строк: {small_peak / 1024 / 1024:.1f} МБ → "
+        f"{peak / 1024 / 1024:.1f} МБ"
+    )
@@ -0,0 +1,145 @@
+"""Unit-тесты push-канала админки (services/admin_events.py) — без Redis.
+
+Покрываем:
+  - format_sse:  кадр text/event-stream
+  - dispatch:    fan-out в очереди клиентов, «dirty» не уходит клиентам,
+                 переполненная очередь теряет старое
+  - refresh:     один пересчёт сводки на окно лока (SET NX), публикация
+  - жизненный цикл: stop последнего клиента не закрывает Redis нового старта
+"""
+import asyncio
+import json
+
+from app.modules.utility.services import admin_events
+from app.modules.utility.services.admin_events import AdminEventHub, format_sse
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.published = []
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+def _msg(event, data):
+    return json.dumps({"event": event, "data": data})
+
+
+def test_format_sse_frame():
+    frame = format_sse("job", {"job_id": 7, "status": "running", "fio": "Иванов"})
+    assert frame == 'event: job\ndata: {"job_id":7,"status":"running","fio":"Иванов"}\n\n'
+
+
+def test_dispatch_fans_out_to_all_clients():
+    hub = AdminEventHub(redis_factory=_FakeRedis)
+    hub._dirty = asyncio.Event()
+    q1, q2 = asyncio.Queue(maxsize=10), asyncio.Queue(maxsize=10)
+    hub._clients = {q1, q2}
+
+    hub.dispatch(_msg("notifications", {"total": 3}))
+    hub.dispatch(_msg("dirty", {}))
+    hub.dispatch("not json")
+
+    assert q1.get_nowait() == ("notifications", {"total": 3})
+    assert q2.get_nowait() == ("notifications", {"total": 3})
+    assert q1.empty() and q2.empty()          # dirty и мусор клиентам не уходят
+    assert hub._dirty.is_set()
+    assert hub.snapshot == {"total": 3}
+
+
+def test_slow_client_drops_oldest_event():
+    hub = AdminEventHub(redis_factory=_FakeRedis)
+    queue = asyncio.Queue(maxsize=2)
+    hub._clients = {queue}
+
+    for i in range(3):
+        hub.dispatch(_msg("job", {"progress": i}))
+
+    assert [queue.get_nowait()[1]["progress"] for _ in range(2)] == [1, 2]
+
+
+def test_refresh_runs_builder_once_per_lock_window():
+    calls = []
+
+    async def _builder():
+        calls.append(1)
+        return {"total": len(calls)}
+
+    async def _scenario():
+        redis = _FakeRedis()
+        hubs = [AdminEventHub(redis_factory=lambda: redis, builder=_builder) for _ in range(3)]
+        results = []
+        for hub in hubs:
+            hub._redis = redis
+            results.append(await hub.refresh(30))
+        return redis, results
+
+    redis, results = asyncio.run(_scenario())
+
+    assert len(calls) == 1                              # три процесса — один пересчёт
+    assert results == [{"total": 1}, None, None]
+    assert json.loads(redis.store[admin_events.SNAPSHOT_KEY]) == {"total": 1}
+    assert redis.published == [(admin_events.CHANNEL, {"event": "notifications", "data": {"total": 1}})]
+
+
+class _PubSub:
+    async def subscribe(self, _channel):
+        pass
+
+    async def listen(self):
+        await asyncio.Event().wait()
+        yield  # pragma: no cover
+
+    async def unsubscribe(self, _channel):
+        await asyncio.sleep(0.01)    # окно, в которое успевает новый subscribe
+
+    async def aclose(self):
+        pass
+
+
+class _LifecycleRedis(_FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    def pubsub(self):
+        return _PubSub()
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_stop_does_not_tear_down_newer_start():
+    clients = []
+
+    def _factory():
+        clients.append(_LifecycleRedis())
+        return clients[-1]
+
+    async def _scenario():
+        hub = AdminEventHub(redis_factory=_factory)
+        first = await hub.subscribe()
+        await asyncio.sleep(0)                   # listener подписался
+        leaving = asyncio.create_task(hub.unsubscribe(first))
+        await asyncio.sleep(0)                   # stop ждёт отмены listener'а
+        second = await hub.subscribe()
+        await leaving
+        alive = (hub._redis, [t.done() for t in hub._tasks])
+        await hub.unsubscribe(second)
+        return hub, alive
+
+    hub, (redis, done) = asyncio.run(_scenario())
+    assert len(clients) == 2 and clients[0].closed
+    assert redis is clients[1] and done == [False, False]   # новый старт цел
+    assert clients[1].closed and hub._redis is None and hub._tasks == []
@@ -0,0 +1,107 @@
+"""Unit-тесты импорта ведомости Арсенала (app/modules/arsenal/services/excel_import.py) — без БД.
+
+Покрываем:
+  - parse_workbook: склад/МОЛ, серийник в скобках, цена за единицу, пропуски
+  - «(Б/Н)» в скобках = нет серийника
+  - registry_row: серийник и количество для номерного и партионного учёта
+  - guess_is_numbered: счёт 105 и расходники — партия
+  - новая номенклатура вставляется пачками (лимит bind-параметров)
+"""
+import io
+from decimal import Decimal
+
+from openpyxl import Workbook
+
+from app.modules.arsenal.services import excel_import as ei
+
+
+def _xlsx(rows) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def test_parse_workbook_two_pass_input():
+    content = _xlsx([
+        ["№", "Наименование", "Счёт", "КБК", "Склад", "Кол-во", "Сумма", "Инв."],
+        [1, "АК-74 (123456)", "101.34", "K1", "Склад №1 - Иванов И.И.", 1, "45 000,00", "INV-1"],
+        [2, "Патрон 5,45", "105.36", None, None, 300, 1500, None],
+        [3, None, None, None, None, None, None, None],
+    ])
+    parsed, skipped = ei.parse_workbook(content)
+    assert skipped == 2  # шапка и строка без наименования
+    ak, cartridges = parsed
+
+    assert (ak.obj_name, ak.mol_name, ak.nom_name, ak.serial) == (
+        "Склад №1", "Иванов И.И.", "АК-74", "123456",
+    )
+    assert ak.unit_price == Decimal("45000.00")
+    assert (cartridges.obj_name, cartridges.mol_name, cartridges.serial) == ("Главный склад", None, None)
+    assert cartridges.unit_price == Decimal("5.00")
+    assert ei.object_key(ak.obj_name, ak.mol_name) == "склад №1_иванов и.и."
+
+
+def test_registry_row_numbered_vs_batch():
+    parsed, _ = ei.parse_workbook(_xlsx([
+        [1, "Пистолет ПМ", "101", None, "Склад", 2, 100, "77"],
+        [2, "Пистолет ПМ", "101", None, "Склад", 1, 100, None],
+        [3, "Масло оружейное", "101", None, "Склад", 40, 400, None],
+    ]))
+    with_inv, without_inv, oil = parsed
+
+    assert ei.guess_is_numbered(with_inv.nom_name, with_inv.account) is True
+    assert ei.guess_is_numbered(oil.nom_name, oil.account) is False
+    assert ei.guess_is_numbered("Ящик", "105.01") is False
+
+    row = ei.registry_row(with_inv, 10, True, 5)
+    assert (row["serial_number"], row["quantity"], row["current_object_id"]) == ("Инв.77", 1, 5)
+    assert ei.registry_row(without_inv, 10, True, 5)["serial_number"] == "Б/Н-2"
+    batch = ei.registry_row(oil, 11, False, 5)
+    assert (batch["serial_number"], batch["quantity"], batch["price"]) == ("Партия 1", 40, Decimal("10.00"))
+
+
+def test_bracketed_no_serial_means_no_serial():
+    parsed, _ = ei.parse_workbook(_xlsx([
+        [1, "АК-74 (Б/Н)", "101", None, "Склад", 1, 100, None],
+        [2, "АК-74 (Б/Н)", "101", None, "Склад", 1, 100, "12"],
+    ]))
+    first, second = parsed
+    assert (first.nom_name, first.serial) == ("АК-74", None)
+    # Разные строки реестра, а не одна с quantity=2.
+    assert ei.registry_row(first, 10, True, 5)["serial_number"] == "Б/Н-1"
+    assert ei.registry_row(second, 10, True, 5)["serial_number"] == "Инв.12"
+
+
+def test_new_nomenclature_insert_is_chunked(monkeypatch):
+    import asyncio
+
+    class _Result:
+        def __init__(self, rows):
+            self._rows = rows
+
+        def all(self):
+            return self._rows
+
+    class _Session:
+        def __init__(self):
+            self.sizes = []
+
+        async def execute(self, statement, params=None):
+            rows = statement.compile().params
+            n = sum(1 for k in rows if k.startswith("name"))
+            self.sizes.append(n)
+            start = sum(self.sizes[:-1])
+            return _Result([(start + i, f"Изделие {start + i}", True) for i in range(n)])
+
+    monkeypatch.setattr(ei, "BATCH_SIZE", 2)
+    parsed, _ = ei.parse_workbook(_xlsx([
+        [i, f"Изделие {i - 1}", "101", None, "Склад", 1, 100, None] for i in range(1, 6)
+    ]))
+    db, nom_by_key = _Session(), {}
+    asyncio.run(ei._create_nomenclature(db, parsed, nom_by_key))
+    assert db.sizes == [2, 2, 1]
+    assert len(nom_by_key) == 5
@@ -0,0 +1,94 @@
+"""Unit-тесты инкрементальной сверки инвентаризации
+(app/modules/arsenal/services/inventory.py) — без БД.
+
+Покрываем:
+  - line_status / counter_deltas: переходы missing → matched → surplus
+  - split_report: формат отчёта (deficit / excess, serial_key '' → None)
+  - apply_scans: один upsert на пачку, дубль серийника в пачке, счётчики
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.modules.arsenal.services import inventory as si
+
+
+def test_line_status_and_counter_deltas():
+    assert si.line_status(0, 0) is None
+    assert si.line_status(1, 1) == "matched"
+    assert si.line_status(3, 1) == "missing"
+    assert si.line_status(0, 1) == "surplus"
+
+    deltas = si.counter_deltas([
+        (1, 0, 1),    # номерной найден: missing → matched
+        (10, 4, 12),  # партия перебрала: missing → surplus
+        (0, 0, 1),    # не числился: → surplus
+        (5, 1, 2),    # всё ещё missing — без изменений
+    ])
+    assert deltas == {"matched": 1, "missing": -2, "surplus": 2}
+
+
+def test_split_report_format():
+    def line(nom, key, numbered, expected, found):
+        return SimpleNamespace(nomenclature_id=nom, serial_key=key, is_numbered=numbered,
+                               expected_quantity=expected, found_quantity=found)
+
+    matched, missing, surplus = si.split_report([
+        (line(1, "A1", True, 1, 1), "АК-74"),
+        (line(2, "Партия 1", False, 100, 60), "Патрон"),
+        (line(3, "", False, 0, 5), "Масло"),
+    ])
+    assert [m["serial_number"] for m in matched] == ["A1"]
+    assert missing[0]["deficit"] == 40 and missing[0]["name"] == "Патрон"
+    assert surplus[0]["serial_number"] is None and surplus[0]["excess"] == 5
+
+
+class _Result:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def all(self):
+        return list(self._rows)
+
+    def scalars(self):
+        return self
+
+
+class _Session:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return self.results.pop(0) if self.results else _Result()
+
+
+def test_apply_scans_single_upsert_and_duplicates():
+    inv = SimpleNamespace(id=7, object_id=1)
+    db = _Session(
+        _Result([(1, True), (2, False)]),   # is_numbered по номенклатурам
+        _Result([(2, "Партия 1")]),         # единственная партия номенклатуры 2
+        _Result([(1, "A1", 1, 1), (2, "Партия 1", 100, 30)]),  # upsert RETURNING
+        _Result([501, 502, 503]),           # id журнала сканов
+    )
+    scans = [
+        si.ScanInput(nomenclature_id=1, serial_number="A1"),
+        si.ScanInput(nomenclature_id=1, serial_number="A1"),   # дубль в пачке
+        si.ScanInput(nomenclature_id=2, quantity=10),
+        si.ScanInput(nomenclature_id=2, quantity=20),
+        si.ScanInput(nomenclature_id=9, serial_number="X"),    # нет номенклатуры
+    ]
+    results = asyncio.run(si.apply_scans(db, inv, scans, user_id=3))
+
+    assert [r["status"] for r in results] == [
+        "saved", "duplicate", "saved", "saved", "unknown_nomenclature",
+    ]
+    assert [results[i]["item_id"] for i in (0, 2, 3)] == [501, 502, 503]
+    assert results[2]["serial_number"] == "Партия 1" and results[3]["found_quantity"] == 30
+
+    # Ровно 5 запросов, сколько бы ни было сканов: номенклатуры, партии,
+    # upsert строк, журнал, счётчики.
+    assert len(db.statements) == 5
+    counters = db.statements[-1].compile().params
+    assert counters["found_units_1"] == 31
+    assert counters["scan_count_1"] == 3
@@ -0,0 +1,91 @@
+"""Unit-тесты партиций и архива журнала действий (services/audit_archive.py) — без БД.
+
+Покрываем:
+  - имена партиций / месяцы вперёд / вышедшие за ретеншн (с нижней границей)
+  - write_archive + manifest → search_archives: фильтры, порядок, пагинация
+  - archive_expired: сбой одной партиции не останавливает остальные
+"""
+from datetime import date, datetime
+
+from app.modules.utility.services import audit_archive as aa
+
+
+def test_partition_months_and_retention():
+    assert aa.partition_name(date(2026, 3, 1)) == "audit_log_y2026m03"
+    assert aa.parse_partition_name("audit_log_y2026m03") == date(2026, 3, 1)
+    assert aa.parse_partition_name("audit_log_default") is None
+
+    assert aa.months_ahead(date(2026, 11, 18), ahead=2) == [
+        date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1),
+    ]
+
+    existing = [date(2024, 9, 1), date(2024, 10, 1), date(2024, 11, 1), date(2026, 10, 1)]
+    assert aa.expired_months(existing, date(2026, 10, 18), retention_months=24) == [date(2024, 9, 1)]
+    # Ретеншн ниже минимума не сносит свежую историю.
+    assert aa.expired_months([date(2026, 8, 1)], date(2026, 10, 18), retention_months=0) == []
+
+
+def _archive(tmp_path, month, rows):
+    file_name = aa.archive_file_name(month)
+    count, sha = aa.write_archive(rows, str(tmp_path / file_name))
+    manifest = aa.read_manifest(str(tmp_path))
+    manifest[month.strftime("%Y-%m")] = {"file": file_name, "rows": count, "sha256": sha}
+    aa._write_manifest(manifest, str(tmp_path))
+    return count
+
+
+def _row(rid, action, user_id, ts):
+    return (rid, user_id, f"u{user_id}", action, "reading", rid, {"k": "значение"}, ts)
+
+
+def test_archive_roundtrip_and_search(tmp_path):
+    # Строки партиции выгружаются новыми первыми (как archive_partition).
+    assert _archive(tmp_path, date(2024, 1, 1), [
+        _row(2, "delete", 6, datetime(2024, 1, 9, 11, 0)),
+        _row(1, "approve", 5, datetime(2024, 1, 3, 10, 0)),
+    ]) == 2
+    _archive(tmp_path, date(2024, 2, 1), [
+        _row(4, "approve", 6, datetime(2024, 2, 2, 9, 0)),
+        _row(3, "approve", 5, datetime(2024, 2, 1, 9, 0)),
+    ])
+    assert not list(tmp_path.glob("*.part"))
+
+    total, items = aa.search_archives(archive_dir=str(tmp_path))
+    assert total == 4
+    assert [it["id"] for it in items] == [4, 3, 2, 1]           # новые первыми
+    assert items[0]["created_at"] == "2024-02-02T09:00:00"
+    assert items[0]["details"] == {"k": "значение"}
+
+    total, items = aa.search_archives(action="approve", user_id=5, archive_dir=str(tmp_path))
+    assert (total, [it["id"] for it in items]) == (2, [3, 1])
+
+    total, items = aa.search_archives(skip=1, limit=2, archive_dir=str(tmp_path))
+    assert (total, [it["id"] for it in items]) == (4, [3, 2])
+
+
+def test_search_without_archives_is_empty(tmp_path):
+    assert aa.search_archives(archive_dir=str(tmp_path / "missing")) == (0, [])
+
+
+def test_archive_expired_continues_after_failed_partition(monkeypatch, tmp_path):
+    partitions = {date(2024, 1, 1): "audit_log_y2024m01", date(2024, 2, 1): "audit_log_y2024m02"}
+    monkeypatch.setattr(aa, "list_partitions", lambda _db: partitions)
+
+    def _archive_partition(_db, month, name, _dir):
+        if month == date(2024, 1, 1):
+            raise RuntimeError("выгружено 1 строк из 2")
+        return {"partition": name}
+
+    monkeypatch.setattr(aa, "archive_partition", _archive_partition)
+
+    class _Db:
+        rollbacks = 0
+
+        def rollback(self):
+            self.rollbacks += 1
+
+    db = _Db()
+    done = aa.archive_expired(db, 24, today=date(2026, 10, 18), archive_dir=str(tmp_path))
+    assert done[0]["partition"] == "audit_log_y2024m01" and "error" in done[0]
+    assert done[1] == {"partition": "audit_log_y2024m02"}
+    assert db.rollbacks == 1
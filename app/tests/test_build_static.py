@@ -0,0 +1,65 @@
+"""Unit-тесты сборки статики с хешами (app/scripts/build_static.py).
+
+Покрываем:
+  - сборка копии реального static/: все ссылки HTML и импорты резолвятся,
+    HTML и модули ссылаются на хешированные имена, есть .gz
+  - цикл импортов → общий хеш; правка зависимости меняет имя зависящего
+"""
+import gzip
+import json
+import shutil
+from pathlib import Path
+
+from app.scripts import build_static as bs
+
+STATIC = Path(__file__).resolve().parents[2] / "static"
+
+
+def test_build_real_static_all_references_resolve(tmp_path):
+    root = tmp_path / "static"
+    shutil.copytree(STATIC, root, ignore=shutil.ignore_patterns(*bs.SKIP_DIRS))
+    assert bs.check(str(root)) == []
+
+    manifest = bs.build(str(root))
+    assert bs.check(str(root)) == []
+    assert json.loads((root / bs.MANIFEST_NAME).read_text()) == manifest
+
+    app_js = manifest["js/app.js"]
+    admin = (root / "admin.html").read_text(encoding="utf-8")
+    assert f'src="{app_js}"' in admin and 'src="js/app.js"' not in admin
+    assert f'href="{manifest["style.css"]}"' in admin
+    assert f'src="/{manifest["qr-portal.js"]}"' in (root / "qr.html").read_text(encoding="utf-8")
+
+    hashed_app = (root / app_js).read_text(encoding="utf-8")
+    assert "'./core/api.js'" not in hashed_app
+    assert manifest["js/core/api.js"].split("/")[-1] in hashed_app
+    assert gzip.decompress((root / (app_js + ".gz")).read_bytes()).decode("utf-8") == hashed_app
+
+    # Повторная сборка поверх собранного не ломает ссылки и не хеширует хеши.
+    assert bs.build(str(root)) == manifest
+    assert bs.check(str(root)) == []
+
+
+def _tree(root, files):
+    for name, body in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(body, encoding="utf-8")
+
+
+def test_cycle_shares_hash_and_dependency_change_propagates(tmp_path):
+    files = {
+        "js/a.js": "import { b } from './b.js';\nexport const a = 1;\n",
+        "js/b.js": "import { a } from './a.js';\nexport const b = 2;\n",
+        "js/main.js": "// import { x } from './missing.js';\nconst m = await import('./a.js');\n",
+        "index.html": '<script type="module" src="js/main.js"></script>',
+    }
+    _tree(tmp_path / "v1", files)
+    first = bs.build(str(tmp_path / "v1"))
+    assert bs.check(str(tmp_path / "v1")) == []
+    assert first["js/a.js"].split(".")[-2] == first["js/b.js"].split(".")[-2]
+
+    _tree(tmp_path / "v2", {**files, "js/b.js": files["js/b.js"] + "export const c = 3;\n"})
+    second = bs.build(str(tmp_path / "v2"))
+    assert second["js/a.js"] != first["js/a.js"]
+    assert second["js/main.js"] != first["js/main.js"]
@@ -0,0 +1,165 @@
+"""Unit-тесты реестра версий данных и ETag (app/core/data_versions.py) — без Redis.
+
+Покрываем:
+  - resolve_keys / keys_for_write: скоуп-ключи (период/комната/жилец) и wildcard
+  - conditional_get: ETag на 200, 304 на совпадающий If-None-Match,
+                     другой пользователь/параметры → другой ETag
+  - read_versions: эпоха реестра — после flush Redis старые версии не совпадут
+  - слушатели Session: bump после commit, ничего после rollback
+  - web-loop: bump задачей через async-клиент, вне loop'а — sync
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from app.core import data_versions as dv
+
+
+def _request(query: str = "", auth: str = "Bearer a", inm: str | None = None) -> Request:
+    headers = [(b"authorization", auth.encode())]
+    if inm:
+        headers.append((b"if-none-match", inm.encode()))
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/admin/summary",
+        "query_string": query.encode(), "headers": headers, "path_params": {},
+    })
+
+
+def test_resolve_keys_period_placeholder():
+    assert dv.resolve_keys(["readings@{period_id}", "users"], {"period_id": "7"}) == [
+        "readings@7", "readings@*", "users",
+    ]
+    # Без периода — версия всей таблицы.
+    assert dv.resolve_keys(["readings@{period_id}", "users"], {}) == ["readings", "users"]
+
+
+def test_keys_for_write():
+    assert dv.keys_for_write("readings", {"period_id": {7}, "room_id": {3}, "user_id": {None}}) == {
+        "readings", "readings@7", "room@3",
+    }
+    assert dv.keys_for_write("readings", None) == {"readings", "readings@*", "room@*", "user@*"}
+    # Переезд жильца: и старая, и новая комната.
+    assert dv.keys_for_write("users", {"id": {5}, "room_id": {1, 2}}) == {
+        "users", "user@5", "room@1", "room@2",
+    }
+    assert dv.keys_for_write("tariffs", {}) == {"tariffs"}
+    assert dv.keys_for_write("audit_log") == set()
+
+
+def test_conditional_get_etag_and_304(monkeypatch):
+    versions = {"readings@7": "3", "readings@*": "1", "users": "9"}
+
+    async def _read(keys):
+        return [versions.get(k, "0") for k in keys]
+
+    monkeypatch.setattr(dv, "read_versions", _read)
+    dep = dv.conditional_get("readings@{period_id}", "users")
+
+    response = Response()
+    asyncio.run(dep(_request("period_id=7"), response))
+    etag = response.headers["ETag"]
+    assert etag.startswith('"dv-')
+
+    with pytest.raises(dv.NotModified) as exc:
+        asyncio.run(dep(_request("period_id=7", inm=etag), Response()))
+    assert exc.value.etag == etag
+
+    # Другой пользователь / другие параметры / новая версия — другой ETag.
+    for req in (_request("period_id=7", auth="Bearer b"), _request("period_id=8")):
+        other = Response()
+        asyncio.run(dep(req, other))
+        assert other.headers["ETag"] != etag
+    versions["readings@7"] = "4"
+    fresh = Response()
+    asyncio.run(dep(_request("period_id=7", inm=etag), fresh))
+    assert fresh.headers["ETag"] != etag
+
+
+def test_conditional_get_without_redis_is_noop(monkeypatch):
+    async def _read(_keys):
+        return None
+
+    monkeypatch.setattr(dv, "read_versions", _read)
+    response = Response()
+    asyncio.run(dv.conditional_get("rooms")(_request(inm='"dv-x"'), response))
+    assert "ETag" not in response.headers
+
+
+class _HashRedis:
+    """Async-заглушка Redis: один хэш, HMGET/HSETNX/HGET."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+
+    async def hmget(self, _name, fields):
+        return [self.data.get(f) for f in fields]
+
+    async def hsetnx(self, _name, field, value):
+        return self.data.setdefault(field, value) == value
+
+    async def hget(self, _name, field):
+        return self.data.get(field)
+
+
+def test_read_versions_epoch_survives_flush(monkeypatch):
+    redis = _HashRedis()
+    monkeypatch.setattr(dv, "_redis_async", lambda: redis)
+
+    first = asyncio.run(dv.read_versions(["rooms", "users"]))
+    assert first == asyncio.run(dv.read_versions(["rooms", "users"]))
+    assert first[0].endswith(".0")
+
+    # FLUSHALL: счётчики снова с нуля, но эпоха новая — версии не совпадают.
+    redis.data.clear()
+    assert asyncio.run(dv.read_versions(["rooms", "users"])) != first
+
+
+def test_session_bumps_after_commit_only(monkeypatch):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+
+    bumped = []
+    monkeypatch.setattr(dv, "bump", lambda keys: bumped.append(set(keys)))
+
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        session.execute(text("CREATE TABLE rooms (id INTEGER)"))
+        session.execute(text("INSERT INTO rooms (id) VALUES (1)"))
+        session.rollback()
+        assert bumped == []
+
+        session.execute(text("UPDATE rooms SET id = 2"))
+        session.commit()
+    assert bumped == [{"rooms", "room@*"}]
+
+
+def test_bump_on_web_loop_is_async_task(monkeypatch):
+    sync_bumped, async_bumped = [], []
+    monkeypatch.setattr(dv, "bump", lambda keys: sync_bumped.append(set(keys)))
+
+    async def _bump_async(keys):
+        async_bumped.append(set(keys))
+
+    monkeypatch.setattr(dv, "bump_async", _bump_async)
+    monkeypatch.setattr(dv, "_web_loop", None)
+
+    async def _web():
+        dv.use_event_loop(asyncio.get_running_loop())
+        dv._bump_on_commit(SimpleNamespace(info={dv._SESSION_KEY: {"rooms"}}))
+        assert sync_bumped == [] and len(dv._pending) == 1
+        await dv.drain()
+        assert async_bumped == [{"rooms"}] and not dv._pending
+
+    asyncio.run(_web())
+
+    # Другой loop (asyncio.run в Celery) и вне loop'а — sync-клиент.
+    asyncio.run(_other_loop_commit())
+    dv._bump_on_commit(SimpleNamespace(info={dv._SESSION_KEY: {"users"}}))
+    assert sync_bumped == [{"tariffs"}, {"users"}] and async_bumped == [{"rooms"}]
+
+
+async def _other_loop_commit():
+    dv._bump_on_commit(SimpleNamespace(info={dv._SESSION_KEY: {"tariffs"}}))
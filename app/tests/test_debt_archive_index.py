@@ -0,0 +1,67 @@
+"""Unit-тесты ФИО-индекса архивов 1С (app/modules/utility/services/debt_archive_index.py).
+
+Покрываем:
+  - индекс даёт те же совпадения, что перебор xlsx: шапка ОСВ отброшена,
+    суммы — только правее колонки ФИО, точное совпадение
+  - load_index: готовый sidecar читается без xlsx, заменённый xlsx → пересборка
+"""
+import os
+
+import openpyxl
+
+from app.modules.utility.services import debt_archive_index as idx
+
+
+def _workbook(path, rows):
+    wb = openpyxl.Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+
+
+ROWS = [
+    ["Оборотно-сальдовая ведомость по счёту 209", None, None],
+    ["Период: Сентябрь 2026", None, None],
+    [7, "Миронов Пётр Ильич", "1 500,00", 0, 250.5],
+    [8, "Иванова А. С.", 99, None, None],
+    [None, "Миронова Анна", None, 12, None],
+    ["Итого Миронов", None, 1749.5],
+]
+
+
+def test_index_matches_resident_like_workbook_scan(tmp_path):
+    path = str(tmp_path / "812.xlsx")
+    _workbook(path, ROWS)
+    index = idx.build_index(path)
+
+    assert [r[0] for r in index["rows"]] == [3, 4, 5]          # шапка/итоги отброшены
+    matches = idx.find_resident(index, idx.normalize("Миронов Пётр Ильич"))
+    assert [(m["row_excel"], m["col_excel"], m["exact_match"]) for m in matches] == [
+        (3, 2, True), (5, 2, False),
+    ]
+    # «1 500,00» — не число (как и раньше), номер строки 7 левее ФИО — мимо
+    assert matches[0]["numeric_values"] == [250.5]
+    assert matches[1]["numeric_values"] == [12.0]
+    assert idx.find_resident(index, "") == []
+
+
+def test_load_index_reads_sidecar_and_rebuilds_stale(tmp_path, monkeypatch):
+    path = str(tmp_path / "813.xlsx")
+    _workbook(path, ROWS)
+    assert not os.path.exists(idx.index_path(path))
+    first = idx.load_index(path)                                # лениво для старого архива
+    assert os.path.exists(idx.index_path(path))
+
+    built = []
+    real_build = idx.build_index
+    monkeypatch.setattr(idx, "build_index", lambda p: built.append(p) or real_build(p))
+    assert idx.load_index(path) == first and built == []       # xlsx не открывался
+
+    _workbook(path, ROWS[:3])
+    os.utime(path, (1, 1))                                      # заменили файл
+    assert [r[0] for r in idx.load_index(path)["rows"]] == [3]
+    assert built == [path]
+
+    idx.remove_index(path)
+    os.remove(path)
+    assert idx.load_index(path) is None
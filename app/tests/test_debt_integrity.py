@@ -0,0 +1,60 @@
+"""Unit-тесты SQL-сверки долгов (app/modules/utility/services/debt_integrity.py) — без БД.
+
+Покрываем:
+  - bulk-фиксы (UPDATE ... FROM / UPDATE ... WHERE id IN) пишут в readings
+    так, что слушатель data_versions видит запись и двигает ETag-версии,
+    а period_stats помечает устаревшим только свой период (scope_writes)
+  - read-only запросы слушатель записью не считает
+  - у каждого запроса ровно те bind-параметры, что передают функции сервиса
+"""
+import asyncio
+
+from sqlalchemy import text
+
+from app.core import data_versions as dv
+from app.modules.utility.services import debt_integrity as di
+from app.modules.utility.services import period_stats
+
+
+def _written_table(sql: str):
+    match = dv._WRITE_SQL_RE.match(sql)
+    return match.group(1).lower() if match else None
+
+
+def test_bulk_fixes_are_seen_as_readings_writes():
+    assert _written_table(di.FIX_DRIFT_SQL) == "readings"
+    assert _written_table(di.CLEAN_ZOMBIES_SQL) == "readings"
+    for sql in (di.DIVERGENCE_SQL, di.TOTALS_SQL, di.MISSING_SQL, di.ZOMBIES_SQL, di.LATEST_SQL):
+        assert _written_table(sql) is None
+
+
+def test_bind_params_match_service_calls():
+    def params(sql):
+        return set(text(sql).compile().params)
+
+    assert params(di.DIVERGENCE_SQL) == {"period_id", "threshold", "limit"}
+    assert params(di.TOTALS_SQL) == {"period_id"}
+    assert params(di.FIX_DRIFT_SQL) == {"period_id", "threshold", "user_id"}
+    assert params(di.MISSING_SQL) == {"period_id", "threshold", "user_id"}
+    assert params(di.ZOMBIES_SQL) == params(di.CLEAN_ZOMBIES_SQL) == {"period_id"}
+    assert params(di.LATEST_SQL) == set()
+
+
+class _Session:
+    def __init__(self):
+        self.info = {}
+
+    async def execute(self, statement, params=None):
+        class _Result:
+            def all(self):
+                return [(1,), (2,)]
+        return _Result()
+
+
+def test_bulk_fixes_scope_period_stats_to_their_period():
+    db = _Session()
+    assert asyncio.run(di.fix_drift(db, 7)) == 2
+    assert db.info[period_stats._SCOPE_KEY] == {7}
+    db = _Session()
+    assert asyncio.run(di.clean_zombies(db, 8)) == 2
+    assert db.info[period_stats._SCOPE_KEY] == {8}
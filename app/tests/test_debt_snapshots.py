@@ -0,0 +1,48 @@
+"""Unit-тесты debt_snapshots (app/modules/utility/services/debt_snapshots.py).
+
+Покрываем:
+  - разбор applied_state: долг своего счёта, мусорные ключи/суммы
+  - replace_snapshots заменяет строки импорта целиком (повтор = тот же итог)
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, select
+
+from app.modules.utility.models import DebtSnapshot
+from app.modules.utility.services import debt_snapshots
+
+STARTED = datetime(2026, 10, 1, 9, 0)
+STATE = {
+    "11": {"debt_209": "1500.5", "overpayment_209": "0", "debt_205": "99",
+           "username": "Иванов И.И.", "room_id": 7, "room_label": "Общ. 1 / 101"},
+    "12": {"debt_209": "", "overpayment_209": "250.00", "room_id": None},
+    "legacy-room": {"debt_209": "5"},
+    "13": "not-a-dict",
+}
+
+
+def test_snapshot_rows_take_own_account_and_skip_garbage():
+    rows = {r["user_id"]: r for r in debt_snapshots.snapshot_rows(5, "209", STARTED, STATE)}
+    assert sorted(rows) == [11, 12]
+    assert rows[11]["debt"] == Decimal("1500.50")             # не debt_205
+    assert rows[11]["room_id"] == 7 and rows[11]["room_label"] == "Общ. 1 / 101"
+    assert rows[12]["debt"] == Decimal("0.00") and rows[12]["overpayment"] == Decimal("250.00")
+    assert rows[12]["room_id"] is None and rows[12]["username"] is None
+    assert debt_snapshots.snapshot_rows(5, "209", STARTED, None) == []
+
+
+def test_replace_snapshots_is_idempotent_per_import():
+    engine = create_engine("sqlite://")
+    DebtSnapshot.__table__.create(engine)
+    with engine.begin() as conn:
+        assert debt_snapshots.replace_snapshots(conn, 5, "209", STARTED, STATE) == 2
+        debt_snapshots.replace_snapshots(conn, 6, "205", STARTED, STATE)
+        # Повтор с урезанным state (ручная привязка поменяла applied_state)
+        debt_snapshots.replace_snapshots(conn, 5, "209", STARTED, {"12": STATE["12"]})
+        rows = conn.execute(
+            select(DebtSnapshot.import_log_id, DebtSnapshot.user_id, DebtSnapshot.debt)
+            .order_by(DebtSnapshot.import_log_id, DebtSnapshot.user_id)
+        ).all()
+    assert [(log, uid) for log, uid, _ in rows] == [(5, 12), (6, 11), (6, 12)]
+    assert Decimal(rows[1][2]) == Decimal("99.00")
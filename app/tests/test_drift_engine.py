@@ -0,0 +1,124 @@
+"""Unit-тесты drift-движка (app/modules/utility/services/drift_engine.py) и
+авто-перерасчёта поверх него — без БД.
+
+Покрываем:
+  - число запросов на период не зависит от числа reading'ов
+  - безопасный drift → один bulk UPDATE по PK, опасный → сигнал, без drift → ничего
+  - существующий открытый RECALC_DRIFT обновляется, а не дублируется
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.modules.utility.services import auto_recalc_drift as arc
+from app.modules.utility.services import drift_engine as de
+
+
+class _Result:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+
+class _Session:
+    """Отдаёт результаты по очереди, пишет (statement, params)."""
+
+    def __init__(self, period, *results):
+        self.period = period
+        self.results = list(results)
+        self.calls = []
+        self.added = []
+        self.info = {}
+
+    async def get(self, _model, _id):
+        return self.period
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        return self.results.pop(0) if self.results else _Result()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        pass
+
+
+def _reading(rid, user_id, total, hot="10"):
+    return SimpleNamespace(
+        id=rid, user_id=user_id, room_id=100 + user_id, period_id=5,
+        created_at=datetime(2026, 10, 1), hot_water=Decimal(hot),
+        cold_water=Decimal("5"), electricity=Decimal("1"),
+        total_cost=Decimal(total), anomaly_flags=None,
+        user=SimpleNamespace(id=user_id, username=f"u{user_id}"),
+        room=SimpleNamespace(id=100 + user_id, tariff_id=1, room_number="1",
+                             dormitory_name="D"),
+        **{k: Decimal("0") for k in de.COST_FIELDS},
+    )
+
+
+def _patch(monkeypatch):
+    tariff = SimpleNamespace(id=1, is_heating_active_now=lambda: True,
+                             is_hw_heating_active_now=lambda: True)
+    monkeypatch.setattr(de, "tariff_cache",
+                        SimpleNamespace(get_effective_tariff=lambda **_: tariff))
+    # «Формула» — всегда 500 ₽.
+    monkeypatch.setattr(de, "compute_reading_breakdown", lambda **_: {
+        "cost_hot_water": Decimal("300"), "cost_cold_water": Decimal("200"),
+        "total_209": Decimal("500"), "total_205": Decimal("0"),
+        "total_cost": Decimal("500"), "is_baseline": False,
+    })
+
+
+def test_query_count_is_fixed_per_period(monkeypatch):
+    _patch(monkeypatch)
+    for n in (3, 300):
+        readings = [_reading(i, i, "500") for i in range(1, n + 1)]
+        db = _Session(SimpleNamespace(id=5, name="Октябрь 2026"), _Result(readings))
+        batch = asyncio.run(de.compute_period_drift(db, 5))
+        assert len(batch.checks) == n
+        # readings + кандидаты prev (≤ 1000 пар — один чанк) + сезонные флаги
+        assert len(db.calls) == 3
+        assert set(batch.timings_ms) == {"load_readings", "load_prev", "compute"}
+
+
+def test_auto_recalc_bulk_fix_and_signal_upsert(monkeypatch):
+    _patch(monkeypatch)
+    readings = [
+        _reading(1, 1, "450"),                 # безопасный drift → фикс
+        _reading(2, 2, "400", hot="797205"),   # битый формат → сигнал
+        _reading(3, 3, "500"),                 # без drift
+        _reading(4, 2, "400", hot="797205"),   # второе показание того же жильца
+    ]
+    open_problem = SimpleNamespace(user_id=2, score=0, severity="high")
+    db = _Session(
+        SimpleNamespace(id=5, name="Октябрь 2026"),
+        _Result(readings),     # reading'и периода
+        _Result(),             # кандидаты prev
+        _Result(),             # сезонные флаги
+        _Result(),             # жильцы с корректировками
+        _Result(),             # bulk UPDATE
+        _Result([open_problem]),  # открытые RECALC_DRIFT
+    )
+    result = asyncio.run(arc.auto_recalc_drift(db, 5))
+
+    # signaled — показания (как до движка), сигнал — один на жильца.
+    assert (result["checked"], result["fixed"], result["signaled"]) == (4, 1, 2)
+    bulk = [params for _stmt, params in db.calls if isinstance(params, list)]
+    assert len(bulk) == 1 and [p["id"] for p in bulk[0]] == [1]
+    assert bulk[0][0]["total_cost"] == Decimal("500")
+    assert bulk[0][0]["cost_sewage"] == Decimal("0")          # нет в breakdown — как было
+    assert bulk[0][0]["anomaly_flags"] == arc.AUTO_MARK
+    # Открытый сигнал обновлён на месте, новых не добавлено.
+    assert db.added == []
+    assert open_problem.severity == "critical"
+    assert open_problem.details["reason"] == "format_suspect"
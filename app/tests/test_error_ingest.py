@@ -0,0 +1,75 @@
+"""Unit-тесты приёма JS-ошибок (app/core/error_ingest.py) — без БД.
+
+Покрываем:
+  - отпечаток не зависит от хоста, ?v=hash, хеша в имени файла, :line:col
+    и id в сообщении
+  - одинаковые ошибки окна → одна строка с occurrences/first/last seen
+  - всплеск → сэмплирование с весом 1/доля; лимит отпечатков окна
+"""
+from app.core import error_ingest as ei
+
+_STACK = (
+    "TypeError: Cannot read properties of undefined (reading 'id')\n"
+    "    at renderRoom (https://{host}/js/rooms.js?v={ver}:{line}:17)\n"
+    "    at https://{host}/js/app.js?v={ver}:88:5"
+)
+
+
+def _stack(host="a.example", ver="1", line=120):
+    return _STACK.format(host=host, ver=ver, line=line)
+
+
+def test_fingerprint_ignores_volatile_parts():
+    base = ei.fingerprint("Room 15 not found", _stack())
+    assert ei.fingerprint("Room 98 not found", _stack("b.example", "2", 131)) == base
+    assert ei.fingerprint("Room 15 not found", _stack(), release="2026.10.1") != base
+    assert ei.fingerprint("Tariff 15 not found", _stack()) != base
+    assert "rooms.js" in ei.normalize_stack(_stack()) and "?v=" not in ei.normalize_stack(_stack())
+    hashed = _stack().replace("rooms.js", "rooms.0a1b2c3d4e.js").replace("app.js", "app.d9df065e17.js")
+    assert ei.normalize_stack(hashed) == ei.normalize_stack(_stack())
+    assert ei.fingerprint("Room 15 not found", hashed) == base
+
+
+def _ingest():
+    sent = []
+    ingest = ei.FrontendErrorIngest(lambda **kw: sent.append(kw) or True,
+                                    burst_threshold=10, max_fingerprints=2,
+                                    rng=iter([0.0, 0.99] * 100).__next__)
+    return ingest, sent
+
+
+def test_same_error_flushes_one_row_per_window():
+    ingest, sent = _ingest()
+    statuses = [
+        ingest.ingest(message=f"boom {i}", stack=_stack(line=i), source="frontend",
+                      extra={"client_ip": "1.2.3.4"})
+        for i in range(5)
+    ]
+    assert statuses == ["new"] + ["aggregated"] * 4
+    assert ingest.flush() == 1
+
+    (row,) = sent
+    assert row["run_investigation"] is False
+    assert row["exc_message"] == "boom 0" and row["source"] == "frontend"
+    extra = row["extra"]
+    assert extra["occurrences"] == 5 and extra["client_ip"] == "1.2.3.4"
+    assert extra["first_seen"] <= extra["last_seen"] and extra["sample_rate"] == 1.0
+    assert ingest.stats()["pending_fingerprints"] == 0
+
+
+def test_burst_sampling_and_fingerprint_cap():
+    ingest, sent = _ingest()
+    statuses = [ingest.ingest(message="x", stack=None) for _ in range(30)]
+    assert statuses.count("sampled_out") > 0
+    kept = 30 - statuses.count("sampled_out")
+    assert ingest.stats()["sample_rate"] < 1.0
+
+    # Новые отпечатки сверх лимита окна только считаются.
+    ingest.flush()
+    ingest.ingest(message="a", stack=None)
+    ingest.ingest(message="b", stack=None)
+    assert ingest.ingest(message="c", stack=None) == "overflow"
+
+    # Принятые события под всплеском весят 1/доля: оценка ≥ фактически принятых.
+    assert sent[0]["extra"]["occurrences"] >= kept
+    assert sent[0]["extra"]["sample_rate"] < 1.0
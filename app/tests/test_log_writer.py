@@ -0,0 +1,120 @@
+"""Unit-тесты буферной записи журналов (app/core/log_writer.py).
+
+Покрываем:
+  - stage_audit: строки уходят ОДНИМ INSERT на commit, rollback их выбрасывает
+  - ErrorLogWriter: пачка одним commit'ом, расследование одно на (путь, метод, user),
+                    переполненная очередь теряет новые записи
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.core import error_logger, log_writer
+
+
+def _audit_row(action):
+    return {
+        "user_id": 1, "username": "admin", "action": action, "entity_type": "reading",
+        "entity_id": 7, "details": {"k": 1}, "created_at": datetime(2026, 10, 1, 12, 0),
+    }
+
+
+def test_audit_rows_flushed_in_one_insert_on_commit():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE audit_log (id INTEGER PRIMARY KEY, user_id INTEGER, username TEXT,"
+            " action TEXT, entity_type TEXT, entity_id INTEGER, details JSON, created_at TIMESTAMP)"
+        ))
+    inserts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO AUDIT_LOG"):
+            inserts.append(statement)
+
+    with Session(engine) as session:
+        session.execute(text("SELECT 1"))                      # транзакция запроса уже идёт
+        log_writer.stage_audit(session, _audit_row("approve"))
+        session.rollback()
+        log_writer.stage_audit(session, _audit_row("approve"))
+        log_writer.stage_audit(session, _audit_row("delete"))
+        assert inserts == []                                  # до commit — ничего
+        session.commit()
+
+        rows = session.execute(text("SELECT action, details FROM audit_log ORDER BY id")).all()
+    assert len(inserts) == 1
+    assert [(a, json.loads(d)) for a, d in rows] == [("approve", {"k": 1}), ("delete", {"k": 1})]
+
+
+class _FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def add_all(self, objects):
+        self.log["added"].append(len(objects))
+        self.log["objects"].extend(objects)
+
+    async def commit(self):
+        self.log["commits"] += 1
+
+
+def _writer(monkeypatch, **kwargs):
+    log = {"added": [], "objects": [], "commits": 0, "investigated": []}
+
+    async def _investigate(db, path, method, user_id, body=None):
+        log["investigated"].append(path)
+        return {"path": path}
+
+    monkeypatch.setattr(error_logger, "investigate_safe", _investigate)
+    return log_writer.ErrorLogWriter(lambda: _FakeSession(log), **kwargs), log
+
+
+def _record(path, exc=None):
+    return {
+        "fields": error_logger.error_fields(
+            source="backend", http_method="GET", http_path=path, exc=exc,
+        ),
+        "investigate": (path, "GET", None),
+    }
+
+
+def test_error_batch_single_commit_and_deduped_investigation(monkeypatch):
+    writer, log = _writer(monkeypatch, flush_seconds=0.05)
+
+    async def _scenario():
+        for path in ("/api/rooms/1", "/api/rooms/1", "/api/users/2"):
+            writer.submit(_record(path, exc=ValueError("boom")))
+        await asyncio.sleep(0.2)
+        await writer.close()
+
+    asyncio.run(_scenario())
+
+    assert log["added"] == [3]                                # одна пачка
+    assert log["commits"] == 2                                # вставка + investigation
+    assert sorted(log["investigated"]) == ["/api/rooms/1", "/api/users/2"]
+    first = log["objects"][0]
+    assert first.exc_type == "ValueError" and "boom" in first.traceback
+    assert first.investigation == {"path": "/api/rooms/1"}
+
+
+def test_full_queue_drops_new_records_and_close_flushes_rest(monkeypatch):
+    writer, log = _writer(monkeypatch, max_queue=2, flush_seconds=10)
+
+    async def _scenario():
+        results = [writer.submit(_record(f"/api/x/{i}")) for i in range(4)]
+        await writer.close()                                  # воркер ещё ждёт — дописывает close
+        return results
+
+    assert asyncio.run(_scenario()) == [True, True, False, False]
+    assert writer.dropped == 2
+    assert sum(log["added"]) == 2
@@ -0,0 +1,108 @@
+"""Unit-тесты графа закрытия месяца (app/modules/utility/services/month_close.py).
+
+Покрываем:
+  - уровни графа: static_rent ∥ unconditional_norm, receipts ∥ open_next
+  - дома на тарифе «без условий» → ребро static_rent → unconditional_norm
+  - выключенные опциями этапы skipped и не держат зависимых
+  - падение этапа: зависимые не стартуют, retry — только упавший этап
+  - зависший этап (смерть воркера): повторная доставка продолжает его,
+    resume сбрасывает queued и running старше лимита задачи
+"""
+from datetime import datetime, timedelta
+
+from app.modules.utility.services import month_close as mc
+from app.modules.utility.tasks import month_close as mc_tasks
+
+FULL = {"next_period_name": "Ноябрь 2026", "generate_norm": True}
+
+
+def _finish(states, *stages, status="done"):
+    for stage in stages:
+        states[stage]["status"] = status
+
+
+def test_levels_run_independent_stages_in_parallel():
+    dag = mc.build_dag(FULL, {"house_unconditional_rooms": 0})
+    assert mc.levels(dag) == [
+        ["preload"],
+        ["static_rent", "unconditional_norm"],
+        ["auto_norm"],
+        ["singles"],
+        ["close"],
+        ["receipts", "open_next"],
+        ["onec_publish"],
+    ]
+
+    states = mc.initial_states(FULL)
+    assert mc.ready_stages(dag, states) == ["preload"]
+    _finish(states, "preload")
+    assert mc.ready_stages(dag, states) == ["static_rent", "unconditional_norm"]
+
+
+def test_house_unconditional_overlap_serializes_charges():
+    dag = mc.build_dag(FULL, {"house_unconditional_rooms": 3})
+    assert mc.levels(dag)[1:3] == [["static_rent"], ["unconditional_norm"]]
+
+    states = mc.initial_states(FULL)
+    _finish(states, "preload")
+    assert mc.ready_stages(dag, states) == ["static_rent"]
+
+
+def test_disabled_stages_are_skipped_and_satisfy_dependencies():
+    options = {"next_period_name": None, "generate_norm": False, "receipts": False}
+    states = mc.initial_states(options)
+    assert {s for s, st in states.items() if st["status"] == "skipped"} == {
+        "auto_norm", "receipts", "open_next", "onec_publish",
+    }
+    dag = mc.build_dag(options, {})
+    _finish(states, "preload", "static_rent", "unconditional_norm")
+    assert mc.ready_stages(dag, states) == ["singles"]
+    _finish(states, "singles", "close")
+    assert mc.run_status(states) == "done"
+
+
+def test_failed_stage_blocks_dependents_and_retries_alone():
+    dag = mc.build_dag(FULL, {})
+    states = mc.initial_states(FULL)
+    _finish(states, "preload", "static_rent", "unconditional_norm", "auto_norm", "singles", "close")
+    _finish(states, "receipts", status="running")
+    _finish(states, "open_next", status="failed")
+
+    assert mc.ready_stages(dag, states) == []
+    assert mc.run_status(states) == "running"           # receipts ещё идёт
+    _finish(states, "receipts")
+    assert mc.run_status(states) == "failed"
+
+    assert mc.reset_failed(states, "open_next") == ["open_next"]
+    assert mc.reset_failed(states, "receipts") == []    # выполненный не трогаем
+    assert mc.ready_stages(dag, states) == ["open_next"]
+    assert mc.run_status(states) == "running"
+
+
+def test_stuck_stages_are_reentered_and_restartable():
+    now = datetime(2026, 10, 19, 12, 0)
+    fresh = (now - timedelta(seconds=30)).isoformat()
+    stale = (now - timedelta(seconds=mc.STALE_RUNNING_SECONDS + 1)).isoformat()
+
+    running = {"status": "running", "started_at": fresh, "task_id": "t-1"}
+    assert not mc.is_stuck(running, now)
+    assert mc_tasks._can_enter(running, "t-1")         # та же доставка после смерти воркера
+    assert not mc_tasks._can_enter(running, "t-2")     # дубль — не выполняем
+    assert mc_tasks._can_enter({"status": "queued"}, "t-2")
+    assert not mc_tasks._can_enter({"status": "done"}, "t-1")
+
+    states = mc.initial_states(FULL)
+    _finish(states, "preload", "static_rent", "unconditional_norm", "auto_norm", "singles", "close")
+    states["receipts"].update(status="running", started_at=stale, task_id="t-9")
+    states["open_next"].update(status="running", started_at=fresh, task_id="t-8")
+    assert mc.is_stuck(states["receipts"], now)
+    assert mc.restartable(states, now) == ["receipts"]
+
+    assert mc.reset_failed(states, None, now) == ["receipts"]
+    assert states["receipts"]["status"] == "pending" and "task_id" not in states["receipts"]
+    assert states["open_next"]["status"] == "running"  # живой этап не трогаем
+
+
+def test_compact_result_drops_previews():
+    result = {"created": 5, "preview": [{"id": 1}] * 100, "by_room": {"1": 2}, "errors": []}
+    assert mc.compact_result(result) == {"created": 5, "errors": []}
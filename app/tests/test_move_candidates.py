@@ -0,0 +1,96 @@
+"""Unit-тесты кандидатов на переезд (app/modules/utility/services/move_candidates.py) — без БД.
+
+Покрываем:
+  - окно месяцев сканера через границу года
+  - сборка кандидатов из строк сводки: текущая комната первой, порядок по
+    подачам из чужих комнат, жильцы без чужих подач отбрасываются
+  - фиксированное число запросов, пустая сводка — один запрос
+  - подачи до оформленного переезда (RoomAssignment) кандидатом не делают
+"""
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+from app.modules.utility.services import move_candidates as mc
+
+
+def test_month_window_crosses_year():
+    assert mc.month_window(date(2026, 10, 19)) == (date(2026, 8, 1), date(2026, 11, 1))
+    assert mc.month_window(date(2027, 1, 5)) == (date(2026, 11, 1), date(2027, 2, 1))
+    assert mc.month_window(date(2026, 12, 31), 1) == (date(2026, 12, 1), date(2027, 1, 1))
+
+
+def _user(uid, room_id):
+    return SimpleNamespace(id=uid, room_id=room_id, username=f"u{uid}", full_name=None)
+
+
+def _room(rid):
+    return SimpleNamespace(id=rid, dormitory_name="Общ. 1", room_number=str(rid))
+
+
+def test_assemble_orders_rooms_and_candidates():
+    rows = [
+        (1, 212, 3), (1, 504, 1),   # переехал 504 → 212, оформлено
+        (2, 300, 1), (2, 301, 4),   # подаёт из 301, числится в 300
+        (3, 400, 2),                # всё из своей — не кандидат
+        (4, 500, 2),                # без комнаты
+        (9, 600, 1),                # жилец удалён
+    ]
+    users = {u.id: u for u in (_user(1, 212), _user(2, 300), _user(3, 400), _user(4, None))}
+    rooms = {rid: _room(rid) for rid in (212, 504, 300, 301, 400, 500)}
+    out = mc.assemble(rows, users, rooms)
+
+    assert [c["user_id"] for c in out] == [2, 4, 1]
+    second = out[0]
+    assert [r["room_id"] for r in second["seen_rooms"]] == [300, 301]
+    assert second["seen_rooms"][0]["is_current"] is True
+    assert (second["rows_total"], second["rows_other"]) == (5, 4)
+    assert second["current_room"] == {"id": 300, "dormitory_name": "Общ. 1", "room_number": "300"}
+    assert out[1]["current_room"] is None
+
+
+class _Result:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def all(self):
+        return list(self._rows)
+
+    def scalars(self):
+        return self
+
+
+class _Session:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        return self.results.pop(0) if self.results else _Result()
+
+
+def test_find_move_candidates_query_count():
+    db = _Session(_Result())
+    assert asyncio.run(mc.find_move_candidates(db, date(2026, 1, 1), date(2027, 1, 1))) == []
+    assert len(db.calls) == 1
+    assert db.calls[0][1] == {"start": date(2026, 1, 1), "end": date(2027, 1, 1)}
+    assert "HAVING" in str(db.calls[0][0])
+
+    db = _Session(
+        _Result([(2, 300, 1), (2, 301, 4)]),
+        _Result([_user(2, 300)]),
+        _Result([_room(300), _room(301)]),
+    )
+    out = asyncio.run(mc.find_move_candidates(db, date(2026, 1, 1), date(2027, 1, 1)))
+    assert len(db.calls) == 3 and out[0]["rows_other"] == 4
+
+
+def test_candidates_ignore_months_before_recorded_move():
+    sql = " ".join(str(mc.CANDIDATES_SQL).split())
+    # Месяц заселения — из открытой RoomAssignment; чужая комната считается
+    # только в месяцах ПОСЛЕ него (или если назначения нет вовсе).
+    assert "FROM room_assignments WHERE moved_out_at IS NULL" in sql
+    assert "AND (m.month IS NULL OR c.month > m.month)" in sql
+    # Показываются все подачи окна — и из старой комнаты тоже.
+    assert sql.count("s.month >= :start AND s.month < :end") == 1
@@ -6,10 +6,13 @@
 задним числом (см. инцидент мая 2026 с Сорокиным С.А. — Февральская
 подача за май делала майскую дельту отрицательной).
 """
+from app.modules.utility.models import BillingPeriod
 from app.modules.utility.services.period_helpers import (
+    chron_ordinal,
     parse_period_name,
     period_chron_key,
 )
+from app.modules.utility.services.period_registry import PeriodEntry, PeriodSnapshot
 
 
 def test_parse_basic():
@@ -115,3 +118,29 @@ def test_sorokin_scenario():
         "Февраль 2026",
         "Начальный период",
     ]
+
+
+def test_chron_ordinal_is_consecutive_across_years():
+    assert chron_ordinal("Январь 2026") - chron_ordinal("Декабрь 2025") == 1
+    assert chron_ordinal("Май 2026") == 2026 * 12 + 5
+    assert chron_ordinal("Начальный период") == 0
+
+
+def test_billing_period_keeps_chronology_on_rename():
+    """Хронология хранится на BillingPeriod и следует за переименованием."""
+    p = BillingPeriod(name="Март 2026")
+    assert (p.chron_year, p.chron_month, p.chron_ordinal) == (2026, 3, chron_ordinal("Март 2026"))
+    p.name = "Тестовый"
+    assert (p.chron_year, p.chron_month, p.chron_ordinal) == (0, 0, 0)
+
+
+def test_registry_snapshot_windows():
+    """Реестр: «N прошлых» и «N по текущий» — по ordinal, а не по id."""
+    names = {1: "Начальный период", 2: "Март 2026", 3: "Апрель 2026", 9: "Февраль 2026"}
+    snap = PeriodSnapshot([PeriodEntry(pid, nm, chron_ordinal(nm), False)
+                           for pid, nm in names.items()])
+
+    assert [p.id for p in snap.previous(3, 2)] == [2, 9]
+    assert [p.id for p in snap.up_to(2)] == [2, 9, 1]
+    assert [p.id for p in snap.last(2)] == [2, 3]
+    assert snap.previous(1) == []
@@ -0,0 +1,66 @@
+"""Unit-тесты агрегатов периода (app/modules/utility/services/period_stats.py) — без БД.
+
+Покрываем:
+  - какие периоды помечает bulk-запись в readings (WHERE / параметры INSERT)
+  - bulk по PK без периода: всё, либо scope_writes
+  - totals: сумма строк общежитий
+"""
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import insert, text, update
+
+from app.modules.utility.models import MeterReading
+from app.modules.utility.services import period_stats as ps
+
+
+def _state(statement, parameters=None, info=None):
+    return SimpleNamespace(
+        statement=statement, parameters=parameters or {},
+        is_insert=getattr(statement, "is_insert", False),
+        is_update=getattr(statement, "is_update", False),
+        is_delete=getattr(statement, "is_delete", False),
+        session=SimpleNamespace(info={} if info is None else info),
+    )
+
+
+def test_statement_periods_from_where_and_params():
+    by_period = update(MeterReading).where(
+        MeterReading.period_id == 7, MeterReading.is_approved.is_(False),
+    ).values(anomaly_flags=None)
+    assert ps.statement_periods(_state(by_period)) == {7}
+
+    in_list = update(MeterReading).where(MeterReading.period_id.in_([3, 4])).values(total_cost=0)
+    assert ps.statement_periods(_state(in_list)) == {3, 4}
+
+    rows = [{"period_id": 5, "user_id": 1}, {"period_id": 6, "user_id": 2}]
+    assert ps.statement_periods(_state(insert(MeterReading), rows)) == {5, 6}
+
+    # Bulk по PK / raw SQL — период неизвестен.
+    assert ps.statement_periods(_state(update(MeterReading), [{"id": 1}])) == {None}
+    assert ps.statement_periods(_state(text("UPDATE readings SET debt_209 = 0"))) == {None}
+
+
+def test_scope_writes_narrows_bulk_by_pk():
+    info = {}
+    session = SimpleNamespace(info=info)
+    ps._stage_statement(_state(update(MeterReading), [{"id": 1}], info))
+    assert info[ps._PENDING_KEY] == {None}
+
+    info.clear()
+    ps.scope_writes(session, [9])
+    ps._stage_statement(_state(update(MeterReading), [{"id": 1}], info))
+    ps._stage_statement(_state(
+        update(MeterReading).where(MeterReading.period_id == 8).values(total_cost=0), None, info,
+    ))
+    assert info[ps._PENDING_KEY] == {8, 9}
+    assert ps._mark_rows({8, 9}) == [{"period_id": 8}, {"period_id": 9}]
+    assert ps._mark_rows({8, None}) == [{"period_id": None}]
+
+
+def test_totals_sum_dormitory_rows():
+    row = dict.fromkeys(ps.COUNT_FIELDS, 1)
+    row.update(dict.fromkeys((*ps.COST_FIELDS, "draft_sum"), Decimal("10.50")))
+    out = ps.totals({"Общ. 1": row, "": row})
+    assert out["approved_count"] == 2 and out["total_cost"] == Decimal("21.00")
+    assert ps.totals({})["draft_sum"] == Decimal("0")
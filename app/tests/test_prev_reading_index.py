@@ -0,0 +1,112 @@
+"""Unit-тесты PrevReadingIndex (prev_reading_index.py) — без БД.
+
+Покрываем:
+  - load:       фиксированное число запросов на любое число пар, память
+  - pick:       канонический выбор (хронология имени, synth-prev, exclude_id)
+  - _plan:      догрузка пары при запросе более позднего периода
+  - for_session: один индекс на сессию (транзакцию): commit, rollback и
+                 запись в readings сбрасывают память
+"""
+import asyncio
+from decimal import Decimal
+
+from app.modules.utility.services.prev_reading_index import PrevKey, PrevReadingIndex
+from app.tests.performance.helpers import (
+    FakeExecuteResult,
+    FakeReading,
+    SequencedAsyncSession,
+)
+
+# Ретроактивный период: «Февраль 2026» (id=9) создан позже «Апреля» (id=3).
+
+
+def _reading(rid, user_id, room_id, period_id, hot, flags=None):
+    return FakeReading(id=rid, user_id=user_id, room_id=room_id, period_id=period_id,
+                       hot_water=Decimal(hot), anomaly_flags=flags, is_approved=True)
+
+
+def _session(candidates):
+    return SequencedAsyncSession(FakeExecuteResult(rows=candidates))
+
+
+def test_single_load_for_many_pairs_and_memo():
+    rows = [
+        (_reading(1, 10, 100, 1, "10"), "Январь 2026"),
+        (_reading(2, 10, 100, 9, "15"), "Февраль 2026"),
+        (_reading(3, 11, 101, 2, "40", flags="AUTO_AVG"), "Март 2026"),
+        (_reading(4, 11, 101, 1, "30"), "Январь 2026"),
+    ]
+    db = _session(rows)
+    index = PrevReadingIndex()
+    keys = [PrevKey(10, 100, "Март 2026"), PrevKey(11, 101, "Апрель 2026"),
+            PrevKey(12, 102, "Март 2026")]
+
+    prev = asyncio.run(index.resolve(db, keys))
+
+    assert len(db.statements) == 1                     # один запрос на все пары
+    assert prev[keys[0]].id == 2                       # февраль по имени, не по id
+    assert prev[keys[1]].id == 4                       # AUTO_AVG — не meaningful
+    assert prev[keys[2]] is None                       # истории нет → baseline
+    assert index.period_name(prev[keys[0]]) == "Февраль 2026"
+
+    asyncio.run(index.load(db, keys))
+    assert len(db.statements) == 1                     # повтор — из памяти
+
+
+def test_pick_excludes_current_reading():
+    rows = [
+        (_reading(1, 10, 100, 1, "10"), "Январь 2026"),
+        (_reading(5, 10, 100, 2, "12", flags="METER_REPLACEMENT"), "Март 2026"),
+    ]
+    index = PrevReadingIndex()
+    asyncio.run(index.load(_session(rows), [PrevKey(10, 100, "Март 2026")]))
+
+    prev, _any, _hist = index.pick(10, 100, "Март 2026")
+    assert prev.id == 5                                # новый baseline после замены
+    prev, _any, _hist = index.pick(10, 100, "Март 2026", exclude_id=5)
+    assert prev.id == 1
+
+
+def test_later_target_reloads_pair():
+    index = PrevReadingIndex()
+    index._bound[(10, 100)] = 2026 * 12 + 3
+
+    pairs, bound = index._plan([PrevKey(10, 100, "Февраль 2026"),
+                                PrevKey(10, 100, "Апрель 2026")])
+
+    assert pairs == [(10, 100)]
+    assert bound == 2026 * 12 + 4
+    assert index._plan([PrevKey(10, 100, "Март 2026")]) == ([], 0)
+
+
+def test_for_session_shares_index():
+    db = SequencedAsyncSession()
+    db.info = {}
+    assert PrevReadingIndex.for_session(db) is PrevReadingIndex.for_session(db)
+    assert PrevReadingIndex.for_session(object()) is not PrevReadingIndex.for_session(object())
+
+
+def test_session_index_dropped_on_commit_rollback_and_readings_write():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        session.execute(text("CREATE TABLE readings (id INTEGER)"))
+        session.execute(text("CREATE TABLE rooms (id INTEGER)"))
+        session.execute(text("CREATE TABLE period_stats_marks (period_id INTEGER)"))
+
+        index = PrevReadingIndex.for_session(session)
+        session.execute(text("UPDATE rooms SET id = 2"))
+        assert PrevReadingIndex.for_session(session) is index     # не readings
+        session.execute(text("UPDATE readings SET id = 2"))
+        assert PrevReadingIndex.for_session(session) is not index
+
+        index = PrevReadingIndex.for_session(session)
+        session.commit()
+        assert PrevReadingIndex.for_session(session) is not index
+
+        index = PrevReadingIndex.for_session(session)
+        session.execute(text("SELECT id FROM readings"))    # как index.load
+        session.rollback()
+        assert PrevReadingIndex.for_session(session) is not index
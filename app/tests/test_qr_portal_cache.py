@@ -0,0 +1,77 @@
+"""Unit-тесты кеша состояния QR-портала (services/qr_portal_cache.py) — без Redis.
+
+Покрываем:
+  - store/load: попадание при неизменных версиях зависимостей
+  - write-through: сдвиг версии комнаты/жильца → промах
+  - гонка: версия сдвинулась за время расчёта → запись не сохраняется
+"""
+import asyncio
+
+import pytest
+
+from app.modules.utility.services import qr_portal_cache as cache
+
+TOKEN = "t" * 43
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+@pytest.fixture
+def env(monkeypatch):
+    redis, versions = _FakeRedis(), {}
+
+    async def _read(keys):
+        return [versions.get(k, "0") for k in keys]
+
+    monkeypatch.setattr(cache, "_redis", lambda: redis)
+    monkeypatch.setattr(cache, "read_versions", _read)
+    return redis, versions
+
+
+def _entry(versions):
+    deps = cache.room_dependencies(5) + cache.user_dependencies([42])
+    return {
+        "room_id": 5, "pw": "hash", "window": {"start": 20, "end": 25},
+        "deps": deps, "versions": [versions.get(k, "0") for k in deps],
+        "state": {"submitted": False},
+    }
+
+
+def test_hit_until_room_or_user_version_moves(env):
+    redis, versions = env
+    asyncio.run(cache.store_entry(TOKEN, _entry(versions)))
+
+    assert TOKEN not in next(iter(redis.store))                 # токен не светится в ключе
+    assert asyncio.run(cache.load_entry(TOKEN))["state"] == {"submitted": False}
+
+    versions["room@5"] = "1"                                    # подача/утверждение
+    assert asyncio.run(cache.load_entry(TOKEN)) is None
+
+    asyncio.run(cache.store_entry(TOKEN, _entry(versions)))
+    versions["user@42"] = "3"                                   # импорт долга жильца
+    assert asyncio.run(cache.load_entry(TOKEN)) is None
+
+
+def test_unrelated_room_does_not_invalidate(env):
+    _redis, versions = env
+    asyncio.run(cache.store_entry(TOKEN, _entry(versions)))
+    versions["room@6"] = "7"
+    versions["user@43"] = "2"
+    assert asyncio.run(cache.load_entry(TOKEN)) is not None
+
+
+def test_store_skipped_when_versions_moved_during_build(env):
+    redis, versions = env
+    entry = _entry(versions)
+    versions["room@*"] = "1"                                    # bulk-запись во время расчёта
+    asyncio.run(cache.store_entry(TOKEN, entry))
+    assert redis.store == {}
@@ -0,0 +1,152 @@
+"""Unit-тесты лимитера (app/core/rate_limit.py) и счётчика Redis-походов — без Redis.
+
+Покрываем:
+  - локальный бакет: ёмкость окна, Retry-After, новое окно — полный бакет
+  - сверка двух воркеров через общий (фейковый) Redis одним pipeline'ом
+  - exact: 429 с Retry-After; Redis упал → локальный бакет, а не 500
+  - CountingConnection: pipeline = один round-trip на запрос
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.core import rate_limit, redis_client
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def incrby(self, key, n):
+        self.ops.append(("incrby", key, n))
+
+    def expire(self, key, seconds):
+        self.ops.append(("noop",))
+
+    def incr(self, key):
+        self.ops.append(("incrby", key, 1))
+
+    def pexpire(self, key, ms, nx=False):
+        self.ops.append(("noop",))
+
+    def pttl(self, key):
+        self.ops.append(("pttl",))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        out = []
+        for op in self.ops:
+            if op[0] == "incrby":
+                self.redis.store[op[1]] = self.redis.store.get(op[1], 0) + op[2]
+                out.append(self.redis.store[op[1]])
+            else:
+                out.append(42_000 if op[0] == "pttl" else True)
+        return out
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = _FakeRedis()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: redis)
+    return redis
+
+
+def test_local_bucket_window_capacity():
+    buckets = rate_limit.LocalBuckets(sync_seconds=3600)
+    now = 1_000_020.0                                          # окно [1_000_020, 1_000_080)
+    assert [buckets.hit("k", 3, 60, now) for _ in range(3)] == [None, None, None]
+    assert buckets.hit("k", 3, 60, now + 10) == pytest.approx(50.0)
+    assert buckets.hit("other", 3, 60, now) is None            # ключи независимы
+    assert buckets.hit("k", 3, 60, now + 60) is None           # новое окно
+
+
+def test_two_workers_reconcile_through_one_pipeline(fake_redis):
+    a, b = rate_limit.LocalBuckets(), rate_limit.LocalBuckets()
+    now = 1_000_020.0
+    for _ in range(3):
+        assert a.hit("k", 5, 60, now) is None
+    assert b.hit("k", 5, 60, now) is None
+
+    asyncio.run(a.sync(now))
+    asyncio.run(b.sync(now))
+    asyncio.run(a.sync(now))                                    # a узнаёт про запрос b
+    assert fake_redis.round_trips == 3                          # по pipeline'у на сверку
+    assert list(fake_redis.store.values()) == [4]
+
+    assert a.hit("k", 5, 60, now) is None                       # 4 + 1 = 5
+    assert a.hit("k", 5, 60, now) is not None
+    assert b.hit("k", 5, 60, now) is None                       # b ещё не знает про 5-й
+    asyncio.run(b.sync(now))
+    assert b.hit("k", 5, 60, now) is not None
+
+
+def _request(path="/api/token", ip="10.0.0.7"):
+    return Request({
+        "type": "http", "method": "POST", "path": path, "query_string": b"",
+        "headers": [(b"x-forwarded-for", f"{ip}, 172.18.0.2".encode())],
+        "client": ("172.18.0.2", 5000),
+    })
+
+
+def test_exact_mode_429_and_fallback(fake_redis, monkeypatch):
+    limit = rate_limit.RateLimit(times=2, seconds=60, exact=True)
+
+    async def _scenario():
+        for _ in range(2):
+            await limit(_request(), None)
+        with pytest.raises(HTTPException) as exc:
+            await limit(_request(), None)
+        return exc.value
+
+    err = asyncio.run(_scenario())
+    assert err.status_code == 429 and err.headers["Retry-After"] == "42"
+    assert fake_redis.round_trips == 3                          # один pipeline на запрос
+    assert list(fake_redis.store) == ["rl:exact:/api/token:10.0.0.7"]
+
+    def _down():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_client, "get_redis", _down)
+    monkeypatch.setattr(rate_limit, "local_buckets", rate_limit.LocalBuckets())
+    assert asyncio.run(limit.check(_request(ip="10.0.0.8"))) is None
+
+
+def test_counting_connection_counts_packets(monkeypatch):
+    sent = []
+
+    async def _send(self, command, check_health=True):
+        sent.append(command)
+
+    monkeypatch.setattr(redis_client.Connection, "send_packed_command", _send)
+    conn = redis_client.CountingConnection()
+
+    async def _scenario():
+        counter = [0]
+        token = redis_client.current_redis_trips.set(counter)
+        try:
+            await conn.send_packed_command([b"GET a"])
+            await conn.send_packed_command([b"GET a", b"GET b", b"GET c"])   # pipeline
+        finally:
+            redis_client.current_redis_trips.reset(token)
+        await conn.send_packed_command([b"GET x"])                          # вне запроса
+        return counter[0]
+
+    assert asyncio.run(_scenario()) == 2
+    assert len(sent) == 3
+
+    redis_client.record("GET /api/x", 2)
+    redis_client.record("GET /api/x", 0)
+    top = {r["route"]: r for r in redis_client.top_routes()}
+    assert top["GET /api/x"]["trips_per_request"] == 1.0
@@ -0,0 +1,307 @@
+"""Unit-тесты шардированного перерасчёта периода (tasks/recalc.py) — без БД.
+
+Покрываем:
+  - _merge_summaries / _diff_summary: слияние итогов шардов, общий топ-30
+  - _load_prev_candidates: окно истории + добор вне окна только для пар без prev
+  - _find_prev: synth-reading'и и текущий период как prev не берутся
+  - планировщик: шарды по плану зданий, повторная доставка не сбрасывает
+    чекпоинты и отправляет только незаконченные шарды
+  - шард: продолжение с last_id чекпоинта, отмена откатывает чанк
+  - recalc_shard_task: retry до SHARD_MAX_RETRIES, затем failed без исключения
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+import celery as celery_pkg
+
+from app.modules.utility.tasks import recalc
+
+
+def _reading(rid, period_id, user_id=1, room_id=10, flags=None):
+    return SimpleNamespace(
+        id=rid, period_id=period_id, user_id=user_id, room_id=room_id,
+        anomaly_flags=flags,
+    )
+
+
+def _top_item(rid, delta):
+    return {"reading_id": rid, "delta": str(delta)}
+
+
+def test_merge_shard_summaries_into_diff_summary():
+    shard_a = {
+        "total": 3, "unchanged": 1, "increased": 2, "decreased": 0,
+        "sum_old": "100.006", "sum_new": "150", "top": [_top_item(1, 30), _top_item(2, 20)],
+    }
+    shard_b = {
+        "total": 2, "unchanged": 0, "increased": 0, "decreased": 2,
+        "sum_old": "50", "sum_new": "40", "top": [_top_item(3, -25), _top_item(4, "-0.5")],
+    }
+    summary = recalc._diff_summary([shard_a, shard_b])
+
+    assert (summary["total"], summary["unchanged"], summary["increased"], summary["decreased"]) == (5, 1, 2, 2)
+    assert summary["sum_old"] == "150.01"                    # округление только в финале
+    assert summary["sum_new"] == "190.00"
+    assert summary["delta"] == "39.99"                      # из несокращённых сумм
+    assert [it["reading_id"] for it in summary["top"]] == [1, 3, 2, 4]
+
+
+def test_merge_keeps_global_top_size(monkeypatch):
+    monkeypatch.setattr(recalc, "TOP_SIZE", 2)
+    parts = [{"top": [_top_item(i, Decimal(i))]} for i in range(5)]
+    merged = recalc._merge_summaries(parts)
+    assert [it["reading_id"] for it in merged["top"]] == [4, 3]
+    assert merged["total"] == 0 and merged["sum_old"] == "0"
+
+
+class _FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = None
+
+    def filter(self, *criteria):
+        self.filters = criteria
+        return self
+
+    def order_by(self, *_):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _FakeDB:
+    """Каждый db.query(...) отдаёт следующий заранее заданный набор строк."""
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.queries = []
+
+    def query(self, _model):
+        q = _FakeQuery(self.batches.pop(0))
+        self.queries.append(q)
+        return q
+
+
+def test_prev_history_window_with_fallback_for_missing_pairs():
+    chunk = [_reading(100, 20, user_id=1, room_id=10), _reading(101, 20, user_id=2, room_id=11)]
+    window = [
+        _reading(50, 15, user_id=1, room_id=10),
+        _reading(51, 16, user_id=2, room_id=11, flags="AUTO_GENERATED"),   # synth — не prev
+        _reading(52, 16, user_id=2, room_id=10),                           # чужая пара
+    ]
+    older = [_reading(7, 3, user_id=2, room_id=11)]
+    db = _FakeDB(window, older)
+
+    by_pair = recalc._load_prev_candidates(db, chunk, period_id=20, floor=9)
+
+    assert len(db.queries) == 2                    # окно + добор только для пары без prev
+    assert [r.id for r in by_pair[(1, 10)]] == [50]
+    assert [r.id for r in by_pair[(2, 11)]] == [7, 51]
+    assert (2, 10) not in by_pair
+    assert recalc._find_prev(by_pair[(2, 11)], 20).id == 7
+
+
+def test_prev_lookup_skips_current_period_and_synth():
+    history = [_reading(1, 5), _reading(2, 6, flags="DATA_OVERFLOW_RESET"), _reading(3, 7)]
+    assert recalc._find_prev(history, 7).id == 1
+    assert recalc._find_prev(history, 8).id == 3
+    assert recalc._find_prev([], 8) is None
+    # Нет предыдущих периодов — окна нет, один запрос истории.
+    db = _FakeDB([])
+    assert recalc._load_prev_candidates(db, [_reading(9, 1)], period_id=1, floor=1) == {}
+    assert len(db.queries) == 1
+
+
+class _JobDB:
+    """sync-сессия с одной строкой recalc_jobs."""
+
+    def __init__(self, job):
+        self.job = job
+        self.info = {}
+        self.commits = 0
+        self.rollbacks = 0
+
+    def query(self, _model):
+        return self
+
+    def filter(self, *_):
+        return self
+
+    def first(self):
+        return self.job
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _use_db(monkeypatch, db):
+    @contextmanager
+    def _session():
+        yield db
+
+    monkeypatch.setattr(recalc, "sync_db_session", _session)
+    monkeypatch.setattr(recalc, "_publish_recalc", lambda job: None)
+    monkeypatch.setattr(recalc, "publish_job_progress", lambda *a, **kw: None)
+    monkeypatch.setattr(recalc, "_load_run_context", lambda db, job: (
+        SimpleNamespace(id=job.period_id), None, {}))
+
+
+def _job(status="preview_pending", shard_state=None):
+    return SimpleNamespace(
+        id=1, period_id=20, status=status, shard_state=shard_state,
+        total_readings=0, processed=0, progress=0, error=None, diff_summary=None,
+    )
+
+
+def _fake_chord(dispatched):
+    def _chord(header):
+        dispatched.append([sig.args for sig in header])
+        return lambda callback: None
+    return _chord
+
+
+def test_planner_builds_shards_and_redelivery_keeps_checkpoints(monkeypatch):
+    job = _job()
+    db = _JobDB(job)
+    _use_db(monkeypatch, db)
+    monkeypatch.setattr(recalc, "_plan_shards", lambda db, pid: [("Общ. 1", 3), ("Общ. 2", 2)])
+    dispatched = []
+    monkeypatch.setattr(celery_pkg, "chord", _fake_chord(dispatched))
+
+    assert recalc._recalc_run(1, apply=False) == {"status": "dispatched", "shards": 2, "total": 5}
+    shards = job.shard_state["shards"]
+    assert job.shard_state["mode"] == "preview"
+    assert [(s["building"], s["total"], s["last_id"]) for s in shards.values()] == [
+        ("Общ. 1", 3, 0), ("Общ. 2", 2, 0),
+    ]
+    assert dispatched == [[(1, "0", False), (1, "1", False)]]
+
+    # Повторная доставка: шард 0 готов, шард 1 на середине — план не
+    # пересчитывается, уходит только шард 1, processed из чекпоинтов.
+    shards["0"].update(done=True, processed=3, last_id=30)
+    shards["1"].update(processed=1, last_id=41)
+    monkeypatch.setattr(recalc, "_plan_shards", lambda db, pid: 1 / 0)
+    assert recalc._recalc_run(1, apply=False)["shards"] == 1
+    assert dispatched[-1] == [(1, "1", False)]
+    assert (job.processed, job.progress, shards["1"]["last_id"]) == (4, 80, 41)
+
+    # Apply после preview — другой режим, чекпоинты preview не годятся.
+    monkeypatch.setattr(recalc, "_plan_shards", lambda db, pid: [("Общ. 1", 3)])
+    recalc._recalc_run(1, apply=True)
+    assert job.status == "apply_pending" and job.shard_state["mode"] == "apply"
+    assert job.shard_state["shards"]["0"]["last_id"] == 0
+
+
+class _ReadingsQuery:
+    """_period_readings(...).options().filter(..., id > last_id)...all()."""
+
+    def __init__(self, ids, chunk_size, seen):
+        self.ids, self.chunk_size, self.seen = ids, chunk_size, seen
+        self.last_id = None
+
+    def options(self, *_):
+        return self
+
+    def filter(self, _building, id_gt):
+        self.last_id = id_gt.right.value
+        self.seen.append(self.last_id)
+        return self
+
+    def order_by(self, *_):
+        return self
+
+    def limit(self, _n):
+        return self
+
+    def all(self):
+        return [SimpleNamespace(id=i) for i in self.ids if i > self.last_id][:self.chunk_size]
+
+
+def _shard_run_setup(monkeypatch, job, ids, checkpoint_row):
+    db = _JobDB(job)
+    _use_db(monkeypatch, db)
+    seen, checkpoints, applied = [], [], []
+    monkeypatch.setattr(recalc, "CHUNK", 2)
+    monkeypatch.setattr(recalc, "_history_floor", lambda db, pid: 1)
+    monkeypatch.setattr(recalc, "_load_prev_candidates", lambda *a: {})
+    monkeypatch.setattr(
+        recalc, "_period_readings", lambda db, pid: _ReadingsQuery(ids, recalc.CHUNK, seen))
+    monkeypatch.setattr(recalc, "_recalc_chunk", lambda db, chunk, *a: (
+        {**recalc._empty_summary(), "total": len(chunk)}, [{"id": r.id} for r in chunk]))
+    monkeypatch.setattr(recalc, "_apply_updates", lambda db, updates, job_id: applied.append(
+        [u["id"] for u in updates]))
+
+    def _checkpoint(db, job_id, shard, state, processed, apply):
+        checkpoints.append(dict(state))
+        return checkpoint_row
+    monkeypatch.setattr(recalc, "_checkpoint", _checkpoint)
+    return db, seen, checkpoints, applied
+
+
+def _shard_state(**state):
+    return {"mode": "apply", "shards": {"0": {
+        "building": "Общ. 1", "total": 5, "last_id": 0, "processed": 0,
+        "done": False, "summary": recalc._empty_summary(), **state,
+    }}}
+
+
+def test_shard_resumes_from_checkpoint(monkeypatch):
+    job = _job("apply_pending", _shard_state(last_id=2, processed=2))
+    row = SimpleNamespace(processed=5, progress=99, total_readings=5)
+    db, seen, checkpoints, applied = _shard_run_setup(monkeypatch, job, [1, 2, 3, 4, 5], row)
+
+    assert recalc._recalc_shard_run(1, "0", apply=True) == {"status": "done", "shard": "0"}
+    assert seen == [2, 4]                          # с last_id, а не с начала
+    assert applied == [[3, 4], [5]]
+    assert [(c["last_id"], c["processed"], c["done"]) for c in checkpoints] == [
+        (4, 4, False), (5, 5, True),
+    ]
+    assert checkpoints[-1]["summary"]["total"] == 3
+    assert (db.commits, db.rollbacks) == (2, 0)    # чанк + чекпоинт — одна транзакция
+
+    # Готовый шард (повторная доставка после завершения) не пересчитывается.
+    job.shard_state["shards"]["0"]["done"] = True
+    assert recalc._recalc_shard_run(1, "0", apply=True) == {"status": "done", "shard": "0"}
+    assert seen == [2, 4]
+
+
+def test_shard_cancel_rolls_back_chunk(monkeypatch):
+    job = _job("apply_pending", _shard_state())
+    db, seen, checkpoints, applied = _shard_run_setup(monkeypatch, job, [1, 2, 3], None)
+
+    # _checkpoint не нашёл задачу в apply_pending — её отменили.
+    assert recalc._recalc_shard_run(1, "0", apply=True) == {"status": "cancelled", "shard": "0"}
+    assert applied == [[1, 2]] and len(checkpoints) == 1
+    assert (db.commits, db.rollbacks) == (0, 1)
+
+    # Отменённая до старта шарда задача — шард ничего не читает.
+    job.status = "cancelled"
+    assert recalc._recalc_shard_run(1, "0", apply=True) == {"status": "skipped", "shard": "0"}
+    assert seen == [0]
+
+
+def test_shard_task_retries_then_fails_job(monkeypatch):
+    attempts, failed = [], []
+
+    def _boom(job_id, shard, apply):
+        attempts.append(shard)
+        raise RuntimeError("deadlock detected")
+
+    monkeypatch.setattr(recalc, "_recalc_shard_run", _boom)
+    monkeypatch.setattr(recalc, "_fail_job", lambda job_id, error: failed.append((job_id, error)))
+
+    result = recalc.recalc_shard_task.apply(args=(1, "0", True)).get()
+    assert len(attempts) == recalc.SHARD_MAX_RETRIES + 1
+    assert failed == [(1, "Шард 0: deadlock detected")]
+    # Обычное значение, а не исключение — chord всё равно вызовет merge.
+    assert result == {"status": "failed", "shard": "0", "error": "deadlock detected"}
+
+    attempts.clear()
+    monkeypatch.setattr(recalc, "_recalc_shard_run", lambda *a: attempts.append(1) or {"status": "done"})
+    assert recalc.recalc_shard_task.apply(args=(1, "0", True)).get() == {"status": "done"}
+    assert attempts == [1] and len(failed) == 1
@@ -8,7 +8,9 @@ from decimal import Decimal
 
 import pytest
 
-from app.modules.utility.routers.admin_registry import _reading_source
+from app.modules.utility.routers.admin_registry import (
+    _decode_cursor, _encode_cursor, _reading_source, _registry_union,
+)
 from app.modules.utility.services.debt_import import _normalize_saldo
 from app.modules.utility.services.excel_readings_import import (
     _is_junk_fio, _num, _sheet_kind, parse_readings_workbook,
@@ -115,6 +117,28 @@ def test_reading_source_saldo_stub():
     assert code2 == "qr"
 
 
+def test_registry_cursor_roundtrip():
+    from datetime import datetime
+    ts = datetime(2026, 7, 1, 9, 30, 15, 123456)
+    cur = _encode_cursor(ts, "gsheets", 42)
+    assert "=" not in cur and "|" not in cur     # безопасен в query-string
+    assert _decode_cursor(cur) == (ts, "gsheets", 42)
+
+
+def test_registry_bad_cursor_is_400():
+    from fastapi import HTTPException
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor("не-курсор")
+    assert exc.value.status_code == 400
+
+
+def test_registry_ts_never_null_in_either_branch():
+    sql = str(_registry_union(7).element)
+    # Keyset по (ts, row_type, id) не переживает NULL — обе ветки через COALESCE.
+    assert sql.count("coalesce(readings.created_at") == 1
+    assert sql.count("coalesce(gsheets_import_rows.sheet_timestamp") == 1
+
+
 # ──────────────────────────────────────────────────────────────
 # generate_qr_token — неугадываемый токен квартиры (QR-портал)
 # ──────────────────────────────────────────────────────────────
@@ -0,0 +1,156 @@
+"""Unit-тесты симулятора тарифа (app/modules/utility/services/tariff_simulator.py) — без БД.
+
+Покрываем:
+  - черновик: поля формы поверх базового тарифа, дефолты как у preview
+  - хеш черновика не зависит от формы записи ставки и способа сборки
+  - прогон: скоуп по зданию/тарифу, дельты по зданиям и жильцам, фиксированное
+    число запросов и никаких записей
+  - кеш: зависимости включают показания предыдущего периода (prev)
+"""
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.modules.utility.models import Tariff
+from app.modules.utility.services import tariff_simulator as ts
+
+
+def _tariff(tid, maintenance):
+    tariff = ts.build_draft_tariff({"maintenance_repair": maintenance, "water_supply": "40"})
+    tariff.id = tid
+    return tariff
+
+
+def test_draft_overrides_base_and_keeps_preview_defaults():
+    draft = ts.build_draft_tariff({"water_supply": "12,5", "heating": "", "charge_waste": "false"})
+    assert draft.water_supply == Decimal("12.5") and draft.heating == Decimal("0")
+    assert draft.hw_heating_active is True and draft.charge_waste is False
+    assert draft.singles_skip_heating is False and draft.id is None
+
+    base = Tariff(maintenance_repair=Decimal("30"), water_supply=Decimal("40"),
+                  hw_norm_per_capita=Decimal("3.5"), tariff_type="unconditional",
+                  heating_active=False, charge_waste=False)
+    draft = ts.build_draft_tariff({"water_supply": "45"}, base)
+    assert (draft.maintenance_repair, draft.water_supply) == (Decimal("30"), Decimal("45"))
+    assert draft.hw_norm_per_capita == Decimal("3.5") and draft.tariff_type == "unconditional"
+    assert draft.heating_active is False and draft.charge_waste is False
+    assert base.water_supply == Decimal("40")
+
+
+def test_draft_hash_is_canonical():
+    base = Tariff(maintenance_repair=Decimal("30.00"), water_supply=Decimal("40"))
+    via_base = ts.build_draft_tariff({"water_supply": "45.0"}, base)
+    full = ts.build_draft_tariff({"maintenance_repair": "30", "water_supply": "45"})
+    scope = {"building": None, "base_tariff_id": None}
+    assert ts.draft_hash(via_base, period_id=5, scope=scope) == ts.draft_hash(full, period_id=5, scope=scope)
+    assert ts.draft_hash(full, period_id=6, scope=scope) != ts.draft_hash(full, period_id=5, scope=scope)
+    other = ts.build_draft_tariff({"maintenance_repair": "31", "water_supply": "45"})
+    assert ts.draft_hash(other, period_id=5, scope=scope) != ts.draft_hash(full, period_id=5, scope=scope)
+
+
+class _Result:
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+
+class _Session:
+    def __init__(self, period, readings):
+        self.period = period
+        self.results = [_Result(readings)]
+        self.calls = []
+        self.added = []
+        self.info = {}
+
+    async def get(self, _model, _id):
+        return self.period
+
+    async def execute(self, statement, params=None):
+        self.calls.append(statement)
+        return self.results.pop(0) if self.results else _Result()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+def _reading(rid, dorm, tariff_id, area="10"):
+    room = SimpleNamespace(
+        id=100 + rid, tariff_id=tariff_id, room_number=str(rid), dormitory_name=dorm,
+        place_type="dormitory", apartment_area=Decimal(area), total_room_residents=1,
+        is_singles_apartment=False, has_hw_meter=True, has_cw_meter=True, has_el_meter=True,
+    )
+    user = SimpleNamespace(id=rid, username=f"u{rid}", residents_count=1)
+    return SimpleNamespace(
+        id=rid, user_id=rid, room_id=room.id, hot_water=Decimal("0"),
+        cold_water=Decimal("0"), electricity=Decimal("0"), user=user, room=room,
+    )
+
+
+def test_simulation_deltas_by_building_and_resident(monkeypatch):
+    current = {1: _tariff(1, "30"), 2: _tariff(2, "50")}
+    monkeypatch.setattr(ts, "tariff_cache", SimpleNamespace(
+        get_effective_tariff=lambda *, user, room: current[room.tariff_id],
+    ))
+    readings = [
+        _reading(1, "Общ. 1", 1), _reading(2, "Общ. 1", 1, area="20"),
+        _reading(3, "Общ. 2", 1), _reading(4, "Общ. 2", 2),
+    ]
+    draft = ts.build_draft_tariff({"maintenance_repair": "35", "water_supply": "40"})
+    db = _Session(SimpleNamespace(id=5, name="Октябрь 2026"), readings)
+
+    sim = asyncio.run(ts.simulate(db, draft, period_id=5, scope={"base_tariff_id": 1}))
+    # readings + сезонные флаги (кандидатов prev нет — baseline без запроса)
+    assert len(db.calls) <= 3 and db.added == []
+    assert sim.skipped_out_of_scope == 1 and not sim.errors
+
+    out = ts.summarize(sim)
+    # Содержание по площади: +5 ₽/м².
+    assert out["totals"]["residents"] == 3
+    assert out["totals"]["delta"] == 200.0
+    assert out["totals"]["components"]["cost_maintenance"] == 200.0
+    assert [b["building"] for b in out["buildings"]] == ["Общ. 1", "Общ. 2"]
+    assert out["buildings"][0]["delta"] == 150.0 and out["buildings"][0]["increased"] == 2
+    assert out["residents"][0]["user_id"] == 2 and out["residents"][0]["delta"] == 100.0
+
+    db = _Session(SimpleNamespace(id=5, name="Октябрь 2026"), readings)
+    sim = asyncio.run(ts.simulate(db, draft, period_id=5, scope={"building": "Общ. 2"}))
+    out = ts.summarize(sim)
+    # Общ. 2 целиком: +50 на тарифе 1 и −150 на тарифе 2.
+    assert out["totals"]["residents"] == 2 and out["totals"]["delta"] == -100.0
+    assert (out["totals"]["increased"], out["totals"]["decreased"]) == (1, 1)
+
+
+def test_cache_depends_on_prev_period_readings(monkeypatch):
+    assert ts.dependencies(5) == [
+        "readings@5", "readings@*", "rooms", "users", "tariffs", "system_settings",
+    ]
+    assert ts.dependencies(5, 4)[:3] == ["readings@5", "readings@4", "readings@*"]
+
+    stored = []
+
+    async def _miss(_key):
+        return None
+
+    async def _versions(keys):
+        return ["1"] * len(keys)
+
+    async def _store(key, deps, versions, result):
+        stored.append(deps)
+
+    async def _prev(_db, period_id):
+        return period_id - 1
+
+    async def _simulate(db, draft, *, period_id, scope):
+        return ts.Simulation(period=SimpleNamespace(id=period_id, name="Октябрь 2026"))
+
+    for name, fn in (("load_result", _miss), ("read_versions", _versions), ("store_result", _store),
+                     ("previous_period_id", _prev), ("simulate", _simulate)):
+        monkeypatch.setattr(ts, name, fn)
+    draft = ts.build_draft_tariff({"water_supply": "40"})
+    _result, cached = asyncio.run(ts.run_cached(None, draft, period_id=5, scope={}))
+    assert cached is False and "readings@4" in stored[0]
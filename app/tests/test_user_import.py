@@ -0,0 +1,131 @@
+"""Unit-тесты пакетного импорта жильцов (user_import.py) — без БД.
+
+Покрываем:
+  - parse_row:         разбор строки листа (адрес, числа, тариф, тип жильца)
+  - iter_row_batches:  потоковый разбор пачками и resume со start_row
+  - _merge_room_rows:  одна запись на комнату для ON CONFLICT
+  - _merge_summary:    накопление счётчиков и лимит ошибок
+"""
+from decimal import Decimal
+
+import pytest
+from openpyxl import Workbook
+
+from app.modules.utility.services import user_import
+from app.modules.utility.services.user_import import (
+    _merge_room_rows,
+    _merge_summary,
+    iter_row_batches,
+    parse_row,
+)
+
+TARIFFS = {"базовый": 7}
+
+
+def _row(username="Иванов Иван", password=None, dorm="Общ-1", room="101", area=18.5,
+         places=2, residents=1, tariff=None, rtype=None):
+    return (username, password, dorm, room, area, places, residents,
+            "ГВС-1", None, "ЭЛ-1", "Цех", tariff, rtype)
+
+
+class TestParseRow:
+    def test_full_row(self):
+        errors = []
+        r = parse_row(2, _row(tariff="Базовый"), TARIFFS, errors)
+        assert errors == []
+        assert r.dormitory == "Общ-1" and r.room_number == "101"
+        assert r.apartment_area == Decimal("18.5")
+        assert r.tariff_id == 7
+        assert r.resident_type == "family"
+        # Пароль не задан → равен логину и не считается «явным».
+        assert r.password == "Иванов Иван" and not r.explicit_password
+
+    def test_blank_row_is_silent(self):
+        errors = []
+        assert parse_row(3, (None, None, None), TARIFFS, errors) is None
+        assert errors == []
+
+    def test_missing_address_reported(self):
+        errors = []
+        assert parse_row(4, _row(room=None), TARIFFS, errors) is None
+        assert "Строка 4" in errors[0]
+
+    def test_bad_numbers_fall_back(self):
+        errors = []
+        r = parse_row(5, _row(area="abc"), TARIFFS, errors)
+        assert r.apartment_area == Decimal("0.00")
+        assert r.total_room_residents == 1
+        assert "числовых" in errors[0]
+
+    def test_unknown_tariff_and_single(self):
+        errors = []
+        r = parse_row(6, _row(tariff="Нет такого", rtype="Койко-место", password="secret"),
+                      TARIFFS, errors)
+        assert r.tariff_id is None
+        assert r.resident_type == "single"
+        assert r.explicit_password
+        assert "не найден" in errors[0]
+
+
+def _write_sheet(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Логин", "Пароль", "Общежитие", "Комната"])
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+
+
+class TestIterRowBatches:
+    def test_batches_and_checkpoints(self, tmp_path):
+        path = tmp_path / "import.xlsx"
+        _write_sheet(path, [_row(username=f"Жилец {i}", room=str(i)) for i in range(7)]
+                     + [_row(room=None)])
+
+        batches = list(iter_row_batches(str(path), TARIFFS, batch_size=3))
+
+        assert [b[0] for b in batches] == [4, 7, 9]      # последняя строка Excel
+        assert sum(b[1] for b in batches) == 8           # прочитано
+        assert sum(b[2] for b in batches) == 1           # без адреса
+        assert sum(len(b[3]) for b in batches) == 7
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        path = tmp_path / "import.xlsx"
+        _write_sheet(path, [_row(username=f"Жилец {i}", room=str(i)) for i in range(5)])
+
+        batches = list(iter_row_batches(str(path), TARIFFS, start_row=5, batch_size=10))
+
+        names = [r.username for b in batches for r in b[3]]
+        assert names == ["Жилец 3", "Жилец 4"]
+
+    def test_parser_error_propagates(self, tmp_path):
+        with pytest.raises(Exception):
+            list(iter_row_batches(str(tmp_path / "missing.xlsx"), TARIFFS))
+
+
+def test_merge_room_rows_keeps_last_non_empty():
+    errors = []
+    a = parse_row(2, _row(area=18, places=2), TARIFFS, errors)
+    b = parse_row(3, _row(username="Петров", area=None, places=3), TARIFFS, errors)
+    b.hw_serial = None
+
+    merged = _merge_room_rows([a, b])
+
+    assert list(merged) == [("Общ-1", "101")]
+    item = merged[("Общ-1", "101")]
+    assert item["apartment_area"] == Decimal("18")      # пустая площадь не затирает
+    assert item["total_room_residents"] == 3
+    assert item["hw_meter_serial"] == "ГВС-1"
+
+
+def test_merge_summary_caps_errors(monkeypatch):
+    monkeypatch.setattr(user_import, "ERRORS_LIMIT", 3)
+    summary = user_import._empty_summary()
+
+    summary = _merge_summary(summary, {"added_users": 2, "skipped": 1}, ["e1", "e2"])
+    summary = _merge_summary(summary, {"added_users": 1, "skipped": 0}, ["e3", "e4", "e5"])
+
+    assert summary["added_users"] == 3
+    assert summary["skipped"] == 1
+    assert summary["errors"] == ["e1", "e2", "e3"]
+    assert summary["errors_truncated"] == 2
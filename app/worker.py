@@ -62,6 +62,8 @@ celery.conf.update(
         # run_arsenal_analyzer_task — arsenal_gsm_default).
         "generate_receipt_task": {"queue": "heavy"},
         "import_debts_task": {"queue": "heavy"},
+        "import_users_task": {"queue": "heavy"},
+        "maintain_audit_partitions_task": {"queue": "heavy"},
 
         # ВСЕ ОСТАЛЬНЫЕ ЗАДАЧИ (легкие ЖКХ) -> default queue.
         "*": {"queue": "default"},
@@ -99,6 +101,12 @@ celery.conf.beat_schedule = {
             else crontab(minute=0, hour=0, day_of_month="31", month_of_year="2")  # никогда
         ),
     },
+    # Автопогашение строк буфера GSheets, чей месяц решён другим путём
+    # (ручной ввод/QR/Excel) — каждые 5 минут. Раньше — в каждом GET реестра.
+    "retire-superseded-gsheets-rows-5min": {
+        "task": "retire_superseded_gsheets_rows_task",
+        "schedule": crontab(minute="*/5"),
+    },
     # Анализатор арсенала: раз в час проверяет данные на дубли / застой /
     # фрод-паттерны. Результат попадает в arsenal_anomaly_flags.
     "arsenal-analyzer-hourly": {
@@ -138,6 +146,12 @@ celery.conf.beat_schedule = {
         "task": "cleanup_qr_tickets_task",
         "schedule": crontab(minute=50, hour=3),
     },
+    # Партиции audit_log: месяцы вперёд + выгрузка в gzip-JSONL и DETACH
+    # вышедших за audit.retention_months (default 24). Ежедневно в 03:40.
+    "maintain-audit-partitions-daily": {
+        "task": "maintain_audit_partitions_task",
+        "schedule": crontab(minute=40, hour=3),
+    },
     # Bug AO: дневная авто-добивка нормативом. Каждый день в 03:45 проходит
     # по периодам, которые закрыты (или давно неактивны), и добавляет
     # reading'и для жильцов без подачи — по стратегии AUTO_NORM_SANCTION /
@@ -30,6 +30,23 @@ MAX_REQUESTS_JITTER=${GUNICORN_MAX_REQUESTS_JITTER:-200}
 
 echo "Workers: $WORKERS | Threads: $THREADS | CPU: $CPU_COUNT"
 
+# Собранная статика образа (build_static: хешированные JS/CSS, .gz, HTML со
+# ссылками на них) → named volume, который nginx отдаёт как /static. Только
+# там, где задан STATIC_DIST_DIR (web-контейнер). Сначала всё кроме HTML, потом HTML —
+# nginx не отдаст страницу со ссылкой на ещё не выложенный хешированный файл.
+# Хешированные файлы прошлых релизов остаются (их просят закэшированные HTML),
+# старше 30 дней — удаляются. generated_files/apps — свои тома, не копируем.
+if [ -n "$STATIC_DIST_DIR" ]; then
+  echo "Publishing static → $STATIC_DIST_DIR"
+  # -m: mtime = время выкладки — по нему чистка ниже отличает прошлые релизы.
+  tar -C /app/static --exclude=./generated_files --exclude=./apps --exclude='*.html' -cf - . \
+    | tar -C "$STATIC_DIST_DIR" -xmf -
+  tar -C /app/static --exclude=./generated_files --exclude=./apps -cf - . \
+    | tar -C "$STATIC_DIST_DIR" -xmf - --wildcards '*.html'
+  find "$STATIC_DIST_DIR" -type f -mtime +30 \
+    -regextype posix-extended -regex '.*\.[0-9a-f]{10}\.(js|css)(\.gz|\.br)?$' -delete
+fi
+
 # Явно используем app.core.uvicorn_worker.UvloopWorker — это subclass
 # uvicorn.workers.UvicornWorker с зафиксированными loop=uvloop и http=httptools.
 # Стандартный UvicornWorker имеет loop="auto" — обычно берёт uvloop, но при
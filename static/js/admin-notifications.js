@@ -1,12 +1,14 @@
 // static/js/admin-notifications.js
 //
 // Колокольчик уведомлений в шапке админки.
-// Polling /api/admin/notifications каждые 30 секунд, badge с числом
-// событий. При клике — dropdown со сгруппированными категориями.
+// Сводка приходит push'ем из SSE-потока /api/admin/events (core/admin-events.js);
+// пока поток недоступен — fallback-polling /api/admin/notifications раз в
+// 30 секунд. Badge с числом событий, при клике — dropdown с категориями.
 // Click по категории — модалка категории; дип-линки бэка ведут на #readings/#tools.
 
 import { api } from './core/api.js';
 import { Auth } from './core/auth.js';
+import { adminEvents } from './core/admin-events.js';
 
 const POLL_INTERVAL_MS = 30_000;
 
@@ -112,27 +114,42 @@ function injectCss() {
 let _pollTimer = null;
 let _outsideClickHandler = null;
 
-async function fetchAndRender() {
+function renderBadge(data) {
     const btn = document.getElementById('notifBtn');
     const badge = document.getElementById('notifBadge');
-    if (!btn || !badge) return;
+    if (!btn || !badge || !data) return;
+
+    const total = data.total || 0;
+    if (total > 0) {
+        badge.textContent = total > 99 ? '99+' : String(total);
+        badge.hidden = false;
+    } else {
+        badge.hidden = true;
+    }
+    // Сохраняем для следующего открытия dropdown.
+    btn.dataset.cache = JSON.stringify(data);
+}
 
+async function fetchAndRender() {
+    if (!document.getElementById('notifBtn')) return;
     try {
-        const data = await api.get('/admin/notifications');
-        const total = data.total || 0;
-        if (total > 0) {
-            badge.textContent = total > 99 ? '99+' : String(total);
-            badge.hidden = false;
-        } else {
-            badge.hidden = true;
-        }
-        // Сохраняем для следующего открытия dropdown.
-        btn.dataset.cache = JSON.stringify(data);
+        renderBadge(await api.get('/admin/notifications'));
     } catch (e) {
         console.warn('[notifs] fetch failed:', e);
     }
 }
 
+function startPolling() {
+    if (_pollTimer) return;
+    fetchAndRender();
+    _pollTimer = setInterval(fetchAndRender, POLL_INTERVAL_MS);
+}
+
+function stopPolling() {
+    if (_pollTimer) clearInterval(_pollTimer);
+    _pollTimer = null;
+}
+
 function renderDropdown(data) {
     const cats = data?.categories || {};
     const items = Object.entries(cats);
@@ -249,10 +266,11 @@ export function initAdminNotifications() {
         e.stopPropagation();
         toggleDropdown();
     });
-    // Первая загрузка — сразу, потом polling.
-    fetchAndRender();
-    if (_pollTimer) clearInterval(_pollTimer);
-    _pollTimer = setInterval(fetchAndRender, POLL_INTERVAL_MS);
+    // Push: первым кадром потока приходит текущая сводка. Polling — только
+    // пока поток не подключён (старт, обрыв, прокси без streaming).
+    adminEvents.on('notifications', renderBadge);
+    adminEvents.on('status', ({ connected }) => (connected ? stopPolling() : startPolling()));
+    if (!adminEvents.connected) startPolling();
 }
 
 // Auto-init если в DOM есть колокольчик (admin.html). На других страницах
@@ -21,6 +21,9 @@ if (!Auth.isAuthenticated()) {
 // должен зависеть от логирования. Дедуп по message за последние 5с —
 // чтобы цикл «while(true){throw}» в багнутом компоненте не залил БД.
 const _frontendErrorRecent = new Map();  // message → timestamp
+// Сборка: хеш в имени этого модуля (app.d9df065e17.js — build_static; он
+// зависит и от всех статических импортов). В dev (js/app.js) — null.
+const _release = (import.meta.url.match(/\.([0-9a-f]{10})\.js(?:[?#]|$)/) || [])[1] || null;
 function _reportFrontendError(payload) {
     try {
         const key = (payload.message || '') + '|' + (payload.source || '');
@@ -40,7 +43,7 @@ function _reportFrontendError(payload) {
         fetch('/api/errors/frontend', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload),
+            body: JSON.stringify({ ...payload, release: _release }),
             keepalive: true,  // дойдёт даже если страница закрывается
         }).catch(() => {});
     } catch { /* безопасно игнорируем */ }
@@ -0,0 +1,140 @@
+// static/js/core/admin-events.js
+//
+// Push-канал админки: SSE-поток GET /api/admin/events.
+//
+// EventSource не умеет слать заголовки, а токен у нас только в
+// Authorization (sessionStorage, своя вкладка — свой токен). Поэтому
+// поток читаем через fetch + ReadableStream и разбираем text/event-stream
+// вручную.
+//
+// События:
+//   notifications — сводка колокольчика (как GET /admin/notifications)
+//   job           — прогресс фоновых задач {kind, job_id, status, progress, ...}
+//
+// Использование:
+//   import { adminEvents } from './core/admin-events.js';
+//   const off = adminEvents.on('job', (data) => { ... });
+//   adminEvents.connected  // true — поток жив, polling можно не делать
+//
+// При обрыве — переподключение с backoff; подписчики сами решают, включать
+// ли fallback-polling (adminEvents.on('status', ({connected}) => ...)).
+
+import { Auth } from './auth.js';
+
+const STREAM_URL = '/api/admin/events';
+const RETRY_MIN_MS = 2_000;
+const RETRY_MAX_MS = 60_000;
+
+class AdminEventStream {
+    constructor() {
+        this._handlers = new Map();
+        this._controller = null;
+        this._retryMs = RETRY_MIN_MS;
+        this._retryTimer = null;
+        this.connected = false;
+    }
+
+    on(event, handler) {
+        if (!this._handlers.has(event)) this._handlers.set(event, new Set());
+        this._handlers.get(event).add(handler);
+        this.start();
+        return () => this._handlers.get(event)?.delete(handler);
+    }
+
+    _emit(event, data) {
+        for (const handler of this._handlers.get(event) || []) {
+            try { handler(data); } catch (e) { console.warn('[events] handler failed:', e); }
+        }
+    }
+
+    _setConnected(value) {
+        if (this.connected === value) return;
+        this.connected = value;
+        this._emit('status', { connected: value });
+    }
+
+    start() {
+        if (this._controller || this._retryTimer) return;
+        if (typeof fetch === 'undefined' || typeof TextDecoder === 'undefined') return;
+        this._run();
+    }
+
+    stop() {
+        if (this._retryTimer) clearTimeout(this._retryTimer);
+        this._retryTimer = null;
+        this._controller?.abort();
+        this._controller = null;
+        this._setConnected(false);
+    }
+
+    async _run() {
+        const token = Auth.getToken();
+        if (!token) return;
+        const controller = new AbortController();
+        this._controller = controller;
+        try {
+            const response = await fetch(STREAM_URL, {
+                headers: { 'Accept': 'text/event-stream', 'Authorization': `Bearer ${token}` },
+                credentials: 'include',
+                cache: 'no-store',
+                signal: controller.signal,
+            });
+            // 401/403 — не переподключаемся: сессия кончилась или роль не та.
+            if (response.status === 401 || response.status === 403) {
+                this._controller = null;
+                return;
+            }
+            if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+            this._setConnected(true);
+            this._retryMs = RETRY_MIN_MS;
+            await this._read(response.body.getReader());
+        } catch (e) {
+            if (controller.signal.aborted) return;
+            console.warn('[events] stream error:', e.message || e);
+        }
+        this._controller = null;
+        this._setConnected(false);
+        this._retryTimer = setTimeout(() => {
+            this._retryTimer = null;
+            this._run();
+        }, this._retryMs);
+        this._retryMs = Math.min(this._retryMs * 2, RETRY_MAX_MS);
+    }
+
+    async _read(reader) {
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) return;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                this._dispatch(buffer.slice(0, sep));
+                buffer = buffer.slice(sep + 2);
+            }
+        }
+    }
+
+    _dispatch(frame) {
+        let event = 'message';
+        const data = [];
+        for (const line of frame.split('\n')) {
+            if (line.startsWith(':')) continue;              // keepalive-комментарий
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+            else if (line.startsWith('retry:')) {
+                const ms = parseInt(line.slice(6), 10);
+                if (ms > 0) this._retryMs = ms;
+            }
+        }
+        if (!data.length) return;
+        try {
+            this._emit(event, JSON.parse(data.join('\n')));
+        } catch (e) {
+            console.warn('[events] bad frame:', e);
+        }
+    }
+}
+
+export const adminEvents = new AdminEventStream();
@@ -16,6 +16,7 @@ export const AuditModule = {
         action: '',
         entity: '',
         userFilter: '',
+        includeArchive: false,
     },
 
     async init() {
@@ -62,6 +63,11 @@ export const AuditModule = {
             this.state.page = 1;
             this.refresh();
         });
+        document.getElementById('auditIncludeArchive')?.addEventListener('change', (e) => {
+            this.state.includeArchive = e.target.checked;
+            this.state.page = 1;
+            this.refresh();
+        });
         let userFilterTimer = null;
         document.getElementById('auditUserFilter')?.addEventListener('input', (e) => {
             clearTimeout(userFilterTimer);
@@ -111,6 +117,7 @@ export const AuditModule = {
             });
             if (this.state.action) qs.set('action', this.state.action);
             if (this.state.entity) qs.set('entity_type', this.state.entity);
+            if (this.state.includeArchive) qs.set('include_archive', 'true');
             const data = await api.get('/admin/audit-log?' + qs.toString());
             this.state.total = data.total;
             this._lastItems = data.items;
@@ -152,6 +159,7 @@ export const AuditModule = {
             <tr>
                 <td style="font-size: 12px; color: var(--text-secondary); white-space: nowrap;">
                     ${escapeHtml(it.created_at || '—')}
+                    ${it.archived ? '<i class="fa-solid fa-box-archive" title="Из архива"></i>' : ''}
                 </td>
                 <td>
                     <span style="font-weight: 600; font-size: 13px;">${escapeHtml(it.username || '—')}</span>
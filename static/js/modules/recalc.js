@@ -5,8 +5,9 @@
 //
 // UX-контракт:
 // 1. Админ выбирает период из селектора, жмёт «Предпросчёт».
-// 2. В фоне Celery считает новые суммы по актуальным тарифам. Мы поллим
-//    /admin/recalc-jobs/{id} раз в 2 секунды и показываем прогресс.
+// 2. В фоне Celery считает новые суммы по актуальным тарифам. Прогресс
+//    приходит событиями `job` из SSE-потока (core/admin-events.js); пока
+//    поток не подключён — поллим /admin/recalc-jobs/{id} раз в 2 секунды.
 // 3. Когда preview готов — в модалке показываем таблицу «старое vs новое»
 //    и три кнопки: «Применить к БД», «Отмена», «Закрыть».
 // 4. «Применить к БД» доступна только админу (сервер отбивает 403 для
@@ -15,8 +16,12 @@
 
 import { api } from '../core/api.js';
 import { toast, showConfirm } from '../core/dom.js';
+import { adminEvents } from '../core/admin-events.js';
 
 const POLL_INTERVAL_MS = 2000;
+// Страховочный опрос при живом SSE-потоке (потерянное событие, рестарт воркера).
+const STREAM_POLL_INTERVAL_MS = 15000;
+const TERMINAL_STATUSES = ['preview_ready', 'done', 'failed', 'cancelled'];
 
 function escapeHtml(s) {
     if (s === null || s === undefined) return '';
@@ -114,8 +119,7 @@ export const RecalcModule = {
             try {
                 const job = await api.get(`/admin/recalc-jobs/${jobId}`);
                 onUpdate(job);
-                const terminal = ['preview_ready', 'done', 'failed', 'cancelled'];
-                if (terminal.includes(job.status)) {
+                if (TERMINAL_STATUSES.includes(job.status)) {
                     this._stopPoll();
                     return;
                 }
@@ -123,8 +127,23 @@ export const RecalcModule = {
                 console.warn('[RECALC] poll error:', e.message);
             }
         };
+        // Промежуточный прогресс рисуем прямо из события; финал (diff_summary)
+        // — одним GET.
+        this.offJobEvents = adminEvents.on('job', (ev) => {
+            if (ev.kind !== 'recalc' || ev.job_id !== jobId) return;
+            if (TERMINAL_STATUSES.includes(ev.status)) {
+                tick();
+                return;
+            }
+            onUpdate({
+                id: jobId, status: ev.status, progress: ev.progress,
+                processed: ev.processed, total_readings: ev.total,
+            });
+        });
         tick();
-        this.pollTimer = setInterval(tick, POLL_INTERVAL_MS);
+        this.pollTimer = setInterval(
+            tick, adminEvents.connected ? STREAM_POLL_INTERVAL_MS : POLL_INTERVAL_MS,
+        );
     },
 
     _stopPoll() {
@@ -132,6 +151,10 @@ export const RecalcModule = {
             clearInterval(this.pollTimer);
             this.pollTimer = null;
         }
+        if (this.offJobEvents) {
+            this.offJobEvents();
+            this.offJobEvents = null;
+        }
     },
 
     async startPreview() {
@@ -179,8 +179,15 @@ export const RegistryModule = {
     });
   },
 
+  // Keyset-пагинация: next_cursor страницы N — курсор для страницы N+1.
+  // Листаем только соседние страницы, поэтому курсор нужной страницы всегда
+  // получен при текущих фильтрах; без курсора (стр. 1) сервер берёт offset.
+  _cursors: {},
+
   _query() {
+    var cursor = this.state.page > 1 ? this._cursors[this.state.page - 1] : null;
     return '/admin/registry?page=' + this.state.page + '&limit=' + this.state.limit +
+      (cursor ? '&cursor=' + encodeURIComponent(cursor) : '') +
       (this.state.source ? '&source=' + encodeURIComponent(this.state.source) : '') +
       (this.state.status ? '&status=' + encodeURIComponent(this.state.status) : '') +
       (this.state.period_id ? '&period_id=' + encodeURIComponent(this.state.period_id) : '') +
@@ -315,6 +322,7 @@ export const RegistryModule = {
       }).join('');
     }
 
+    this._cursors[data.page || 1] = data.next_cursor || null;
     if (this.dom.pager) {
       var pages = Math.max(1, Math.ceil((data.total || 0) / this.state.limit));
       if (this.state.page > pages) this.state.page = pages;
@@ -56,9 +56,24 @@ export async function handleImport(importInput, btnImport, table) {
     setLoading(btnImport, true, 'Загрузка...');
 
     try {
-        const result = await api.post('/users/import_excel', formData);
-        showImportResultModal(result);
+        // Импорт идёт фоновой задачей: сервер сразу отдаёт job, дальше
+        // поллим прогресс. Упавший импорт можно продолжить с чекпоинта.
+        let job = await api.post('/users/import_excel', formData);
         importInput.value = '';
+        job = await pollImportJob(job, btnImport);
+        if (job.status === 'failed') {
+            const resume = await showConfirm(
+                `Импорт остановился на строке ${job.checkpoint_row}: ${job.error || 'ошибка'}.\n\n` +
+                'Уже записанные строки сохранены. Продолжить с этого места?',
+                { confirmText: 'Продолжить' }
+            );
+            if (resume) {
+                job = await api.post(`/users/import_jobs/${job.id}/resume`, {});
+                job = await pollImportJob(job, btnImport);
+            }
+        }
+        if (job.summary) showImportResultModal(job.summary);
+        if (job.status === 'failed') toast(`Импорт не завершён: ${job.error || 'ошибка'}`, 'error');
         table.refresh();
     } catch (error) {
         toast(error.message, 'error');
@@ -67,6 +82,21 @@ export async function handleImport(importInput, btnImport, table) {
     }
 }
 
+async function pollImportJob(job, btnImport) {
+    const INTERVAL_MS = 2000;
+    while (job.status === 'pending' || job.status === 'running') {
+        setLoading(btnImport, true, `Импорт ${job.progress || 0}%...`);
+        await new Promise(r => setTimeout(r, INTERVAL_MS));
+        try {
+            job = await api.get(`/users/import_jobs/${job.id}`);
+        } catch (e) {
+            // Сетевой блип — задача идёт на сервере, просто повторяем.
+            console.warn('[import] poll failed:', e.message);
+        }
+    }
+    return job;
+}
+
 // ==========================================
 // ЕДИНЫЙ ПРОЦЕСС: РАСЧЕТ + ПЕРЕСЕЛЕНИЕ/ВЫСЕЛЕНИЕ
 // ==========================================